@@ -17,3 +17,4 @@ source ${virtualenv_dir}/bin/activate
 ./manage.py hansard_check_for_new_sources
 ./manage.py hansard_process_sources
 ./manage.py hansard_assign_speakers
+./manage.py hansard_update_appearance_summaries
@@ -17,4 +17,4 @@ cd `dirname $0`/..
 ./manage.py za_hansard_q_and_a_scraper --run-all-steps
 
 # Run the committee minutes scraper and imports
-./manage.py za_hansard_pmg_api_scraper --scrape --save-json --import-to-sayit --delete-existing --commit
+./manage.py za_hansard_pmg_api_scraper --scrape --save-json --import-to-sayit --delete-existing --commit --workers 4
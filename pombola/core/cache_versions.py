@@ -0,0 +1,43 @@
+"""
+Versions that cached results are stored under, to invalidate them cheaply.
+
+Rather than deleting cached results when something they were made from
+changes (or clearing a whole cache), their keys include the current
+version of each thing they depend on, and invalidate() gives a thing a
+new version; the old results are then never looked up again, and are
+left to expire.
+
+The versions are random, rather than counters, so that if a version is
+evicted from the cache, results stored under an earlier one can't be
+mistaken for current ones. e.g.:
+
+    cache = caches['house_composition']
+    key = '-'.join(get_versions(cache, 'house-version-', [house.id]))
+    ...
+    invalidate(cache, 'house-version-', house.id)
+"""
+
+import uuid
+
+
+def version_key(prefix, name):
+    return '{0}{1}'.format(prefix, name)
+
+
+def get_versions(cache, prefix, names):
+    """Return the current version of each name, creating missing ones"""
+    keys = [version_key(prefix, name) for name in names]
+    versions = cache.get_many(keys)
+    missing = dict(
+        (key, uuid.uuid4().hex) for key in keys if key not in versions)
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(cache, prefix, *names):
+    """Give each of the names a new version"""
+    cache.set_many(
+        dict((version_key(prefix, name), uuid.uuid4().hex) for name in names),
+        None)
@@ -0,0 +1,196 @@
+"""
+A cache of rendered page fragments that knows what they were made from.
+
+Each fragment is cached under a key which includes a version for every
+object (or whole model) it depends on, e.g.:
+
+    {% load cache_fragments %}
+    {% cachefragment "person-summary" object "core.Organisation" %}
+      ...
+    {% endcachefragment %}
+
+When one of those objects is saved or deleted, the signal handlers that
+pombola.core.models connects with track_model give it a new version, so
+the fragment is rendered again on the next request rather than a stale
+copy being served. A dependency on a model (given as a model class or
+an 'app_label.ModelName' string) changes when any of its rows do.
+Changes to related objects can invalidate the objects they're shown
+with (e.g. a Position invalidates its person, place and organisation)
+through the related functions passed to track_model.
+
+Fragments also vary by the current date, since most of them show what
+is current. If the FRAGMENT_CACHE_STATS setting is True, the numbers of
+hits and misses for each fragment name are counted in the cache too
+(see core_fragment_cache_stats).
+"""
+
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+
+from pombola.core import cache_versions
+
+CACHE_ALIAS = 'fragments'
+
+# The names of the fragments that this process has counted, so that
+# each is only added to the list of names in the cache once:
+counted_fragment_names = set()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def dependency_name(dependency, pk=None):
+    """Return the version name for a model instance, class or label
+
+    >>> from pombola.core.models import Person
+    >>> dependency_name(Person)
+    'core.person'
+    >>> dependency_name('core.Person', 42)
+    'core.person:42'
+    >>> dependency_name(Person(id=3))
+    'core.person:3'
+    """
+    if isinstance(dependency, Model):
+        pk = dependency.pk
+        dependency = dependency.__class__
+    if isinstance(dependency, basestring):
+        dependency = apps.get_model(dependency)
+    # Saving a proxy model's instance sends the signals for the proxy,
+    # so fragments always depend on the concrete model:
+    opts = dependency._meta.concrete_model._meta
+    name = '{0}.{1}'.format(opts.app_label, opts.model_name)
+    if pk is not None:
+        name += ':{0}'.format(pk)
+    return name
+
+
+VERSION_PREFIX = 'fragment-version-'
+
+
+def get_versions(names):
+    """Return the current version of each name, creating missing ones"""
+    return cache_versions.get_versions(get_cache(), VERSION_PREFIX, names)
+
+
+def invalidate(*names):
+    """Give each of the version names a new version"""
+    cache_versions.invalidate(get_cache(), VERSION_PREFIX, *names)
+
+
+def flatten_dependencies(dependencies):
+    """Yield the version names of dependencies, expanding any lists"""
+    for dependency in dependencies:
+        if dependency is None or dependency == '':
+            continue
+        if isinstance(dependency, (Model, type, basestring)):
+            yield dependency_name(dependency)
+        else:
+            for name in flatten_dependencies(dependency):
+                yield name
+
+
+def fragment_key(name, dependencies, vary_on=()):
+    names = sorted(set(flatten_dependencies(dependencies)))
+    return 'fragment-{0}-{1}'.format(name, '-'.join(
+        [datetime.date.today().isoformat()] +
+        [unicode(v) for v in vary_on] +
+        get_versions(names)))
+
+
+def count(name, outcome):
+    """Add one to the hits or misses of the fragment called name"""
+    if not settings.FRAGMENT_CACHE_STATS:
+        return
+    cache = get_cache()
+    if name not in counted_fragment_names:
+        names = cache.get('fragment-stats-names') or set()
+        if name not in names:
+            cache.set('fragment-stats-names', names | set([name]), None)
+        counted_fragment_names.add(name)
+    key = 'fragment-stats-{0}-{1}'.format(name, outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # It was evicted since it was added
+        cache.set(key, 1, None)
+
+
+def fragment_stats():
+    """Return a dict mapping each fragment name to its (hits, misses)"""
+    cache = get_cache()
+    names = cache.get('fragment-stats-names') or set()
+    counts = cache.get_many(
+        ['fragment-stats-{0}-{1}'.format(name, outcome)
+         for name in names for outcome in ('hits', 'misses')])
+    return dict(
+        (name, tuple(
+            counts.get('fragment-stats-{0}-{1}'.format(name, outcome), 0)
+            for outcome in ('hits', 'misses')))
+        for name in names
+    )
+
+
+def reset_fragment_stats():
+    cache = get_cache()
+    names = cache.get('fragment-stats-names') or set()
+    cache.delete_many(
+        ['fragment-stats-{0}-{1}'.format(name, outcome)
+         for name in names for outcome in ('hits', 'misses')] +
+        ['fragment-stats-names'])
+    counted_fragment_names.clear()
+
+
+def get_or_render(name, dependencies, render, vary_on=()):
+    """Return the cached fragment, or cache and return render()"""
+    cache = get_cache()
+    key = fragment_key(name, dependencies, vary_on)
+    content = cache.get(key)
+    if content is None:
+        count(name, 'misses')
+        content = render()
+        cache.set(key, content)
+    else:
+        count(name, 'hits')
+    return content
+
+
+# The models whose changes invalidate fragments, mapped to the function
+# (or None) that finds the related objects they also invalidate:
+tracked_models = {}
+
+
+def track_model(model, related=None):
+    """Invalidate the fragments depending on a model's rows when they change
+
+    related, if given, should be a function that takes an instance of
+    model and returns a list of (model, pk) tuples of the other objects
+    whose fragments show it (or (model, None) for every object of a
+    model); it shouldn't need to query the database."""
+    tracked_models[model] = related
+
+
+def invalidate_for_instance(sender, instance, **kwargs):
+    """A signal handler to invalidate the fragments that show instance"""
+    model = sender._meta.concrete_model
+    if model not in tracked_models:
+        return
+    names = [dependency_name(model), dependency_name(model, instance.pk)]
+    related = tracked_models[model]
+    if related:
+        names.extend(
+            dependency_name(m, pk) for m, pk in related(instance)
+            if m is not None)
+    invalidate(*names)
+
+# These are connected for every sender so that saving an instance of a
+# proxy model (e.g. ZAPlace) invalidates the fragments for its concrete
+# model too:
+post_save.connect(invalidate_for_instance, dispatch_uid='fragment-cache-save')
+post_delete.connect(invalidate_for_instance, dispatch_uid='fragment-cache-delete')
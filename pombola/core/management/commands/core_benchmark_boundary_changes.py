@@ -0,0 +1,63 @@
+# Compare the time taken to find boundary changes by intersecting the
+# MapIt boundaries (as Place.get_boundary_changes used to on every
+# request) with the time taken to look them up in the precomputed
+# PlaceBoundaryOverlap table.  For example, with the Kenyan 2013
+# boundaries imported by core_import_kenyan_boundaries_2013:
+#
+#   ./manage.py core_benchmark_boundary_changes --kind=constituency --limit=50
+
+from optparse import make_option
+import time
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from pombola.core.models import Place, PlaceBoundaryOverlap, PlaceKind
+
+
+class Command(NoArgsCommand):
+
+    help = 'Time live boundary intersections against the precomputed overlaps'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--kind', dest='kind', default='constituency', help='The slug of the PlaceKind to test'),
+        make_option('--limit', dest='limit', type='int', default=20, help='The number of places to test'),
+    )
+
+    def handle_noargs(self, **options):
+        try:
+            kind = PlaceKind.objects.get(slug=options['kind'])
+        except PlaceKind.DoesNotExist:
+            raise CommandError("No PlaceKind with slug '{0}'".format(options['kind']))
+        places = list(
+            Place.objects.filter(
+                kind=kind,
+                mapit_area__isnull=False,
+                parliamentary_session__isnull=False,
+            ).select_related('kind', 'mapit_area__type')[:options['limit']]
+        )
+        if not places:
+            raise CommandError("No places of that kind with MapIt areas")
+
+        live_times = []
+        lookup_times = []
+        for place in places:
+            start = time.time()
+            for session in place.adjacent_sessions():
+                if session:
+                    PlaceBoundaryOverlap.objects.calculate_overlaps(place, session)
+            live_times.append(time.time() - start)
+
+            start = time.time()
+            place.get_boundary_changes()
+            lookup_times.append(time.time() - start)
+
+        for label, times in (('Live GEOS intersections', live_times),
+                             ('Precomputed lookup', lookup_times)):
+            times.sort()
+            print "{0}: mean {1:.4f}s, median {2:.4f}s, max {3:.4f}s over {4} places".format(
+                label,
+                sum(times) / len(times),
+                times[len(times) // 2],
+                times[-1],
+                len(times),
+            )
@@ -0,0 +1,100 @@
+# Compare the time taken and peak memory used by the streaming Popolo
+# export in pombola.core.popolo with building the whole of the Popolo
+# data in memory and then dumping it, as core_export_to_popolo_json
+# used to.  Each export is run in its own process, so that the peak
+# resident set size reported is just that export's.  For example:
+#
+#   ./manage.py core_benchmark_popolo_export https://www.pa.org.za/
+
+from multiprocessing import Process, Queue
+from optparse import make_option
+from os.path import join
+import json
+import resource
+import shutil
+import tempfile
+import time
+import urlparse
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from pombola.core.models import Person, Position
+from pombola.core.popolo import get_popolo_data, write_pombola_json
+
+
+def in_memory_export(output_directory, primary_id_scheme, base_url):
+    for inline_memberships, leafname in (
+            (True, 'pombola.json'),
+            (False, 'pombola-no-inline-memberships.json'),
+    ):
+        popolo_data = get_popolo_data(
+            primary_id_scheme,
+            base_url,
+            inline_memberships=inline_memberships
+        )
+        with open(join(output_directory, leafname), 'w') as f:
+            json.dump(popolo_data, f, indent=4, sort_keys=True)
+
+
+def run_and_measure(export_function, args, queue):
+    start = time.time()
+    export_function(*args)
+    # ru_maxrss is in kilobytes on Linux:
+    queue.put((time.time() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+class Command(BaseCommand):
+    args = 'POMBOLA-URL'
+    help = 'Time the streaming Popolo export against building it in memory'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--compare', action='store_true', dest='compare', default=False,
+            help='Check that both exports produce the same data (this loads them both into memory)'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError("You must provide the Pombola instance URL")
+        base_url = args[0]
+        parsed_url = urlparse.urlparse(base_url)
+        if not parsed_url.netloc:
+            raise CommandError("The Pombola URL must begin http:// or https://")
+        primary_id_scheme = '.'.join(reversed(parsed_url.netloc.split('.')))
+
+        print "{0} people, {1} positions".format(
+            Person.objects.count(), Position.objects.count())
+
+        outputs = {}
+        for label, export_function in (('In memory', in_memory_export),
+                                       ('Streaming', write_pombola_json)):
+            output_directory = tempfile.mkdtemp()
+            try:
+                # Each child process opens its own database connection:
+                connections.close_all()
+                queue = Queue()
+                process = Process(
+                    target=run_and_measure,
+                    args=(export_function,
+                          (output_directory, primary_id_scheme, base_url),
+                          queue))
+                process.start()
+                process.join()
+                if process.exitcode != 0:
+                    raise CommandError("The '{0}' export failed".format(label))
+                seconds, max_rss = queue.get()
+                print "{0}: {1:.2f}s, peak memory {2:.1f}MB".format(
+                    label, seconds, max_rss / 1024.0)
+                if options['compare']:
+                    with open(join(output_directory, 'pombola.json')) as f:
+                        outputs[label] = json.load(f)
+            finally:
+                shutil.rmtree(output_directory)
+
+        # The collections are in a different order, but their contents
+        # should be the same:
+        if options['compare']:
+            if outputs['In memory'] == outputs['Streaming']:
+                print "The two exports of pombola.json are the same"
+            else:
+                print "Warning: the two exports of pombola.json differ"
@@ -0,0 +1,126 @@
+# Compare the date filters in PositionQuerySet, which use the indexed
+# active_dates range column, with the comparisons of the sorting date
+# strings that they used to make.  Each filter is run over all
+# positions for a sample of dates, and any date where the two give a
+# different number of positions is reported.  For example:
+#
+#   ./manage.py core_benchmark_position_dates --years=10 --repeat=5
+
+from optparse import make_option
+import datetime
+import time
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db.models import Q
+
+from django_date_extensions.fields import ApproximateDate
+
+from pombola.core.models import Position
+
+
+def approx_repr(when):
+    return repr(ApproximateDate(year=when.year, month=when.month, day=when.day))
+
+
+def string_currently_active(qs, when):
+    return qs.filter(sorting_start_date__lte=approx_repr(when)) \
+        .filter(Q(sorting_end_date_high__gte=approx_repr(when)) | Q(end_date=''))
+
+
+def string_previous(qs, when):
+    return qs.filter(
+        Q(sorting_end_date_high__lt=approx_repr(when)) & ~Q(end_date=''))
+
+
+def string_future(qs, when):
+    return qs.filter(sorting_start_date__gt=approx_repr(when))
+
+
+def string_active_during_year(qs, when):
+    first_day = datetime.date(when.year, 1, 1)
+    last_day = datetime.date(when.year, 12, 31)
+    start_criteria = \
+        Q(start_date='') | \
+        Q(start_date='past') | \
+        Q(sorting_start_date__lte=last_day)
+    end_criteria = \
+        Q(end_date='') | \
+        Q(end_date='future') | \
+        Q(sorting_end_date_high__gte=first_day)
+    return qs.filter(start_criteria & end_criteria)
+
+
+def range_active_during_year(qs, when):
+    return qs.overlapping_dates(
+        datetime.date(when.year, 1, 1), datetime.date(when.year, 12, 31))
+
+
+FILTERS = (
+    ('currently_active',
+     string_currently_active,
+     lambda qs, when: qs.currently_active(when)),
+    ('previous',
+     string_previous,
+     lambda qs, when: qs.previous(when)),
+    ('future',
+     string_future,
+     lambda qs, when: qs.future(when)),
+    ('active_during_year',
+     string_active_during_year,
+     range_active_during_year),
+)
+
+
+def time_count(queryset, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        count = queryset.count()
+        times.append(time.time() - start)
+    return count, min(times)
+
+
+class Command(NoArgsCommand):
+
+    help = 'Time the Position date filters against the old string comparisons'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--years', dest='years', type='int', default=10, help='The number of years back from today to sample a date in'),
+        make_option('--repeat', dest='repeat', type='int', default=3, help='The number of times to run each query (the fastest is reported)'),
+    )
+
+    def handle_noargs(self, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat must be at least 1")
+
+        missing = Position.objects.filter(active_dates__isnull=True).count()
+        if missing:
+            print "Warning: {0} positions have no active_dates yet".format(missing)
+
+        today = datetime.date.today()
+        dates = [
+            datetime.date(today.year - i, today.month, min(today.day, 28))
+            for i in range(options['years'])
+        ]
+
+        print "{0} positions, {1} dates".format(Position.objects.count(), len(dates))
+
+        for label, string_filter, range_filter in FILTERS:
+            string_total = 0
+            range_total = 0
+            for when in dates:
+                qs = Position.objects.all()
+                string_count, string_time = time_count(
+                    string_filter(qs, when), options['repeat'])
+                range_count, range_time = time_count(
+                    range_filter(qs, when), options['repeat'])
+                string_total += string_time
+                range_total += range_time
+                if string_count != range_count:
+                    print "  {0} on {1}: {2} positions with strings, {3} with ranges".format(
+                        label, when, string_count, range_count)
+            print "{0}: strings {1:.4f}s, ranges {2:.4f}s (mean per date)".format(
+                label,
+                string_total / len(dates),
+                range_total / len(dates),
+            )
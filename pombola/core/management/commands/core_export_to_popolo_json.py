@@ -1,12 +1,11 @@
 # This command creates a new PopIt instance based on the Person,
 # Position and Organisation models in Pombola.
 
-import json
 from optparse import make_option
-from os.path import exists, isdir, join
+from os.path import exists, isdir
 import urlparse
 
-from pombola.core.popolo import get_popolo_data
+from pombola.core.popolo import write_pombola_json, write_popolo_collections
 
 from django.core.management.base import BaseCommand, CommandError
 
@@ -41,36 +40,6 @@ class Command(BaseCommand):
         primary_id_scheme = '.'.join(reversed(parsed_url.netloc.split('.')))
 
         if options['pombola']:
-            for inline_memberships, leafname in (
-                    (True, 'pombola.json'),
-                    (False, 'pombola-no-inline-memberships.json'),
-            ):
-                popolo_data = get_popolo_data(
-                    primary_id_scheme,
-                    pombola_url,
-                    inline_memberships=inline_memberships
-                )
-                output_filename = join(output_directory, leafname)
-                with open(output_filename, 'w') as f:
-                    json.dump(popolo_data, f, indent=4, sort_keys=True)
+            write_pombola_json(output_directory, primary_id_scheme, pombola_url)
         else:
-            popolo_data = get_popolo_data(
-                primary_id_scheme,
-                pombola_url,
-                inline_memberships=False
-            )
-            for collection, data in popolo_data.items():
-                for mongoexport_format in (True, False):
-                    if mongoexport_format:
-                        output_basename = 'mongo-' + collection + '.dump'
-                    else:
-                        output_basename = collection + ".json"
-                    output_filename = join(output_directory, output_basename)
-                    with open(output_filename, 'w') as f:
-                        if mongoexport_format:
-                            for item in data:
-                                item['_id'] = item['id']
-                                json.dump(item, f, sort_keys=True)
-                                f.write("\n")
-                        else:
-                            json.dump(data, f, indent=4, sort_keys=True)
+            write_popolo_collections(output_directory, primary_id_scheme, pombola_url)
@@ -0,0 +1,36 @@
+# Report how often each of the cached page fragments (see
+# pombola.core.fragment_cache) was served from the cache, since the
+# counts were last reset.  They're only counted while the
+# FRAGMENT_CACHE_STATS setting is True.  For example:
+#
+#   ./manage.py core_fragment_cache_stats
+#   ./manage.py core_fragment_cache_stats --reset
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+
+from pombola.core.fragment_cache import fragment_stats, reset_fragment_stats
+
+
+class Command(NoArgsCommand):
+
+    help = 'Show the hit rate of each cached page fragment'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--reset', action='store_true', dest='reset', default=False, help='Set the counts back to zero after showing them'),
+    )
+
+    def handle_noargs(self, **options):
+        stats = fragment_stats()
+        if not settings.FRAGMENT_CACHE_STATS:
+            print "FRAGMENT_CACHE_STATS is off, so fragments aren't being counted"
+        if not stats:
+            print "No fragments have been counted"
+        for name, (hits, misses) in sorted(stats.items()):
+            total = hits + misses
+            print "{0}: {1} hits, {2} misses ({3:.1f}% hit rate)".format(
+                name, hits, misses, (100.0 * hits / total) if total else 0)
+        if options['reset']:
+            reset_fragment_stats()
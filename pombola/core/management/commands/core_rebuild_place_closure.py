@@ -0,0 +1,14 @@
+from django.core.management.base import NoArgsCommand
+
+from pombola.core.models import PlaceClosure
+
+
+class Command(NoArgsCommand):
+
+    help = 'Recalculate the ancestor / descendant table for the Place hierarchy'
+
+    def handle_noargs(self, **options):
+        PlaceClosure.objects.rebuild()
+        if int(options['verbosity']) > 1:
+            print "There are now {0} place closure rows".format(
+                PlaceClosure.objects.count())
@@ -0,0 +1,36 @@
+# Place.get_boundary_changes reads how much each place overlaps with
+# places of the same kind in the previous and next parliamentary
+# sessions from the PlaceBoundaryOverlap table.  Those rows are
+# updated when a place's MapIt area or session changes, but after
+# importing new boundaries into MapIt you should run this command to
+# recalculate them, e.g.:
+#
+#   ./manage.py core_update_boundary_overlaps --kind=constituency
+
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from pombola.core.models import Place, PlaceBoundaryOverlap, PlaceKind
+
+
+class Command(NoArgsCommand):
+
+    help = 'Recalculate the overlaps between places in adjacent sessions'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--kind', dest='kind', help='Only update places of the PlaceKind with this slug'),
+    )
+
+    def handle_noargs(self, **options):
+        places = Place.objects.all()
+        if options['kind']:
+            try:
+                kind = PlaceKind.objects.get(slug=options['kind'])
+            except PlaceKind.DoesNotExist:
+                raise CommandError("No PlaceKind with slug '{0}'".format(options['kind']))
+            places = places.filter(kind=kind)
+        PlaceBoundaryOverlap.objects.rebuild(places)
+        if int(options['verbosity']) > 1:
+            print "There are now {0} boundary overlap rows".format(
+                PlaceBoundaryOverlap.objects.count())
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_auto_20190906_1342'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceClosure',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('depth', models.PositiveIntegerField()),
+                ('sessions_overlap', models.BooleanField(default=True)),
+                ('ancestor', models.ForeignKey(related_name='descendant_closures', to='core.Place')),
+                ('descendant', models.ForeignKey(related_name='ancestor_closures', to='core.Place')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='placeclosure',
+            unique_together=set([('descendant', 'ancestor')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='placeclosure',
+            index_together=set([('descendant', 'depth')]),
+        ),
+    ]
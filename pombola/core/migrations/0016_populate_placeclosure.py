@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def sessions_overlap(session, parent_session):
+    if session is None or parent_session is None:
+        return True
+    return parent_session.start_date <= session.end_date and \
+        session.start_date <= parent_session.end_date
+
+
+def populate_place_closure(apps, schema_editor):
+    Place = apps.get_model('core', 'Place')
+    PlaceClosure = apps.get_model('core', 'PlaceClosure')
+    ParliamentarySession = apps.get_model('core', 'ParliamentarySession')
+
+    sessions = {s.id: s for s in ParliamentarySession.objects.all()}
+    places = {
+        place_id: (parent_id, sessions.get(session_id))
+        for place_id, parent_id, session_id in Place.objects.values_list(
+            'id', 'parent_place_id', 'parliamentary_session_id')
+    }
+
+    rows = []
+    for place_id, (parent_id, session) in places.items():
+        rows.append(PlaceClosure(
+            ancestor_id=place_id,
+            descendant_id=place_id,
+            depth=0,
+            sessions_overlap=True))
+        seen = set([place_id])
+        overlap = True
+        depth = 0
+        while parent_id is not None and parent_id not in seen:
+            seen.add(parent_id)
+            depth += 1
+            grandparent_id, parent_session = places[parent_id]
+            overlap = overlap and sessions_overlap(session, parent_session)
+            rows.append(PlaceClosure(
+                ancestor_id=parent_id,
+                descendant_id=place_id,
+                depth=depth,
+                sessions_overlap=overlap))
+            parent_id, session = grandparent_id, parent_session
+
+    PlaceClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+def clear_place_closure(apps, schema_editor):
+    PlaceClosure = apps.get_model('core', 'PlaceClosure')
+    PlaceClosure.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_placeclosure'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_place_closure, clear_place_closure),
+    ]
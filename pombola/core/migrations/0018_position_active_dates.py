@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+import django.contrib.postgres.fields.ranges
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_placeboundaryoverlap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='position',
+            name='active_dates',
+            field=django.contrib.postgres.fields.ranges.DateRangeField(null=True, editable=False),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_position_active_dates_gist ON core_position USING GIST (active_dates)',
+            'DROP INDEX core_position_active_dates_gist',
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def populate_active_dates(apps, schema_editor):
+    # import here so that the migration uses the same rules as Position.save
+    from pombola.core.models import approximate_dates_to_range
+
+    Position = apps.get_model('core', 'Position')
+
+    # Most positions share their dates with many others (e.g. everyone
+    # elected at the same election), so update them in groups:
+    ids_by_range = defaultdict(list)
+    for position in Position.objects.only('id', 'start_date', 'end_date').iterator():
+        active_dates = approximate_dates_to_range(
+            position.start_date, position.end_date)
+        ids_by_range[active_dates].append(position.id)
+
+    for active_dates, ids in ids_by_range.items():
+        for i in range(0, len(ids), 1000):
+            Position.objects.filter(id__in=ids[i:i + 1000]) \
+                .update(active_dates=active_dates)
+
+
+def clear_active_dates(apps, schema_editor):
+    Position = apps.get_model('core', 'Position')
+    Position.objects.update(active_dates=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_position_active_dates'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_active_dates, clear_active_dates),
+    ]
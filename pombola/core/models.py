@@ -14,7 +14,7 @@ from django.core.validators import MinValueValidator
 
 from django.db.models import Q, Prefetch
 from django.db import transaction
-from django.db.models.signals import post_init
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 
 from django.utils.dateformat import DateFormat
 
@@ -23,11 +23,14 @@ from django.contrib.contenttypes.fields import (
 )
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
+from django.contrib.postgres.fields import DateRangeField
 
 from django.db.models.fields import DateField
 
 from markitup.fields import MarkupField
 
+from psycopg2.extras import DateRange
+
 from django_date_extensions.fields import ApproximateDateField, ApproximateDate
 
 from slug_helpers.models import validate_slug_not_redirecting
@@ -41,6 +44,7 @@ from pombola.budgets.models import BudgetsMixin
 from mapit import models as mapit_models
 
 from pombola.country import significant_positions_filter
+from pombola.core import fragment_cache
 
 date_help_text = "Format: '2011-12-31', '31 Jan 2011', 'Jan 2011' or '2011' or 'future'"
 
@@ -115,6 +119,53 @@ def approximate_date_to_date(approx_date, assume):
     # Otherwise we must have a complete date:
     return datetime.date(year, month, day)
 
+def approximate_dates_to_range(start_date, end_date):
+    """Return a DateRange of the days between two approximate dates
+
+    The range includes every day that start_date and end_date could
+    mean, so a start date of 2011 begins on 1st January 2011 and an end
+    date of March 2012 finishes on 31st March 2012. A missing or 'past'
+    start date, or a missing or 'future' end date, leaves that end of
+    the range unbounded. A 'future' start date gives a range beginning
+    on date.max, and a 'past' end date one that finishes on date.min,
+    so that they are never active but still sort before or after
+    everything else. If the dates are the wrong way round (which is
+    presumably a mistake in the data) they're treated as if they were
+    swapped, so that the position is still found by the date filters.
+
+    For example:
+
+    >>> approximate_dates_to_range(ApproximateDate(year=2011), ApproximateDate(year=2012, month=3))
+    DateRange(datetime.date(2011, 1, 1), datetime.date(2012, 4, 1), '[)')
+    >>> approximate_dates_to_range(ApproximateDate(past=True), None)
+    DateRange(None, None, '[)')
+    >>> approximate_dates_to_range(ApproximateDate(future=True), None)
+    DateRange(datetime.date(9999, 12, 31), None, '[)')
+    >>> approximate_dates_to_range(ApproximateDate(year=2012), ApproximateDate(year=2010))
+    DateRange(datetime.date(2010, 1, 1), datetime.date(2013, 1, 1), '[)')
+
+    """
+    if start_date and start_date.future:
+        return DateRange(datetime.date.max, None, '[)')
+    if end_date and end_date.past:
+        return DateRange(None, datetime.date.min + datetime.timedelta(days=1), '[)')
+    lower = None
+    if start_date and not start_date.past:
+        lower = approximate_date_to_date(start_date, 'earliest')
+    upper = None
+    if end_date and not end_date.future:
+        last_day = approximate_date_to_date(end_date, 'latest')
+        if last_day < datetime.date.max:
+            upper = last_day + datetime.timedelta(days=1)
+    if lower and upper and lower >= upper:
+        lower = approximate_date_to_date(end_date, 'earliest')
+        upper = None
+        last_day = approximate_date_to_date(start_date, 'latest')
+        if last_day < datetime.date.max:
+            upper = last_day + datetime.timedelta(days=1)
+    return DateRange(lower, upper, '[)')
+
+
 def get_latest_day_of_year(year):
     """
     Return a date object for the last day of the year, or today if it's the current year.
@@ -332,6 +383,45 @@ class InformationSource(ModelBase):
        ordering = ["content_type", "object_id", "source"]
 
 
+def queryset_with_results(queryset, results):
+    """Return the queryset with its results already filled in
+
+    This is what prefetch_related does for related managers: iterating
+    over the queryset, or checking its length or truth, uses the
+    results given rather than running a query, but it can still be
+    filtered further in the usual way (which does run a new query)."""
+    queryset._result_cache = list(results)
+    queryset._prefetch_done = True
+    return queryset
+
+
+def current_membership_positions(when=None):
+    """Return the positions that decide people's parties, constituencies, etc.
+
+    These are the active party and coalition memberships, political
+    positions and aspirant positions, with everything needed to sort
+    them into those groups."""
+    return Position.objects.currently_active(when).filter(
+        (Q(title__slug='member') & Q(organisation__kind__slug='party')) |
+        Q(title__slug='coalition-member') |
+        Q(category='political') |
+        Q(title__slug__startswith='aspirant-')
+    ).select_related('organisation__kind', 'title', 'place__kind')
+
+
+def current_memberships_prefetch(lookup='position_set'):
+    """Return a Prefetch that loads people's current memberships
+
+    lookup is the path to a Person's position_set, so that the
+    memberships can also be loaded through a relation, e.g. with
+    'person__position_set' on a queryset of positions."""
+    return Prefetch(
+        lookup,
+        queryset=current_membership_positions(),
+        to_attr='current_membership_positions',
+    )
+
+
 class PersonQuerySet(models.query.GeoQuerySet):
     def is_politician(self, when=None):
         # FIXME - Don't like the look of this, rather a big subquery.
@@ -374,6 +464,14 @@ class PersonQuerySet(models.query.GeoQuerySet):
             )
         )
 
+    def with_current_memberships(self):
+        """
+        Load everyone's current parties, coalitions, constituencies,
+        political and aspirant positions with a single query, so that
+        the Person methods that return them don't need to run any.
+        """
+        return self.prefetch_related(current_memberships_prefetch())
+
 class PersonManager(ManagerBase):
     def get_queryset(self):
         return PersonQuerySet(self.model)
@@ -564,8 +662,44 @@ class Person(ModelBase, HasImageMixin, ScorecardMixin, IdentifierMixin):
     def remove_alternative_name(self, alternative_name):
         self.alternative_names.filter(alternative_name=alternative_name).delete()
 
+    def current_memberships(self):
+        """
+        Return a list of this person's current memberships
+
+        These are the positions that parties(), coalitions(),
+        parties_and_coalitions(), politician_positions(),
+        aspirant_positions() and constituencies() are answered from.
+        They're loaded for many people at once by
+        Person.objects.with_current_memberships(), or otherwise for
+        just this person the first time they're needed, and are kept
+        until one of this person's positions is saved or deleted.
+        """
+        if not hasattr(self, 'current_membership_positions'):
+            self.current_membership_positions = list(
+                current_membership_positions().filter(person=self))
+        return self.current_membership_positions
+
+    def clear_current_memberships(self):
+        self.__dict__.pop('current_membership_positions', None)
+
+    def _current_party_memberships(self):
+        return [
+            p for p in self.current_memberships()
+            if p.title and p.title.slug == 'member'
+            and p.organisation and p.organisation.kind.slug == 'party'
+        ]
+
+    def _current_coalition_memberships(self):
+        return [
+            p for p in self.current_memberships()
+            if p.title and p.title.slug == 'coalition-member'
+        ]
+
     def aspirant_positions(self):
-        return self.position_set.all().current_aspirant_positions()
+        return queryset_with_results(
+            self.position_set.all().current_aspirant_positions(),
+            [p for p in self.current_memberships()
+             if p.title and p.title.slug.startswith('aspirant-')])
 
     def aspirant_positions_ever(self):
         return self.position_set.all().aspirant_positions()
@@ -574,7 +708,9 @@ class Person(ModelBase, HasImageMixin, ScorecardMixin, IdentifierMixin):
         return self.aspirant_positions().exists()
 
     def politician_positions(self):
-        return self.position_set.all().current_politician_positions()
+        return queryset_with_results(
+            self.position_set.all().current_politician_positions(),
+            [p for p in self.current_memberships() if p.category == 'political'])
 
     def politician_positions_ever(self):
         return self.politician_positions()
@@ -585,7 +721,11 @@ class Person(ModelBase, HasImageMixin, ScorecardMixin, IdentifierMixin):
     def parties(self):
         """Return list of parties that this person is currently a member of"""
         party_memberships = self.position_set.all().currently_active().filter(title__slug='member').filter(organisation__kind__slug='party')
-        return Organisation.objects.filter(position__in=party_memberships)
+        return queryset_with_results(
+            Organisation.objects.filter(position__in=party_memberships),
+            sorted(
+                (p.organisation for p in self._current_party_memberships()),
+                key=lambda o: o.name))
 
     def parties_ever(self):
         """Return list of parties that this person has ever been a member of"""
@@ -595,7 +735,11 @@ class Person(ModelBase, HasImageMixin, ScorecardMixin, IdentifierMixin):
     def coalitions(self):
         """Return list of coalitions that this person is currently a member of"""
         coalition_memberships = self.position_set.all().currently_active().filter(title__slug='coalition-member')
-        return Organisation.objects.filter(position__in=coalition_memberships)
+        return queryset_with_results(
+            Organisation.objects.filter(position__in=coalition_memberships),
+            sorted(
+                (p.organisation for p in self._current_coalition_memberships()),
+                key=lambda o: o.name))
 
     def parties_and_coalitions(self):
         """Return list of parties and coalitions that this person is currently a member of"""
@@ -612,11 +756,22 @@ class Person(ModelBase, HasImageMixin, ScorecardMixin, IdentifierMixin):
               | Q(title__slug='coalition-member')
             )
         )
-        return Organisation.objects.filter(position__in=party_memberships).distinct()
+        organisations = dict(
+            (p.organisation.id, p.organisation)
+            for p in self._current_party_memberships() + self._current_coalition_memberships()
+        )
+        return queryset_with_results(
+            Organisation.objects.filter(position__in=party_memberships).distinct(),
+            sorted(organisations.values(), key=lambda o: o.name))
 
     def constituencies(self):
         """Return list of constituencies that this person is currently an politician for"""
-        return Place.objects.filter(position__in=self.politician_positions()).distinct()
+        places = dict(
+            (p.place.id, p.place) for p in self.politician_positions() if p.place
+        )
+        return queryset_with_results(
+            Place.objects.filter(position__in=self.position_set.all().current_politician_positions()).distinct(),
+            sorted(places.values(), key=lambda p: p.slug))
 
     def constituency_offices(self):
         """
@@ -992,25 +1147,22 @@ class Place(ModelBase, HasImageMixin, ScorecardMixin, BudgetsMixin, IdentifierMi
 
     def parent_places(self):
         """Return an array of all the parent places."""
-        if self.parent_place:
-            parents = [ self.parent_place ]
-            parents.extend( self.parent_place.parent_places() )
-            # print parents
-            return parents
-        else:
-            return []
+        return [
+            link.ancestor for link in
+            PlaceClosure.objects
+                .filter(descendant=self, depth__gt=0)
+                .select_related('ancestor__kind', 'ancestor__parliamentary_session')
+                .order_by('depth')
+        ]
 
     def self_and_parents(self):
         """Return a query set that matches this place and all parents."""
-        parents = self.parent_places()
-        ids     = [ x.id for x in parents ]
-        ids.append(self.id)
-        return Place.objects.filter(pk__in=ids)
+        return Place.objects.filter(descendant_closures__descendant=self)
 
 
     def all_related_positions(self):
         """Return a query set of all the positions for this place, and all parent places."""
-        return Position.objects.filter(place__in=self.self_and_parents())
+        return Position.objects.filter(place__descendant_closures__descendant=self)
 
     def all_related_politicians(self):
         """Return a query set of all the politicians for this place, and all parent places."""
@@ -1046,6 +1198,25 @@ class Place(ModelBase, HasImageMixin, ScorecardMixin, BudgetsMixin, IdentifierMi
     class Meta:
        ordering = ["slug"]
 
+    def adjacent_sessions(self):
+        """Return the sessions before and after this place's session
+
+        This returns a tuple of the previous and next parliamentary
+        sessions with places of the same PlaceKind as this one; either
+        may be None."""
+        previous_sessions = []
+        next_sessions = []
+        append_to = previous_sessions
+        for session in self.kind.parliamentary_sessions():
+            if session == self.parliamentary_session:
+                append_to = next_sessions
+                continue
+            append_to.append(session)
+
+        previous_session = previous_sessions[-1] if previous_sessions else None
+        next_session = next_sessions[0] if next_sessions else None
+        return previous_session, next_session
+
     def get_boundary_changes(self):
         """Return a dictionary representing previous and next boundary changes
 
@@ -1064,23 +1235,16 @@ class Place(ModelBase, HasImageMixin, ScorecardMixin, BudgetsMixin, IdentifierMi
                       'cutoff': 1,
                       'others': [Place(...), Place(...)]}
          'next': None}
+
+        The overlaps are looked up in the PlaceBoundaryOverlap table
+        rather than being calculated from the MapIt boundaries.
         """
 
         # This is the percentage overlap below which we just list the
         # area name in a note below the main changes:
         cutoff = 1
 
-        previous_sessions = []
-        next_sessions = []
-        append_to = previous_sessions
-        for session in self.kind.parliamentary_sessions():
-            if session == self.parliamentary_session:
-                append_to = next_sessions
-                continue
-            append_to.append(session)
-
-        previous_session = previous_sessions[-1] if previous_sessions else None
-        next_session = next_sessions[0] if next_sessions else None
+        previous_session, next_session = self.adjacent_sessions()
 
         connectors = {'previous': {'Past': 'was previously in',
                                    'Current': 'is currently in',
@@ -1094,31 +1258,25 @@ class Place(ModelBase, HasImageMixin, ScorecardMixin, BudgetsMixin, IdentifierMi
         # Occasionally a place will not have a MapIt area associated
         # with it; in these cases we can't find which boundaries it
         # overlaps with, so just return an empty dictionary.
-        if self.mapit_area is None:
+        if self.mapit_area_id is None:
             return result
 
+        sessions = [s for s in (previous_session, next_session) if s]
+        intersections_by_session = defaultdict(list)
+        overlaps = self.boundary_overlaps \
+            .filter(other_place__parliamentary_session__in=sessions) \
+            .select_related('other_place__kind', 'other_place__parliamentary_session') \
+            .order_by('-percent', 'other_place__name')
+        for overlap in overlaps:
+            intersections_by_session[overlap.other_place.parliamentary_session_id].append(
+                (overlap.percent, overlap.other_place))
+
         for key, session in (('previous', previous_session),
                              ('next', next_session)):
             if not session:
                 result[key] = None
                 continue
-            intersections = []
-            for area in mapit_models.Area.objects.intersect('intersects',
-                                               self.mapit_area,
-                                               [self.mapit_area.type.code],
-                                               mapit_models.Generation.objects.get(pk=session.mapit_generation)):
-                # Now work out the % intersection between the two:
-                self_geos_geometry = self.mapit_area.polygons.collect()
-                if self_geos_geometry.area == 0:
-                    continue
-                other_geos_geometry = area.polygons.collect()
-                intersection = self_geos_geometry.intersection(other_geos_geometry)
-                proportion_shared = intersection.area / self_geos_geometry.area
-                intersections.append((100 * proportion_shared,
-                                      Place.objects.get(kind=self.kind,
-                                                        parliamentary_session=session,
-                                                        mapit_area=area)))
-            intersections.sort(key=lambda x: -x[0])
+            intersections = intersections_by_session[session.id]
             result[key] = {'session': session,
                            'connector': connectors[key][session.relative_time()],
                            'intersections': [{'percent': i[0],
@@ -1155,29 +1313,17 @@ class Place(ModelBase, HasImageMixin, ScorecardMixin, BudgetsMixin, IdentifierMi
 
         found_any_aspirants = False
 
-        # This is a classically horrible thing to try to do with SQL -
-        # recurse up this place's hierarchy via the parent column -
-        # however, we know that there will only be at most 5 levels
-        # (Ward -> Constituency -> County -> Province -> Country) for
-        # Kenya, and the results of the query should be cached.
-
-        place_hierarchy = []
-
-        current_place = self
-        while True:
-            place_hierarchy.append(current_place)
-            parent = current_place.parent_place
-            current_place_session = current_place.parliamentary_session
-            if parent:
-                # If the parent place is actually from a non-overlapping
-                # parliamentary sessions, stop recursing:
-                parent_session = parent.parliamentary_session
-                if parent_session and current_place_session:
-                    if not parent_session.overlaps(current_place_session):
-                        break
-                current_place = parent
-            else:
-                break
+        # The PlaceClosure table records, for each ancestor, whether
+        # every step up to it is between places from overlapping
+        # parliamentary sessions; we stop going up the hierarchy at
+        # the first step where they don't overlap.
+        place_hierarchy = [
+            link.ancestor for link in
+            PlaceClosure.objects
+                .filter(descendant=self, sessions_overlap=True)
+                .select_related('ancestor__kind', 'ancestor__parliamentary_session')
+                .order_by('depth')
+        ]
 
         # Preserve the order of places in the hierarchy, but allow
         # fast lookups with a dict:
@@ -1185,7 +1331,11 @@ class Place(ModelBase, HasImageMixin, ScorecardMixin, BudgetsMixin, IdentifierMi
 
         aspirants_for_places = [(p, defaultdict(list)) for p in place_hierarchy]
 
-        for position in Position.objects.filter(place__in=place_hierarchy, title__slug__startswith='aspirant-').currently_active():
+        aspirant_positions = Position.objects \
+            .filter(place__in=place_hierarchy, title__slug__startswith='aspirant-') \
+            .currently_active() \
+            .select_related('title', 'person')
+        for position in aspirant_positions:
             found_any_aspirants = True
             aspirants_for_places[place_to_index[position.place]][1][position.title.name].append(position.person)
 
@@ -1207,6 +1357,287 @@ class Place(ModelBase, HasImageMixin, ScorecardMixin, BudgetsMixin, IdentifierMi
         else:
             True
 
+
+def place_sessions_compatible(place, parent):
+    """Return False if the two places are from non-overlapping sessions
+
+    If either place isn't associated with a parliamentary session then
+    they are considered compatible."""
+    session = place.parliamentary_session
+    parent_session = parent.parliamentary_session
+    if session and parent_session:
+        return parent_session.overlaps(session)
+    return True
+
+
+class PlaceClosureManager(models.Manager):
+
+    def closure_rows(self, place, parent, parent_rows):
+        """Return the unsaved closure rows for place
+
+        'parent_rows' should be the closure rows for place's parent,
+        i.e. those with the parent as the descendant."""
+        rows = [self.model(
+            ancestor_id=place.id,
+            descendant_id=place.id,
+            depth=0,
+            sessions_overlap=True,
+        )]
+        if parent is not None:
+            compatible = place_sessions_compatible(place, parent)
+            for parent_row in parent_rows:
+                rows.append(self.model(
+                    ancestor_id=parent_row.ancestor_id,
+                    descendant_id=place.id,
+                    depth=parent_row.depth + 1,
+                    sessions_overlap=(compatible and parent_row.sessions_overlap),
+                ))
+        return rows
+
+    @transaction.atomic
+    def update_for_places(self, places):
+        """Recalculate the closure rows for these places and all their descendants
+
+        The descendants are found a level at a time, so this only runs
+        one query for each level of the hierarchy below the given
+        places, plus one for the closure rows of each of their
+        parents."""
+        affected = {p.id: p for p in places}
+        level = affected.keys()
+        while level:
+            children = Place.objects \
+                .filter(parent_place__in=level) \
+                .exclude(pk__in=affected.keys()) \
+                .select_related('parliamentary_session')
+            level = []
+            for child in children:
+                affected[child.id] = child
+                level.append(child.id)
+
+        rows_for_place_id = {}
+
+        def rows_for(place):
+            if place.id not in rows_for_place_id:
+                # Guard against loops in the hierarchy:
+                rows_for_place_id[place.id] = []
+                parent, parent_rows = None, []
+                if place.parent_place_id in affected:
+                    parent = affected[place.parent_place_id]
+                    parent_rows = rows_for(parent)
+                elif place.parent_place_id:
+                    # When loading fixtures the parent might not have
+                    # been created yet; if so, this place's rows will
+                    # be updated when the parent is saved.
+                    try:
+                        parent = place.parent_place
+                    except Place.DoesNotExist:
+                        pass
+                    else:
+                        parent_rows = list(self.filter(descendant=parent))
+                rows_for_place_id[place.id] = \
+                    self.closure_rows(place, parent, parent_rows)
+            return rows_for_place_id[place.id]
+
+        for place in affected.values():
+            rows_for(place)
+
+        self.filter(descendant__in=affected.keys()).delete()
+        self.bulk_create(
+            [row for rows in rows_for_place_id.values() for row in rows])
+
+    def rebuild(self):
+        """Recalculate the closure rows for every place"""
+        self.update_for_places(
+            Place.objects.filter(parent_place__isnull=True)
+                .select_related('parliamentary_session'))
+
+
+class PlaceClosure(models.Model):
+    """A row for each (ancestor, descendant) pair in the Place hierarchy
+
+    This is the transitive closure of Place.parent_place, including a
+    row linking each place to itself with depth 0, so that all the
+    parents (or children) of a place can be found with a single
+    query.  'sessions_overlap' is False if, on the way up from the
+    descendant to the ancestor, there is a step to a parent place from
+    a parliamentary session that doesn't overlap with the child's.
+
+    These rows are kept up to date by signal handlers when a Place's
+    parent or session or a ParliamentarySession changes; they can be
+    rebuilt from scratch with the core_rebuild_place_closure command.
+    """
+    ancestor = models.ForeignKey('Place', related_name='descendant_closures')
+    descendant = models.ForeignKey('Place', related_name='ancestor_closures')
+    depth = models.PositiveIntegerField()
+    sessions_overlap = models.BooleanField(default=True)
+
+    objects = PlaceClosureManager()
+
+    class Meta:
+        unique_together = ('descendant', 'ancestor')
+        index_together = [('descendant', 'depth')]
+
+
+def record_place_hierarchy(**kwargs):
+    """A signal handler to remember the values that affect PlaceClosure"""
+    place = kwargs.get('instance')
+    # Use __dict__ so that deferred fields aren't loaded here:
+    place._original_hierarchy = (
+        place.__dict__.get('parent_place_id'),
+        place.__dict__.get('parliamentary_session_id'),
+    )
+
+post_init.connect(record_place_hierarchy, Place)
+
+
+def update_place_closure(sender, instance, created, **kwargs):
+    """A signal handler to update PlaceClosure when a Place moves"""
+    hierarchy = (instance.parent_place_id, instance.parliamentary_session_id)
+    if created or hierarchy != instance._original_hierarchy:
+        PlaceClosure.objects.update_for_places([instance])
+        instance._original_hierarchy = hierarchy
+
+post_save.connect(update_place_closure, Place)
+
+
+class PlaceBoundaryOverlapManager(models.Manager):
+
+    def calculate_overlaps(self, place, session):
+        """Calculate how place's boundary overlaps with places in session
+
+        This intersects the MapIt boundaries, so it may be very slow
+        for large areas.  It returns a list of tuples of the form
+        (other_place, percent_of_place, percent_of_other_place) for
+        each place of the same kind in 'session' that intersects
+        with 'place'."""
+        results = []
+        mapit_area = place.mapit_area
+        if mapit_area is None or session.mapit_generation is None:
+            return results
+        place_geometry = mapit_area.polygons.collect()
+        if place_geometry is None or place_geometry.area == 0:
+            return results
+        generation = mapit_models.Generation.objects.get(pk=session.mapit_generation)
+        areas = list(mapit_models.Area.objects.intersect(
+            'intersects', mapit_area, [mapit_area.type.code], generation))
+        area_id_to_place = {
+            p.mapit_area_id: p for p in Place.objects.filter(
+                kind=place.kind_id,
+                parliamentary_session=session,
+                mapit_area__in=[a.id for a in areas],
+            )
+        }
+        for area in areas:
+            other_place = area_id_to_place.get(area.id)
+            if other_place is None:
+                continue
+            other_geometry = area.polygons.collect()
+            intersection = place_geometry.intersection(other_geometry)
+            percent_of_other = 0
+            if other_geometry.area:
+                percent_of_other = 100 * intersection.area / other_geometry.area
+            results.append((
+                other_place,
+                100 * intersection.area / place_geometry.area,
+                percent_of_other,
+            ))
+        return results
+
+    def overlap_rows(self, place, session):
+        """Return unsaved rows in both directions between place and session"""
+        rows = []
+        for other_place, percent, percent_of_other in \
+                self.calculate_overlaps(place, session):
+            rows.append(self.model(
+                place=place, other_place=other_place, percent=percent))
+            rows.append(self.model(
+                place=other_place, other_place=place, percent=percent_of_other))
+        return rows
+
+    @transaction.atomic
+    def update_for_place(self, place):
+        """Recalculate the overlaps between place and adjacent sessions"""
+        self.filter(Q(place=place) | Q(other_place=place)).delete()
+        if place.mapit_area_id is None or place.parliamentary_session_id is None:
+            return
+        rows = []
+        for session in place.adjacent_sessions():
+            if session:
+                rows.extend(self.overlap_rows(place, session))
+        self.bulk_create(rows)
+
+    @transaction.atomic
+    def rebuild(self, places=None):
+        """Recalculate all overlaps for places (by default, every place)
+
+        Every existing row involving one of the places is deleted
+        first; since overlaps are only between places of the same kind,
+        rebuilding the places of a kind doesn't lose any rows that
+        aren't recalculated.  Each pair of places is only intersected
+        once: each place is only compared with the places in the next
+        session."""
+        if places is None:
+            places = Place.objects.all()
+        self.filter(Q(place__in=places) | Q(other_place__in=places)).delete()
+        places = places \
+            .filter(mapit_area__isnull=False, parliamentary_session__isnull=False) \
+            .select_related('kind', 'mapit_area__type')
+        for place in places:
+            _, next_session = place.adjacent_sessions()
+            if next_session:
+                self.bulk_create(self.overlap_rows(place, next_session))
+
+
+class PlaceBoundaryOverlap(models.Model):
+    """How much a place's boundary overlaps with a place from another session
+
+    'percent' is the percentage of the area of 'place' that is also
+    within 'other_place'.  Rows are only kept for places of the same
+    kind from adjacent parliamentary sessions, which is what
+    Place.get_boundary_changes needs; working them out means
+    intersecting MapIt boundaries, which is too slow to do on each
+    request.  They're recalculated when a place's MapIt area or
+    session changes, and can be rebuilt with the
+    core_update_boundary_overlaps command.
+    """
+    place = models.ForeignKey('Place', related_name='boundary_overlaps')
+    other_place = models.ForeignKey('Place', related_name='+')
+    percent = models.FloatField()
+
+    objects = PlaceBoundaryOverlapManager()
+
+    class Meta:
+        unique_together = ('place', 'other_place')
+
+
+def record_place_boundary(**kwargs):
+    """A signal handler to remember the values that affect PlaceBoundaryOverlap"""
+    place = kwargs.get('instance')
+    place._original_boundary = (
+        place.__dict__.get('mapit_area_id'),
+        place.__dict__.get('parliamentary_session_id'),
+    )
+
+post_init.connect(record_place_boundary, Place)
+
+
+def update_place_boundary_overlaps(sender, instance, created, raw, **kwargs):
+    """A signal handler to recalculate overlaps when a place's boundary changes"""
+    if raw:
+        return
+    boundary = (instance.mapit_area_id, instance.parliamentary_session_id)
+    if created:
+        # A new place has no overlaps to clear, only ones to add.
+        changed = None not in boundary
+    else:
+        changed = boundary != instance._original_boundary
+    if changed:
+        PlaceBoundaryOverlap.objects.update_for_place(instance)
+        instance._original_boundary = boundary
+
+post_save.connect(update_place_boundary_overlaps, Place)
+
+
 class PositionTitle(ModelBase):
     name = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=200, unique=True, help_text="created from name")
@@ -1251,6 +1682,12 @@ class PositionTitle(ModelBase):
        ordering = ["slug"]
 
 
+def single_day_range(when):
+    """Return a DateRange of just the day of a date or datetime"""
+    day = datetime.date(when.year, when.month, when.day)
+    return DateRange(day, day, '[]')
+
+
 class PositionQuerySet(models.query.GeoQuerySet):
     def currently_active(self, when=None):
         """Filter on start and end dates to limit to currently active positions"""
@@ -1258,15 +1695,7 @@ class PositionQuerySet(models.query.GeoQuerySet):
         if when == None:
             when = datetime.date.today()
 
-        now_approx = repr(ApproximateDate(year=when.year, month=when.month, day=when.day))
-
-        qs = (
-            self
-                .filter(sorting_start_date__lte=now_approx)
-                .filter(Q(sorting_end_date_high__gte=now_approx) | Q(end_date=''))
-        )
-
-        return qs
+        return self.filter(active_dates__contains=single_day_range(when))
 
     def currently_inactive(self, when=None):
         """Filter on start and end dates to limit to currently inactive positions"""
@@ -1274,47 +1703,32 @@ class PositionQuerySet(models.query.GeoQuerySet):
         if when == None:
             when = datetime.date.today()
 
-        now_approx = repr(ApproximateDate(year=when.year, month=when.month, day=when.day))
-
-        start_criteria = Q(start_date__gt=now_approx)
-        end_criteria = Q(sorting_end_date_high__lt=now_approx) & ~Q(end_date='')
-
-        qs = self.filter(start_criteria | end_criteria)
-
-        return qs
+        return self.exclude(active_dates__contains=single_day_range(when))
 
     def previous(self, when=None):
         """Filter end dates to limit to positions which are already over."""
 
         when = when or datetime.date.today()
 
-        when_approx = repr(ApproximateDate(year=when.year, month=when.month, day=when.day))
+        when_day = single_day_range(when).lower
 
-        end_criteria = Q(sorting_end_date_high__lt=when_approx) & ~Q(end_date='')
-
-        return self.filter(end_criteria)
+        return self.filter(active_dates__fully_lt=DateRange(when_day, None, '[)'))
 
     def future(self, when=None):
         """Positions which have not yet started."""
 
         when = when or datetime.date.today()
 
-        when_approx = repr(ApproximateDate(year=when.year, month=when.month, day=when.day))
-
-        start_criteria = Q(sorting_start_date__gt=when_approx)
+        when_day = single_day_range(when).lower
 
-        return self.filter(start_criteria)
+        return self.filter(active_dates__fully_gt=DateRange(None, when_day, '[]'))
 
     def overlapping_dates(self, start_date, end_date):
-        start_criteria = \
-            Q(start_date='') | \
-            Q(start_date='past') | \
-            Q(sorting_start_date__lte=end_date)
-        end_criteria = \
-            Q(end_date='') | \
-            Q(end_date='future') | \
-            Q(sorting_end_date_high__gte=start_date)
-        return self.filter(start_criteria & end_criteria)
+        """Positions which were active on any day from start_date to end_date"""
+        first_day = single_day_range(start_date).lower
+        last_day = single_day_range(end_date).upper
+        return self.filter(
+            active_dates__overlap=DateRange(first_day, last_day, '[]'))
 
     def aspirant_positions(self):
         """
@@ -1423,6 +1837,12 @@ class Position(ModelBase, IdentifierMixin):
     sorting_start_date_high = models.CharField(editable=True, default='', max_length=10)
     sorting_end_date_high = models.CharField(editable=True, default='', max_length=10)
 
+    # The days on which the position is active, derived from start_date
+    # and end_date by approximate_dates_to_range when the position is
+    # saved. This has a GiST index, and is what the date filters in
+    # PositionQuerySet use.
+    active_dates = DateRangeField(null=True, editable=False)
+
     identifiers = GenericRelation(Identifier)
 
     objects = PositionQuerySet.as_manager()
@@ -1600,6 +2020,8 @@ class Position(ModelBase, IdentifierMixin):
 
     def save(self, *args, **kwargs):
         self._set_sorting_dates()
+        self.active_dates = approximate_dates_to_range(
+            self.start_date, self.end_date)
         super(Position, self).save(*args, **kwargs)
 
     def __unicode__(self):
@@ -1615,6 +2037,27 @@ class Position(ModelBase, IdentifierMixin):
     class Meta:
         ordering = ['-sorting_end_date', '-sorting_start_date']
 
+def clear_person_current_memberships(sender, instance, **kwargs):
+    # If the position's person has been loaded, forget their current
+    # memberships so they're reloaded with this change.
+    person = getattr(instance, Position.person.cache_name, None)
+    if person is not None:
+        person.clear_current_memberships()
+
+post_save.connect(clear_person_current_memberships, Position)
+post_delete.connect(clear_person_current_memberships, Position)
+
+
+def set_raw_position_active_dates(sender, instance, raw, **kwargs):
+    """A signal handler to set active_dates on positions loaded from
+    fixtures, which Position.save() isn't called for"""
+    if raw:
+        instance.active_dates = approximate_dates_to_range(
+            instance.start_date, instance.end_date)
+
+pre_save.connect(set_raw_position_active_dates, Position)
+
+
 class ParliamentarySession(ModelBase):
     start_date = DateField(blank=True, null=True)
     end_date = DateField(blank=True, null=True)
@@ -1691,6 +2134,19 @@ class ParliamentarySession(ModelBase):
         ordering = ['start_date']
 
 
+def update_place_closure_for_session(sender, instance, created, **kwargs):
+    """A signal handler to update PlaceClosure when session dates change
+
+    Whether a place's parent is from an overlapping session may have
+    changed, so recalculate the closure rows for places in the session."""
+    if created:
+        return
+    PlaceClosure.objects.update_for_places(
+        instance.place_set.select_related('parent_place__parliamentary_session'))
+
+post_save.connect(update_place_closure_for_session, ParliamentarySession)
+
+
 class OrganisationRelationshipKind(ModelBase):
     """This represent a kind of relationship two organisations can be in
 
@@ -1780,3 +2236,40 @@ def raw_query_with_prefetch(query_model, query, params, fields_prefetches):
             if related_object:
                 setattr(o, field, related_object)
     return objects
+
+
+# Invalidate the cached fragments of person, place and organisation
+# pages (see pombola.core.fragment_cache) when what they show changes:
+
+def position_fragment_dependencies(position):
+    return [
+        (Person, position.person_id),
+        (Place, position.place_id),
+        (Organisation, position.organisation_id),
+    ]
+
+
+def content_object_fragment_dependencies(instance):
+    content_type = ContentType.objects.get_for_id(instance.content_type_id)
+    return [(content_type.model_class(), instance.object_id)]
+
+
+def every_page_fragment_dependencies(instance):
+    # Kinds, titles and sessions are shown on many pages, but are
+    # rarely changed, so throw away all the pages' fragments:
+    return [(Person, None), (Place, None), (Organisation, None)]
+
+
+fragment_cache.track_model(Person)
+fragment_cache.track_model(Place)
+fragment_cache.track_model(Organisation)
+fragment_cache.track_model(Position, position_fragment_dependencies)
+fragment_cache.track_model(
+    AlternativePersonName, lambda n: [(Person, n.person_id)])
+for generic_model in (Contact, Identifier, InformationSource, Image):
+    fragment_cache.track_model(
+        generic_model, content_object_fragment_dependencies)
+for shared_model in (
+        ContactKind, OrganisationKind, ParliamentarySession, PlaceKind,
+        PositionTitle):
+    fragment_cache.track_model(shared_model, every_page_fragment_dependencies)
@@ -3,8 +3,12 @@ import slumber
 import json
 import datetime
 from collections import defaultdict
+from os.path import join
+import shutil
+import tempfile
 from urlparse import urljoin
 
+from django.conf import settings
 from django.db.models import Prefetch
 from django.core.urlresolvers import reverse
 
@@ -16,6 +20,10 @@ from pombola.core.models import (
 from pombola import country
 
 
+# The number of people or organisations (with everything prefetched for
+# them) that are loaded at once when generating the Popolo data:
+CHUNK_SIZE = 500
+
 extra_popolo_person_fields = (
     'email',
     'summary',
@@ -30,6 +38,25 @@ extra_popolo_person_fields = (
     'gender',
 )
 
+def chunked_queryset(queryset, chunk_size=CHUNK_SIZE):
+    """Iterate over a queryset in primary key order, a chunk at a time
+
+    Unlike queryset.iterator(), this keeps any prefetch_related
+    lookups, since each chunk is fetched (and its related objects
+    prefetched) with separate queries, so only one chunk of objects is
+    in memory at once."""
+    last_pk = None
+    while True:
+        chunk_queryset = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk_queryset = chunk_queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+        for o in chunk:
+            yield o
+        last_pk = chunk[-1].pk
+
 def get_area_information(place, base_url):
     """Given a PopIt place, generate a Popolo area dictionary
 
@@ -134,8 +161,7 @@ def add_other_names(person, properties):
             an_properties['note'] = an.note
         properties['other_names'].append(an_properties)
 
-def get_events(primary_id_scheme, base_url):
-    result = []
+def iter_events(primary_id_scheme, base_url):
     for ps in ParliamentarySession.objects.select_related('house'):
         event = {
             'classification': 'legislative period',
@@ -146,20 +172,21 @@ def get_events(primary_id_scheme, base_url):
         }
         if ps.house:
             event['organization_id'] = ps.house.get_popolo_id(primary_id_scheme),
-        result.append(event)
-    return result
+        yield event
 
-def get_organizations(primary_id_scheme, base_url):
-    """Return a list of Popolo organization objects"""
+def get_events(primary_id_scheme, base_url):
+    return list(iter_events(primary_id_scheme, base_url))
 
-    result = []
+def get_organisation_categories():
+    """Return a dict mapping organisation slugs to a Popolo category"""
 
     oslug_to_categories = defaultdict(set)
 
-    for pos in Position.objects.order_by().select_related('organisation'):
-        if pos.organisation:
-            slug = pos.organisation.slug
-            oslug_to_categories[slug].add(pos.category)
+    # Each distinct organisation and category pair is only fetched once,
+    # rather than looking at every position:
+    for slug, category in Position.objects.filter(organisation__isnull=False) \
+            .order_by().values_list('organisation__slug', 'category').distinct():
+        oslug_to_categories[slug].add(category)
 
     all_categories = set()
     oslug_to_category = {}
@@ -191,12 +218,22 @@ def get_organizations(primary_id_scheme, base_url):
             print >> sys.stderr, error
         raise Exception, "Found organisations with multiple categories other than 'other'"
 
-    for o in Organisation.objects.order_by().select_related('kind').prefetch_related(
-            Prefetch(
-                'contacts',
-                queryset=Contact.objects.select_related('kind')
-            ),
-            'identifiers',
+    return oslug_to_category
+
+def iter_organizations(primary_id_scheme, base_url):
+    """Generate Popolo organization objects"""
+
+    oslug_to_category = get_organisation_categories()
+
+    for o in chunked_queryset(
+            Organisation.objects.select_related('kind').prefetch_related(
+                Prefetch(
+                    'contacts',
+                    queryset=Contact.objects.select_related('kind')
+                ),
+                'identifiers',
+                'place_set',
+            )
     ):
         properties = {'slug': o.slug,
                       'name': o.name.strip(),
@@ -210,17 +247,23 @@ def get_organizations(primary_id_scheme, base_url):
             end_key_map=('ended', 'dissolution_date'))
         add_identifiers_to_properties(o, properties, primary_id_scheme)
         add_contact_details_to_properties(o, properties)
-        result.append(properties)
         country.add_extra_popolo_data_for_organization(o, properties, base_url)
-    return result
+        yield properties
+
+def get_organizations(primary_id_scheme, base_url):
+    """Return a list of Popolo organization objects"""
+    return list(iter_organizations(primary_id_scheme, base_url))
+
+def iter_areas(primary_id_scheme, base_url):
+    places = Place.objects.order_by().select_related(
+        'mapit_area__type', 'parliamentary_session__house')
+    for pl in places.iterator():
+        area_information = get_area_information(pl, base_url)
+        if area_information is not None:
+            yield area_information
 
 def get_areas(primary_id_scheme, base_url):
-    all_areas = [
-        get_area_information(pl, base_url) for pl in
-        Place.objects.order_by().select_related(
-            'mapit_area__type', 'parliamentary_session__house')
-    ]
-    return [a for a in all_areas if a is not None]
+    return list(iter_areas(primary_id_scheme, base_url))
 
 def create_organisations(popit, primary_id_scheme, base_url):
     """Create organizations in PopIt based on those used in memberships in Pombola
@@ -240,35 +283,41 @@ def create_organisations(popit, primary_id_scheme, base_url):
             print >> sys.stderr, json.dumps(organization, indent=4)
             raise
 
-def get_people(primary_id_scheme, base_url, title_to_sessions, inline_memberships=True):
-
-    result = {
-        'persons': []
-    }
-    if not inline_memberships:
-        result['memberships'] = []
-
-    # TODO: if interests_register is being used, we should prefetch
-    # that as well (with the Prefetch doing a select_related on
-    # category and a prefetch_related on line_items.
-    for person in Person.objects.order_by().prefetch_related(
-            'alternative_names',
-            Prefetch(
-                'contacts',
-                queryset=Contact.objects.select_related('kind')
-            ),
-            'identifiers',
-            'images',
-            Prefetch(
-                'position_set',
-                queryset=Position.objects.order_by().select_related(
-                    'organisation',
-                    'place__mapit_area__type',
-                    'place__parliamentary_session__house',
-                    'title',
-                ).prefetch_related('identifiers')
-            )
-    ):
+def iter_people(primary_id_scheme, base_url, title_to_sessions):
+    """Generate a Popolo person object and a list of their memberships
+
+    The memberships aren't added to the person object, so that the
+    caller can decide whether to put them inline or not."""
+
+    prefetches = [
+        'alternative_names',
+        Prefetch(
+            'contacts',
+            queryset=Contact.objects.select_related('kind')
+        ),
+        'identifiers',
+        'images',
+        Prefetch(
+            'position_set',
+            queryset=Position.objects.order_by().select_related(
+                'organisation',
+                'place__mapit_area__type',
+                'place__parliamentary_session__house',
+                'title',
+            ).prefetch_related('identifiers')
+        ),
+    ]
+    if 'pombola.interests_register' in settings.INSTALLED_APPS:
+        # import here to avoid creating an import loop
+        from pombola.interests_register.models import Entry
+        prefetches.append(Prefetch(
+            'interests_register_entries',
+            queryset=Entry.objects.select_related('release', 'category') \
+                .prefetch_related('line_items')
+        ))
+
+    for person in chunked_queryset(
+            Person.objects.prefetch_related(*prefetches)):
         name = person.legal_name
         person_properties = {'name': name}
         for date, key in ((person.date_of_birth, 'birth_date'),
@@ -304,8 +353,7 @@ def get_people(primary_id_scheme, base_url, title_to_sessions, inline_membership
                 person_properties[key] = value
         country.add_extra_popolo_data_for_person(person, person_properties, base_url)
 
-        if inline_memberships:
-            person_properties['memberships'] = []
+        memberships = []
 
         for position in person.position_set.all():
             properties = {'person_id': person.get_popolo_id(primary_id_scheme)}
@@ -337,15 +385,28 @@ def get_people(primary_id_scheme, base_url, title_to_sessions, inline_membership
                 # better models reality anyway.0
                 most_likely_event = events_with_overlap[0]
                 properties['legislative_period_id'] = most_likely_event[1].slug
-            if inline_memberships:
-                person_properties['memberships'].append(properties)
-            else:
-                result['memberships'].append(properties)
+            memberships.append(properties)
+
+        yield person_properties, memberships
+
+def get_people(primary_id_scheme, base_url, title_to_sessions, inline_memberships=True):
+
+    result = {
+        'persons': []
+    }
+    if not inline_memberships:
+        result['memberships'] = []
 
+    for person_properties, memberships in iter_people(
+            primary_id_scheme, base_url, title_to_sessions):
+        if inline_memberships:
+            person_properties['memberships'] = memberships
+        else:
+            result['memberships'].extend(memberships)
         result['persons'].append(person_properties)
     return result
 
-def get_popolo_data(primary_id_scheme, base_url, inline_memberships=True):
+def get_title_to_sessions():
     title_to_sessions = {}
     for ps in ParliamentarySession.objects.select_related(
             'house', 'position_title'):
@@ -357,10 +418,13 @@ def get_popolo_data(primary_id_scheme, base_url, inline_memberships=True):
         title_to_sessions[title_slug].append(ps)
     for sessions in title_to_sessions.values():
         sessions.sort(key=lambda s: s.start_date)
+    return title_to_sessions
+
+def get_popolo_data(primary_id_scheme, base_url, inline_memberships=True):
     result = get_people(
         primary_id_scheme,
         base_url,
-        title_to_sessions,
+        get_title_to_sessions(),
         inline_memberships,
     )
     result['organizations'] = get_organizations(primary_id_scheme, base_url)
@@ -388,3 +452,159 @@ def create_people(popit, primary_id_scheme, base_url):
                 print >> sys.stderr, "Failed POSTing the {0}:".format(singular)
                 print >> sys.stderr, json.dumps(properties, indent=4)
                 raise
+
+class JSONArrayWriter(object):
+    """Write a JSON array to a file one item at a time
+
+    The array is indented as if it were a value 'depth' levels deep in
+    the object being written."""
+
+    def __init__(self, f, depth=0):
+        self.f = f
+        self.item_indent = '\n' + ' ' * (4 * (depth + 1))
+        self.end_indent = '\n' + ' ' * (4 * depth)
+        self.count = 0
+        self.f.write('[')
+
+    def write(self, item):
+        if self.count:
+            self.f.write(',')
+        text = json.dumps(item, indent=4, sort_keys=True, separators=(',', ': '))
+        self.f.write(self.item_indent)
+        self.f.write(text.replace('\n', self.item_indent))
+        self.count += 1
+
+    def close(self):
+        if self.count:
+            self.f.write(self.end_indent)
+        self.f.write(']')
+
+class MongoExportWriter(object):
+    """Write items in mongoexport format, one JSON object per line"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, item):
+        item = dict(item, _id=item['id'])
+        json.dump(item, self.f, sort_keys=True)
+        self.f.write("\n")
+
+    def close(self):
+        pass
+
+class PopoloJSONWriter(object):
+    """Write a Popolo JSON object to a file, a collection at a time"""
+
+    def __init__(self, f):
+        self.f = f
+        self.collection_count = 0
+        self.f.write('{')
+
+    def _write_key(self, name):
+        if self.collection_count:
+            self.f.write(',')
+        self.f.write('\n    {0}: '.format(json.dumps(name)))
+        self.collection_count += 1
+
+    def collection(self, name):
+        """Return a JSONArrayWriter for the items of a new collection"""
+        self._write_key(name)
+        return JSONArrayWriter(self.f, depth=1)
+
+    def copy_collection(self, name, array_file):
+        """Add a collection that was written to another file by a JSONArrayWriter"""
+        self._write_key(name)
+        array_file.seek(0)
+        shutil.copyfileobj(array_file, self.f)
+
+    def close(self):
+        self.f.write('\n}\n')
+
+def write_items(items, writers):
+    for item in items:
+        for writer in writers:
+            writer.write(item)
+    for writer in writers:
+        writer.close()
+
+def write_pombola_json(output_directory, primary_id_scheme, base_url):
+    """Write pombola.json and pombola-no-inline-memberships.json
+
+    Both files are written with a single pass over the database, and
+    items are written out as they're generated, so memory use doesn't
+    grow with the number of people or positions."""
+    title_to_sessions = get_title_to_sessions()
+    with open(join(output_directory, 'pombola.json'), 'w') as inline_file, \
+            open(join(output_directory, 'pombola-no-inline-memberships.json'), 'w') as separate_file, \
+            tempfile.TemporaryFile() as memberships_file:
+        inline = PopoloJSONWriter(inline_file)
+        separate = PopoloJSONWriter(separate_file)
+        for name, items in (
+                ('areas', iter_areas(primary_id_scheme, base_url)),
+                ('events', iter_events(primary_id_scheme, base_url)),
+                ('organizations', iter_organizations(primary_id_scheme, base_url)),
+        ):
+            write_items(items, [inline.collection(name), separate.collection(name)])
+
+        # In the file without inline memberships, the memberships are
+        # a separate collection, which is spooled to a temporary file
+        # until all the people have been written.
+        inline_persons = inline.collection('persons')
+        separate_persons = separate.collection('persons')
+        memberships = JSONArrayWriter(memberships_file, depth=1)
+        for person_properties, person_memberships in iter_people(
+                primary_id_scheme, base_url, title_to_sessions):
+            separate_persons.write(person_properties)
+            for membership in person_memberships:
+                memberships.write(membership)
+            person_properties['memberships'] = person_memberships
+            inline_persons.write(person_properties)
+        inline_persons.close()
+        separate_persons.close()
+        memberships.close()
+        separate.copy_collection('memberships', memberships_file)
+
+        for writer in (inline, separate):
+            writer.collection('posts').close()
+            writer.close()
+
+def write_popolo_collections(output_directory, primary_id_scheme, base_url):
+    """Write each Popolo collection as JSON and in mongoexport format
+
+    As with write_pombola_json, the items are written as they're
+    generated, and the people and memberships are found in one pass."""
+
+    def open_writers(collection):
+        json_file = open(join(output_directory, collection + '.json'), 'w')
+        mongo_file = open(join(output_directory, 'mongo-' + collection + '.dump'), 'w')
+        return [JSONArrayWriter(json_file), MongoExportWriter(mongo_file)], [json_file, mongo_file]
+
+    files = []
+    try:
+        for collection, items in (
+                ('areas', iter_areas(primary_id_scheme, base_url)),
+                ('events', iter_events(primary_id_scheme, base_url)),
+                ('organizations', iter_organizations(primary_id_scheme, base_url)),
+                ('posts', []),
+        ):
+            writers, collection_files = open_writers(collection)
+            files.extend(collection_files)
+            write_items(items, writers)
+
+        person_writers, collection_files = open_writers('persons')
+        files.extend(collection_files)
+        membership_writers, collection_files = open_writers('memberships')
+        files.extend(collection_files)
+        for person_properties, memberships in iter_people(
+                primary_id_scheme, base_url, get_title_to_sessions()):
+            for writer in person_writers:
+                writer.write(person_properties)
+            for membership in memberships:
+                for writer in membership_writers:
+                    writer.write(membership)
+        for writer in person_writers + membership_writers:
+            writer.close()
+    finally:
+        for f in files:
+            f.close()
@@ -0,0 +1,183 @@
+"""Streaming CSV export of the people holding a set of positions
+
+The position listing pages can be downloaded as CSV with
+?format=csv. For a large house that used to run several queries per
+row (identifiers, email contacts, parties and constituencies, and the
+identifiers of each of those), so this module loads everything the
+rows need in a fixed number of bulk queries and then streams the CSV
+out row by row.
+"""
+
+import unicodecsv as csv
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+
+from pombola.core.models import (
+    Contact, Identifier, Organisation, Place, current_memberships_prefetch
+)
+
+
+CSV_HEADERS = [
+    'id',
+    'source',
+    'name',
+    'honorific_prefix',
+    'email',
+    'image',
+    'identifier__wikidata',
+    'party',
+    'party_wikidata_id',
+    'area',
+    'area_wikidata_id',
+    'start_date',
+    'end_date',
+]
+
+
+class RowBuffer(object):
+    """A minimal file-like object for the CSV writer to write a row to
+
+    Each row written is collected and then handed back by pop(), so
+    that rows can be yielded one at a time to a StreamingHttpResponse
+    rather than building the whole file in memory."""
+
+    def __init__(self):
+        self.data = []
+
+    def write(self, value):
+        self.data.append(value)
+
+    def pop(self):
+        result = ''.join(self.data)
+        self.data = []
+        return result
+
+
+def handle_approx_date(date):
+    return_date = None
+    if date and not date.future:
+        if date.year:
+            return_date = str(date.year)
+        if date.month:
+            return_date = return_date + '-' + str(date.month).zfill(2)
+        if date.day:
+            return_date = return_date + '-' + str(date.day).zfill(2)
+    return return_date
+
+
+def wikidata_ids_for(model, object_ids):
+    """Return a dict mapping object ID to a wikidata ID for that object"""
+    if not object_ids:
+        return {}
+    identifiers = Identifier.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        object_id__in=object_ids,
+        scheme='wikidata',
+    ).order_by('id').values_list('object_id', 'identifier')
+    result = {}
+    for object_id, identifier in identifiers:
+        result.setdefault(object_id, identifier)
+    return result
+
+
+def single_name_and_wikidata_id(objects, wikidata_ids):
+    if not objects:
+        return None, None
+    if len(objects) > 1:
+        return 'MULTIPLE', 'MULTIPLE'
+    o = objects[0]
+    return o.name, wikidata_ids.get(o.id)
+
+
+def position_csv_rows(request, positions):
+    """Generate the header and then one row per position
+
+    The number of queries run is independent of the number of
+    positions."""
+    positions = list(
+        positions.prefetch_related(
+            'person__alternative_names',
+            'person__images',
+            Prefetch(
+                'person__identifiers',
+                queryset=Identifier.objects.filter(scheme='wikidata').order_by('id'),
+                to_attr='wikidata_identifiers',
+            ),
+            Prefetch(
+                'person__contacts',
+                queryset=Contact.email_contacts().order_by('-preferred', 'id'),
+                to_attr='email_addresses',
+            ),
+            current_memberships_prefetch('person__position_set'),
+        )
+    )
+
+    # Each person's parties and constituencies come from the
+    # memberships prefetched above, so finding them doesn't run any
+    # more queries:
+    parties = {}
+    constituencies = {}
+    for position in positions:
+        person = position.person
+        parties[person.id] = list(person.parties_and_coalitions())
+        constituencies[person.id] = list(person.constituencies())
+    party_wikidata_ids = wikidata_ids_for(
+        Organisation,
+        set(o.id for orgs in parties.values() for o in orgs))
+    place_wikidata_ids = wikidata_ids_for(
+        Place,
+        set(p.id for places in constituencies.values() for p in places))
+
+    yield CSV_HEADERS
+
+    for position in positions:
+        person = position.person
+
+        person_wikidata_id = None
+        if person.wikidata_identifiers:
+            person_wikidata_id = person.wikidata_identifiers[0].identifier
+
+        email = None
+        if person.email_addresses:
+            email = person.email_addresses[0].value
+
+        party_name, party_wikidata_id = single_name_and_wikidata_id(
+            parties.get(person.id), party_wikidata_ids)
+        area_name, area_wikidata_id = single_name_and_wikidata_id(
+            constituencies.get(person.id), place_wikidata_ids)
+
+        yield [
+            person.slug,
+            request.build_absolute_uri(person.get_absolute_url())
+                        .replace('http://', 'https://'),
+            person.name,
+            person.honorific_prefix,
+            email,
+            request.build_absolute_uri('/' + str(person.primary_image()))
+                        .replace('http://', 'https://'),
+            person_wikidata_id,
+            party_name,
+            party_wikidata_id,
+            area_name,
+            area_wikidata_id,
+            handle_approx_date(position.start_date),
+            handle_approx_date(position.end_date),
+        ]
+
+
+def position_csv_lines(request, positions):
+    buf = RowBuffer()
+    writer = csv.writer(buf)
+    for row in position_csv_rows(request, positions):
+        writer.writerow(row)
+        yield buf.pop()
+
+
+def position_csv_response(request, positions):
+    """Return a StreamingHttpResponse with the CSV for these positions"""
+    return StreamingHttpResponse(
+        position_csv_lines(request, positions),
+        content_type='text/csv',
+    )
@@ -0,0 +1,163 @@
+"""
+An in-memory index of positions by the dates they were active.
+
+Code that needs to know which positions were held on many different
+dates (e.g. the speaker of every hansard entry) would otherwise run a
+currently_active(when) query for each date and person. A PositionIndex
+loads the positions once, and then answers "which positions was this
+person holding on this date?" and "who was holding a position on this
+date?" from interval trees, without querying the database again.
+"""
+
+import datetime
+from collections import defaultdict
+
+from pombola.core.models import Position, approximate_dates_to_range
+
+
+class IntervalTree(object):
+    """
+    A static centred interval tree of half-open intervals.
+
+    intervals should be an iterable of (start, end, value) tuples; an
+    interval contains a point if start <= point < end. Empty intervals
+    are dropped. Finding the values of the intervals that contain a
+    point takes O(log n + k) time, where k is the number of matches.
+
+    >>> tree = IntervalTree([(1, 5, 'a'), (3, 8, 'b'), (8, 9, 'c'), (4, 4, 'd')])
+    >>> sorted(tree.search(0))
+    []
+    >>> sorted(tree.search(4))
+    ['a', 'b']
+    >>> sorted(tree.search(5))
+    ['b']
+    >>> sorted(tree.search(8))
+    ['c']
+    >>> len(tree)
+    3
+    """
+
+    def __init__(self, intervals):
+        intervals = [i for i in intervals if i[0] < i[1]]
+        self.size = len(intervals)
+        self.root = self.build(intervals)
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def build(cls, intervals):
+        """Return the root node for intervals as a tuple, or None"""
+        if not intervals:
+            return None
+        starts = sorted(i[0] for i in intervals)
+        # The interval starting at the median contains it, so each
+        # level of the tree has at most half the intervals of the last.
+        center = starts[len(starts) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] <= center:
+                left.append(interval)
+            elif interval[0] > center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        by_start = sorted(here, key=lambda i: i[0])
+        by_end = sorted(here, key=lambda i: i[1], reverse=True)
+        return (
+            center, by_start, by_end, cls.build(left), cls.build(right))
+
+    def search(self, point):
+        """Return a list of the values of intervals that contain point"""
+        results = []
+        node = self.root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if point < center:
+                # Every interval here ends after center, so it contains
+                # point if it starts on or before it.
+                for start, end, value in by_start:
+                    if start > point:
+                        break
+                    results.append(value)
+                node = left
+            else:
+                # Every interval here starts on or before center, so
+                # it contains point if it ends after it.
+                for start, end, value in by_end:
+                    if end <= point:
+                        break
+                    results.append(value)
+                node = right
+        return results
+
+
+def position_interval(position):
+    """Return the (start, end) dates of the days position was active"""
+    active_dates = position.active_dates
+    if active_dates is None:
+        active_dates = approximate_dates_to_range(
+            position.start_date, position.end_date)
+    if active_dates.isempty:
+        return datetime.date.max, datetime.date.max
+    return (
+        active_dates.lower or datetime.date.min,
+        active_dates.upper or datetime.date.max,
+    )
+
+
+class PositionIndex(object):
+    """
+    Find the positions that were active on a date, in memory.
+
+    Build one from a Position queryset (e.g. with PositionIndex.political())
+    once per command run or request; it doesn't see positions that are
+    changed after it was built.
+    """
+
+    def __init__(self, positions):
+        intervals = []
+        intervals_by_person = defaultdict(list)
+        for position in positions:
+            start, end = position_interval(position)
+            intervals.append((start, end, position))
+            intervals_by_person[position.person_id].append(
+                (start, end, position))
+        self.positions = IntervalTree(intervals)
+        self.positions_by_person = dict(
+            (person_id, IntervalTree(person_intervals))
+            for person_id, person_intervals in intervals_by_person.items()
+        )
+
+    @classmethod
+    def political(cls):
+        """Return an index of every political position"""
+        return cls(
+            Position.objects.political().select_related(
+                'person',
+                'title',
+                'place__kind',
+                'place__parent_place__kind',
+                'organisation__kind',
+            )
+        )
+
+    def active_positions(self, when):
+        """Return all the positions that were active on the date when"""
+        return self.positions.search(when)
+
+    def positions_for_person(self, person, when):
+        """Return the positions person (or a person ID) held on when"""
+        person_id = getattr(person, 'id', person)
+        tree = self.positions_by_person.get(person_id)
+        if tree is None:
+            return []
+        return tree.search(when)
+
+    def people(self, when, include_hidden=False):
+        """Return the people holding any position on when, by sort name"""
+        people = dict(
+            (p.person_id, p.person) for p in self.active_positions(when)
+            if include_hidden or not p.person.hidden
+        )
+        return sorted(people.values(), key=lambda p: (p.sort_name, p.id))
@@ -0,0 +1,53 @@
+from django import template
+
+from pombola.core import fragment_cache
+
+register = template.Library()
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, dependencies, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.dependencies = dependencies
+        self.vary_on = vary_on
+
+    def render(self, context):
+        return fragment_cache.get_or_render(
+            self.name.resolve(context),
+            [d.resolve(context) for d in self.dependencies],
+            lambda: self.nodelist.render(context),
+            vary_on=[v.resolve(context) for v in self.vary_on],
+        )
+
+
+@register.tag
+def cachefragment(parser, token):
+    """
+    Cache the contents of the block until something they depend on changes::
+
+        {% cachefragment "place-politicians" object object.parent_places "core.Person" vary=request.GET.order %}
+            ...
+        {% endcachefragment %}
+
+    The first argument is the name of the fragment, which its hits and
+    misses are counted under. The others are what it depends on: model
+    instances, lists of them, or models (as 'app_label.ModelName'
+    strings) for fragments that depend on every row. Any 'vary='
+    arguments are other values that the contents depend on.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            "'{0}' tag requires at least a fragment name".format(bits[0]))
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    dependencies = []
+    vary_on = []
+    for bit in bits[2:]:
+        if bit.startswith('vary='):
+            vary_on.append(parser.compile_filter(bit[len('vary='):]))
+        else:
+            dependencies.append(parser.compile_filter(bit))
+    return CacheFragmentNode(
+        nodelist, parser.compile_filter(bits[1]), dependencies, vary_on)
@@ -0,0 +1,79 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django_webtest import WebTest
+
+from pombola.core import fragment_cache, models
+
+
+@override_settings(FRAGMENT_CACHE_STATS=True)
+class FragmentCacheTest(WebTest):
+
+    def setUp(self):
+        fragment_cache.get_cache().clear()
+        fragment_cache.reset_fragment_stats()
+
+        self.organisation_kind = models.OrganisationKind.objects.create(
+            name='Foo',
+            slug='foo',
+        )
+        self.organisation = models.Organisation.objects.create(
+            name='Test Org',
+            slug='test-org',
+            kind=self.organisation_kind,
+        )
+        self.title = models.PositionTitle.objects.create(
+            name='Test title',
+            slug='test-title',
+        )
+        self.alice = models.Person.objects.create(
+            legal_name='Alice Adams',
+            slug='alice-adams',
+        )
+        self.bob = models.Person.objects.create(
+            legal_name='Bob Brown',
+            slug='bob-brown',
+        )
+        models.Position.objects.create(
+            person=self.alice,
+            title=self.title,
+            organisation=self.organisation,
+        )
+
+    def get_organisation_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.app.get('/organisation/test-org/')
+        return ' '.join(resp.text.split()), len(queries)
+
+    def test_fragment_served_from_cache(self):
+        text, first_queries = self.get_organisation_page()
+        self.assertIn('1 person', text)
+        text, second_queries = self.get_organisation_page()
+        self.assertIn('1 person', text)
+        self.assertLess(second_queries, first_queries)
+        self.assertEqual(
+            fragment_cache.fragment_stats()['organisation-counts'], (1, 1))
+
+    @override_settings(FRAGMENT_CACHE_STATS=False)
+    def test_fragments_not_counted_by_default(self):
+        self.get_organisation_page()
+        self.assertEqual(fragment_cache.fragment_stats(), {})
+
+    def test_fragment_invalidated_by_related_change(self):
+        self.get_organisation_page()
+        models.Position.objects.create(
+            person=self.bob,
+            title=self.title,
+            organisation=self.organisation,
+        )
+        text, _ = self.get_organisation_page()
+        self.assertIn('2 people', text)
+        self.assertEqual(
+            fragment_cache.fragment_stats()['organisation-counts'], (0, 2))
+
+    def test_model_dependency_invalidated_by_any_row(self):
+        key = fragment_cache.fragment_key('test', ['core.Person'])
+        self.assertEqual(
+            key, fragment_cache.fragment_key('test', ['core.Person']))
+        self.bob.save()
+        self.assertNotEqual(
+            key, fragment_cache.fragment_key('test', ['core.Person']))
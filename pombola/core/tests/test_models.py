@@ -5,6 +5,8 @@ from django.test import TestCase
 from django_date_extensions.fields import ApproximateDate
 from django.contrib.contenttypes.models import ContentType
 
+from mapit.models import Area, Generation, Type
+from mock import patch
 from slug_helpers.models import SlugRedirect
 
 from pombola.core import models
@@ -524,6 +526,27 @@ class PersonPlaceTest(TestCase):
     def test_constituencies_comes_from_political_positions(self):
         self.assertTrue(self.place_d not in self.person.constituencies())
 
+    def test_with_current_memberships(self):
+        person = models.Person.objects.with_current_memberships() \
+            .get(pk=self.person.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [p.slug for p in person.constituencies()],
+                ['other-place', 'place', 'third-place'])
+            self.assertTrue(person.is_politician())
+            self.assertFalse(person.is_aspirant())
+            self.assertFalse(person.parties_and_coalitions())
+        # The results can still be filtered further:
+        self.assertEqual(
+            [p.slug for p in person.constituencies().filter(slug='place')],
+            ['place'])
+
+    def test_current_memberships_cleared_when_position_saved(self):
+        self.assertEqual(len(self.person.constituencies()), 3)
+        self.position_e.end_date = '2001-12-31'
+        self.position_e.save()
+        self.assertEqual(len(self.person.constituencies()), 2)
+
     def test_place_related_people_no_filter(self):
         related_people = self.place_a.related_people(
             positions_filter=lambda qs: qs)
@@ -543,6 +566,176 @@ class PersonPlaceTest(TestCase):
                          set([self.position_a]))
 
 
+class PlaceClosureTest(TestCase):
+
+    def setUp(self):
+        self.kind = models.PlaceKind.objects.create(
+            name='Test Place',
+            slug='test-place',
+        )
+        self.session_old = models.ParliamentarySession.objects.create(
+            start_date=date(2007, 12, 28),
+            end_date=date(2013, 1, 14),
+            slug='s2007',
+            name='Session 2007-2013',
+        )
+        self.session_new = models.ParliamentarySession.objects.create(
+            start_date=date(2013, 3, 5),
+            end_date=date(9999, 12, 31),
+            slug='s2013',
+            name='Session 2013-',
+        )
+        self.country = self.create_place('country')
+        self.province = self.create_place('province', parent=self.country)
+        self.county = self.create_place(
+            'county', parent=self.province, session=self.session_old)
+        self.ward = self.create_place(
+            'ward', parent=self.county, session=self.session_new)
+
+    def create_place(self, slug, parent=None, session=None):
+        return models.Place.objects.create(
+            name=slug.title(),
+            slug=slug,
+            kind=self.kind,
+            parent_place=parent,
+            parliamentary_session=session,
+        )
+
+    def test_parent_places(self):
+        self.assertEqual(
+            self.ward.parent_places(),
+            [self.county, self.province, self.country])
+        self.assertEqual(self.country.parent_places(), [])
+
+    def test_parent_places_single_query(self):
+        with self.assertNumQueries(1):
+            self.ward.parent_places()
+
+    def test_self_and_parents(self):
+        self.assertEqual(
+            set(self.county.self_and_parents()),
+            set([self.county, self.province, self.country]))
+
+    def test_moving_a_place_updates_descendants(self):
+        self.county.parent_place = None
+        self.county.save()
+        self.assertEqual(self.ward.parent_places(), [self.county])
+        self.county.parent_place = self.country
+        self.county.save()
+        self.assertEqual(
+            self.ward.parent_places(), [self.county, self.country])
+
+    def test_session_overlap_rule(self):
+        closures = models.PlaceClosure.objects.filter(descendant=self.ward)
+        self.assertEqual(
+            set(c.ancestor for c in closures if c.sessions_overlap),
+            set([self.ward]))
+        self.session_old.end_date = date(2013, 6, 1)
+        self.session_old.save()
+        closures = models.PlaceClosure.objects.filter(descendant=self.ward)
+        self.assertEqual(
+            set(c.ancestor for c in closures if c.sessions_overlap),
+            set([self.ward, self.county, self.province, self.country]))
+
+    def test_rebuild(self):
+        models.PlaceClosure.objects.all().delete()
+        models.PlaceClosure.objects.rebuild()
+        self.assertEqual(
+            self.ward.parent_places(),
+            [self.county, self.province, self.country])
+        self.assertEqual(models.PlaceClosure.objects.count(), 10)
+
+
+class PlaceBoundaryOverlapTest(TestCase):
+
+    def setUp(self):
+        self.generation = Generation.objects.create(
+            active=True,
+            description="Test generation",
+        )
+        self.area_type = Type.objects.create(
+            code='CON',
+            description='Constituency',
+        )
+        self.kind = models.PlaceKind.objects.create(
+            name='Constituency',
+            slug='constituency',
+        )
+        self.session_2007 = models.ParliamentarySession.objects.create(
+            start_date=date(2007, 12, 28),
+            end_date=date(2013, 1, 14),
+            slug='na2007',
+            name='National Assembly 2007-2013',
+        )
+        self.session_2013 = models.ParliamentarySession.objects.create(
+            start_date=date(2013, 3, 5),
+            end_date=date(9999, 12, 31),
+            slug='na2013',
+            name='National Assembly 2013-',
+        )
+        self.old = self.create_place('old', self.session_2007)
+        self.new_a = self.create_place('new-a', self.session_2013)
+        self.new_b = self.create_place('new-b', self.session_2013)
+        self.new_c = self.create_place('new-c', self.session_2013)
+
+    def create_place(self, slug, session):
+        area = Area.objects.create(
+            name=slug,
+            type=self.area_type,
+            generation_low=self.generation,
+            generation_high=self.generation,
+        )
+        return models.Place.objects.create(
+            name=slug,
+            slug=slug,
+            kind=self.kind,
+            mapit_area=area,
+            parliamentary_session=session,
+        )
+
+    def test_boundary_changes_from_table(self):
+        for place, percent in ((self.new_a, 70.0),
+                               (self.new_b, 29.5),
+                               (self.new_c, 0.5)):
+            models.PlaceBoundaryOverlap.objects.create(
+                place=self.old, other_place=place, percent=percent)
+        with self.assertNumQueries(2):
+            changes = self.old.get_boundary_changes()
+        self.assertIsNone(changes['previous'])
+        self.assertEqual(changes['next']['session'], self.session_2013)
+        self.assertEqual(changes['next']['connector'], 'is currently in')
+        self.assertEqual(
+            changes['next']['intersections'],
+            [{'percent': 70.0, 'place': self.new_a},
+             {'percent': 29.5, 'place': self.new_b}])
+        self.assertEqual(changes['next']['others'], [self.new_c])
+
+    def test_changing_area_clears_overlaps(self):
+        models.PlaceBoundaryOverlap.objects.create(
+            place=self.old, other_place=self.new_a, percent=100.0)
+        models.PlaceBoundaryOverlap.objects.create(
+            place=self.new_a, other_place=self.old, percent=100.0)
+        self.new_a.mapit_area = None
+        self.new_a.save()
+        self.assertFalse(models.PlaceBoundaryOverlap.objects.exists())
+
+    def test_creating_place_with_area_calculates_overlaps(self):
+        with patch.object(models.PlaceBoundaryOverlap.objects,
+                          'update_for_place') as update_for_place:
+            place = self.create_place('new-d', self.session_2013)
+        update_for_place.assert_called_once_with(place)
+
+    def test_rebuild_clears_stale_overlaps(self):
+        models.PlaceBoundaryOverlap.objects.create(
+            place=self.old, other_place=self.new_a, percent=100.0)
+        models.PlaceBoundaryOverlap.objects.create(
+            place=self.new_a, other_place=self.old, percent=100.0)
+        # Bypass the signal handlers, as a bulk update would:
+        models.Place.objects.filter(pk=self.old.pk).update(mapit_area=None)
+        models.PlaceBoundaryOverlap.objects.rebuild()
+        self.assertFalse(models.PlaceBoundaryOverlap.objects.exists())
+
+
 @attr(country="south_africa")
 class SummaryTest(TestCase):
 
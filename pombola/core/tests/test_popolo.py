@@ -1,4 +1,8 @@
 from datetime import date
+import json
+from os.path import join
+import shutil
+import tempfile
 
 from django.contrib.contenttypes.models import ContentType
 from django.core.files.base import ContentFile
@@ -11,7 +15,9 @@ from mapit.models import Generation, Area, Type
 from images.models import Image
 
 from pombola.core import models
-from pombola.core.popolo import get_popolo_data
+from pombola.core.popolo import (
+    get_popolo_data, write_pombola_json, write_popolo_collections
+)
 
 
 class PopoloTest(TestCase):
@@ -300,5 +306,44 @@ class PopoloTest(TestCase):
         self.assertEqual(session['id'], example_session.id)
         self.assertEqual(session['mapit_generation'], self.generation.id)
 
+    def test_streamed_pombola_json(self):
+        output_directory = tempfile.mkdtemp()
+        try:
+            write_pombola_json(
+                output_directory, 'org.example', 'http://pombola.example.org/')
+            for leafname, inline_memberships in (
+                    ('pombola.json', True),
+                    ('pombola-no-inline-memberships.json', False),
+            ):
+                with open(join(output_directory, leafname)) as f:
+                    streamed = json.load(f)
+                expected = get_popolo_data(
+                    'org.example',
+                    'http://pombola.example.org/',
+                    inline_memberships=inline_memberships)
+                self.assertEqual(streamed, json.loads(json.dumps(expected)))
+        finally:
+            shutil.rmtree(output_directory)
+
+    def test_streamed_popolo_collections(self):
+        output_directory = tempfile.mkdtemp()
+        try:
+            write_popolo_collections(
+                output_directory, 'org.example', 'http://pombola.example.org/')
+            expected = json.loads(json.dumps(get_popolo_data(
+                'org.example',
+                'http://pombola.example.org/',
+                inline_memberships=False)))
+            for collection, items in expected.items():
+                with open(join(output_directory, collection + '.json')) as f:
+                    self.assertEqual(json.load(f), items)
+                with open(join(output_directory, 'mongo-' + collection + '.dump')) as f:
+                    mongo_items = [json.loads(line) for line in f]
+                self.assertEqual(
+                    mongo_items,
+                    [dict(item, _id=item['id']) for item in items])
+        finally:
+            shutil.rmtree(output_directory)
+
 # FIXME: also mock out the PopIt API to test create_organisations and
 # create_people.
@@ -0,0 +1,101 @@
+import datetime
+
+from django.test import TestCase
+
+from django_date_extensions.fields import ApproximateDate
+
+from nose.plugins.attrib import attr
+
+from pombola.core import models
+from pombola.core.position_index import PositionIndex
+
+
+@attr(country='south_africa')
+class PositionIndexTest(TestCase):
+    def setUp(self):
+        self.title = models.PositionTitle.objects.create(
+            name='Member of Parliament',
+            slug='member-of-parliament',
+        )
+        self.alice = models.Person.objects.create(
+            legal_name='Alice Adams',
+            slug='alice-adams',
+        )
+        self.bob = models.Person.objects.create(
+            legal_name='Bob Brown',
+            slug='bob-brown',
+        )
+        self.hidden = models.Person.objects.create(
+            legal_name='Hidden Person',
+            slug='hidden-person',
+            hidden=True,
+        )
+        self.alice_first = models.Position.objects.create(
+            person=self.alice,
+            title=self.title,
+            category='political',
+            start_date=ApproximateDate(2009),
+            end_date=ApproximateDate(2014, 5),
+        )
+        self.alice_second = models.Position.objects.create(
+            person=self.alice,
+            title=self.title,
+            category='political',
+            start_date=ApproximateDate(2014, 6, 1),
+            end_date=ApproximateDate(future=True),
+        )
+        self.bob_position = models.Position.objects.create(
+            person=self.bob,
+            title=self.title,
+            category='political',
+            start_date=ApproximateDate(2012, 3, 4),
+            end_date=ApproximateDate(2013, 2, 1),
+        )
+        models.Position.objects.create(
+            person=self.hidden,
+            title=self.title,
+            category='political',
+            start_date=ApproximateDate(2010),
+        )
+        models.Position.objects.create(
+            person=self.bob,
+            title=self.title,
+            category='other',
+            start_date=ApproximateDate(2010),
+        )
+        self.index = PositionIndex.political()
+
+    def test_positions_for_person_match_queries(self):
+        for when in (
+                datetime.date(2008, 12, 31),
+                datetime.date(2012, 3, 4),
+                datetime.date(2013, 2, 1),
+                datetime.date(2013, 2, 2),
+                datetime.date(2014, 5, 31),
+                datetime.date(2014, 6, 1),
+                datetime.date(2030, 1, 1)):
+            for person in (self.alice, self.bob, self.hidden):
+                expected = set(
+                    person.position_set.all().current_politician_positions(when))
+                self.assertEqual(
+                    set(self.index.positions_for_person(person, when)),
+                    expected)
+
+    def test_positions_for_person_without_positions(self):
+        self.assertEqual(
+            self.index.positions_for_person(0, datetime.date(2012, 1, 1)),
+            [])
+
+    def test_people(self):
+        self.assertEqual(
+            self.index.people(datetime.date(2012, 6, 1)),
+            [self.alice, self.bob])
+        self.assertEqual(
+            self.index.people(datetime.date(2014, 5, 31)),
+            [self.alice])
+        self.assertEqual(
+            self.index.people(datetime.date(2008, 1, 1)),
+            [])
+        self.assertIn(
+            self.hidden,
+            self.index.people(datetime.date(2012, 6, 1), include_hidden=True))
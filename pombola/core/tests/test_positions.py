@@ -2,7 +2,7 @@ import random
 import datetime
 
 from django.contrib.contenttypes.models import ContentType
-from django.core import exceptions
+from django.core import exceptions, serializers
 from django.core.urlresolvers import reverse
 from django.test import TestCase
 
@@ -541,6 +541,69 @@ class PositionTest(TestCase):
         self.assertEqual( pos_qs.previous(mid_2012).count(), 0 )
         self.assertEqual( pos_qs.previous(mid_2013).count(), 1 )
 
+    def test_active_dates_range(self):
+        """Check the range that the date filters use is set on save"""
+
+        position = models.Position.objects.create(
+            person     = self.person,
+            title      = self.title,
+            start_date = ApproximateDate(year=2011, month=3),
+            end_date   = ApproximateDate(year=2012),
+        )
+        position = models.Position.objects.get(pk=position.pk)
+        self.assertEqual(position.active_dates.lower, datetime.date(2011, 3, 1))
+        self.assertEqual(position.active_dates.upper, datetime.date(2013, 1, 1))
+
+        pos_qs = models.Position.objects.all()
+        self.assertEqual( pos_qs.currently_active(datetime.date(2011, 2, 28)).count(), 0 )
+        self.assertEqual( pos_qs.currently_active(datetime.date(2011, 3, 1)).count(), 1 )
+        self.assertEqual( pos_qs.currently_active(datetime.date(2012, 12, 31)).count(), 1 )
+        self.assertEqual( pos_qs.future(datetime.date(2011, 2, 28)).count(), 1 )
+        self.assertEqual( pos_qs.future(datetime.date(2011, 3, 1)).count(), 0 )
+        self.assertEqual( pos_qs.active_during_year(2010).count(), 0 )
+        self.assertEqual( pos_qs.active_during_year(2011).count(), 1 )
+        self.assertEqual( pos_qs.active_during_year(2012).count(), 1 )
+        self.assertEqual( pos_qs.active_during_year(2013).count(), 0 )
+
+        # A 'past' end date means the position has ended, whatever the
+        # start date:
+        position.end_date = ApproximateDate(past=True)
+        position.save()
+        self.assertEqual( pos_qs.currently_active(datetime.date(2011, 6, 1)).count(), 0 )
+        self.assertEqual( pos_qs.previous(datetime.date(2000, 1, 1)).count(), 1 )
+        self.assertEqual( pos_qs.active_during_year(2011).count(), 0 )
+
+    def test_active_dates_range_of_dates_wrong_way_round(self):
+        """Check positions that end before they start are still found"""
+
+        models.Position.objects.create(
+            person     = self.person,
+            title      = self.title,
+            start_date = ApproximateDate(year=2012),
+            end_date   = ApproximateDate(year=2010),
+        )
+        pos_qs = models.Position.objects.all()
+        self.assertEqual( pos_qs.currently_active(datetime.date(2011, 6, 1)).count(), 1 )
+        self.assertEqual( pos_qs.previous(datetime.date(2013, 1, 1)).count(), 1 )
+        self.assertEqual( pos_qs.future(datetime.date(2009, 12, 31)).count(), 1 )
+
+    def test_active_dates_range_set_for_fixtures(self):
+        """Check the range is set for positions loaded without save()"""
+
+        position = models.Position.objects.create(
+            person     = self.person,
+            title      = self.title,
+            start_date = ApproximateDate(year=2011),
+            end_date   = ApproximateDate(year=2012),
+        )
+        data = serializers.serialize('json', [position], fields=(
+            'person', 'title', 'start_date', 'end_date', 'category'))
+        position.delete()
+        for deserialized in serializers.deserialize('json', data):
+            deserialized.save()
+        self.assertEqual(
+            models.Position.objects.all().currently_active(datetime.date(2011, 6, 1)).count(), 1)
+
     def test_position_title_no_redirect(self):
         response = self.client.get(
             reverse('position_pt', kwargs={
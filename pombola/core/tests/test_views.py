@@ -5,7 +5,9 @@ from contextlib import contextmanager
 from django_date_extensions.fields import ApproximateDate
 from django_webtest import WebTest
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from slug_helpers.models import SlugRedirect
 
@@ -294,6 +296,109 @@ class PositionViewTest(WebTest):
         self.assertTrue(response.context['alphabetical_link_from_query_parameter'])
 
 
+class PositionCSVTest(WebTest):
+
+    def setUp(self):
+        self.title = models.PositionTitle.objects.create(
+            name='Member of Parliament',
+            slug='member-parliament',
+        )
+        self.party_kind = models.OrganisationKind.objects.create(
+            name='Party',
+            slug='party',
+        )
+        self.parliament_kind = models.OrganisationKind.objects.create(
+            name='Governmental',
+            slug='governmental',
+        )
+        self.parliament = models.Organisation.objects.create(
+            name='National Assembly',
+            slug='national-assembly',
+            kind=self.parliament_kind,
+        )
+        self.place_kind = models.PlaceKind.objects.create(
+            name='Constituency',
+            slug='constituency',
+        )
+        self.member_title = models.PositionTitle.objects.create(
+            name='Member',
+            slug='member',
+        )
+        self.email_kind = models.ContactKind.objects.create(
+            name='Email',
+            slug='email',
+        )
+        self.party = models.Organisation.objects.create(
+            name='Test Party',
+            slug='test-party',
+            kind=self.party_kind,
+        )
+        self.party.identifiers.create(scheme='wikidata', identifier='Q1')
+        self.add_members(range(3))
+
+    def add_members(self, numbers):
+        for i in numbers:
+            person = models.Person.objects.create(
+                legal_name='Person {0}'.format(i),
+                slug='person-{0}'.format(i),
+            )
+            person.identifiers.create(
+                scheme='wikidata', identifier='Q10{0}'.format(i))
+            person.contacts.create(
+                kind=self.email_kind,
+                value='person{0}@example.org'.format(i),
+                preferred=True,
+            )
+            place = models.Place.objects.create(
+                name='Place {0}'.format(i),
+                slug='place-{0}'.format(i),
+                kind=self.place_kind,
+            )
+            place.identifiers.create(
+                scheme='wikidata', identifier='Q20{0}'.format(i))
+            models.Position.objects.create(
+                person=person,
+                organisation=self.parliament,
+                title=self.title,
+                place=place,
+                category='political',
+                start_date=ApproximateDate(year=2013, month=3, day=4),
+            )
+            models.Position.objects.create(
+                person=person,
+                organisation=self.party,
+                title=self.member_title,
+            )
+
+    def get_csv_rows(self):
+        resp = self.app.get('/position/member-parliament/?format=csv')
+        self.assertEqual(resp.content_type, 'text/csv')
+        return [l.split(',') for l in resp.body.strip().splitlines()]
+
+    def test_csv_contents(self):
+        rows = self.get_csv_rows()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0][0], 'id')
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row['id'], 'person-0')
+        self.assertEqual(row['email'], 'person0@example.org')
+        self.assertEqual(row['identifier__wikidata'], 'Q100')
+        self.assertEqual(row['party'], 'Test Party')
+        self.assertEqual(row['party_wikidata_id'], 'Q1')
+        self.assertEqual(row['area'], 'Place 0')
+        self.assertEqual(row['area_wikidata_id'], 'Q200')
+        self.assertEqual(row['start_date'], '2013-03-04')
+
+    def test_csv_query_count_does_not_depend_on_rows(self):
+        with CaptureQueriesContext(connection) as few_rows:
+            self.get_csv_rows()
+        self.add_members(range(3, 20))
+        with CaptureQueriesContext(connection) as many_rows:
+            rows = self.get_csv_rows()
+        self.assertEqual(len(rows), 21)
+        self.assertEqual(len(few_rows), len(many_rows))
+
+
 class TestPersonView(WebTest):
 
     def setUp(self):
@@ -14,7 +14,6 @@ import json
 import string
 import sys
 import subprocess
-import unicodecsv as csv
 from urlparse import urlsplit, urlunsplit, urljoin
 from os.path import dirname
 
@@ -32,11 +31,13 @@ from django.core.cache import cache
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.views.generic import View
+from django.utils.functional import SimpleLazyObject
 
 from popolo.models import Identifier
 from slug_helpers.views import SlugRedirectMixin, get_slug_redirect
 
 from pombola.core import models
+from pombola.core.position_csv import position_csv_response
 from pombola.country import override_current_session
 
 import requests
@@ -152,9 +153,17 @@ class SubSlugRedirectMixin(SlugRedirectMixin):
 
 
 class BaseDetailView(DetailView):
+    def get_fragment_dependencies(self):
+        """What the cached fragments of the page are made from
+
+        These are passed to the cachefragment template tag as
+        fragment_dependencies; see pombola.core.fragment_cache."""
+        return [self.object]
+
     def get_context_data(self, **kwargs):
         context = super(BaseDetailView, self).get_context_data(**kwargs)
         context.update(self.object.get_disqus_thread_data(self.request))
+        context['fragment_dependencies'] = self.get_fragment_dependencies()
         return context
 
 
@@ -198,11 +207,24 @@ class PersonSpeakerMappingsMixin(object):
 class BasePlaceDetailView(BaseDetailView):
     model = models.Place
 
+    def get_fragment_dependencies(self):
+        # The politicians listed for a place are also those of its
+        # parent places, and their names, or those of the organisations
+        # they're in, might change:
+        return [
+            self.object,
+            self.object.parent_places(),
+            'core.Person',
+            'core.Organisation',
+        ]
+
     def get_context_data(self, **kwargs):
         # Call the base implementation first to get a context
         context = super(BasePlaceDetailView, self).get_context_data(**kwargs)
         context['place_type_count'] = models.Place.objects.filter(kind=self.object.kind).count()
-        context['related_people'] = self.object.related_people()
+        # Only find the related people if they're used, rather than
+        # shown from a cached fragment:
+        context['related_people'] = SimpleLazyObject(self.object.related_people)
         if settings.ENABLED_FEATURES['projects']:
             # The number of projects associated with the place is used
             # in the link text in the object_menu_links:
@@ -513,108 +535,14 @@ def position(request, pt_slug, ok_slug=None, o_slug=None):
 
     if request.GET.get('format') == 'csv':
 
-        response = HttpResponse(content_type='text/csv')
-
-        writer = csv.writer(response)
-
-        writer.writerow([
-            'id',
-            'source',
-            'name',
-            'honorific_prefix',
-            'email',
-            'image',
-            'identifier__wikidata',
-            'party',
-            'party_wikidata_id',
-            'area',
-            'area_wikidata_id',
-            'start_date',
-            'end_date'
-        ])
-
-        for position in positions:
-
-            person = position.person
-
-            person_wikidata_id_query = person.identifiers.filter(scheme='wikidata')
-            if person_wikidata_id_query.exists():
-                person_wikidata_id = person_wikidata_id_query.first().identifier
-            else:
-                person_wikidata_id = None
-
-            email_query = person.contacts.filter(kind__slug='email').order_by('-preferred')
-            if email_query.exists():
-                email = email_query.first().value
-            else:
-                email = None
-
-            if person.parties_and_coalitions():
-                if len(person.parties_and_coalitions()) > 1:
-                    person_party_name = 'MULTIPLE'
-                    person_party_wikidata_id = 'MULTIPLE'
-                else:
-                    party = person.parties_and_coalitions().first()
-                    person_party_name = party.name
-                    person_party_wikidata_id_query = party.identifiers.filter(scheme='wikidata')
-                    if person_party_wikidata_id_query.exists():
-                        person_party_wikidata_id = person_party_wikidata_id_query.first().identifier
-                    else:
-                        person_party_wikidata_id = None
-            else:
-                person_party_name = None
-                person_party_wikidata_id = None
-
-            if person.constituencies():
-                if len(person.constituencies()) > 1:
-                    person_area_name = 'MULTIPLE'
-                    person_area_wikidata_id = 'MULTIPLE'
-                else:
-                    area = person.constituencies().first()
-                    person_area_name = area.name
-                    person_area_wikidata_id_query = area.identifiers.filter(scheme='wikidata')
-                    if person_area_wikidata_id_query.exists():
-                        person_area_wikidata_id = person_area_wikidata_id_query.first().identifier
-                    else:
-                        person_area_wikidata_id = None
-            else:
-                person_area_name = None
-                person_area_wikidata_id = None
-
-            def handle_approx_date(date):
-                return_date = None
-                if date and not date.future:
-                    if date.year:
-                        return_date = str(date.year)
-                    if date.month:
-                        return_date = return_date + '-' + str(date.month).zfill(2)
-                    if date.day:
-                        return_date = return_date + '-' + str(date.day).zfill(2)
-
-                return return_date
-
-            writer.writerow([
-                person.slug,
-                request.build_absolute_uri(person.get_absolute_url())
-                            .replace('http://', 'https://'),
-                person.name,
-                person.honorific_prefix,
-                email,
-                request.build_absolute_uri('/' + str(person.primary_image()))
-                            .replace('http://', 'https://'),
-                person_wikidata_id,
-                person_party_name,
-                person_party_wikidata_id,
-                person_area_name,
-                person_area_wikidata_id,
-                handle_approx_date(position.start_date),
-                handle_approx_date(position.end_date)
-            ])
-
-        return response
+        return position_csv_response(request, positions)
 
     else:
 
+        # The listing shows each person's parties:
+        context['positions'] = positions.prefetch_related(
+            models.current_memberships_prefetch('person__position_set'))
+
         return render_to_response(
             template,
             context,
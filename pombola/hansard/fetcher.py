@@ -0,0 +1,208 @@
+"""
+Fetching of hansard list pages and source files.
+
+Each response body is saved in the 'content' directory of HANSARD_CACHE
+under the SHA-1 of its content, so a file that is listed under several
+names or URLs is only stored (and parsed) once. The ETag and
+Last-Modified headers of each URL are kept in FetchedUrl, so that
+refetching a URL is a conditional request which the server can answer
+with a 304 rather than the whole file.
+"""
+
+import datetime
+import errno
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+
+from pombola.hansard.models.fetched_url import FetchedUrl
+
+
+REQUEST_TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+
+
+class FetchError(Exception):
+    pass
+
+
+FetchResult = namedtuple(
+    'FetchResult',
+    ['url', 'content_hash', 'etag', 'last_modified', 'changed'],
+)
+
+
+def make_session(workers=1):
+    """Return a session which keeps open connections for `workers` threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=workers, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def content_path(content_hash):
+    """Absolute path to the stored file with the given content hash"""
+    return os.path.join(
+        settings.HANSARD_CACHE, 'content', content_hash[:2], content_hash)
+
+
+def store_content(chunks):
+    """Save the chunks of a body in the content store and return its hash"""
+    content_dir = os.path.join(settings.HANSARD_CACHE, 'content')
+    makedirs(content_dir)
+
+    # Write to a temporary file first, so that a partial download is
+    # never found under a content hash.
+    sha1 = hashlib.sha1()
+    fd, temp_path = tempfile.mkstemp(dir=content_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                sha1.update(chunk)
+                f.write(chunk)
+        content_hash = sha1.hexdigest()
+        path = content_path(content_hash)
+        makedirs(os.path.dirname(path))
+        os.rename(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return content_hash
+
+
+def fetch(session, url, previous=None):
+    """
+    Fetch url into the content store and return a FetchResult.
+
+    If previous (the FetchedUrl of an earlier fetch) is given and its
+    content is still in the store, the request is conditional on the
+    content having changed since. This doesn't use the database, so it
+    can be run in several threads at once. Raises FetchError if the URL
+    could not be retrieved.
+    """
+    headers = {}
+    if previous and previous.content_hash \
+            and os.path.exists(content_path(previous.content_hash)):
+        if previous.etag:
+            headers['If-None-Match'] = previous.etag
+        if previous.last_modified:
+            headers['If-Modified-Since'] = previous.last_modified
+
+    try:
+        response = session.get(
+            url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        raise FetchError("%s, url: %s" % (e, url))
+
+    try:
+        if headers and response.status_code == 304:
+            return FetchResult(
+                url=url,
+                content_hash=previous.content_hash,
+                etag=response.headers.get('ETag', previous.etag),
+                last_modified=response.headers.get(
+                    'Last-Modified', previous.last_modified),
+                changed=False,
+            )
+
+        if response.status_code != 200:
+            raise FetchError(
+                "status code: %s, url: %s" % (response.status_code, url))
+
+        try:
+            content_hash = store_content(response.iter_content(CHUNK_SIZE))
+        except requests.exceptions.RequestException as e:
+            raise FetchError("%s, url: %s" % (e, url))
+    finally:
+        response.close()
+
+    return FetchResult(
+        url=url,
+        content_hash=content_hash,
+        etag=response.headers.get('ETag', ''),
+        last_modified=response.headers.get('Last-Modified', ''),
+        changed=(previous is None or previous.content_hash != content_hash),
+    )
+
+
+def save_fetch_result(result, fetched_url=None):
+    """Record a FetchResult in the FetchedUrl for its URL, and return that"""
+    if fetched_url is None:
+        fetched_url = FetchedUrl(url=result.url)
+    fetched_url.content_hash = result.content_hash
+    fetched_url.etag = result.etag[:200]
+    fetched_url.last_modified = result.last_modified[:100]
+    fetched_url.last_fetched = datetime.datetime.now()
+    fetched_url.save()
+    return fetched_url
+
+
+def previous_fetches(urls):
+    """Return a dict of the FetchedUrl of each of urls that has one"""
+    return dict(
+        (f.url, f) for f in FetchedUrl.objects.filter(url__in=list(urls))
+    )
+
+
+def fetch_url(url, session=None):
+    """
+    Fetch url, recording the result, and return a tuple of its
+    FetchedUrl and whether its content has changed since it was last
+    fetched.
+    """
+    previous = previous_fetches([url]).get(url)
+    result = fetch(session or make_session(), url, previous)
+    return save_fetch_result(result, previous), result.changed
+
+
+def fetch_urls(urls, workers=4, session=None):
+    """
+    Fetch several URLs, making at most `workers` requests at once.
+
+    Returns a dict mapping each URL to its FetchedUrl, or to the
+    FetchError if it couldn't be retrieved. All the database queries
+    are made from the calling thread.
+    """
+    urls = set(urls)
+    if not urls:
+        return {}
+    workers = min(workers, len(urls))
+    session = session or make_session(workers)
+    previous = previous_fetches(urls)
+
+    def fetch_one(url):
+        try:
+            return url, fetch(session, url, previous.get(url))
+        except FetchError as e:
+            return url, e
+
+    results = {}
+    pool = ThreadPool(workers)
+    try:
+        for url, result in pool.imap_unordered(fetch_one, urls):
+            if isinstance(result, FetchError):
+                results[url] = result
+            else:
+                results[url] = save_fetch_result(result, previous.get(url))
+    finally:
+        pool.close()
+        pool.join()
+    return results
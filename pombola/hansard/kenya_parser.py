@@ -9,6 +9,8 @@ from django.db import transaction
 from BeautifulSoup import BeautifulSoup, BeautifulStoneSoup, Tag
 
 from pombola.hansard.models import Sitting, Entry, Venue
+from pombola.hansard.signals import entries_created
+from pombola.search.models import IndexQueueItem
 
 
 # EXCEPTIONS
@@ -93,6 +95,14 @@ class KenyaParser():
         )
         (?:\ in\ the\ National\ Assembly\ Chamber)?""", re.VERBOSE)
 
+    venue_names = {
+        'national_assembly': 'National Assembly',
+        'senate':            'Senate',
+    }
+
+    # Set once the local pdftohtml has been found to be the right version
+    pdftohtml_version_checked = False
+
 
     @classmethod
     def convert_pdf_to_html(cls, pdf_file):
@@ -120,15 +130,18 @@ class KenyaParser():
 
         # get the version number of pdftohtml and check that it is acceptable - see
         # 'hansard/notes.txt' for issues with the output from different versions.
-        # Version output is sent to stderr
-        ( ignore_me, version_error ) = subprocess.Popen(
-            [ pdftohtml_cmd, '-v' ],
-            shell = False,
-            stderr = subprocess.PIPE,
-        ).communicate()
-        wanted_version = 'pdftohtml version 0.18.4'
-        if wanted_version not in version_error:
-            raise Exception( "Bad pdftohtml version - got '%s' but want '%s'" % (version_error, wanted_version) )
+        # Version output is sent to stderr. This only needs checking once
+        # per process.
+        if not cls.pdftohtml_version_checked:
+            ( ignore_me, version_error ) = subprocess.Popen(
+                [ pdftohtml_cmd, '-v' ],
+                shell = False,
+                stderr = subprocess.PIPE,
+            ).communicate()
+            wanted_version = 'pdftohtml version 0.18.4'
+            if wanted_version not in version_error:
+                raise Exception( "Bad pdftohtml version - got '%s' but want '%s'" % (version_error, wanted_version) )
+            cls.pdftohtml_version_checked = True
 
         ( convert_output, ignore_me ) = subprocess.Popen(
             [ pdftohtml_cmd, '-stdout', '-noframes', '-enc', 'UTF-8', pdf_file.name ],
@@ -374,15 +387,11 @@ class KenyaParser():
     @classmethod
     def extract_meta_from_transcript(cls, transcript):
 
-        # create the two venues
-        national_assembly, created = Venue.objects.get_or_create(
-            slug = 'national_assembly',
-            defaults = {"name": "National Assembly"},
-        )
-        senate, created = Venue.objects.get_or_create(
-            slug = 'senate',
-            defaults = {"name": "Senate"},
-        )
+        # This doesn't touch the database, so that it can be run in the
+        # worker processes of hansard_process_sources. The venues are
+        # created if necessary by create_entries_from_data_and_source.
+        national_assembly = 'national_assembly'
+        senate            = 'senate'
 
         reg   = None
         venue = None
@@ -407,7 +416,7 @@ class KenyaParser():
             raise Exception, "Failed to find the Venue"
 
         results = {
-            'venue': venue.slug,
+            'venue': venue,
         }
 
         for line in transcript:
@@ -503,7 +512,10 @@ class KenyaParser():
     def create_entries_from_data_and_source( cls, data, source ):
         """Create the needed sitting and entries"""
 
-        venue = Venue.objects.get( slug=data['meta']['venue'] )
+        venue, created = Venue.objects.get_or_create(
+            slug     = data['meta']['venue'],
+            defaults = {"name": cls.venue_names[data['meta']['venue']]},
+        )
 
         # Joint Sittings can be published by both Houses (identical documents)
         # prevent the same Sitting being created twice
@@ -517,23 +529,23 @@ class KenyaParser():
             print "skipping duplicate source %s for %s" % (source.name, source.date)
             return None
 
-        sitting = Sitting(
-            source     = source,
-            venue      = venue,
-            start_date = source.date,
-            start_time = data['meta'].get('start_time', None),
-            end_date   = source.date,
-            end_time   = data['meta'].get('end_time', None),
-        )
-        sitting.save()
-
         with transaction.atomic():
-            counter = 0
-            for line in data['transcript']:
-
-                counter += 1
-
-                entry = Entry(
+            sitting = Sitting(
+                source     = source,
+                venue      = venue,
+                start_date = source.date,
+                start_time = data['meta'].get('start_time', None),
+                end_date   = source.date,
+                end_time   = data['meta'].get('end_time', None),
+            )
+            sitting.save()
+
+            # A sitting can have thousands of entries, so they're inserted
+            # together rather than saved one by one. bulk_create doesn't
+            # send post_save, so queue them for the search index here.
+            entries = []
+            for counter, line in enumerate(data['transcript'], 1):
+                entries.append(Entry(
                     sitting       = sitting,
                     type          = line['type'],
                     page_number   = line['page_number'],
@@ -541,8 +553,16 @@ class KenyaParser():
                     speaker_name  = line.get('speaker_name',  ''),
                     speaker_title = line.get('speaker_title', ''),
                     content       = line['text'],
-                )
-                entry.save()
+                ))
+            Entry.objects.bulk_create(entries, batch_size=1000)
+
+            IndexQueueItem.objects.enqueue_many(
+                Entry,
+                sitting.entry_set.values_list('id', flat=True),
+                IndexQueueItem.ACTION_UPDATE,
+            )
+
+            entries_created.send(sender=Entry, sitting=sitting)
 
             source.last_processing_success = datetime.datetime.now()
             source.save()
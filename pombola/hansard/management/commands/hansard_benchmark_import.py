@@ -0,0 +1,124 @@
+# Time importing the sample transcripts in pombola/hansard/tests,
+# comparing saving entries and matching their speakers one at a time
+# with the bulk import and Entry.assign_speakers.  Everything is
+# done in a transaction that is rolled back, so nothing is left in the
+# database afterwards.  By default the pdftohtml output that's stored
+# next to each sample PDF is parsed; use --pdf to time the conversion
+# from PDF too (this needs the right version of pdftohtml installed).
+#
+#   ./manage.py hansard_benchmark_import --repeat=5
+
+from optparse import make_option
+import datetime
+import glob
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+
+import pombola.hansard.tests
+from pombola.hansard.kenya_parser import KenyaParser
+from pombola.hansard.models import Entry, Sitting, Source, Venue
+
+
+SAMPLE_DIRECTORY = os.path.dirname(pombola.hansard.tests.__file__)
+
+
+def one_at_a_time(data, source, name_matching_algorithm):
+    """Import and match speakers the way it was done before bulk loading"""
+    venue = Venue.objects.get(slug=data['meta']['venue'])
+    sitting = Sitting.objects.create(
+        source=source,
+        venue=venue,
+        start_date=source.date,
+        end_date=source.date,
+    )
+    for counter, line in enumerate(data['transcript'], 1):
+        Entry.objects.create(
+            sitting=sitting,
+            type=line['type'],
+            page_number=line['page_number'],
+            text_counter=counter,
+            speaker_name=line.get('speaker_name', ''),
+            speaker_title=line.get('speaker_title', ''),
+            content=line['text'],
+        )
+    cache = {}
+    for entry in sitting.entry_set.all().unassigned_speeches():
+        cache_key = (entry.speaker_name, entry.speaker_title)
+        if cache_key not in cache:
+            cache[cache_key] = entry.possible_matching_speakers(
+                update_aliases=True,
+                name_matching_algorithm=name_matching_algorithm,
+            )
+        speakers = cache[cache_key]
+        if speakers and len(speakers) == 1:
+            entry.speaker = speakers[0]
+            entry.save()
+
+
+def bulk(data, source, name_matching_algorithm):
+    KenyaParser.create_entries_from_data_and_source(data, source)
+    Entry.assign_speakers(
+        name_matching_algorithm=name_matching_algorithm,
+        entries=Entry.objects.filter(sitting__source=source),
+    )
+
+
+class Command(NoArgsCommand):
+
+    help = 'Time importing the sample hansard transcripts'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--pdf', action='store_true', dest='pdf', default=False, help='Convert the sample PDFs rather than using the stored HTML'),
+        make_option('--repeat', dest='repeat', type='int', default=3, help='The number of times to import each sample'),
+    )
+
+    def handle_noargs(self, **options):
+        algorithm = settings.HANSARD_NAME_MATCHING_ALGORITHM
+        pdf_paths = sorted(glob.glob(os.path.join(SAMPLE_DIRECTORY, '*.pdf')))
+
+        for pdf_path in pdf_paths:
+            basename = os.path.basename(pdf_path)
+
+            start = time.time()
+            if options['pdf']:
+                with open(pdf_path) as f:
+                    html = KenyaParser.convert_pdf_to_html(f)
+            else:
+                with open(os.path.splitext(pdf_path)[0] + '.html') as f:
+                    html = f.read()
+            data = KenyaParser.convert_html_to_data(html)
+            parse_time = time.time() - start
+
+            print "{0}: {1} entries, parsed in {2:.3f}s".format(
+                basename, len(data['transcript']), parse_time)
+
+            for label, import_function in (('One at a time', one_at_a_time),
+                                           ('Bulk', bulk)):
+                times = []
+                for i in range(options['repeat']):
+                    with transaction.atomic():
+                        for slug in ('national_assembly', 'senate'):
+                            Venue.objects.get_or_create(
+                                slug=slug,
+                                defaults={'name': slug.replace('_', ' ').title()})
+                        source = Source.objects.create(
+                            name=basename,
+                            url='http://example.com/' + basename,
+                            date=datetime.date(*[int(x) for x in basename.split('-')[:3]]),
+                        )
+                        start = time.time()
+                        import_function(data, source, algorithm)
+                        times.append(time.time() - start)
+                        transaction.set_rollback(True)
+                times.sort()
+                print "  {0}: mean {1:.3f}s, min {2:.3f}s, max {3:.3f}s over {4} runs".format(
+                    label,
+                    sum(times) / len(times),
+                    times[0],
+                    times[-1],
+                    len(times),
+                )
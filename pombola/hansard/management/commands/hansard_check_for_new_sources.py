@@ -12,7 +12,6 @@
 #
 #    https://github.com/mysociety/pombola/blob/ec4a44f7d7e0743426aff87b59e4bfa54250ec1c/pombola/hansard/management/commands/hansard_check_for_new_sources.py
 
-import httplib2
 import re
 import datetime
 from optparse import make_option
@@ -22,11 +21,10 @@ from urlparse import urlsplit, urlunsplit
 
 from BeautifulSoup import BeautifulSoup, BeautifulStoneSoup
 
-from django.conf import settings
-
-
 from django.core.management.base import NoArgsCommand
 
+from pombola.hansard.fetcher import (
+    content_path, fetch, make_session, previous_fetches, save_fetch_result)
 from pombola.hansard.models import Source
 
 def fix_date_text(date_text):
@@ -77,7 +75,7 @@ class Command(NoArgsCommand):
         # when the scraper hasn't run for a while such as a major update to
         # the target site necessitating a adjustment to this script)
 
-        for soup, base_url in self.get_index_pages(url, list_page, verbose):
+        for soup, base_url, record_fetch in self.get_index_pages(url, list_page, verbose):
             # Grab each of the blocks on the current page which are supposed
             # to contain a link to a PDF file.
             link_sections = soup.findAll('span', 'file--application-pdf')
@@ -123,6 +121,11 @@ class Command(NoArgsCommand):
             # to the server part way through as this gives us no means of
             # moving beyond the first page if, for example, page 1 has been
             # processed but pages 2 and 3 have not)
+            # Only remember the list page's validators once all of its
+            # sources have been added, so that an interrupted run isn't
+            # mistaken for the page being up to date next time.
+            record_fetch()
+
             if not (get_next_page or self.options['check_all']):
                 break
 
@@ -156,7 +159,16 @@ class Command(NoArgsCommand):
 
 
     def get_index_pages(self, url, list_page, verbose):
-        h = httplib2.Http( settings.HTTPLIB2_CACHE_DIR )
+        """
+        Yield the soup and base URL of each list page, and a function to
+        call once its sources have been added.
+
+        The list pages are fetched with conditional requests; if a page
+        hasn't changed since it was last checked then neither have the
+        pages after it, so (unless --check-all was given) none of them
+        are yielded.
+        """
+        session = make_session()
         next_url = url
         i = 0
 
@@ -165,7 +177,18 @@ class Command(NoArgsCommand):
                 i+=1
                 message = "\nAttempting to get list page {0} for {1}"
                 print message.format(i, list_page)
-            response, content = h.request(next_url)
+            previous = previous_fetches([next_url]).get(next_url)
+            result = fetch(session, next_url, previous)
+
+            if not (result.changed or self.options['check_all']):
+                if verbose:
+                    message = "{0}: List page {1} is unchanged since it was last checked"
+                    print message.format(list_page, i)
+                save_fetch_result(result, previous)
+                return
+
+            with open(content_path(result.content_hash), 'rb') as f:
+                content = f.read()
 
             # parse content
             soup = BeautifulSoup(
@@ -178,7 +201,7 @@ class Command(NoArgsCommand):
 
             next_url = self.get_next_url(soup, url)
 
-            yield soup, base_url
+            yield soup, base_url, lambda: save_fetch_result(result, previous)
 
 
     def format_url(self, url, base_url):
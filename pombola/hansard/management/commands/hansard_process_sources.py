@@ -1,33 +1,215 @@
+from collections import defaultdict
 import datetime
+from multiprocessing import Pool
+import os
+from optparse import make_option
+import time
+import traceback
 
-from django.core.management.base import NoArgsCommand
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import connections
 
+from pombola.hansard.fetcher import fetch_urls, FetchError
 from pombola.hansard.models import Source
 from pombola.hansard.kenya_parser import KenyaParser
 
+
+STAGES = ('fetch', 'pdftohtml', 'parse', 'write')
+
+
+def convert_source(source):
+    """
+    Fetch a source and parse it into the data for its entries.
+
+    This doesn't use the database, so it can be run in a worker
+    process. Returns a tuple of the source, the data (or None if there
+    was an error), a dict of the time taken by each stage, and the
+    traceback of any error.
+    """
+    timings = {}
+    try:
+        start = time.time()
+        pdf = source.file()
+        timings['fetch'] = time.time() - start
+
+        start = time.time()
+        try:
+            html = KenyaParser.convert_pdf_to_html( pdf )
+        finally:
+            pdf.close()
+        timings['pdftohtml'] = time.time() - start
+
+        start = time.time()
+        data = KenyaParser.convert_html_to_data( html )
+        timings['parse'] = time.time() - start
+    except Exception:
+        return source, None, timings, traceback.format_exc()
+    return source, data, timings, None
+
+
+def download_sources(sources, workers):
+    """
+    Fetch the files of the sources that aren't cached yet, making up to
+    `workers` requests at once.
+
+    Returns a dict of the sources that couldn't be fetched and their
+    errors.
+    """
+    to_fetch = [s for s in sources if not os.path.exists(s.cache_file_path())]
+    results = fetch_urls([s.url for s in to_fetch], workers=workers)
+    errors = {}
+    for source in to_fetch:
+        result = results[source.url]
+        if isinstance(result, FetchError):
+            errors[source] = str(result)
+        else:
+            source.set_content_hash(result.content_hash)
+    return errors
+
+
+def skip_duplicate_sources(sources, verbose):
+    """
+    Mark the sources whose file has already been processed for another
+    source as done, and return the rest.
+
+    If several of the sources have the same file, only the first is
+    returned, and the others are left to be picked up again once it
+    has been processed.
+    """
+    hashes = set(s.content_hash for s in sources if s.content_hash)
+    processed = dict(
+        Source.objects
+        .filter(content_hash__in=hashes, last_processing_success__isnull=False)
+        .values_list('content_hash', 'name')
+    )
+    seen = set()
+    remaining = []
+    for source in sources:
+        content_hash = source.content_hash
+        if content_hash in processed:
+            source.last_processing_success = datetime.datetime.now()
+            source.save(update_fields=['last_processing_success'])
+            if verbose:
+                message = "{0}: Skipping {1}, which has the same file as {2}"
+                print message.format(source.list_page, source, processed[content_hash])
+        elif content_hash in seen:
+            Source.objects.filter(id=source.id).update(last_processing_attempt=None)
+        else:
+            if content_hash:
+                seen.add(content_hash)
+            remaining.append(source)
+    return remaining
+
+
 class Command(NoArgsCommand):
     help = 'Process all sources that have not been done'
     args = ''
 
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers', dest='workers', type='int', default=1,
+            help='The number of processes to convert sources with, and of files to download at once'),
+    )
+
     def handle_noargs(self, **options):
 
         verbose = int(options.get('verbosity')) >= 2
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError("--workers must be at least 1")
 
-        for source in Source.objects.all().requires_processing():
+        timings = defaultdict(list)
+        download_times = []
+        failed = []
+        # Sources whose file couldn't be fetched are released for the
+        # next run, but not tried again in this one.
+        fetch_failed_ids = []
 
-            if verbose:
-                message = "{0}: Looking at {1}"
-                print message.format(source.list_page, source)
+        pool = None
+        if workers > 1:
+            # The worker processes don't use the database, but make sure
+            # they don't inherit the connection of this process either.
+            connections.close_all()
+            pool = Pool(workers)
+
+        try:
+            while True:
+                # Claim a few sources at a time, so that a concurrent run
+                # can share the work, and so a crash doesn't leave many
+                # sources claimed but not processed.
+                sources = []
+                candidates = (
+                    Source.objects.all()
+                    .requires_processing()
+                    .exclude(id__in=fetch_failed_ids)
+                )
+                for source in candidates[:workers * 2]:
+                    if source.claim_for_processing():
+                        sources.append(source)
+                        if verbose:
+                            message = "{0}: Looking at {1}"
+                            print message.format(source.list_page, source)
+                if not sources:
+                    break
+
+                # Download the files for the batch together, and don't
+                # parse any file a second time.
+                start = time.time()
+                errors = download_sources(sources, workers)
+                download_times.append(time.time() - start)
+                for source, error in errors.items():
+                    print "There was an exception when fetching {0}".format(source.url)
+                    print error
+                    failed.append(source)
+                    fetch_failed_ids.append(source.id)
+                Source.objects.filter(id__in=[s.id for s in errors]) \
+                    .update(last_processing_attempt=None)
+                sources = skip_duplicate_sources(
+                    [s for s in sources if s not in errors], verbose)
+
+                if pool:
+                    results = pool.imap_unordered(convert_source, sources)
+                else:
+                    results = (convert_source(s) for s in sources)
+
+                # All the database writes happen in this process.
+                for source, data, source_timings, error in results:
+                    if data is not None:
+                        start = time.time()
+                        try:
+                            KenyaParser.create_entries_from_data_and_source( data, source )
+                        except Exception:
+                            error = traceback.format_exc()
+                        source_timings['write'] = time.time() - start
+
+                    for stage, seconds in source_timings.items():
+                        timings[stage].append(seconds)
 
-            pdf = source.file()
+                    if error:
+                        print "There was an exception when parsing {0}".format(source.cache_file_path())
+                        print error
+                        failed.append(source)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
 
-            source.last_processing_attempt = datetime.datetime.now()
-            source.save()
+        if verbose or workers > 1:
+            if download_times:
+                print "download: total {0:.2f}s over {1} batches".format(
+                    sum(download_times), len(download_times))
+            for stage in STAGES:
+                times = sorted(timings[stage])
+                if not times:
+                    continue
+                print "{0}: total {1:.2f}s, mean {2:.2f}s, max {3:.2f}s over {4} sources".format(
+                    stage,
+                    sum(times),
+                    sum(times) / len(times),
+                    times[-1],
+                    len(times),
+                )
 
-            try:
-                html = KenyaParser.convert_pdf_to_html( pdf )
-                data = KenyaParser.convert_html_to_data( html )
-                KenyaParser.create_entries_from_data_and_source( data, source )
-            except Exception as e:
-                print "There was an exception when parsing {0}".format(pdf)
-                raise
+        if failed:
+            raise CommandError(
+                "Failed to process {0} source(s): {1}".format(
+                    len(failed), ', '.join(unicode(s) for s in failed)))
@@ -80,3 +80,6 @@ class Command(BaseCommand):
                 raise Exception("Command halted by user, no changes made")
 
         entries.update(speaker=entries_to)
+
+        hansard_models.PersonAppearanceSummary.objects.update_for_people(
+            [entries_from.id, entries_to.id])
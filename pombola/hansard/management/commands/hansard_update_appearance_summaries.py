@@ -0,0 +1,11 @@
+from django.core.management.base import NoArgsCommand
+
+from pombola.hansard.models import PersonAppearanceSummary
+
+
+class Command(NoArgsCommand):
+    help = "Recalculate everyone's monthly hansard appearance counts"
+    args = ''
+
+    def handle_noargs(self, **options):
+        PersonAppearanceSummary.objects.rebuild()
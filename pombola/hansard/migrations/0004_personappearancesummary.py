@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hansard', '0003_datetimefield_remove_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonAppearanceSummary',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('month', models.DateField()),
+                ('count', models.PositiveIntegerField()),
+                ('person', models.ForeignKey(related_name='hansard_appearance_summaries', to='core.Person')),
+            ],
+            options={
+                'ordering': ['person', '-month'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='personappearancesummary',
+            unique_together=set([('person', 'month')]),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import Counter
+
+from django.db import migrations
+
+
+def populate_person_appearance_summary(apps, schema_editor):
+    Entry = apps.get_model('hansard', 'Entry')
+    PersonAppearanceSummary = apps.get_model('hansard', 'PersonAppearanceSummary')
+
+    counts = Counter()
+    entries = Entry.objects.filter(speaker__isnull=False) \
+        .values_list('speaker_id', 'sitting__start_date')
+    for person_id, start_date in entries.iterator():
+        counts[(person_id, start_date.replace(day=1))] += 1
+
+    PersonAppearanceSummary.objects.bulk_create(
+        [
+            PersonAppearanceSummary(person_id=person_id, month=month, count=count)
+            for (person_id, month), count in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hansard', '0004_personappearancesummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            populate_person_appearance_summary,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hansard', '0005_populate_personappearancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FetchedUrl',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('url', models.URLField(unique=True, max_length=1000)),
+                ('etag', models.CharField(max_length=200, blank=True)),
+                ('last_modified', models.CharField(max_length=100, blank=True)),
+                ('content_hash', models.CharField(max_length=40, blank=True)),
+                ('last_fetched', models.DateTimeField(null=True, blank=True)),
+            ],
+            options={
+                'ordering': ['url'],
+            },
+        ),
+        migrations.AddField(
+            model_name='source',
+            name='content_hash',
+            field=models.CharField(db_index=True, max_length=40, blank=True),
+        ),
+    ]
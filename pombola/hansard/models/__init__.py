@@ -1,7 +1,9 @@
 # flake8: noqa
 
 from alias import Alias
+from fetched_url import FetchedUrl
 from source import Source, SourceUrlCouldNotBeRetrieved, SourceCouldNotParseTimeString
 from venue import Venue
 from sitting import Sitting
 from entry import Entry, NAME_SUBSTRING_MATCH, NAME_SET_INTERSECTION_MATCH
+from appearance_summary import PersonAppearanceSummary
@@ -0,0 +1,88 @@
+from django.db import models, transaction
+
+from pombola.core.models import Person
+from pombola.hansard.models import Entry
+from pombola.hansard.models.base import HansardModelBase, DateTrunc
+
+
+class PersonAppearanceSummaryQuerySet(models.query.QuerySet):
+    def monthly_appearance_counts(self):
+        """Return a list of dictionaries for dates and counts for each month"""
+        return [
+            dict(date=s.month, count=s.count)
+            for s in self.order_by('-month')
+        ]
+
+    def yearly_appearance_counts(self):
+        """Return a list of dictionaries for dates and counts for each year"""
+        counts = (
+            self
+            .annotate(date=DateTrunc('month', 'year'))
+            .values('date')
+            .annotate(total=models.Sum('count'))
+            .order_by('-date')
+        )
+        return [dict(date=c['date'], count=c['total']) for c in counts]
+
+
+class PersonAppearanceSummaryManager(models.Manager):
+    def get_queryset(self):
+        return PersonAppearanceSummaryQuerySet(self.model)
+
+    def summaries_for_entries(self, entries):
+        """Return unsaved summaries of the speakers of entries"""
+        counts = (
+            entries
+            .filter(speaker__isnull=False)
+            .annotate(month=DateTrunc('sitting__start_date', 'month'))
+            .values('speaker', 'month')
+            .annotate(count=models.Count('id'))
+            .order_by()
+        )
+        return [
+            self.model(person_id=c['speaker'], month=c['month'], count=c['count'])
+            for c in counts
+        ]
+
+    def update_for_people(self, person_ids):
+        """Recalculate the summaries of the people with the given IDs"""
+        person_ids = set(person_ids)
+        if not person_ids:
+            return
+        with transaction.atomic():
+            self.filter(person__in=person_ids).delete()
+            self.bulk_create(self.summaries_for_entries(
+                Entry.objects.filter(speaker__in=person_ids)))
+
+    def rebuild(self):
+        """Recalculate the summaries of everyone"""
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(self.summaries_for_entries(Entry.objects.all()))
+
+
+class PersonAppearanceSummary(HansardModelBase):
+    """
+    The number of hansard entries spoken by a person in a month.
+
+    These are kept up to date by Entry.assign_speakers and
+    hansard_reattribute_entries, and can be rebuilt with
+    hansard_update_appearance_summaries. If the
+    HANSARD_APPEARANCE_SUMMARIES setting is True, they're used by the
+    hansard tab of the person pages, instead of counting the entries
+    on each request.
+    """
+
+    person = models.ForeignKey(Person, related_name='hansard_appearance_summaries')
+    month  = models.DateField()
+    count  = models.PositiveIntegerField()
+
+    objects = PersonAppearanceSummaryManager()
+
+    def __unicode__(self):
+        return "%s: %s entries in %s" % (self.person, self.count, self.month.strftime('%b %Y'))
+
+    class Meta:
+        app_label = 'hansard'
+        ordering = ['person', '-month']
+        unique_together = ('person', 'month')
@@ -13,3 +13,22 @@ class HansardModelBase(models.Model):
 
     class Meta:
        abstract = True      
+
+
+class DateTrunc(models.Func):
+    """
+    Truncate a date to the start of its month, year, etc.
+
+    This uses PostgreSQL's date_trunc, so 'precision' can be anything it
+    accepts, e.g. 'month' or 'year'.
+    """
+
+    template = "DATE_TRUNC('%(precision)s', %(expressions)s)::date"
+
+    def __init__(self, expression, precision, **extra):
+        super(DateTrunc, self).__init__(
+            expression,
+            precision=precision,
+            output_field=models.DateField(),
+            **extra
+        )
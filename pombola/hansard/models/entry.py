@@ -1,43 +1,41 @@
 import re
 import calendar
+from collections import defaultdict
 
-from django.db import models
+from django.db import models, transaction
 
-from pombola.core.models import Person, Place, ParliamentarySession
+from pombola.core.models import Person, Place, ParliamentarySession, Position
+from pombola.core.position_index import PositionIndex
 from pombola.hansard.models import Sitting, Alias
-from pombola.hansard.models.base import HansardModelBase
+from pombola.hansard.models.base import HansardModelBase, DateTrunc
 
 from pombola.hansard.constants import NAME_SUBSTRING_MATCH, NAME_SET_INTERSECTION_MATCH
+from pombola.search.models import IndexQueueItem
 
 
 class EntryQuerySet(models.query.QuerySet):
+    def appearance_counts(self, precision):
+        """
+        Return a list of dictionaries for dates and counts, where the
+        dates are the sitting dates truncated to 'precision' (e.g.
+        'month' or 'year'), most recent first.
+        """
+        counts = (
+            self
+            .annotate(date=DateTrunc('sitting__start_date', precision))
+            .values('date')
+            .annotate(count=models.Count('id'))
+            .order_by('-date')
+        )
+        return [dict(date=c['date'], count=c['count']) for c in counts]
+
     def monthly_appearance_counts(self):
         """Return an list of dictionaries for dates and counts for each month"""
-
-        # would prefer to do this as a single query but I can't seem to make the ORM do that.
-
-        dates = self.dates('sitting__start_date','month', 'DESC')
-        counts = []
-
-        for d in dates:
-            qs = self.filter(sitting__start_date__month=d.month, sitting__start_date__year=d.year)
-            counts.append(dict(date=d, count=qs.count()))
-
-        return counts
+        return self.appearance_counts('month')
 
     def yearly_appearance_counts(self):
         """Return an list of dictionaries for dates and counts for each year"""
-
-        # would prefer to do this as a single query but I can't seem to make the ORM do that.
-
-        dates = self.dates('sitting__start_date', 'year', 'DESC')
-        counts = []
-
-        for d in dates:
-            qs = self.filter(sitting__start_date__year=d.year)
-            counts.append(dict(date=d, count=qs.count()))
-
-        return counts
+        return self.appearance_counts('year')
 
     def unassigned_speeches(self):
         """All speeches that do not have a speaker assigned"""
@@ -97,31 +95,48 @@ class Entry(HansardModelBase):
         verbose_name_plural = 'entries'
 
     @classmethod
-    def assign_speakers(cls, name_matching_algorithm=NAME_SET_INTERSECTION_MATCH):
-        """Go through all entries and assign speakers"""
+    def assign_speakers(cls, name_matching_algorithm=NAME_SET_INTERSECTION_MATCH, entries=None):
+        """Go through all entries (or just those in 'entries') and assign speakers"""
 
-        entries = cls.objects.all().unassigned_speeches()
+        if entries is None:
+            entries = cls.objects.all()
+
+        entries = (
+            entries
+            .unassigned_speeches()
+            .select_related('sitting__source', 'sitting__venue')
+        )
 
-        # create an in memory cache of speaker names and the sitting dates, to
-        # avoid hitting the db as badly with all the repeated requests
+        resolver = SpeakerResolver(name_matching_algorithm)
+
+        # Each speaker name is only looked up once per sitting, and
+        # then the entries for each speaker are updated together.
         cache = {}
+        entry_ids_by_speaker = defaultdict(list)
 
-        for entry in entries:
-            cache_key = "%s-%s" % (entry.sitting.start_date, entry.speaker_name)
+        for entry in entries.iterator():
+            cache_key = (entry.sitting_id, entry.speaker_name, entry.speaker_title)
 
             if cache_key in cache:
                 speakers = cache[cache_key]
             else:
-                speakers = entry.possible_matching_speakers(
-                    update_aliases=True,
-                    name_matching_algorithm=name_matching_algorithm,
-                    )
+                speakers = resolver.possible_matching_speakers(
+                    entry, update_aliases=True)
                 cache[cache_key] = speakers
 
             if speakers and len(speakers) == 1:
-                speaker = speakers[0]
-                entry.speaker = speaker
-                entry.save()
+                entry_ids_by_speaker[speakers[0].id].append(entry.id)
+
+        # Avoid a circular import:
+        from pombola.hansard.models import PersonAppearanceSummary
+
+        with transaction.atomic():
+            for speaker_id, entry_ids in entry_ids_by_speaker.items():
+                cls.objects.filter(id__in=entry_ids).update(speaker=speaker_id)
+                IndexQueueItem.objects.enqueue_many(
+                    cls, entry_ids, IndexQueueItem.ACTION_UPDATE)
+            PersonAppearanceSummary.objects.update_for_people(
+                entry_ids_by_speaker.keys())
 
     def alias_match_score(self, name_one, name_two):
         """
@@ -139,105 +154,17 @@ class Entry(HansardModelBase):
         If 'update_aliases' is True (False by default) and the name cannot be
         ignored then an entry will be made in the alias table that so that the
         alias is inspected by an admin.
-        """
 
-        name = self.speaker_name
-
-        # Nominated reps don't have a unique speaker name, so fall back to the speaker title
-        if re.split(r'[,\s]+', self.speaker_name)[0] == 'Nominated':
-            name = self.speaker_title
-
-        name = Alias.clean_up_name( name )
-
-        # First check for a matching alias that is not ignored
-        try:
-            alias = Alias.objects.get( alias=name )
-
-            if alias.ignored:
-                # if the alias is ignored we should not match anything
-                return []
-            elif alias.person:
-                return [ alias.person ]
-            elif alias.is_unassigned:
-                # Pretend that this alias does not exist so that it is checked
-                # in case new people have been added to the database since the
-                # last run.
-                pass
-            else:
-                return []
-
-        except Alias.DoesNotExist:
-            alias = None
-
-        person_search = (
-            Person
-            .objects
-            .all()
-            .is_politician( when=self.sitting.start_date )
-            .exclude(hidden=True)
-            .distinct()
+        To match the speakers of many entries, use a SpeakerResolver
+        directly, so that the aliases and politicians are only loaded once.
+        """
+        resolver = SpeakerResolver(
+            name_matching_algorithm,
+            preload_aliases=False,
+            preload_positions=False,
         )
-
-        if name_matching_algorithm == NAME_SUBSTRING_MATCH:
-            # drop the prefix
-            stripped_name = re.sub(r'^\w+\.\s', '', name)
-            person_search = person_search.filter(legal_name__icontains=stripped_name)
-
-            # if the results are ambiguous, try restricting to members of the current house
-            # unless it's a joint sitting, in which case this is dangerous
-            #
-            # FIXME: (1) the position filter currently checks whether a person has *ever* held
-            #        a qualifying position, would be better if this were a check against
-            #        whether the position was held at date of the sitting.
-            #
-            #        (2) it might also be interesting to have an optional Pombola Organisation
-            #        associated with a Sitting so that it would be easier to check whether the
-            #        Person has a matching association with an Organisation rather than checking
-            #        PositionTitle names (not sure what would happen with Joint Sittings - dual association?)
-
-            if len(person_search) > 1 and 'Joint Sitting' not in self.sitting.source.name:
-                if self.sitting.venue.name == 'Senate':
-                    current_house = person_search.filter(position__title__name__contains='Senator')
-                else:
-                    current_house = person_search.filter(position__title__name__contains=self.sitting.venue.name)
-                if current_house:
-                    person_search = current_house
-
-        results = person_search.all()[0:]
-
-        if name_matching_algorithm == NAME_SET_INTERSECTION_MATCH:
-            results = sorted(
-                [i for i in results if self.alias_match_score('%s %s'%(i.title, i.legal_name), name) > 1],
-                key=lambda x: self.alias_match_score('%s %s'%(x.title, x.legal_name), name),
-                reverse=True,
-                )
-
-        if len(results) == 0:
-            place_name, party_initials = self.place_name_and_party_initials_from_hansard_name(name)
-            if place_name and party_initials:
-                matches = self.find_person_from_constituency_and_party_reference(place_name, party_initials)
-                if matches:
-                    results = matches
-                else:
-                    # Create alias so admins can manually match
-                    Alias.objects.get_or_create(alias=name)
-                    return []
-
-        found_one_result = len(results) == 1
-
-        # If there is a single matching speaker and an unassigned alias delete it
-        if found_one_result and alias and alias.is_unassigned:
-            alias.delete()
-
-        # create an entry in the aliases table if one is needed
-        if not alias and update_aliases and not found_one_result and not Alias.can_ignore_name(name):
-            Alias.objects.create(
-                alias   = name,
-                ignored = False,
-                person  = None,
-            )
-
-        return results
+        return resolver.possible_matching_speakers(
+            self, update_aliases=update_aliases)
 
     def place_name_and_party_initials_from_hansard_name(self, name):
         if self.name_should_be_ignored(name):
@@ -308,3 +235,193 @@ class Entry(HansardModelBase):
         ).exists():
             return
         return [position.person]
+
+
+class SpeakerResolver(object):
+    """
+    Match the speaker names of hansard entries to people.
+
+    The alias table is loaded into memory the first time it's needed, and
+    so are all the political positions (in a PositionIndex, which can be
+    passed in to share it with other code), so that the politicians who
+    could have been speaking on each date can be found without querying
+    the database again. With preload_positions=False the politicians are
+    instead queried once for each date, which is quicker for a single
+    entry.
+    """
+
+    def __init__(self, name_matching_algorithm=NAME_SET_INTERSECTION_MATCH,
+                 preload_aliases=True, preload_positions=True,
+                 position_index=None):
+        self.name_matching_algorithm = name_matching_algorithm
+        self.preload_aliases = preload_aliases
+        self.preload_positions = preload_positions or position_index is not None
+        self._aliases = None
+        self._position_index = position_index
+        self._titles = None
+        self._politicians = {}
+
+    @property
+    def aliases(self):
+        if self._aliases is None:
+            if self.preload_aliases:
+                self._aliases = dict(
+                    (alias.alias, alias)
+                    for alias in Alias.objects.select_related('person')
+                )
+            else:
+                self._aliases = {}
+        return self._aliases
+
+    def get_alias(self, name):
+        if name not in self.aliases and not self.preload_aliases:
+            self.aliases[name] = Alias.objects.filter(alias=name) \
+                .select_related('person').first()
+        return self.aliases.get(name)
+
+    @property
+    def position_index(self):
+        if self._position_index is None:
+            self._position_index = PositionIndex.political()
+        return self._position_index
+
+    def titles(self, people):
+        """Return a dict of the titles of every position each of people held"""
+        if self._titles is not None:
+            return self._titles
+        titles = defaultdict(set)
+        positions = Position.objects.filter(title__isnull=False)
+        if not self.preload_positions:
+            positions = positions.filter(person__in=[p.id for p in people])
+        for person_id, title_name in positions.values_list('person_id', 'title__name'):
+            titles[person_id].add(title_name)
+        if self.preload_positions:
+            # These are the titles of everyone, so they can be reused
+            self._titles = titles
+        return titles
+
+    def politicians(self, when):
+        """
+        Return a list of (person, position title names) pairs for everyone
+        who was a politician on the date 'when'.
+
+        The position titles are only needed for NAME_SUBSTRING_MATCH, and
+        are the titles of all the positions the person has ever held.
+        """
+        if when not in self._politicians:
+            if self.preload_positions:
+                people = self.position_index.people(when)
+            else:
+                people = list(
+                    Person
+                    .objects
+                    .all()
+                    .is_politician( when=when )
+                    .exclude(hidden=True)
+                    .distinct()
+                )
+            titles = defaultdict(set)
+            if self.name_matching_algorithm == NAME_SUBSTRING_MATCH and people:
+                titles = self.titles(people)
+            self._politicians[when] = [(p, titles[p.id]) for p in people]
+        return self._politicians[when]
+
+    def create_alias(self, name):
+        alias, _ = Alias.objects.get_or_create(alias=name)
+        self.aliases[name] = alias
+        return alias
+
+    def possible_matching_speakers(self, entry, update_aliases=False):
+        """
+        Return array of person objects that might be the speaker of entry.
+
+        See Entry.possible_matching_speakers for details.
+        """
+
+        name = entry.speaker_name
+
+        # Nominated reps don't have a unique speaker name, so fall back to the speaker title
+        if re.split(r'[,\s]+', entry.speaker_name)[0] == 'Nominated':
+            name = entry.speaker_title
+
+        name = Alias.clean_up_name( name )
+
+        # First check for a matching alias that is not ignored
+        alias = self.get_alias(name)
+        if alias:
+            if alias.ignored:
+                # if the alias is ignored we should not match anything
+                return []
+            elif alias.person:
+                return [ alias.person ]
+            # Otherwise the alias is unassigned, so carry on as if it
+            # did not exist so that it is checked in case new people
+            # have been added to the database since the last run.
+
+        sitting = entry.sitting
+        candidates = self.politicians(sitting.start_date)
+
+        if self.name_matching_algorithm == NAME_SUBSTRING_MATCH:
+            # drop the prefix
+            stripped_name = re.sub(r'^\w+\.\s', '', name).lower()
+            candidates = [
+                (person, titles) for person, titles in candidates
+                if stripped_name in person.legal_name.lower()
+            ]
+
+            # if the results are ambiguous, try restricting to members of the current house
+            # unless it's a joint sitting, in which case this is dangerous
+            #
+            # FIXME: (1) the position filter currently checks whether a person has *ever* held
+            #        a qualifying position, would be better if this were a check against
+            #        whether the position was held at date of the sitting.
+            #
+            #        (2) it might also be interesting to have an optional Pombola Organisation
+            #        associated with a Sitting so that it would be easier to check whether the
+            #        Person has a matching association with an Organisation rather than checking
+            #        PositionTitle names (not sure what would happen with Joint Sittings - dual association?)
+
+            if len(candidates) > 1 and 'Joint Sitting' not in sitting.source.name:
+                if sitting.venue.name == 'Senate':
+                    house_title = 'Senator'
+                else:
+                    house_title = sitting.venue.name
+                current_house = [
+                    (person, titles) for person, titles in candidates
+                    if any(house_title in t for t in titles)
+                ]
+                if current_house:
+                    candidates = current_house
+
+        results = [person for person, titles in candidates]
+
+        if self.name_matching_algorithm == NAME_SET_INTERSECTION_MATCH:
+            results = sorted(
+                [i for i in results if entry.alias_match_score('%s %s'%(i.title, i.legal_name), name) > 1],
+                key=lambda x: entry.alias_match_score('%s %s'%(x.title, x.legal_name), name),
+                reverse=True,
+                )
+
+        if len(results) == 0:
+            place_name, party_initials = entry.place_name_and_party_initials_from_hansard_name(name)
+            if place_name and party_initials:
+                matches = entry.find_person_from_constituency_and_party_reference(place_name, party_initials)
+                if matches:
+                    results = matches
+                else:
+                    # Create alias so admins can manually match
+                    self.create_alias(name)
+                    return []
+
+        found_one_result = len(results) == 1
+
+        # If there is a single matching speaker and an unassigned alias delete it
+        if found_one_result and alias:
+            alias.delete()
+            self.aliases[name] = None
+
+        # create an entry in the aliases table if one is needed
+        if not alias and update_aliases and not found_one_result and not Alias.can_ignore_name(name):
+            self.create_alias(name)
+
+        return results
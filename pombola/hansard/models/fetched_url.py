@@ -0,0 +1,27 @@
+from django.db import models
+
+from pombola.hansard.models.base import HansardModelBase
+
+
+class FetchedUrl(HansardModelBase):
+    """
+    The result of the last fetch of a hansard list page or source URL.
+
+    The ETag and Last-Modified headers are kept so that the next fetch
+    can be a conditional request, and content_hash says where in the
+    content-addressed store (see pombola.hansard.fetcher) the body was
+    saved.
+    """
+
+    url           = models.URLField(max_length=1000, unique=True)
+    etag          = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)
+    content_hash  = models.CharField(max_length=40, blank=True)
+    last_fetched  = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        app_label = 'hansard'
+        ordering = [ 'url' ]
+
+    def __unicode__(self):
+        return self.url
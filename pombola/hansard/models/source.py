@@ -1,5 +1,5 @@
 import os
-import httplib2
+import datetime
 
 from django.db import models
 from django.conf import settings
@@ -57,6 +57,11 @@ class Source(HansardModelBase):
         help_text='A code describing the list page from which the source was found',
     )
 
+    # The SHA-1 of the source's file, which is where it's kept in the
+    # content-addressed store of pombola.hansard.fetcher. Sources found
+    # before this was recorded are cached under their id instead.
+    content_hash = models.CharField(max_length=40, blank=True, db_index=True)
+
     last_processing_attempt = models.DateTimeField(blank=True, null=True)
     last_processing_success = models.DateTimeField(blank=True, null=True)
 
@@ -72,16 +77,42 @@ class Source(HansardModelBase):
         return self.name
 
 
+    def claim_for_processing(self):
+        """
+        Record that processing of this source has started.
+
+        This only succeeds if no other process has already started
+        processing the source, so that concurrent runs of
+        hansard_process_sources never process the same source twice.
+        Returns True if the source was claimed, and False otherwise.
+        """
+        now = datetime.datetime.now()
+        claimed = Source.objects.filter(
+            id=self.id,
+            last_processing_attempt=None,
+        ).update(last_processing_attempt=now)
+        if claimed:
+            self.last_processing_attempt = now
+        return bool(claimed)
+
+
     def delete(self):
-        """After deleting from db, delete the cached file too"""
+        """
+        After deleting from db, delete the cached file too, unless
+        another source has the same file.
+        """
         cache_file_path = self.cache_file_path()
+        shared = self.content_hash and Source.objects \
+            .filter(content_hash=self.content_hash) \
+            .exclude(id=self.id) \
+            .exists()
         super( Source, self ).delete()
 
-        if os.path.exists( cache_file_path ):
+        if not shared and os.path.exists( cache_file_path ):
             os.remove( cache_file_path )
 
 
-    def file(self, http_object=None):
+    def file(self, session=None):
         """
         Return as a file object the resource that the url is pointing to.
 
@@ -91,34 +122,40 @@ class Source(HansardModelBase):
         Raises a SourceUrlCouldNotBeRetrieved exception if URL could not be
         retrieved.
 
-        The http_object parameter is primarily to aid testing; you can pass
-        in a mock object that will be used in place of httplib2.Http() for
-        fetching data from URL.
+        The session parameter is a requests session to fetch the URL
+        with, so that several fetches can share its connections.
         """
-        cache_file_path = self.cache_file_path()
+        # The fetcher module imports the models, so import it here.
+        from pombola.hansard.fetcher import fetch_url, FetchError
 
         # If the file exists open it, read it and return it
         try:
-            return open(cache_file_path, 'r')
+            return open(self.cache_file_path(), 'rb')
         except IOError:
             pass # ignore
 
-        # If not fetch the file, save to cache and then return fh
-        h = httplib2.Http() if (http_object is None) else http_object
-        response, content = h.request(self.url)
+        # If not fetch the file into the store and then return fh
+        try:
+            fetched_url, changed = fetch_url(self.url, session=session)
+        except FetchError as e:
+            raise SourceUrlCouldNotBeRetrieved(str(e))
+        self.set_content_hash(fetched_url.content_hash)
 
-        # Crude handling of response - is there an is_success method?
-        if response.status != 200:
-            raise SourceUrlCouldNotBeRetrieved("status code: %s, url: %s" % (response.status, self.url) )
+        return open(self.cache_file_path(), 'rb')
 
-        with open(cache_file_path, "w") as new_cache_file:
-            new_cache_file.write(content)
 
-        return open(cache_file_path, 'r')
+    def set_content_hash(self, content_hash):
+        """Record the hash of the file that has been fetched for this source"""
+        self.content_hash = content_hash
+        Source.objects.filter(id=self.id).update(content_hash=content_hash)
 
 
     def cache_file_path(self):
         """Absolute path to the cache file for this source"""
+        from pombola.hansard.fetcher import content_path
+
+        if self.content_hash:
+            return content_path(self.content_hash)
 
         id_str= "%05u" % self.id
 
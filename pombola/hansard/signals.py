@@ -0,0 +1,8 @@
+from django.dispatch import Signal
+
+
+# Sent with the Sitting whose entries have just been created in bulk by
+# KenyaParser.create_entries_from_data_and_source. bulk_create doesn't
+# send post_save, so anything that needs to know about new entries
+# should listen for this too.
+entries_created = Signal(providing_args=['sitting'])
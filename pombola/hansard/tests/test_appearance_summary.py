@@ -0,0 +1,110 @@
+from datetime import date
+
+from django.test import TestCase
+
+from pombola.core.models import Person
+from pombola.hansard.models import (
+    Entry, PersonAppearanceSummary, Sitting, Source, Venue
+)
+
+
+class AppearanceCountsTest(TestCase):
+
+    def setUp(self):
+        venue = Venue.objects.create(
+            name='National Assembly',
+            slug='national_assembly',
+        )
+        self.person = Person.objects.create(
+            legal_name='Paul Jones',
+            slug='paul-jones',
+        )
+        self.other_person = Person.objects.create(
+            legal_name='Tom Jones',
+            slug='tom-jones',
+        )
+
+        # Speeches by self.person on these dates (with repeats), and one
+        # by self.other_person on the first date:
+        sitting_dates = [
+            date(2011, 11, 15),
+            date(2011, 11, 15),
+            date(2011, 11, 22),
+            date(2011, 12, 1),
+            date(2012, 3, 6),
+        ]
+        counter = 0
+        for start_date in sorted(set(sitting_dates)):
+            source = Source.objects.create(
+                name='Source for {0}'.format(start_date),
+                date=start_date,
+            )
+            sitting = Sitting.objects.create(
+                source=source,
+                venue=venue,
+                start_date=start_date,
+            )
+            speakers = [self.person] * sitting_dates.count(start_date)
+            if start_date == sitting_dates[0]:
+                speakers.append(self.other_person)
+            for speaker in speakers:
+                counter += 1
+                Entry.objects.create(
+                    sitting=sitting,
+                    type='speech',
+                    page_number=1,
+                    text_counter=counter,
+                    speaker_name=speaker.legal_name,
+                    speaker=speaker,
+                    content='test',
+                )
+
+        self.expected_monthly = [
+            dict(date=date(2012, 3, 1), count=1),
+            dict(date=date(2011, 12, 1), count=1),
+            dict(date=date(2011, 11, 1), count=3),
+        ]
+        self.expected_yearly = [
+            dict(date=date(2012, 1, 1), count=1),
+            dict(date=date(2011, 1, 1), count=4),
+        ]
+
+    def test_entry_appearance_counts(self):
+        entries = Entry.objects.filter(speaker=self.person)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                entries.monthly_appearance_counts(), self.expected_monthly)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                entries.yearly_appearance_counts(), self.expected_yearly)
+
+    def test_summary_appearance_counts(self):
+        PersonAppearanceSummary.objects.rebuild()
+
+        summaries = PersonAppearanceSummary.objects.filter(person=self.person)
+        self.assertEqual(
+            summaries.monthly_appearance_counts(), self.expected_monthly)
+        self.assertEqual(
+            summaries.yearly_appearance_counts(), self.expected_yearly)
+
+        other_summaries = PersonAppearanceSummary.objects \
+            .filter(person=self.other_person)
+        self.assertEqual(
+            other_summaries.monthly_appearance_counts(),
+            [dict(date=date(2011, 11, 1), count=1)],
+        )
+
+    def test_update_for_people(self):
+        PersonAppearanceSummary.objects.rebuild()
+
+        Entry.objects.filter(speaker=self.other_person).update(speaker=self.person)
+        PersonAppearanceSummary.objects.update_for_people(
+            [self.person.id, self.other_person.id])
+
+        self.assertEqual(
+            PersonAppearanceSummary.objects.get(
+                person=self.person, month=date(2011, 11, 1)).count,
+            4,
+        )
+        self.assertFalse(
+            PersonAppearanceSummary.objects.filter(person=self.other_person).exists())
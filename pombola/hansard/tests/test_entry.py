@@ -2,7 +2,7 @@ from datetime import date
 
 from django.test import TestCase
 from pombola.core.models import Person, Place, PlaceKind, Position, PositionTitle
-from pombola.hansard.models import Source, Sitting, Venue, Entry
+from pombola.hansard.models import Alias, Source, Sitting, Venue, Entry
 from pombola.hansard.models.entry import NAME_SUBSTRING_MATCH
 
 
@@ -153,3 +153,35 @@ class HansardEntryTest(TestCase):
             self.mp,
             possible_speakers[0]
         )
+
+    def test_assign_speakers(self):
+        self.senate_sitting.save()
+        self.na_sitting.save()
+
+        def create_entry(sitting, text_counter, speaker_name):
+            return Entry.objects.create(
+                sitting       = sitting,
+                type          = 'speech',
+                page_number   = 12,
+                text_counter  = text_counter,
+                speaker_name  = speaker_name,
+                speaker_title = 'Hon.',
+                content       = 'test',
+            )
+
+        senate_entries = [
+            create_entry(self.senate_sitting, i, 'Jones') for i in range(3)
+        ]
+        na_entry = create_entry(self.na_sitting, 1, 'Jones')
+        unknown_entry = create_entry(self.na_sitting, 2, 'Mr. Nobody')
+
+        Entry.assign_speakers(name_matching_algorithm=NAME_SUBSTRING_MATCH)
+
+        for entry in senate_entries:
+            self.assertEqual(
+                self.senator, Entry.objects.get(id=entry.id).speaker)
+        self.assertEqual(self.mp, Entry.objects.get(id=na_entry.id).speaker)
+        self.assertIsNone(Entry.objects.get(id=unknown_entry.id).speaker)
+
+        # The unmatched name should have been added for an admin to check:
+        self.assertTrue(Alias.objects.unassigned().filter(alias='Mr. Nobody').exists())
@@ -0,0 +1,56 @@
+import datetime
+import json
+import os
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from pombola.hansard.kenya_parser import KenyaParser
+from pombola.hansard.models import Entry, Sitting, Source, Venue
+from pombola.search.models import IndexQueueItem
+
+
+class KenyaParserCreateEntriesTest(TestCase):
+
+    def setUp(self):
+        Venue.objects.create(
+            name='National Assembly',
+            slug='national_assembly',
+        )
+        self.source = Source.objects.create(
+            name='2011-09-01-assembly-sample',
+            url='http://example.com/2011-09-01-assembly-sample.pdf',
+            date=datetime.date(2011, 9, 1),
+        )
+        json_path = os.path.join(
+            os.path.dirname(__file__), '2011-09-01-assembly-sample.json')
+        with open(json_path) as f:
+            self.data = json.load(f)
+
+    def test_create_entries_from_data_and_source(self):
+        KenyaParser.create_entries_from_data_and_source(self.data, self.source)
+
+        sitting = Sitting.objects.get(source=self.source)
+        self.assertEqual(sitting.start_time, datetime.time(14, 30))
+
+        entries = list(sitting.entry_set.all())
+        transcript = self.data['transcript']
+        self.assertEqual(len(entries), len(transcript))
+        self.assertEqual(
+            [e.text_counter for e in entries],
+            range(1, len(transcript) + 1),
+        )
+        self.assertEqual(entries[0].content, transcript[0]['text'])
+
+        self.assertTrue(
+            Source.objects.get(id=self.source.id).last_processing_success)
+
+        # The entries are bulk created, so they have to be queued for
+        # indexing explicitly:
+        self.assertEqual(
+            IndexQueueItem.objects.filter(
+                content_type=ContentType.objects.get_for_model(Entry),
+                object_id__in=[e.id for e in entries],
+            ).count(),
+            len(entries),
+        )
@@ -1,22 +1,17 @@
 import datetime
 import os
-from collections import namedtuple
 
-from django.test import TestCase
-
-from pombola.hansard.models import Source, SourceUrlCouldNotBeRetrieved
+import requests_mock
 
+from django.test import TestCase
 
-class FakeHttp(object):
+from pombola.hansard.fetcher import fetch_url
+from pombola.hansard.models import FetchedUrl, Source, SourceUrlCouldNotBeRetrieved
 
-    def __init__(self, status_code=200):
-        self.status_code = status_code
 
-    def request(self, _):
-        FakeResponse = namedtuple('FakeResponse', ['status'])
-        # With the tests as they are at the moment, the response could
-        # actually be any data, but might as well make it HTML:
-        return FakeResponse(self.status_code), """<!doctype html>
+# With the tests as they are at the moment, the response could actually
+# be any data, but might as well make it HTML:
+EXAMPLE_DOCUMENT = """<!doctype html>
 <html lang=en>
   <head>
     <meta charset=utf-8>
@@ -40,6 +35,16 @@ class HansardSourceTest(TestCase):
         source.save()
         self.source = source
 
+        self.requests_mock = requests_mock.Mocker()
+        self.requests_mock.start()
+        self.addCleanup(self.requests_mock.stop)
+        self.requests_mock.get(
+            'http://example.com/whatever',
+            text=EXAMPLE_DOCUMENT,
+            headers={'ETag': '"abc"'},
+        )
+        self.requests_mock.get('http://example.com/whateverxxx', status_code=404)
+
 
     def test_source_file(self):
         """Check that source file is retrieved and cached correctly"""
@@ -48,23 +53,27 @@ class HansardSourceTest(TestCase):
         
         self.assertEqual( source.name, 'Test Source')
 
-        # get where the file will be stored
-        cache_file_path = source.cache_file_path()
-        
-        # check that the file does not exist
-        self.assertFalse( os.path.exists( cache_file_path ))
+        # check that the file has not been fetched
+        self.assertFalse( source.content_hash )
+        self.assertFalse( os.path.exists( source.cache_file_path() ))
 
-        # retrieve and check it does
-        self.assertTrue( len( source.file(http_object=FakeHttp()).read() ) )
+        # retrieve and check it is stored under the hash of its content
+        self.assertTrue( len( source.file().read() ) )
+        self.assertTrue( source.content_hash )
+        self.assertEqual(
+            Source.objects.get(id=source.id).content_hash, source.content_hash)
+        cache_file_path = source.cache_file_path()
+        self.assertTrue( cache_file_path.endswith( source.content_hash ))
         self.assertTrue( os.path.exists( cache_file_path ))
 
         # change file, retrieve again and check we get cached version
         self.assertTrue( os.path.exists( cache_file_path ))
         added_text = "some random testing nonsense"
-        self.assertFalse( added_text in source.file(http_object=FakeHttp()).read() )
+        self.assertFalse( added_text in source.file().read() )
         with open(cache_file_path, "a") as append_to_me:
             append_to_me.write("\n\n" + added_text + "\n\n")        
-        self.assertTrue( added_text in source.file(http_object=FakeHttp()).read() )
+        self.assertTrue( added_text in source.file().read() )
+        self.assertEqual( self.requests_mock.call_count, 1 )
         
         # delete the object - check cache file gone to
         source.delete()
@@ -81,11 +90,53 @@ class HansardSourceTest(TestCase):
         self.assertRaises(
             SourceUrlCouldNotBeRetrieved,
             Source.file,
-            source,
-            http_object=FakeHttp(404))
+            source)
+        self.assertFalse( source.content_hash )
         self.assertFalse( os.path.exists( source.cache_file_path() ))
 
 
+    def test_renamed_source_file(self):
+        """Check that a renamed source's file is revalidated, not refetched"""
+        self.source.file().close()
+
+        renamed = Source.objects.create(
+            name = 'Renamed Test Source',
+            url  = self.source.url,
+            date = self.source.date,
+        )
+        self.requests_mock.get(self.source.url, status_code=304)
+
+        self.assertEqual( renamed.file().read(), EXAMPLE_DOCUMENT )
+        self.assertEqual( renamed.content_hash, self.source.content_hash )
+        self.assertEqual(
+            self.requests_mock.last_request.headers['If-None-Match'], '"abc"')
+
+        fetched_url, changed = fetch_url(self.source.url)
+        self.assertFalse( changed )
+        self.assertEqual( FetchedUrl.objects.count(), 1 )
+
+
+    def test_duplicate_source_file(self):
+        """Check that sources with the same file share it"""
+        duplicate = Source.objects.create(
+            name = 'Duplicate Test Source',
+            url  = 'http://example.com/another',
+            date = self.source.date,
+        )
+        self.requests_mock.get(duplicate.url, text=EXAMPLE_DOCUMENT)
+
+        self.source.file().close()
+        duplicate.file().close()
+        cache_file_path = self.source.cache_file_path()
+        self.assertEqual( duplicate.cache_file_path(), cache_file_path )
+
+        # the file is only deleted with the last source that uses it
+        duplicate.delete()
+        self.assertTrue( os.path.exists( cache_file_path ))
+        self.source.delete()
+        self.assertFalse( os.path.exists( cache_file_path ))
+
+
     def test_requires_processing(self):
         """Check requires_processing qs works"""
         
@@ -113,3 +164,17 @@ class HansardSourceTest(TestCase):
 
 
 
+
+
+    def test_claim_for_processing(self):
+        """Check that a source can only be claimed for processing once"""
+
+        # A copy of the source as loaded by a concurrent run:
+        other = Source.objects.get(id=self.source.id)
+
+        self.assertTrue( self.source.claim_for_processing() )
+        self.assertTrue( self.source.last_processing_attempt )
+        self.assertEqual( Source.objects.all().requires_processing().count(), 0 )
+
+        self.assertFalse( other.claim_for_processing() )
+        self.assertFalse( other.last_processing_attempt )
@@ -1,12 +1,13 @@
 import re
 import datetime
 
+from django.conf import settings
 from django.shortcuts  import render_to_response, get_object_or_404
 from django.http import Http404
 from django.template   import RequestContext
 from django.views.generic import TemplateView, DetailView, ListView
 
-from pombola.hansard.models import Sitting, Entry
+from pombola.hansard.models import Sitting, Entry, PersonAppearanceSummary
 from pombola.core.models import Person
 
 # import models
@@ -159,12 +160,22 @@ def person_summary(request, slug):
 
     entries_qs = Entry.objects.filter(speaker=person)
 
-    lifetime_summary = entries_qs.monthly_appearance_counts()
+    if settings.HANSARD_APPEARANCE_SUMMARIES:
+        lifetime_summary = PersonAppearanceSummary.objects \
+            .filter(person=person).monthly_appearance_counts()
+        entry_count = sum(s['count'] for s in lifetime_summary)
+    else:
+        lifetime_summary = entries_qs.monthly_appearance_counts()
+        entry_count = entries_qs.count()
+
+    recent_entries = entries_qs.all() \
+        .select_related('sitting__venue') \
+        .order_by('-sitting__start_date')[0:5]
 
     context = {
         'person':           person,
-        'entry_count':      entries_qs.count(),
-        'recent_entries':   entries_qs.all().order_by('-sitting__start_date')[0:5],
+        'entry_count':      entry_count,
+        'recent_entries':   recent_entries,
         'lifetime_summary': lifetime_summary,
     }
     context.update(person.get_disqus_thread_data(request))
@@ -200,6 +211,7 @@ class HansardPersonMixin(object):
 
     def get_context_data(self, **kwargs):
         context = super(HansardPersonMixin, self).get_context_data(**kwargs)
-        entries = Entry.objects.filter(speaker=self.object)
+        entries = Entry.objects.filter(speaker=self.object) \
+            .select_related('sitting__venue')
         context['hansard_entries'] = entries.order_by('-sitting__start_date')
         return context
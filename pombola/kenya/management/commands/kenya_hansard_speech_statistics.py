@@ -1,5 +1,6 @@
 from collections import defaultdict
 import csv
+import re
 from dateutil import parser
 from optparse import make_option
 
@@ -8,6 +9,7 @@ from django.db import connection
 from django.db.models import Count, Q
 
 from pombola.core.models import Person
+from pombola.core.position_index import PositionIndex
 from pombola.hansard.models import Entry, Venue
 
 class MultipleMembershipsException(Exception):
@@ -40,44 +42,41 @@ class Command(BaseCommand):
             'coalition_membership': []
         }
 
-        positions = speaker.position_set.all(). \
-            current_politician_positions(date)
+        positions = self.position_index.positions_for_person(speaker, date)
 
-        # Find positions associated with counties:
+        def kind_name(o):
+            return o.kind.name if o else None
 
-        for p in positions.filter(
-            title__name__in=('Senator', 'Governor'),
-            place__kind__name='County'):
-            results['county_associated'].append((p.title.name, p.place.name))
+        for p in positions:
+            title_name = p.title.name if p.title else None
 
-        for p in positions.filter(
-            title__name='Member of the National Assembly',
-            place__kind__name='Constituency',
-            place__parent_place__kind__name='County'):
-            results['county_associated'].append((p.title.name, p.place.parent_place.name))
+            # Find positions associated with counties:
 
-        for p in positions.filter(
-            title__name='Member of the National Assembly',
-            # The spelling of the subtitle 'Women's representative' varies:
-            subtitle__regex="omen.*epresentative",
-            place__kind__name='County'):
-            results['county_associated'].append((p.title.name, p.place.name))
+            if title_name in ('Senator', 'Governor') \
+                    and kind_name(p.place) == 'County':
+                results['county_associated'].append((title_name, p.place.name))
+
+            if title_name == 'Member of the National Assembly' \
+                    and kind_name(p.place) == 'Constituency' \
+                    and kind_name(p.place.parent_place) == 'County':
+                results['county_associated'].append(
+                    (title_name, p.place.parent_place.name))
 
-        # Now find party and coalition memberships:
+            # The spelling of the subtitle 'Women's representative' varies:
+            if title_name == 'Member of the National Assembly' \
+                    and re.search("omen.*epresentative", p.subtitle) \
+                    and kind_name(p.place) == 'County':
+                results['county_associated'].append((title_name, p.place.name))
 
-        party_memberships = positions. \
-            filter(title__name='Member'). \
-            filter(organisation__kind__name='Political Party')
-        coalition_memberships = positions. \
-            filter(title__name='Coalition Member'). \
-            filter(organisation__kind__name='Coalition')
+            # Now find party and coalition memberships:
 
-        for mtype, memberships in (
-                ("party", party_memberships),
-                ("coalition", coalition_memberships)):
+            if title_name == 'Member' \
+                    and kind_name(p.organisation) == 'Political Party':
+                results['party_membership'].append(p.organisation.name)
 
-            for m in memberships:
-                results[mtype + '_membership'].append(m.organisation.name)
+            if title_name == 'Coalition Member' \
+                    and kind_name(p.organisation) == 'Coalition':
+                results['coalition_membership'].append(p.organisation.name)
 
         for k, v in results.items():
             count = len(v)
@@ -97,6 +96,9 @@ class Command(BaseCommand):
 
     def handle(self, **options):
         position_data_cache = {}
+        # All the political positions are loaded once, rather than
+        # querying for each speaker's positions on each sitting date:
+        self.position_index = PositionIndex.political()
 
         if not options['date_from']:
             raise CommandError("You must specify --date-from")
@@ -189,9 +191,6 @@ class Command(BaseCommand):
                 .filter(sitting__venue__slug=vslug,
                         speaker__isnull=False)
                 .select_related('speaker', 'sitting')
-                .prefetch_related('speaker__position_set')
-                .prefetch_related('speaker__position_set__title')
-                .prefetch_related('speaker__position_set__place')
                 )
 
             # The gender split is easy to find, so do that first:
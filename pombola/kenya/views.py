@@ -7,6 +7,7 @@ import json
 import math
 import sys
 
+from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.http import HttpResponse
 from django.views.generic.base import View, TemplateView, RedirectView
@@ -25,6 +26,7 @@ from pombola.experiments.views import (
     ExperimentViewDataMixin, ExperimentFormSubmissionMixin,
     sanitize_parameter
 )
+from pombola.hansard.models import PersonAppearanceSummary
 from pombola.hansard.views import HansardPersonMixin
 from pombola.kenya import shujaaz
 from pombola.sms.models import Message, Question
@@ -217,8 +219,12 @@ class KEPersonDetailAppearances(HansardPersonMixin, PersonDetailSub, KEPersonDet
     def get_context_data(self, **kwargs):
         context = super(KEPersonDetailAppearances, self).get_context_data(**kwargs)
         context['hansard_entries_to_show'] = ":5"
-        context['lifetime_summary'] = context['hansard_entries'] \
-            .yearly_appearance_counts()
+        if settings.HANSARD_APPEARANCE_SUMMARIES:
+            context['lifetime_summary'] = PersonAppearanceSummary.objects \
+                .filter(person=self.object).yearly_appearance_counts()
+        else:
+            context['lifetime_summary'] = context['hansard_entries'] \
+                .yearly_appearance_counts()
         return context
 
 
@@ -10,3 +10,35 @@ def significant_positions_filter(qs):
     Governors and Federal Representatives."""
 
     return qs.filter(title__slug__in=('governor', 'representative', 'senator'))
+
+
+def find_overlapping_areas(code, polygons):
+    """Find MapIt areas of 'code' type that overlap with 'polygons'
+
+    Return a list of (area, overlap) tuples, largest overlap first,
+    where overlap is the fraction of polygons (a MultiPolygon) that
+    lies within the area. Every area which at least 50% of polygons
+    overlaps is returned; if there are no such areas, just the 5 areas
+    of the right type with the largest overlap are."""
+
+    from mapit.models import Area
+
+    all_areas = Area.objects.filter(
+        type__code=code, polygons__polygon__intersects=polygons).distinct()
+
+    area_of_original = polygons.area
+
+    overlaps = []
+    for area in all_areas:
+        intersection = polygons.intersection(area.polygons.collect())
+        overlaps.append((area, intersection.area / area_of_original))
+
+    overlaps.sort(reverse=True, key=lambda t: t[1])
+
+    likely_areas = [t for t in overlaps if t[1] > 0.5]
+
+    # If there are none use the first five (better than nothing...)
+    if not likely_areas:
+        likely_areas = overlaps[:5]
+
+    return likely_areas
@@ -0,0 +1,24 @@
+# The Poll Unit Number search reads the federal constituencies and
+# senatorial districts that each PUN overlaps, and their current
+# representatives, from the PollUnitLookup and PollUnitDistrict tables.
+# Rebuild them after running nigeria_add_polling_units_to_mapit,
+# importing new boundaries, or changing representatives' positions:
+#
+#   ./manage.py nigeria_build_poll_unit_lookup
+
+from django.core.management.base import NoArgsCommand
+
+from pombola.nigeria.models import PollUnitDistrict, PollUnitLookup
+
+
+class Command(NoArgsCommand):
+
+    help = 'Recalculate the districts that each poll unit number is in'
+
+    def handle_noargs(self, **options):
+        verbose = int(options['verbosity']) > 1
+        PollUnitLookup.objects.rebuild(verbose=verbose)
+        if int(options['verbosity']) > 0:
+            print "There are now {0} poll unit numbers in {1} districts".format(
+                PollUnitLookup.objects.count(),
+                PollUnitDistrict.objects.values('place').distinct().count())
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapit', '0002_auto_20141218_1615'),
+        ('core', '0019_populate_position_active_dates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollUnitLookup',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('code', models.CharField(unique=True, max_length=50)),
+                ('name', models.CharField(max_length=200)),
+                ('area', models.ForeignKey(related_name='poll_unit_lookups', to='mapit.Area')),
+            ],
+            options={
+                'ordering': ('code',),
+            },
+        ),
+        migrations.CreateModel(
+            name='PollUnitDistrict',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('kind', models.CharField(max_length=3, choices=[('FED', 'Federal Constituency'), ('SEN', 'Senatorial District')])),
+                ('rank', models.PositiveIntegerField()),
+                ('overlap', models.FloatField(help_text="The fraction of the PUN's area within the district")),
+                ('lookup', models.ForeignKey(related_name='districts', to='nigeria.PollUnitLookup')),
+                ('place', models.ForeignKey(related_name='+', to='core.Place')),
+                ('representative', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='core.Person', null=True)),
+            ],
+            options={
+                'ordering': ('lookup', 'kind', 'rank'),
+            },
+        ),
+    ]
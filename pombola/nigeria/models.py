@@ -0,0 +1,181 @@
+from django.db import models, transaction
+
+from mapit.models import Area, Code
+
+from pombola.core.models import Person, Place
+
+
+# The PositionTitle slugs of the representatives of each kind of district:
+DISTRICT_KIND_ROLES = (
+    ('FED', 'representative'),
+    ('SEN', 'senator'),
+)
+
+
+def find_area_with_polygons(area):
+    """Return area or its nearest ancestor that has a boundary"""
+    while area and not area.polygons.exists():
+        area = area.parent_area
+    return area
+
+
+class PollUnitLookupManager(models.Manager):
+
+    def lookup_for_pun(self, pun):
+        """Return the lookup for the longest prefix of pun, or None
+
+        pun should already have been tidied up; the lookup comes with
+        its districts, their places and representatives."""
+        components = pun.split(':')
+        prefixes = [
+            ':'.join(components[:i]) for i in range(1, len(components) + 1)]
+        lookups = self.filter(code__in=prefixes) \
+            .select_related('area') \
+            .prefetch_related(models.Prefetch(
+                'districts',
+                queryset=PollUnitDistrict.objects.select_related(
+                    'place', 'representative').prefetch_related(
+                    'representative__alternative_names')))
+        lookups = sorted(lookups, key=lambda l: len(l.code), reverse=True)
+        return lookups[0] if lookups else None
+
+    def calculate_districts(self, polygons):
+        """Work out the districts of each kind that overlap polygons
+
+        Returns a list of (kind, rank, overlap, place) tuples."""
+        # Imported here since pombola.nigeria.lib is loaded with the settings
+        from pombola.nigeria.lib import find_overlapping_areas
+
+        results = []
+        for kind, _ in DISTRICT_KIND_ROLES:
+            overlaps = find_overlapping_areas(kind, polygons)
+            area_id_to_place = {
+                p.mapit_area_id: p for p in Place.objects.filter(
+                    mapit_area__in=[a.id for a, _ in overlaps])
+            }
+            rank = 0
+            for district_area, overlap in overlaps:
+                place = area_id_to_place.get(district_area.id)
+                if place is None:
+                    continue
+                rank += 1
+                results.append((kind, rank, overlap, place))
+        return results
+
+    @transaction.atomic
+    def rebuild(self, verbose=False):
+        """Recalculate the lookups for every PUN code in MapIt
+
+        Areas without a boundary of their own use their nearest
+        ancestor's, so the overlaps for each boundary are only
+        calculated once."""
+        codes = Code.objects.filter(type__code='poll_unit') \
+            .select_related('area').order_by('code')
+
+        districts_cache = {}
+        representatives_cache = {}
+
+        def representative(place, kind):
+            if place.id not in representatives_cache:
+                role = dict(DISTRICT_KIND_ROLES)[kind]
+                people = place.related_people(
+                    lambda qs: qs.filter(person__position__title__slug=role))
+                representatives_cache[place.id] = \
+                    people[0][0] if people else None
+            return representatives_cache[place.id]
+
+        PollUnitDistrict.objects.all().delete()
+        self.all().delete()
+
+        lookups = []
+        lookup_districts = {}
+        for code in codes:
+            area = code.area
+            name = area.names.filter(type__code='poll_unit') \
+                .values_list('name', flat=True).first() or area.name
+            lookups.append(self.model(code=code.code, name=name, area=area))
+
+            area_for_polygons = find_area_with_polygons(area)
+            if area_for_polygons is None:
+                lookup_districts[code.code] = []
+            else:
+                key = area_for_polygons.id
+                if key not in districts_cache:
+                    districts_cache[key] = self.calculate_districts(
+                        area_for_polygons.polygons.collect())
+                lookup_districts[code.code] = districts_cache[key]
+            if verbose:
+                print "{0}: {1} district(s)".format(
+                    code.code, len(lookup_districts[code.code]))
+
+        self.bulk_create(lookups)
+
+        code_to_id = dict(self.values_list('code', 'id'))
+        PollUnitDistrict.objects.bulk_create([
+            PollUnitDistrict(
+                lookup_id=code_to_id[code],
+                kind=kind,
+                rank=rank,
+                overlap=overlap,
+                place=place,
+                representative=representative(place, kind),
+            )
+            for code, districts in lookup_districts.items()
+            for kind, rank, overlap, place in districts
+        ])
+
+
+class PollUnitLookup(models.Model):
+    """The districts that a Poll Unit Number (PUN) prefix falls within
+
+    There's one of these for every state, LGA and ward that has a PUN
+    in MapIt, so that the PUN search can find the overlapping federal
+    constituencies and senatorial districts without calculating the
+    overlap of their boundaries on every request. They are built by
+    the nigeria_build_poll_unit_lookup management command, which should
+    be run again after the polling units, boundaries or representatives
+    change.
+    """
+
+    code = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=200)
+    area = models.ForeignKey(Area, related_name='poll_unit_lookups')
+
+    objects = PollUnitLookupManager()
+
+    class Meta:
+        ordering = ('code',)
+
+    def __unicode__(self):
+        return self.code
+
+    def districts_of_kind(self, kind):
+        return [d for d in self.districts.all() if d.kind == kind]
+
+
+class PollUnitDistrict(models.Model):
+    """A district that overlaps the area of a PUN, and its representative"""
+
+    KIND_FEDERAL_CONSTITUENCY = 'FED'
+    KIND_SENATORIAL_DISTRICT = 'SEN'
+    KIND_CHOICES = (
+        (KIND_FEDERAL_CONSTITUENCY, 'Federal Constituency'),
+        (KIND_SENATORIAL_DISTRICT, 'Senatorial District'),
+    )
+
+    lookup = models.ForeignKey(PollUnitLookup, related_name='districts')
+    kind = models.CharField(max_length=3, choices=KIND_CHOICES)
+    rank = models.PositiveIntegerField()
+    overlap = models.FloatField(
+        help_text="The fraction of the PUN's area within the district")
+    place = models.ForeignKey(Place, related_name='+')
+    representative = models.ForeignKey(
+        Person, blank=True, null=True, on_delete=models.SET_NULL,
+        related_name='+')
+
+    class Meta:
+        ordering = ('lookup', 'kind', 'rank')
+
+    def __unicode__(self):
+        return u'{0} in {1} ({2:.0%})'.format(
+            self.lookup.code, self.place.name, self.overlap)
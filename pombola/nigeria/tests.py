@@ -14,6 +14,7 @@ from info.models import InfoPage
 
 from pombola.core.models import (
     Place, PlaceKind, Person, Position, PositionTitle)
+from pombola.nigeria.models import PollUnitDistrict, PollUnitLookup
 
 # Needed to run the doc tests in views.py
 
@@ -176,3 +177,37 @@ class NGSearchViewTest(WebTest):
             'Best match is the local government area "AKOKO SOUTH WEST" with poll unit number \'ON:4\'',
             response.content
         )
+
+    def test_matching_lga_from_lookup(self):
+        fed_place = Place.objects.create(
+            kind=self.place_kind,
+            slug="test_federal_constituency",
+            name="Test Federal Constituency",
+        )
+        representative = Person.objects.create(
+            slug="representative_test",
+            legal_name="Test Representative",
+        )
+        lookup = PollUnitLookup.objects.create(
+            code="ON:4",
+            name="AKOKO SOUTH WEST",
+            area=self.mapit_test_lga,
+        )
+        PollUnitDistrict.objects.create(
+            lookup=lookup,
+            kind=PollUnitDistrict.KIND_FEDERAL_CONSTITUENCY,
+            rank=1,
+            overlap=0.9,
+            place=fed_place,
+            representative=representative,
+        )
+
+        response = self.app.get("/search/?q=28/04/09")
+        self.assertIn(
+            'Best match is the local government area "AKOKO SOUTH WEST" with poll unit number \'ON:4\'',
+            response.content
+        )
+        self.assertIn('Test Federal Constituency', response.content)
+        self.assertIn('current representative', response.content)
+        self.assertIn('Test Representative', response.content)
+        self.assertIn('No overlapping Senatorial Districts', response.content)
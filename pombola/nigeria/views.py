@@ -8,6 +8,9 @@ from pombola.core.models import Place
 from pombola.core.views import HomeView
 from pombola.search.views import SearchBaseView
 
+from .lib import find_overlapping_areas
+from .models import PollUnitDistrict, PollUnitLookup, find_area_with_polygons
+
 
 class NGHomeView(HomeView):
 
@@ -142,6 +145,12 @@ class NGSearchView(SearchBaseView):
         query = tidy_up_pun(self.request.GET.get('q'))
         context['raw_query'] = query
         context['query'] = query
+
+        # Use the precomputed districts if there are any for this PUN:
+        lookup = PollUnitLookup.objects.lookup_for_pun(query)
+        if lookup:
+            return self.add_lookup_to_context(context, lookup, query)
+
         context['area'] = self.get_area_from_pun(query)
 
         # If area found find places of interest
@@ -202,31 +211,7 @@ class NGSearchView(SearchBaseView):
         type with the largest overlap
         """
 
-        all_areas = Area.objects.filter(type__code=code, polygons__polygon__intersects=polygons).distinct()
-
-        area_of_original = polygons.area
-
-        size_of_overlap = {}
-
-        # calculate the overlap
-        for area in all_areas:
-            area_polygons = area.polygons.collect()
-            intersection = polygons.intersection(area_polygons)
-
-            size_of_overlap[area] = intersection.area / area_of_original
-
-        # Sort the results by the overlap size; largest overlap first
-        all_areas = sorted(all_areas,
-                           reverse=True,
-                           key=lambda a: size_of_overlap[a])
-
-        # get the most overlapping ones
-        likely_areas = [a for a in all_areas if size_of_overlap[a] > 0.5]
-
-        # If there are none display first five (better than nothing...)
-        if not likely_areas:
-            likely_areas = all_areas[:5]
-
+        likely_areas = [a for a, _ in find_overlapping_areas(code, polygons)]
         return self.convert_areas_to_places(likely_areas)
 
     def convert_areas_to_places(self, areas):
@@ -278,10 +263,7 @@ class NGSearchView(SearchBaseView):
                 return governor[0][0]
 
     def find_containing_area(self, area):
-        area_for_polygons = area
-        while area_for_polygons and not area_for_polygons.polygons.exists():
-            area_for_polygons = area_for_polygons.parent_area
-        return area_for_polygons
+        return find_area_with_polygons(area)
 
     def get_pun_type(self, pun):
         # use the length of the matched PUN to determine whether
@@ -308,6 +290,32 @@ class NGSearchView(SearchBaseView):
             district_list.append(place)
         return district_list
 
+    def get_lookup_district_data(self, districts):
+        district_list = []
+        for district in districts:
+            place = {}
+            place['district_name'] = district.place.name
+            place['district_url'] = district.place.get_absolute_url()
+            if district.representative:
+                place['rep_name'] = district.representative.name
+                place['rep_url'] = district.representative.get_absolute_url()
+            district_list.append(place)
+        return district_list
+
+    def add_lookup_to_context(self, context, lookup, query):
+        """Fill in the context from a PollUnitLookup for the query"""
+        context['area'] = lookup.area
+        context['area_pun_code'] = lookup.code
+        context['area_pun_name'] = lookup.name
+        context['state'] = self.get_state(lookup.code, query[0:2], lookup.area)
+        context['area_pun_type'] = self.get_pun_type(lookup.code)
+        context['governor'] = self.find_governor(context['state'])
+        context['federal_constituencies'] = self.get_lookup_district_data(
+            lookup.districts_of_kind(PollUnitDistrict.KIND_FEDERAL_CONSTITUENCY))
+        context['senatorial_districts'] = self.get_lookup_district_data(
+            lookup.districts_of_kind(PollUnitDistrict.KIND_SENATORIAL_DISTRICT))
+        return context
+
     def get_people(self, place, role):
         return place.related_people(
             lambda qs: qs.filter(person__position__title__slug=role))
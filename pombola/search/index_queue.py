@@ -0,0 +1,72 @@
+"""Process the queue of objects whose search index entries are out of date"""
+
+from collections import defaultdict
+from operator import or_
+
+from django.db.models import Q
+
+from haystack import connections as haystack_connections
+from haystack.exceptions import NotHandled
+
+from .models import IndexQueueItem
+
+
+def process_index_queue_batch(batch_size=500, using='default'):
+    """Update the search index for a batch of queued objects
+
+    The objects to update are loaded and sent to the search engine
+    with one bulk request per model.  Queue items are only removed if
+    they haven't been changed again while the batch was being
+    processed.  Returns the number of queue items processed."""
+    items = list(
+        IndexQueueItem.objects.select_related('content_type')[:batch_size])
+    if not items:
+        return 0
+
+    backend = haystack_connections[using].get_backend()
+    unified_index = haystack_connections[using].get_unified_index()
+
+    to_update = defaultdict(list)
+    to_remove = []
+    for item in items:
+        if item.action == IndexQueueItem.ACTION_UPDATE:
+            to_update[item.content_type].append(item)
+        else:
+            to_remove.append(item)
+
+    for content_type, update_items in to_update.items():
+        model = content_type.model_class()
+        try:
+            index = unified_index.get_index(model)
+        except NotHandled:
+            continue
+        ids = set(i.object_id for i in update_items)
+        objects = [
+            o for o in index.index_queryset(using=using).filter(pk__in=ids)
+            if index.should_update(o)
+        ]
+        if objects:
+            backend.update(index, objects)
+        # Anything that no longer exists, or isn't included by the
+        # index's queryset any more, should be removed:
+        found_ids = set(o.pk for o in objects)
+        to_remove.extend(i for i in update_items if i.object_id not in found_ids)
+
+    for item in to_remove:
+        backend.remove(item.haystack_identifier())
+
+    IndexQueueItem.objects.filter(
+        reduce(or_, [Q(pk=i.pk, dirtied=i.dirtied) for i in items])
+    ).delete()
+
+    return len(items)
+
+
+def process_index_queue(batch_size=500, using='default'):
+    """Process the whole queue, and return the number of items processed"""
+    total = 0
+    while True:
+        processed = process_index_queue_batch(batch_size, using)
+        if not processed:
+            return total
+        total += processed
@@ -0,0 +1,42 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from pombola.search.index_queue import process_index_queue
+from pombola.search.models import IndexQueueItem
+
+
+class Command(NoArgsCommand):
+
+    help = 'Update the search index for objects queued by QueuedSignalProcessor'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int', default=500,
+                    help='The number of queued objects to index in each batch'),
+        make_option('--loop', action='store_true', dest='loop',
+                    help='Keep running, checking the queue every --sleep seconds'),
+        make_option('--sleep', dest='sleep', type='float', default=10,
+                    help='How long to wait between checks of the queue with --loop'),
+        make_option('--using', dest='using', default='default',
+                    help='The haystack connection to update'),
+        make_option('--status', action='store_true', dest='status',
+                    help='Just print the queue depth and indexing lag'),
+    )
+
+    def print_status(self):
+        status = IndexQueueItem.objects.status()
+        print "Queue depth: {queue_depth}, lag: {lag_seconds:.0f}s".format(**status)
+
+    def handle_noargs(self, **options):
+        verbose = int(options['verbosity']) > 1
+        if options['status']:
+            self.print_status()
+            return
+        while True:
+            processed = process_index_queue(options['batch_size'], options['using'])
+            if verbose and processed:
+                print "Indexed {0} queued objects".format(processed)
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
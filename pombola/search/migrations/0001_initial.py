@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexQueueItem',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('object_id', models.PositiveIntegerField()),
+                ('action', models.CharField(max_length=10, choices=[(b'update', b'Update'), (b'delete', b'Delete')])),
+                ('dirtied', models.DateTimeField()),
+                ('first_dirtied', models.DateTimeField(db_index=True)),
+                ('content_type', models.ForeignKey(to='contenttypes.ContentType')),
+            ],
+            options={
+                'ordering': ['first_dirtied'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='indexqueueitem',
+            unique_together=set([('content_type', 'object_id')]),
+        ),
+    ]
@@ -0,0 +1,124 @@
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+
+class IndexQueueItemManager(models.Manager):
+
+    def enqueue(self, instance, action):
+        """Record that the search index entry for instance needs updating
+
+        There is at most one row for each object, so if the object is
+        already queued, this just updates the action and the time it
+        was last changed."""
+        self._enqueue(
+            ContentType.objects.get_for_model(instance), instance.pk, action)
+
+    def enqueue_many(self, model, object_ids, action):
+        """Record that the index entries for many objects of model need updating
+
+        This is for code that changes objects with bulk_create() or
+        update(), which don't send the signals QueuedSignalProcessor
+        listens for."""
+        content_type = ContentType.objects.get_for_model(model)
+        object_ids = set(object_ids)
+        if not object_ids:
+            return
+        now = timezone.now()
+        existing = self.filter(content_type=content_type, object_id__in=object_ids)
+        already_queued = set(existing.values_list('object_id', flat=True))
+        existing.update(action=action, dirtied=now)
+        try:
+            with transaction.atomic():
+                self.bulk_create([
+                    self.model(
+                        content_type=content_type,
+                        object_id=object_id,
+                        action=action,
+                        dirtied=now,
+                        first_dirtied=now,
+                    )
+                    for object_id in object_ids - already_queued
+                ])
+        except IntegrityError:
+            # Another process queued some of the same objects in the
+            # meantime, so fall back to queueing them one at a time:
+            for object_id in object_ids - already_queued:
+                self._enqueue(content_type, object_id, action)
+
+    def _enqueue(self, content_type, object_id, action):
+        now = timezone.now()
+        existing = self.filter(content_type=content_type, object_id=object_id)
+        if existing.update(action=action, dirtied=now):
+            return
+        try:
+            with transaction.atomic():
+                self.create(
+                    content_type=content_type,
+                    object_id=object_id,
+                    action=action,
+                    dirtied=now,
+                    first_dirtied=now,
+                )
+        except IntegrityError:
+            # Another process queued the same object in the meantime:
+            existing.update(action=action, dirtied=now)
+
+    def status(self):
+        """Return a dict with the queue depth and the indexing lag
+
+        The lag is the number of seconds since the oldest unprocessed
+        change was made, or 0 if the queue is empty."""
+        depth = self.count()
+        oldest = self.aggregate(models.Min('first_dirtied'))['first_dirtied__min']
+        lag = 0
+        if oldest is not None:
+            lag = (timezone.now() - oldest).total_seconds()
+        return {
+            'queue_depth': depth,
+            'oldest_change': oldest.isoformat() if oldest else None,
+            'lag_seconds': lag,
+        }
+
+
+class IndexQueueItem(models.Model):
+    """An object whose entry in the search index is out of date
+
+    These are created by QueuedSignalProcessor when indexed models are
+    saved or deleted, and are removed by the
+    search_process_index_queue command once the search index has been
+    updated."""
+
+    ACTION_UPDATE = 'update'
+    ACTION_DELETE = 'delete'
+
+    action_choices = (
+        (ACTION_UPDATE, 'Update'),
+        (ACTION_DELETE, 'Delete'),
+    )
+
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    action = models.CharField(max_length=10, choices=action_choices)
+
+    # When the object was last changed, and when it was first changed
+    # since it was last indexed:
+    dirtied = models.DateTimeField()
+    first_dirtied = models.DateTimeField(db_index=True)
+
+    objects = IndexQueueItemManager()
+
+    def __unicode__(self):
+        return "%s %s.%s" % (self.action, self.content_type, self.object_id)
+
+    def haystack_identifier(self):
+        """The identifier haystack uses for this object in the index"""
+        return "%s.%s.%s" % (
+            self.content_type.app_label, self.content_type.model, self.object_id)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+        ordering = ['first_dirtied']
@@ -1,6 +1,9 @@
+import logging
+
 from django.conf import settings
 
 from haystack import indexes
+from sorl.thumbnail import get_thumbnail
 
 from pombola.core import models as core_models
 
@@ -16,30 +19,80 @@ from pombola.core import models as core_models
 # Note - these indexes could be specified in the individual apps, which might
 # well be cleaner.
 
+logger = logging.getLogger(__name__)
+
 class BaseIndex(indexes.SearchIndex):
     text = indexes.CharField(document=True, use_template=True)
 
-class PersonIndex(BaseIndex, indexes.Indexable):
+class AutocompleteIndex(BaseIndex):
+    """An index that stores everything the autocomplete view returns
+
+    This means that search.views.autocomplete can be answered from the
+    search results alone, without loading the objects or generating
+    thumbnails."""
+
     name_auto = indexes.EdgeNgramField(model_attr='name')
+
+    autocomplete_name = indexes.CharField(model_attr='name', indexed=False)
+    autocomplete_url = indexes.CharField(indexed=False)
+    autocomplete_css_class = indexes.CharField(indexed=False)
+    autocomplete_extra_data = indexes.CharField(indexed=False, null=True)
+    autocomplete_image_url = indexes.CharField(indexed=False)
+
+    def prepare_autocomplete_url(self, obj):
+        return obj.get_absolute_url()
+
+    def prepare_autocomplete_css_class(self, obj):
+        return obj.css_class()
+
+    def prepare_autocomplete_extra_data(self, obj):
+        return getattr(obj, 'extra_autocomplete_data', None)
+
+    def prepare_autocomplete_image_url(self, obj):
+        if hasattr(obj, 'primary_image'):
+            image = obj.primary_image()
+            if image:
+                try:
+                    return get_thumbnail(image, '16x16', crop="center").url
+                except Exception:
+                    # sorl.thumbnail can fail for missing or corrupt
+                    # files; fall back to the generic image.
+                    logger.exception(
+                        "Failed to make a thumbnail of %s for %r", image, obj)
+        return "/static/images/" + obj.css_class() + "-16x16.jpg"
+
+class PersonIndex(AutocompleteIndex, indexes.Indexable):
     hidden = indexes.BooleanField(model_attr='hidden')
 
     def get_model(self):
         return core_models.Person
 
-class PlaceIndex(BaseIndex, indexes.Indexable):
-    name_auto = indexes.EdgeNgramField(model_attr='name')
+    def index_queryset(self, using=None):
+        return self.get_model().objects.prefetch_related('images', 'alternative_names')
+
+class PlaceIndex(AutocompleteIndex, indexes.Indexable):
+    # When places in different sessions have the same name and kind,
+    # autocomplete only shows the one from the latest session:
+    session_end_date = indexes.DateField(
+        model_attr='parliamentary_session__end_date', null=True, indexed=False)
 
     def get_model(self):
         return core_models.Place
 
-class OrganisationIndex(BaseIndex, indexes.Indexable):
-    name_auto = indexes.EdgeNgramField(model_attr='name')
+    def index_queryset(self, using=None):
+        return self.get_model().objects \
+            .select_related('kind', 'parliamentary_session') \
+            .prefetch_related('images')
+
+class OrganisationIndex(AutocompleteIndex, indexes.Indexable):
 
     def get_model(self):
         return core_models.Organisation
 
-class PositionTitleIndex(BaseIndex, indexes.Indexable):
-    name_auto = indexes.EdgeNgramField(model_attr='name')
+    def index_queryset(self, using=None):
+        return self.get_model().objects.prefetch_related('images')
+
+class PositionTitleIndex(AutocompleteIndex, indexes.Indexable):
 
     def get_model(self):
         return core_models.PositionTitle
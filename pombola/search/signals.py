@@ -0,0 +1,53 @@
+from django.db import models
+
+from haystack.exceptions import NotHandled
+from haystack.signals import BaseSignalProcessor
+from images.models import Image
+
+from .models import IndexQueueItem
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """Queue changes to indexed models rather than indexing them immediately
+
+    haystack's RealtimeSignalProcessor makes a round trip to the search
+    engine on every save, which makes admin edits and bulk imports
+    slow.  This just records which objects have changed in
+    IndexQueueItem; the search_process_index_queue command then updates
+    the index in batches."""
+
+    def setup(self):
+        models.signals.post_save.connect(self.handle_save)
+        models.signals.post_delete.connect(self.handle_delete)
+        models.signals.post_save.connect(self.handle_image_change, sender=Image)
+        models.signals.post_delete.connect(self.handle_image_change, sender=Image)
+
+    def teardown(self):
+        models.signals.post_save.disconnect(self.handle_save)
+        models.signals.post_delete.disconnect(self.handle_delete)
+        models.signals.post_save.disconnect(self.handle_image_change, sender=Image)
+        models.signals.post_delete.disconnect(self.handle_image_change, sender=Image)
+
+    def is_indexed(self, sender, instance):
+        for using in self.connection_router.for_write(instance=instance):
+            try:
+                self.connections[using].get_unified_index().get_index(sender)
+                return True
+            except NotHandled:
+                pass
+        return False
+
+    def handle_save(self, sender, instance, **kwargs):
+        if self.is_indexed(sender, instance):
+            IndexQueueItem.objects.enqueue(instance, IndexQueueItem.ACTION_UPDATE)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if self.is_indexed(sender, instance):
+            IndexQueueItem.objects.enqueue(instance, IndexQueueItem.ACTION_DELETE)
+
+    def handle_image_change(self, sender, instance, **kwargs):
+        # The thumbnail of an object's primary image is stored in the
+        # index for autocomplete, so reindex the object the image is of.
+        obj = instance.content_object
+        if obj is not None and self.is_indexed(type(obj), obj):
+            IndexQueueItem.objects.enqueue(obj, IndexQueueItem.ACTION_UPDATE)
@@ -1,13 +1,17 @@
 import json
 import re
 
+from django.core.cache import caches
+from django.db import connection
 from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
 from django.utils import unittest
 from django.utils.text import slugify
 from django.core.urlresolvers import reverse
 from django.core.management import call_command
 
 from pombola.core.models import Person
+from pombola.search.views import autocomplete_results
 
 
 class AutocompleteTest(unittest.TestCase):
@@ -25,13 +29,16 @@ class AutocompleteTest(unittest.TestCase):
             (u'Joe Smith', False),
             (u'Josepth Smyth', True),
         ]
+        self.people = []
         for name, hidden in names_and_hidden:
-            Person(
+            person = Person(
                 slug=slugify(name),
                 legal_name=name,
                 gender='m',
                 hidden=hidden,
-            ).save()
+            )
+            person.save()
+            self.people.append(person)
 
         # Haystack indexes are not touched when fixtures are dumped. Run this
         # so that other changes cannot affect these tests. Have added a note to
@@ -39,6 +46,14 @@ class AutocompleteTest(unittest.TestCase):
         #   https://github.com/toastdriven/django-haystack/issues/226
         call_command('rebuild_index', interactive=False, verbosity=0)
 
+        caches['autocomplete'].clear()
+
+    def tearDown(self):
+        # This isn't a django.test.TestCase, so remove the people
+        # again so that the next test can create them.
+        for person in self.people:
+            person.delete()
+
 
     def test_autocomplete_requests(self):
         c = Client()
@@ -88,3 +103,22 @@ class AutocompleteTest(unittest.TestCase):
                 set(expected_output),
                 msg="\n\nTesting input: '%s'" % test_input
             )
+
+    def test_autocomplete_results_from_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            results = autocomplete_results('bobby')
+
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(
+            results,
+            [
+                {
+                    'url': '/person/bobby-smith/',
+                    'name': 'Bobby Smith',
+                    'image_url': '/static/images/person-16x16.jpg',
+                    'extra_data': None,
+                    'type': 'person',
+                    'value': 'Bobby Smith',
+                },
+            ]
+        )
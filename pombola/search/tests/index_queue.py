@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from haystack import connections
+from mock import patch
+
+from pombola.core.models import Person
+from pombola.search.index_queue import process_index_queue
+from pombola.search.models import IndexQueueItem
+from pombola.search.signals import QueuedSignalProcessor
+
+
+class IndexQueueTest(TestCase):
+
+    def setUp(self):
+        self.processor = QueuedSignalProcessor(
+            connections, connections.connection_router)
+        self.person = Person.objects.create(
+            legal_name='Alice Smith',
+            slug='alice-smith',
+        )
+
+    def tearDown(self):
+        self.processor.teardown()
+
+    def test_saves_are_queued_once(self):
+        self.person.save()
+        self.person.save()
+        items = IndexQueueItem.objects.all()
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0].content_object, self.person)
+        self.assertEqual(items[0].action, IndexQueueItem.ACTION_UPDATE)
+
+    def test_unindexed_models_are_not_queued(self):
+        IndexQueueItem.objects.all().delete()
+        self.person.alternative_names.create(alternative_name='Alice Jones')
+        self.assertFalse(IndexQueueItem.objects.exists())
+
+    def test_delete_replaces_update(self):
+        self.person.save()
+        person_id = self.person.id
+        self.person.delete()
+        item = IndexQueueItem.objects.get(object_id=person_id)
+        self.assertEqual(item.action, IndexQueueItem.ACTION_DELETE)
+        self.assertEqual(item.haystack_identifier(), 'core.person.{0}'.format(person_id))
+
+    def test_status(self):
+        self.person.save()
+        status = IndexQueueItem.objects.status()
+        self.assertEqual(status['queue_depth'], 1)
+        self.assertGreaterEqual(status['lag_seconds'], 0)
+
+    def test_status_only_for_staff(self):
+        response = self.client.get('/search/index-queue-status/')
+        self.assertEqual(response.status_code, 302)
+        editor = User.objects.create_user('editor', password='secret')
+        editor.is_staff = True
+        editor.save()
+        self.client.login(username='editor', password='secret')
+        response = self.client.get('/search/index-queue-status/')
+        self.assertEqual(response.status_code, 200)
+
+    @patch('haystack.backends.elasticsearch_backend.ElasticsearchSearchBackend.remove')
+    @patch('haystack.backends.elasticsearch_backend.ElasticsearchSearchBackend.update')
+    def test_process_queue(self, mock_update, mock_remove):
+        other = Person.objects.create(legal_name='Bob Jones', slug='bob-jones')
+        self.person.save()
+        other_id = other.id
+        other.delete()
+        self.assertEqual(process_index_queue(), 2)
+        self.assertEqual(mock_update.call_count, 1)
+        index, objects = mock_update.call_args[0]
+        self.assertEqual(list(objects), [self.person])
+        mock_remove.assert_called_once_with('core.person.{0}'.format(other_id))
+        self.assertFalse(IndexQueueItem.objects.exists())
@@ -5,6 +5,7 @@ from .views import (
     autocomplete,
     GeocoderView,
     SearchBaseView,
+    index_queue_status,
     )
 
 
@@ -12,6 +13,9 @@ urlpatterns = [
     # Haystack and other searches
     url(r'^autocomplete/', autocomplete, name="autocomplete"),
 
+    # How far behind the search index is
+    url(r'^index-queue-status/$', index_queue_status, name='index_queue_status'),
+
     url(r'^$',
         SearchBaseView.as_view(),
         name='core_search'),
@@ -1,13 +1,17 @@
 from datetime import datetime
+import hashlib
 import re
 import sys
 import simplejson
 import logging
 
+from django.contrib.admin.views.decorators import staff_member_required
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.conf import settings
+from django.core.cache import caches
 
+from django.views.decorators.cache import never_cache
 from django.views.generic import TemplateView
 
 from pombola.core import models
@@ -16,8 +20,8 @@ from haystack.query import SearchQuerySet
 from haystack.inputs import AutoQuery, Raw
 
 from pygeolib import GeocoderError
-from sorl.thumbnail import get_thumbnail
 from .geocoder import geocoder
+from .models import IndexQueueItem
 from .recaptcha import check_recaptcha_is_valid_if_query_param_present
 
 
@@ -391,13 +395,13 @@ known_kinds = {
     'place':  models.Place,
 }
 
-def places_ordered_by_session(place_a, place_b):
-    """Return True if both places have sessions and place_b's is later"""
-    a_session = place_a.parliamentary_session
-    b_session = place_b.parliamentary_session
-    if not (a_session and b_session):
+def places_ordered_by_session(result_a, result_b):
+    """Return True if both places have sessions and result_b's is later"""
+    a_end_date = result_a['session_end_date']
+    b_end_date = result_b['session_end_date']
+    if not (a_end_date and b_end_date):
         return False
-    return a_session.end_date < b_session.end_date
+    return a_end_date < b_end_date
 
 def remove_duplicate_places(response_data):
     """Remove all but the newest of places with indistinguishable labels
@@ -417,10 +421,9 @@ def remove_duplicate_places(response_data):
 
     for i, result in enumerate(response_data):
         this_label = (result['name'], result['extra_data'])
-        this_object = result['object']
-        if (this_label in previous_label_index) and type(this_object) == models.Place:
+        if (this_label in previous_label_index) and result['model'] == models.Place:
             previous_i = previous_label_index[this_label]
-            if places_ordered_by_session(response_data[previous_i]['object'], this_object):
+            if places_ordered_by_session(response_data[previous_i], result):
                 indices_to_remove.append(previous_i)
                 previous_label_index[this_label] = i
             else:
@@ -433,81 +436,98 @@ def remove_duplicate_places(response_data):
     for index_to_remove in indices_to_remove:
         del response_data[index_to_remove]
 
-def autocomplete(request):
-    """Return autocomplete JSON results"""
+def autocomplete_results(term, model_kind=None):
+    """Return the autocomplete results for term as a list of dicts
 
-    term = request.GET.get('term','').strip()
-    response_data = []
+    Everything is taken from fields stored in the search index, so
+    this doesn't query the database."""
 
-    if len(term):
+    response_data = []
 
-        # Does not work - probably because the FLAG_PARTIAL is not set on Xapian
-        # (trying to set it in settings.py as documented appears to have no effect)
-        # sqs = SearchQuerySet().autocomplete(name_auto=term)
+    # Does not work - probably because the FLAG_PARTIAL is not set on Xapian
+    # (trying to set it in settings.py as documented appears to have no effect)
+    # sqs = SearchQuerySet().autocomplete(name_auto=term)
 
-        # Split the search term up into little bits
-        terms = re.split(r'\s+', term)
+    # Split the search term up into little bits
+    terms = re.split(r'\s+', term)
 
-        # Build up a query based on the bits
-        sqs = SearchQuerySet()
-        for bit in terms:
-            # print "Adding '%s' to the '%s' query" % (bit,term)
-            sqs = sqs.filter_and(
-                name_auto__startswith = sqs.query.clean( bit )
-            )
-        sqs = sqs.exclude(hidden=False)
-
-        # If we have a kind then filter on that too
-        model_kind = request.GET.get('model', None)
-        if model_kind:
-            model = known_kinds.get(model_kind, None)
-            if model:
-                sqs = sqs.models(model)
-        else:
-            sqs = sqs.models(
-                models.Person,
-                models.Organisation,
-                models.Place,
-                models.PositionTitle,
-            )
+    # Build up a query based on the bits
+    sqs = SearchQuerySet()
+    for bit in terms:
+        # print "Adding '%s' to the '%s' query" % (bit,term)
+        sqs = sqs.filter_and(
+            name_auto__startswith = sqs.query.clean( bit )
+        )
+    sqs = sqs.exclude(hidden=False)
+
+    # If we have a kind then filter on that too
+    model = known_kinds.get(model_kind, None) if model_kind else None
+    if model:
+        sqs = sqs.models(model)
+    else:
+        sqs = sqs.models(
+            models.Person,
+            models.Organisation,
+            models.Place,
+            models.PositionTitle,
+        )
 
-        # collate the results into json for the autocomplete js
-        for result in sqs.all()[0:10]:
+    # collate the results into json for the autocomplete js
+    for result in sqs.all()[0:10]:
+        response_data.append({
+            'url': result.autocomplete_url,
+            'name': result.autocomplete_name,
+            'image_url': result.autocomplete_image_url,
+            'extra_data': result.autocomplete_extra_data,
+            'type': result.autocomplete_css_class,
+            'value': result.autocomplete_name,
+            'model': result.model,
+            'session_end_date': getattr(result, 'session_end_date', None),
+        })
 
-            o = result.object
-            css_class = o.css_class()
+    remove_duplicate_places(response_data)
 
-            extra_autocomplete_data = None
-            if hasattr(o, 'extra_autocomplete_data'):
-                extra_autocomplete_data = o.extra_autocomplete_data
+    # Remove the elements that were only needed for removing duplicates:
+    for d in response_data:
+        del d['model']
+        del d['session_end_date']
 
-            image_url = None
-            if hasattr(o, 'primary_image'):
-                image = o.primary_image()
-                if image:
-                    image_url = get_thumbnail(image, '16x16', crop="center").url
+    return response_data
 
-            if not image_url:
-                image_url = "/static/images/" + css_class + "-16x16.jpg"
+def autocomplete(request):
+    """Return autocomplete JSON results
 
-            response_data.append({
-                'url': o.get_absolute_url(),
-                'name': o.name,
-                'image_url': image_url,
-                'extra_data': extra_autocomplete_data,
-                'type': css_class,
-                'value': o.name,
-                'object': o
-            })
+    This is requested on every keystroke, so the results for each term
+    are also kept for a short time in the 'autocomplete' cache."""
 
-    remove_duplicate_places(response_data)
+    term = request.GET.get('term','').strip()
+    model_kind = request.GET.get('model', None)
+    response_data = []
 
-    # Remove the 'object' elements before returning the response:
-    for d in response_data:
-        del d['object']
+    if len(term):
+        cache = caches['autocomplete']
+        cache_key = 'autocomplete-' + hashlib.md5(
+            u'{0}\n{1}'.format(term.lower(), model_kind or '').encode('utf-8')
+        ).hexdigest()
+        response_data = cache.get(cache_key)
+        if response_data is None:
+            response_data = autocomplete_results(term, model_kind)
+            cache.set(cache_key, response_data)
 
     # send back the results as JSON
     return HttpResponse(
         simplejson.dumps(response_data),
         content_type='application/json',
     )
+
+
+@never_cache
+@staff_member_required
+def index_queue_status(request):
+    """Return the number of objects waiting to be indexed, and the lag
+
+    This is only for staff, since it says how busy the site is."""
+    return HttpResponse(
+        simplejson.dumps(IndexQueueItem.objects.status()),
+        content_type='application/json',
+    )
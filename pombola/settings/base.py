@@ -186,8 +186,35 @@ CACHES = {
     'dummy': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
     },
+    # a small in-process cache for the autocomplete results of popular
+    # search terms, which are requested on every keystroke
+    'autocomplete': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'autocomplete',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    # rendered fragments of person, place and organisation pages, which
+    # are invalidated when what they show changes (see
+    # pombola.core.fragment_cache)
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/tmp/django_fragment_cache',
+        'TIMEOUT': 60*60*24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
 }
 
+# Whether to count the hits and misses of each cached page fragment (see
+# core_fragment_cache_stats). The counts are kept in the 'fragments'
+# cache, so this adds cache writes to every page that uses a fragment;
+# only turn it on while measuring.
+FRAGMENT_CACHE_STATS = False
+
 CACHE_MIDDLEWARE_ALIAS='dummy'
 if DEBUG:
     CACHE_MIDDLEWARE_SECONDS = 0
@@ -324,7 +351,9 @@ if os.environ.get("ELASTICSEARCH_PASSWORD"):
     }
 
 
-HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'
+# Changes to indexed models are queued, and the search index is updated
+# from that queue by the search_process_index_queue management command:
+HAYSTACK_SIGNAL_PROCESSOR = 'pombola.search.signals.QueuedSignalProcessor'
 
 # Admin autocomplete
 AJAX_LOOKUP_CHANNELS = {
@@ -392,6 +421,12 @@ PMG_API_KEY = os.environ.get("PMG_API_KEY", "")
 #   looking for the largest intersection.
 HANSARD_NAME_MATCHING_ALGORITHM = NAME_SET_INTERSECTION_MATCH
 
+# Whether the hansard tab on person pages should use the monthly
+# appearance counts stored in PersonAppearanceSummary, rather than
+# counting each person's entries on every request. The summaries are
+# recalculated by hansard_update_appearance_summaries.
+HANSARD_APPEARANCE_SUMMARIES = False
+
 # Which popit instance to use
 POPIT_API_URL = "/help/api"
 
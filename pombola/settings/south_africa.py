@@ -28,16 +28,56 @@ PIPELINE_JS.update(COUNTRY_JS)
 
 EXCLUDE_FROM_SEARCH = ('places', 'info_pages');
 
-PMG_API_CACHE_PATH = os.path.join(data_dir, 'pmg_api_cache')
+INTERESTS_REGISTER_CACHE_PATH = os.path.join(data_dir, 'interests_register_cache')
 
 try:
-    os.makedirs(PMG_API_CACHE_PATH)
+    os.makedirs(INTERESTS_REGISTER_CACHE_PATH)
 except OSError as exception:
     if exception.errno != errno.EEXIST:
         raise
-CACHES['pmg_api'] = {
+# The tables of the members' interests pages; they're stored under a
+# version that changes whenever the register changes
+# (see pombola.south_africa.models):
+CACHES['interests_register'] = {
     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-    'LOCATION': PMG_API_CACHE_PATH,
+    'LOCATION': INTERESTS_REGISTER_CACHE_PATH,
+    'OPTIONS': {
+        'MAX_ENTRIES': 10000,
+        },
+    'TIMEOUT': 60*60*24*7,
+}
+
+WARD_LOOKUP_CACHE_PATH = os.path.join(data_dir, 'ward_lookup_cache')
+
+try:
+    os.makedirs(WARD_LOOKUP_CACHE_PATH)
+except OSError as exception:
+    if exception.errno != errno.EEXIST:
+        raise
+# The wards containing points, and the councillors for each ward, that
+# are looked up from MapIt and Code for SA on the lat/lon pages:
+CACHES['ward_lookup'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': WARD_LOOKUP_CACHE_PATH,
+    'OPTIONS': {
+        'MAX_ENTRIES': 100000,
+        },
+    'TIMEOUT': 60*60*24,
+}
+
+HOUSE_COMPOSITION_CACHE_PATH = os.path.join(data_dir, 'house_composition_cache')
+
+try:
+    os.makedirs(HOUSE_COMPOSITION_CACHE_PATH)
+except OSError as exception:
+    if exception.errno != errno.EEXIST:
+        raise
+# The party seat counts of each house, and the election statistics;
+# the entries are replaced whenever the positions they count change
+# (see pombola.south_africa.house_composition):
+CACHES['house_composition'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': HOUSE_COMPOSITION_CACHE_PATH,
     'OPTIONS': {
         'MAX_ENTRIES': 10000,
         },
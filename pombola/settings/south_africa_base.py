@@ -34,6 +34,10 @@ MAP_BOUNDING_BOX_EAST = 32.95
 MAP_BOUNDING_BOX_SOUTH = -35.00
 MAP_BOUNDING_BOX_WEST = 16.30
 
+# The geocoder used by the constituency office importers (see
+# pombola.south_africa.geocoding):
+GEOCODING_PROVIDER = 'google'
+
 MAPIT_COUNTRY = 'ZA'
 
 COUNTRY_CSS = {
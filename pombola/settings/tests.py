@@ -23,3 +23,10 @@ NOSE_ARGS += ['-a', '!country']
 COUNTRY_APP = None
 
 MAPIT_COUNTRY = 'Global'
+
+# Keep rendered fragments in memory, so that they don't outlive the
+# test database:
+CACHES['fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'fragments_test',
+    }
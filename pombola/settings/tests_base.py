@@ -37,4 +37,8 @@ MAP_BOUNDING_BOX_WEST = None
 #   https://github.com/cyberdelia/django-pipeline/issues/277
 STATICFILES_STORAGE = 'pipeline.storage.PipelineStorage'
 
-CAPTCHA_TEST_MODE = True
\ No newline at end of file
+CAPTCHA_TEST_MODE = True
+
+# Index changes immediately in tests, so that search results reflect
+# objects created in setUp without running the index queue:
+HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'
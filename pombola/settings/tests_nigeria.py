@@ -12,3 +12,10 @@ INSTALLED_APPS += OPTIONAL_APPS
 ENABLED_FEATURES = make_enabled_features(INSTALLED_APPS, ALL_OPTIONAL_APPS)
 
 NOSE_ARGS += ['-a', 'country=nigeria']
+
+# Keep rendered fragments in memory, so that they don't outlive the
+# test database:
+CACHES['fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'fragments_test',
+    }
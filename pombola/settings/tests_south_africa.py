@@ -27,7 +27,22 @@ NOSE_ARGS += ['-a', 'country=south_africa']
 # For testing purposes we need a cache that we can put stuff in
 # to avoid external calls, and generally to avoid polluting the
 # cache proper.
-CACHES['pmg_api'] = {
+CACHES['interests_register'] = {
     'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    'LOCATION': 'pmg_api_test',
+    'LOCATION': 'interests_register_test',
     }
+CACHES['ward_lookup'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'ward_lookup_test',
+    }
+CACHES['house_composition'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'house_composition_test',
+    }
+CACHES['fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'fragments_test',
+    }
+
+# Never send addresses to a real geocoder from the tests:
+GEOCODING_PROVIDER = 'stub'
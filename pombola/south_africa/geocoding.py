@@ -0,0 +1,196 @@
+"""Geocoding of constituency office addresses, with a persistent store
+
+Each geocoder response is saved in GeocodedAddress as soon as it's
+received, keyed by the provider, the bounds the results were biased to
+and the normalised address. A run that fails part way through keeps
+everything it had looked up, and all the importers (and several runs at
+once) share the same results. geocode_many requests the addresses that
+aren't stored yet concurrently, at no more than REQUESTS_PER_SECOND.
+
+The provider is chosen with settings.GEOCODING_PROVIDER: 'google', or
+'stub', which answers from settings.GEOCODING_STUB_LOCATIONS without
+any network access, for tests and offline development.
+"""
+
+from multiprocessing.pool import ThreadPool
+import json
+import logging
+import threading
+import time
+import urllib
+
+import requests
+
+from django.conf import settings
+
+from pombola.south_africa.models import GeocodedAddress
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = 30
+REQUESTS_PER_SECOND = 10
+WORKERS = 4
+
+# Other statuses (e.g. OVER_QUERY_LIMIT or UNKNOWN_ERROR) might not be
+# given the next time, so responses with them aren't stored:
+STORED_STATUSES = ('OK', 'ZERO_RESULTS')
+
+
+def normalise_address(address):
+    """Return address with the differences that don't matter removed
+
+    >>> normalise_address(u'  12 Long  Street,\\n Cape Town, ')
+    u'12 long street, cape town'
+    """
+    return u' '.join(address.split()).strip(u' ,').lower()
+
+
+def default_bounds():
+    return '{w},{s}|{e},{n}'.format(
+        w=settings.MAP_BOUNDING_BOX_WEST,
+        s=settings.MAP_BOUNDING_BOX_SOUTH,
+        e=settings.MAP_BOUNDING_BOX_EAST,
+        n=settings.MAP_BOUNDING_BOX_NORTH,
+    )
+
+
+class GoogleGeocoder(object):
+    name = 'google'
+
+    url_template = \
+        'https://maps.googleapis.com/maps/api/geocode/json?address={address}&bounds={bounds}&key={key}'
+
+    def request(self, address, bounds):
+        url = self.url_template.format(
+            address=urllib.quote(address.encode('UTF-8')),
+            bounds=bounds,
+            key=settings.GOOGLE_MAPS_GEOCODING_API_KEY,
+        )
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+
+class StubGeocoder(object):
+    """A geocoder that answers from a dict of addresses to (lon, lat)
+
+    Its responses are in the same form as Google's; any address that
+    isn't in locations has ZERO_RESULTS."""
+    name = 'stub'
+
+    def __init__(self, locations=None):
+        if locations is None:
+            locations = getattr(settings, 'GEOCODING_STUB_LOCATIONS', {})
+        self.locations = dict(
+            (normalise_address(address), location)
+            for address, location in locations.items())
+
+    def request(self, address, bounds):
+        location = self.locations.get(normalise_address(address))
+        if location is None:
+            return {'status': 'ZERO_RESULTS', 'results': []}
+        lon, lat = location
+        return {
+            'status': 'OK',
+            'results': [{
+                'formatted_address': address,
+                'geometry': {'location': {'lat': lat, 'lng': lon}},
+            }],
+        }
+
+
+PROVIDERS = {
+    'google': GoogleGeocoder,
+    'stub': StubGeocoder,
+}
+
+
+def get_geocoder():
+    return PROVIDERS[settings.GEOCODING_PROVIDER]()
+
+
+class RateLimiter(object):
+    """Space out calls of wait(), from any number of threads"""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def stored_responses(geocoder, bounds, addresses):
+    """Return a dict of the stored response for each normalised address"""
+    return dict(
+        (g.address, json.loads(g.response))
+        for g in GeocodedAddress.objects.filter(
+            provider=geocoder.name, bounds=bounds, address__in=addresses)
+    )
+
+
+def store_response(geocoder, bounds, address, response):
+    if response.get('status') not in STORED_STATUSES:
+        return
+    GeocodedAddress.objects.update_or_create(
+        provider=geocoder.name,
+        bounds=bounds,
+        address=address,
+        defaults={'response': json.dumps(response)},
+    )
+
+
+def geocode_many(addresses, geocoder=None, bounds=None,
+                 workers=WORKERS, requests_per_second=REQUESTS_PER_SECOND):
+    """
+    Return a dict mapping each of addresses to the geocoder's response.
+
+    Stored responses are used where there are any; the other addresses
+    are requested in `workers` threads, and each response is stored as
+    it arrives. All the database queries are made from the calling
+    thread. An address is left out of the dict if its request failed.
+    """
+    geocoder = geocoder or get_geocoder()
+    bounds = bounds or default_bounds()
+    addresses = set(addresses)
+    # The address to request for each normalised one:
+    to_request = {}
+    for address in addresses:
+        to_request.setdefault(normalise_address(address), address)
+
+    responses = stored_responses(geocoder, bounds, to_request.keys())
+    missing = [a for a in to_request if a not in responses]
+    if missing:
+        limiter = RateLimiter(requests_per_second)
+
+        def request(normalised):
+            limiter.wait()
+            try:
+                return normalised, geocoder.request(
+                    to_request[normalised], bounds)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.warning(
+                    u"Geocoding %s failed: %s", to_request[normalised], e)
+                return normalised, None
+
+        pool = ThreadPool(min(workers, len(missing)))
+        try:
+            for normalised, response in pool.imap_unordered(request, missing):
+                if response is not None:
+                    store_response(geocoder, bounds, normalised, response)
+                    responses[normalised] = response
+        finally:
+            pool.close()
+            pool.join()
+
+    return dict(
+        (address, responses[normalise_address(address)])
+        for address in addresses
+        if normalise_address(address) in responses
+    )
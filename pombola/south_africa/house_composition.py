@@ -0,0 +1,252 @@
+"""
+The party make-up of the houses of Parliament, counted in SQL.
+
+The seats each party holds in a house, how many of the current members
+are standing again in an election, and which candidates have changed
+party, are all worked out with grouped queries rather than by loading
+every position. The results are kept in the 'house_composition' cache
+for each house and date. They're invalidated by invalidate_for_position,
+which pombola.south_africa.models connects to Position's signals: the
+cache keys include a version for each house, which changes when any
+position in that house (or that has just left it) does, and one for
+party and election list memberships, which every result depends on.
+"""
+
+import datetime
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.db.models import Case, Count, Q, When
+
+from pombola.core import cache_versions
+from pombola.core.models import Organisation, Person, Position
+
+MEMBERSHIP_ORGANISATION_KINDS = ('party', 'election-list')
+
+
+VERSION_PREFIX = 'house-composition-version-'
+
+
+def get_versions(names):
+    return cache_versions.get_versions(
+        caches['house_composition'], VERSION_PREFIX, names)
+
+
+def new_version(name):
+    cache_versions.invalidate(caches['house_composition'], VERSION_PREFIX, name)
+
+
+def record_position_organisation(**kwargs):
+    """A signal handler to remember which house a position was in"""
+    position = kwargs.get('instance')
+    position._original_organisation_id = \
+        position.__dict__.get('organisation_id')
+
+
+def invalidate_for_position(sender, instance, **kwargs):
+    """A signal handler to throw away results that depend on a position
+
+    If the position has moved from one organisation to another, the
+    results for both are thrown away."""
+    if kwargs.get('raw'):
+        return
+    organisation_ids = set([
+        instance.organisation_id,
+        getattr(instance, '_original_organisation_id', None),
+    ])
+    organisation_ids.discard(None)
+    if not organisation_ids:
+        return
+    for organisation_id in organisation_ids:
+        new_version(organisation_id)
+    instance._original_organisation_id = instance.organisation_id
+    if Organisation.objects.filter(
+            id__in=organisation_ids,
+            kind__slug__in=MEMBERSHIP_ORGANISATION_KINDS).exists():
+        new_version('memberships')
+
+
+def memoise(name, version_names, calculate, *args):
+    """Return calculate(*args), cached until any of the versions change"""
+    key = 'house-composition-' + '-'.join(
+        [name] + get_versions(version_names) + [unicode(a) for a in args])
+    cache = caches['house_composition']
+    result = cache.get(key)
+    if result is None:
+        result = calculate(*args)
+        cache.set(key, result)
+    return result
+
+
+def current_member_ids(house_id, when):
+    """A subquery of the IDs of people with active positions in a house"""
+    return Position.objects.filter(organisation=house_id) \
+        .currently_active(when).values('person_id')
+
+
+def calculate_party_seats(house_id, when):
+    total_people = Position.objects.filter(organisation=house_id) \
+        .currently_active(when) \
+        .aggregate(total=Count('person', distinct=True))['total']
+
+    # Each party with its number of seats, in one query; the position
+    # conditions are in a single filter() so that the count is only of
+    # the positions that match them.
+    parties = list(Organisation.objects.filter(
+        kind__slug='party',
+        position__in=Position.objects.filter(
+            title__slug='member',
+            person__in=current_member_ids(house_id, when)) \
+            .currently_active(when)) \
+        .annotate(seats=Count('position__person', distinct=True)))
+    seats = dict((party.id, party.seats) for party in parties)
+
+    # Calculate the % of the house each party occupies.
+    parties_counts_and_percentages = sorted(
+        [
+            (party,
+             seats[party.id],
+             (float(seats[party.id]) * 100) / total_people)
+            for party in sorted(parties, key=lambda o: o.name)
+        ],
+        key=lambda x: x[1],
+        reverse=True,
+    )
+    return total_people, parties_counts_and_percentages
+
+
+def party_seats(house, when=None):
+    """Return the number of people in house on the date when (by
+    default today), and a list of (party, seats, percentage of the
+    house) tuples for the parties they're members of, largest first"""
+    when = when or datetime.date.today()
+    return memoise(
+        'party-seats', [house.id, 'memberships'],
+        calculate_party_seats, house.id, when)
+
+
+def rerunning_person_ids(election_year):
+    """A subquery of the IDs of people on lists for the national election"""
+    return Position.objects.filter(
+        Q(organisation__slug__contains='national-election-list-' + election_year) |
+        (Q(organisation__slug__contains='election-list-' + election_year) &
+         Q(organisation__slug__contains='regional'))
+    ).values('person_id')
+
+
+def calculate_rerunning_counts(house_id, election_year, when):
+    rerunning_ids = rerunning_person_ids(election_year)
+    member_positions = Position.objects.filter(organisation=house_id) \
+        .currently_active(when)
+
+    totals = member_positions.aggregate(
+        current=Count('person', distinct=True),
+        rerunning=Count(
+            Case(When(person__in=rerunning_ids, then='person')),
+            distinct=True),
+    )
+    counts = {
+        'all': {
+            'current': totals['current'],
+            'rerunning': totals['rerunning'],
+            'percent_rerunning': (
+                100 * totals['rerunning'] / totals['current']
+                if totals['current'] else 0),
+        },
+        'byparty': [],
+    }
+
+    # The current members who have ever held any position in each
+    # party, and how many of those are standing again:
+    party_counts = Position.objects.filter(
+        organisation__kind__slug='party',
+        person__in=member_positions.values('person_id')) \
+        .values('organisation') \
+        .annotate(
+            current=Count('person', distinct=True),
+            rerunning=Count(
+                Case(When(person__in=rerunning_ids, then='person')),
+                distinct=True))
+    party_counts = dict((c['organisation'], c) for c in party_counts)
+    parties = Organisation.objects.in_bulk(party_counts.keys()).values()
+
+    for party in sorted(parties, key=lambda o: o.name):
+        c = party_counts[party.id]
+        counts['byparty'].append({
+            'party': party,
+            'current': c['current'],
+            'rerunning': c['rerunning'],
+            'percent_rerunning': 100 * c['rerunning'] / c['current'],
+        })
+    return counts
+
+
+def rerunning_counts(house, election_year, when=None):
+    """Return how many of the people in house on the date when (by
+    default today) are on lists for the national election in
+    election_year, in total and for each party, as a dict of the form
+    {'all': {'current': ..., 'rerunning': ..., 'percent_rerunning': ...},
+     'byparty': [{'party': ..., 'current': ..., ...}, ...]}"""
+    when = when or datetime.date.today()
+    return memoise(
+        'rerunning', [house.id, 'memberships'],
+        calculate_rerunning_counts, house.id, election_year, when)
+
+
+def calculate_party_switchers(election_year, when):
+    people = list(
+        Person.objects
+        .filter(
+            position__organisation__kind__slug='party',
+            position__title__slug='member')
+        .annotate(num_parties=Count('position'))
+        .filter(num_parties__gt=1)
+        .filter(id__in=Position.objects.filter(
+            organisation__slug__contains='election-list-' + election_year)
+            .values('person_id'))
+        .prefetch_related('alternative_names')
+    )
+    person_ids = [p.id for p in people]
+
+    party_positions = defaultdict(list)
+    for position in Position.objects.filter(
+            person__in=person_ids, organisation__kind__slug='party') \
+            .select_related('organisation'):
+        party_positions[position.person_id].append(position)
+
+    list_positions = defaultdict(list)
+    for position in Position.objects.filter(
+            person__in=person_ids,
+            organisation__slug__contains='election-list-' + election_year) \
+            .select_related('organisation'):
+        list_positions[position.person_id].append(position)
+
+    # A position with no active dates is neither current nor former,
+    # as with the currently_active and currently_inactive filters:
+    def is_current(position):
+        return when in position.active_dates
+
+    return [
+        {
+            'person': person,
+            'current_positions': [
+                p for p in party_positions[person.id]
+                if p.active_dates is not None and is_current(p)],
+            'former_positions': [
+                p for p in party_positions[person.id]
+                if p.active_dates is not None and not is_current(p)],
+            'person_list': list_positions[person.id],
+        }
+        for person in people
+    ]
+
+
+def party_switchers(election_year, when=None):
+    """Return the people who are on a list for the election in
+    election_year and have been members of more than one party, as
+    dicts with their current (on the date when, by default today) and
+    former party memberships and their election list positions"""
+    when = when or datetime.date.today()
+    return memoise(
+        'party-switchers', ['memberships'],
+        calculate_party_switchers, election_year, when)
@@ -0,0 +1,31 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+from django.db import transaction
+
+from pombola.south_africa.pmg_attendance import (
+    refresh_attendance, summarise_period_attendance)
+
+
+class Command(NoArgsCommand):
+
+    help = 'Fetch committee meeting attendance from the PMG API into the database'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--workers', dest='workers', type='int', default=8, help='The number of API requests to make at once'),
+        make_option('--summarise-only', dest='summarise_only', action='store_true', default=False, help="Don't fetch anything, just rebuild the MP attendance page's summaries (e.g. after ministers' positions have changed)"),
+    )
+
+    def handle_noargs(self, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        if options['summarise_only']:
+            with transaction.atomic():
+                summarise_period_attendance()
+            return
+
+        verbose = int(options['verbosity']) > 1
+        refresh = refresh_attendance(workers=options['workers'], verbose=verbose)
+        if verbose:
+            print "Attendance data is now as of {0}".format(refresh.fetched_at)
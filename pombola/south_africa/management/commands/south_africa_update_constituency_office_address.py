@@ -61,7 +61,7 @@ class Command(BaseCommand):
         else:
             # Otherwise try to geocode the address:
             try:
-                lon, lat, _ = geocode(options['new_address'])
+                lon, lat = geocode(options['new_address'])
                 print "Location found"
             except LocationNotFound:
                 raise CommandError(u"Couldn't find the location of:\n{0}".format(
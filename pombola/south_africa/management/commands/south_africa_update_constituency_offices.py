@@ -26,8 +26,8 @@ from pombola.core.models import (OrganisationKind, Organisation, Place, PlaceKin
 
 from ..helpers import (
     LocationNotFound,
-    geocode, get_na_member_lookup, get_mapit_municipality, find_pombola_person,
-    get_geocode_cache, write_geocode_cache, debug_location_change
+    geocode, geocode_all, get_na_member_lookup, get_mapit_municipality,
+    find_pombola_person, debug_location_change
 )
 
 organisation_content_type = ContentType.objects.get_for_model(Organisation)
@@ -45,7 +45,7 @@ nonexistent_phone_number = '000 000 0000'
 
 VERBOSE = False
 
-def process_office(office, commit, start_date, end_date, na_member_lookup, geocode_cache, search_office):
+def process_office(office, commit, start_date, end_date, na_member_lookup, search_office):
     print("Processing office %s" % office['Title'])
     global locationsnotfound, personnotfound
 
@@ -397,11 +397,11 @@ def process_office(office, commit, start_date, end_date, na_member_lookup, geoco
                 print 'manual'
             elif 'Location' in office:
                 reference_location = office['Location']
-                lon, lat, geocode_cache = geocode(office['Location'], geocode_cache, VERBOSE)
+                lon, lat = geocode(office['Location'], VERBOSE)
             elif 'Physical Address' in office:
                 reference_location = office['Physical Address']
                 #geocode physical address
-                lon, lat, geocode_cache = geocode(office['Physical Address'], geocode_cache, VERBOSE)
+                lon, lat = geocode(office['Physical Address'], VERBOSE)
 
             location = Point(lon, lat)
             if office['Type']=='area':
@@ -765,28 +765,27 @@ class Command(LabelCommand):
         organisations_to_keep = []
 
         na_member_lookup = get_na_member_lookup()
-        geocode_cache = get_geocode_cache()
 
-        try:
-            with open(input_filename) as fp:
-                data = json.load(fp)
-
-                for office in data['offices']:
-                    organisation = process_office(
-                        office,
-                        commit,
-                        data['start_date'],
-                        None,
-                        na_member_lookup,
-                        geocode_cache,
-                        search_office
-                    )
-                    if organisation:
-                        organisations_to_keep.append(organisation.id)
-
-
-        finally:
-            write_geocode_cache(geocode_cache)
+        with open(input_filename) as fp:
+            data = json.load(fp)
+
+        # Geocode the new addresses of all the offices at once, rather
+        # than one at a time as each office is processed:
+        geocode_all(
+            office.get('Location', office.get('Physical Address'))
+            for office in data['offices'] if 'manual_lonlat' not in office)
+
+        for office in data['offices']:
+            organisation = process_office(
+                office,
+                commit,
+                data['start_date'],
+                None,
+                na_member_lookup,
+                search_office
+            )
+            if organisation:
+                organisations_to_keep.append(organisation.id)
 
         #find the organisations to end
         if end_old_offices:
@@ -0,0 +1,11 @@
+from django.core.management.base import NoArgsCommand
+
+from pombola.south_africa.models import SectionSummary
+
+
+class Command(NoArgsCommand):
+    help = "Recalculate the speech counts and dates of every SayIt section"
+    args = ''
+
+    def handle_noargs(self, **options):
+        SectionSummary.objects.rebuild()
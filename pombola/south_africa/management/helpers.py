@@ -1,20 +1,15 @@
 from collections import defaultdict
 from difflib import SequenceMatcher
 from itertools import chain
-import json
 import math
-import os
 import re
-import requests
-import time
-import urllib
 
-from django.conf import settings
 from django.db.models import Q
 
 from mapit.models import Generation, Area, Code
 
 from pombola.core.models import Position
+from pombola.south_africa import geocoding
 
 def fix_province_name(province_name):
     if province_name == 'Kwa-Zulu Natal':
@@ -63,54 +58,41 @@ def all_initial_forms(name, squash_initials=False):
 class LocationNotFound(Exception):
     pass
 
-def geocode(address_string, geocode_cache=None, verbose=True):
-    if geocode_cache is None:
-        geocode_cache = {}
+def geocode_all(address_strings):
+    """Look up all the addresses that haven't been geocoded before at once
 
+    The lookups are made concurrently, so calling this before geocoding
+    each address in turn saves waiting for each request."""
+    geocoding.geocode_many(
+        a for a in address_strings if a and a != 'TBA')
+
+def geocode(address_string, verbose=True):
     if address_string=='TBA':
         raise LocationNotFound
 
-    # Try using Google's geocoder:
-    geocode_cache.setdefault('google', {})
-    url_template = \
-        'https://maps.googleapis.com/maps/api/geocode/json?address={address}&bounds={w},{s}|{e},{n}&key={key}'
-    url = url_template.format(
-        address=urllib.quote(address_string.encode('UTF-8')),
-        w=settings.MAP_BOUNDING_BOX_WEST,
-        s=settings.MAP_BOUNDING_BOX_SOUTH,
-        e=settings.MAP_BOUNDING_BOX_EAST,
-        n=settings.MAP_BOUNDING_BOX_NORTH,
-        key=settings.GOOGLE_MAPS_GEOCODING_API_KEY
-    )
-    if url in geocode_cache['google']:
-        result = geocode_cache['google'][url]
-    else:
-        r = requests.get(url)
-        result = r.json()
-        geocode_cache['google'][url] = result
-        time.sleep(1.5)
-    status = result['status']
-    if status in ("ZERO_RESULTS", "UNKNOWN_ERROR"):
+    # The responses are stored, so each address is only sent to the
+    # geocoder once:
+    result = geocoding.geocode_many([address_string]).get(address_string)
+    if result is None or result['status'] != "OK":
         raise LocationNotFound
-    elif status == "OK":
-        all_results = result['results']
-        if len(all_results) > 1:
-            # The ambiguous results here typically seem to be much of
-            # a muchness - one just based on the postal code, on just
-            # based on the town name, etc.  As a simple heuristic for
-            # the moment, just pick the one with the longest
-            # formatted_address:
-            all_results.sort(key=lambda r: -len(r['formatted_address']))
-            message = u"Warning: disambiguating %s to %s" % (address_string,
-                                                             all_results[0]['formatted_address'])
-            if verbose:
-                print message.encode('UTF-8')
-        # FIXME: We should really check the accuracy information here, but
-        # for the moment just use the 'location' coordinate as is:
-        geometry = all_results[0]['geometry']
-        lon = float(geometry['location']['lng'])
-        lat = float(geometry['location']['lat'])
-        return lon, lat, geocode_cache
+    all_results = result['results']
+    if len(all_results) > 1:
+        # The ambiguous results here typically seem to be much of
+        # a muchness - one just based on the postal code, on just
+        # based on the town name, etc.  As a simple heuristic for
+        # the moment, just pick the one with the longest
+        # formatted_address:
+        all_results.sort(key=lambda r: -len(r['formatted_address']))
+        message = u"Warning: disambiguating %s to %s" % (address_string,
+                                                         all_results[0]['formatted_address'])
+        if verbose:
+            print message.encode('UTF-8')
+    # FIXME: We should really check the accuracy information here, but
+    # for the moment just use the 'location' coordinate as is:
+    geometry = all_results[0]['geometry']
+    lon = float(geometry['location']['lng'])
+    lat = float(geometry['location']['lat'])
+    return lon, lat
 
 title_slugs = ('provincial-legislature-member',
                'committee-member',
@@ -245,21 +227,6 @@ def find_pombola_person(name_string, na_member_lookup, verbose=True):
             print "Failed to find a match for " + name_string.encode('utf-8')
         return None
 
-geocode_cache_filename = os.path.join(
-    os.path.dirname(__file__),
-    '.geocode-request-cache')
-
-def get_geocode_cache():
-    try:
-        with open(geocode_cache_filename) as fp:
-            return json.load(fp)
-    except IOError:
-        return {}
-
-def write_geocode_cache(geocode_cache):
-    with open(geocode_cache_filename, "w") as fp:
-        json.dump(geocode_cache, fp, indent=2)
-
 def debug_location_change(location_from, location_to):
 
     #calculate the distance between the points to
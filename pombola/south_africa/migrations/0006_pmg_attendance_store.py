@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('south_africa', '0005_create_parliamentary_terms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PMGAttendanceRefresh',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'get_latest_by': 'fetched_at',
+            },
+        ),
+        migrations.CreateModel(
+            name='PMGAttendancePeriod',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+            ],
+            options={
+                'ordering': ('-end_date',),
+            },
+        ),
+        migrations.CreateModel(
+            name='PMGMemberAttendance',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('pmg_member_id', models.IntegerField(null=True, blank=True)),
+                ('name', models.CharField(max_length=300)),
+                ('pa_url', models.CharField(max_length=300, null=True, blank=True)),
+                ('party_name', models.CharField(max_length=200, null=True, blank=True)),
+                ('period', models.ForeignKey(related_name='members', to='south_africa.PMGAttendancePeriod')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PMGMeetingAttendance',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date', models.DateField()),
+                ('attendance', models.CharField(max_length=10)),
+                ('member', models.ForeignKey(related_name='meetings', to='south_africa.PMGMemberAttendance')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PersonMeetingAttendance',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('attendance', models.CharField(max_length=10)),
+                ('meeting_date', models.DateField()),
+                ('meeting_url', models.URLField(max_length=300)),
+                ('title', models.TextField()),
+                ('committee_name', models.CharField(max_length=300)),
+                ('summary', models.TextField(blank=True)),
+                ('person', models.ForeignKey(related_name='meeting_attendances', to='core.Person')),
+            ],
+            options={
+                'ordering': ('-meeting_date', 'id'),
+            },
+        ),
+    ]
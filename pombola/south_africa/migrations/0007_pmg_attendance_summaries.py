@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('south_africa', '0006_pmg_attendance_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PMGAttendanceBucket',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('label', models.CharField(unique=True, max_length=100)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+            ],
+            options={
+                'ordering': ('-end_date',),
+            },
+        ),
+        migrations.CreateModel(
+            name='PMGAttendanceBucketParty',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(max_length=200)),
+                ('bucket', models.ForeignKey(related_name='parties', to='south_africa.PMGAttendanceBucket')),
+            ],
+            options={
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='PMGAttendanceSummary',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('party', models.CharField(max_length=200, blank=True)),
+                ('position', models.CharField(max_length=20)),
+                ('order', models.IntegerField()),
+                ('name', models.CharField(max_length=300)),
+                ('pa_url', models.CharField(max_length=300)),
+                ('party_name', models.CharField(max_length=200, null=True, blank=True)),
+                ('minister_position', models.CharField(max_length=100, blank=True)),
+                ('total', models.IntegerField()),
+                ('present', models.IntegerField()),
+                ('arrive_late', models.IntegerField()),
+                ('depart_early', models.IntegerField()),
+                ('bucket', models.ForeignKey(related_name='summaries', to='south_africa.PMGAttendanceBucket')),
+            ],
+            options={
+                'ordering': ('order',),
+            },
+        ),
+        migrations.AlterIndexTogether(
+            name='pmgattendancesummary',
+            index_together=set([('bucket', 'party', 'position')]),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def populate_section_summaries(apps, schema_editor):
+    Speech = apps.get_model('speeches', 'Speech')
+    SectionSummary = apps.get_model('south_africa', 'SectionSummary')
+
+    figures = (
+        Speech.objects
+        .filter(section__isnull=False)
+        .values(
+            'section',
+            'section__heading',
+            'section__parent',
+            'section__parent__heading',
+            'section__parent__parent',
+        )
+        .annotate(
+            first_speech_id=models.Min('id'),
+            latest_speech_date=models.Max('start_date'),
+            speech_count=models.Count('id'),
+        )
+        .order_by()
+    )
+    SectionSummary.objects.bulk_create(
+        [
+            SectionSummary(
+                section_id=f['section'],
+                heading=f['section__heading'],
+                parent_id=f['section__parent'],
+                parent_heading=f['section__parent__heading'] or '',
+                grandparent_id=f['section__parent__parent'],
+                first_speech_id=f['first_speech_id'],
+                latest_speech_date=f['latest_speech_date'],
+                speech_count=f['speech_count'],
+            )
+            for f in figures
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('speeches', '0001_initial'),
+        ('south_africa', '0007_pmg_attendance_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SectionSummary',
+            fields=[
+                ('section', models.OneToOneField(related_name='summary', primary_key=True, serialize=False, to='speeches.Section')),
+                ('heading', models.TextField(blank=True)),
+                ('parent_heading', models.TextField(blank=True)),
+                ('first_speech_id', models.IntegerField()),
+                ('latest_speech_date', models.DateField(null=True, blank=True)),
+                ('speech_count', models.IntegerField()),
+                ('grandparent', models.ForeignKey(related_name='grandchild_summaries', blank=True, to='speeches.Section', null=True)),
+                ('parent', models.ForeignKey(related_name='child_summaries', blank=True, to='speeches.Section', null=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='sectionsummary',
+            index_together=set([('parent_heading', 'latest_speech_date')]),
+        ),
+        migrations.RunPython(
+            populate_section_summaries, migrations.RunPython.noop),
+    ]
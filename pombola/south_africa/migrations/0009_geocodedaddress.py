@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('south_africa', '0008_sectionsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedAddress',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('provider', models.CharField(max_length=50)),
+                ('bounds', models.CharField(max_length=100)),
+                ('address', models.TextField()),
+                ('response', models.TextField()),
+                ('geocoded_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='geocodedaddress',
+            unique_together=set([('provider', 'bounds', 'address')]),
+        ),
+    ]
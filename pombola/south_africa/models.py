@@ -1,12 +1,28 @@
-from django.db import models
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_init, post_save
 
-from pombola.core.models import Place, Position, Organisation
+from pombola.core import cache_versions
+from pombola.core.models import (
+    InformationSource, Place, Person, Position, Organisation)
+from pombola.interests_register.models import (
+    Category, Entry, EntryLineItem, Release)
+
+from speeches.models import Section, Speech
+
+from pombola.south_africa.house_composition import (
+    invalidate_for_position as invalidate_house_composition,
+    record_position_organisation)
 
 class ZAPlace(Place):
     class Meta:
         proxy = True
 
     def postal_addresses(self):
+        # Use the address contacts if they've been prefetched (as the
+        # lat/lon view does) rather than running a query per office:
+        if hasattr(self.organisation, 'address_contacts'):
+            return self.organisation.address_contacts
         return self.organisation.contacts.filter(kind__slug='address')
 
     def related_positions(self):
@@ -47,4 +63,283 @@ class ParliamentaryTerm(models.Model):
         return cls.objects.\
             filter(start_date__lte=d).filter(end_date__gte=d).get()
 
-    
\ No newline at end of file
+
+class PMGAttendanceRefresh(models.Model):
+    """A completed refresh of the committee meeting attendance data from
+    the PMG API; the most recent one says how up to date the stored
+    attendance is."""
+    fetched_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        get_latest_by = 'fetched_at'
+
+    @classmethod
+    def latest_fetched_at(cls):
+        """Return when the stored attendance was fetched, or None if it
+        has never been"""
+        try:
+            return cls.objects.latest().fetched_at
+        except cls.DoesNotExist:
+            return None
+
+
+class PMGAttendancePeriod(models.Model):
+    """One of the periods (usually a year) that PMG's meetings-by-member
+    attendance API groups its records into"""
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    class Meta:
+        ordering = ('-end_date',)
+
+    @classmethod
+    def as_api_results(cls):
+        """Return the stored attendance in the form that the
+        meetings-by-member API returns it: a list of periods, most recent
+        first, each with the meetings of every member during it."""
+        members = PMGMemberAttendance.objects.order_by('id').prefetch_related(
+            models.Prefetch(
+                'meetings',
+                queryset=PMGMeetingAttendance.objects.order_by('date', 'id')))
+        periods = cls.objects.prefetch_related(
+            models.Prefetch('members', queryset=members))
+        return [
+            {
+                'start_date': period.start_date.isoformat(),
+                'end_date': period.end_date.isoformat(),
+                'meetings_by_member': [
+                    member.as_api_result() for member in period.members.all()],
+            }
+            for period in periods
+        ]
+
+
+class PMGMemberAttendance(models.Model):
+    """The meetings a member was recorded at during a PMGAttendancePeriod"""
+    period = models.ForeignKey(PMGAttendancePeriod, related_name='members')
+    pmg_member_id = models.IntegerField(null=True, blank=True)
+    name = models.CharField(max_length=300)
+    pa_url = models.CharField(max_length=300, null=True, blank=True)
+    party_name = models.CharField(max_length=200, null=True, blank=True)
+
+    def as_api_result(self):
+        return {
+            'member': {
+                'id': self.pmg_member_id,
+                'name': self.name,
+                'pa_url': self.pa_url,
+                'party_name': self.party_name,
+            },
+            'meetings': [
+                {'date': meeting.date.isoformat(), 'attendance': meeting.attendance}
+                for meeting in self.meetings.all()
+            ],
+        }
+
+
+class PMGMeetingAttendance(models.Model):
+    member = models.ForeignKey(PMGMemberAttendance, related_name='meetings')
+    date = models.DateField()
+    attendance = models.CharField(max_length=10)
+
+
+class PersonMeetingAttendance(models.Model):
+    """A person's attendance at a committee meeting, from PMG's
+    per-member attendance API"""
+    person = models.ForeignKey(Person, related_name='meeting_attendances')
+    attendance = models.CharField(max_length=10)
+    meeting_date = models.DateField()
+    meeting_url = models.URLField(max_length=300)
+    title = models.TextField()
+    committee_name = models.CharField(max_length=300)
+    summary = models.TextField(blank=True)
+
+    class Meta:
+        # The order of the records from the API, most recent first
+        ordering = ('-meeting_date', 'id')
+
+
+class PMGAttendanceBucket(models.Model):
+    """One of the periods that can be chosen on the MP attendance page:
+    a PMGAttendancePeriod, or half of one for the 2019 election year"""
+    label = models.CharField(max_length=100, unique=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    class Meta:
+        ordering = ('-end_date',)
+
+
+class PMGAttendanceBucketParty(models.Model):
+    """A party that members had attendance recorded for in a bucket"""
+    bucket = models.ForeignKey(PMGAttendanceBucket, related_name='parties')
+    name = models.CharField(max_length=200)
+
+    class Meta:
+        ordering = ('name',)
+
+
+class PMGAttendanceSummary(models.Model):
+    """A member's tallied attendance for a row of the MP attendance page
+
+    There's a set of rows for each bucket, party (blank for all parties)
+    and position ('mps' or 'ministers') that can be chosen on the page;
+    these are rebuilt whenever the attendance is refreshed."""
+    bucket = models.ForeignKey(PMGAttendanceBucket, related_name='summaries')
+    party = models.CharField(max_length=200, blank=True)
+    position = models.CharField(max_length=20)
+    order = models.IntegerField()
+
+    name = models.CharField(max_length=300)
+    pa_url = models.CharField(max_length=300)
+    party_name = models.CharField(max_length=200, null=True, blank=True)
+    minister_position = models.CharField(max_length=100, blank=True)
+
+    total = models.IntegerField()
+    present = models.IntegerField()
+    arrive_late = models.IntegerField()
+    depart_early = models.IntegerField()
+
+    class Meta:
+        ordering = ('order',)
+        index_together = ('bucket', 'party', 'position')
+
+
+class SectionSummaryManager(models.Manager):
+    def summaries_for_speeches(self, speeches):
+        """Return unsaved summaries of the sections of speeches"""
+        figures = (
+            speeches
+            .filter(section__isnull=False)
+            .values(
+                'section',
+                'section__heading',
+                'section__parent',
+                'section__parent__heading',
+                'section__parent__parent',
+            )
+            .annotate(
+                first_speech_id=models.Min('id'),
+                latest_speech_date=models.Max('start_date'),
+                speech_count=models.Count('id'),
+            )
+            .order_by()
+        )
+        return [
+            self.model(
+                section_id=f['section'],
+                heading=f['section__heading'],
+                parent_id=f['section__parent'],
+                parent_heading=f['section__parent__heading'] or '',
+                grandparent_id=f['section__parent__parent'],
+                first_speech_id=f['first_speech_id'],
+                latest_speech_date=f['latest_speech_date'],
+                speech_count=f['speech_count'],
+            )
+            for f in figures
+        ]
+
+    def update_for_sections(self, section_ids):
+        """Recalculate the summaries of the sections with the given IDs"""
+        section_ids = set(section_ids)
+        if not section_ids:
+            return
+        with transaction.atomic():
+            self.filter(section__in=section_ids).delete()
+            self.bulk_create(
+                self.summaries_for_speeches(
+                    Speech.objects.filter(section__in=section_ids)),
+                batch_size=1000,
+            )
+
+    def update_for_tree(self, section):
+        """Recalculate the summaries of section and every section below it"""
+        section_ids = [section.id]
+        level = [section.id]
+        while level:
+            level = list(
+                Section.objects.filter(parent__in=level).values_list('id', flat=True))
+            section_ids.extend(level)
+        self.update_for_sections(section_ids)
+
+    def rebuild(self):
+        """Recalculate the summaries of every section"""
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                self.summaries_for_speeches(Speech.objects.all()),
+                batch_size=1000,
+            )
+
+
+class SectionSummary(models.Model):
+    """Figures about the speeches directly in a SayIt section
+
+    The Hansard and Committee Minutes indexes list sections by these
+    rather than aggregating over all the speeches on each request. They
+    are kept up to date by the za_hansard importers, and can be rebuilt
+    with south_africa_update_section_summaries."""
+    section = models.OneToOneField(
+        Section, primary_key=True, related_name='summary')
+    heading = models.TextField(blank=True)
+    parent = models.ForeignKey(
+        Section, null=True, blank=True, related_name='child_summaries')
+    parent_heading = models.TextField(blank=True)
+    grandparent = models.ForeignKey(
+        Section, null=True, blank=True, related_name='grandchild_summaries')
+
+    first_speech_id = models.IntegerField()
+    latest_speech_date = models.DateField(null=True, blank=True)
+    speech_count = models.IntegerField()
+
+    objects = SectionSummaryManager()
+
+    class Meta:
+        index_together = ('parent_heading', 'latest_speech_date')
+
+
+class GeocodedAddress(models.Model):
+    """A geocoder's response for an address, looked up within bounds
+
+    The constituency office importers only ask the geocoder about an
+    address that isn't here yet; see pombola.south_africa.geocoding."""
+    provider = models.CharField(max_length=50)
+    # The bounds ('west,south|east,north') that results were biased to:
+    bounds = models.CharField(max_length=100)
+    # The address, normalised with geocoding.normalise_address:
+    address = models.TextField()
+    # The response as JSON:
+    response = models.TextField()
+    geocoded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('provider', 'bounds', 'address')
+
+
+def interests_register_version():
+    """The version that the cached members' interests tables are stored
+    under, which invalidate_interests_register_cache changes"""
+    return cache_versions.get_versions(
+        caches['interests_register'], 'sa-interests-version-', ['register'])[0]
+
+
+def invalidate_interests_register_cache(sender, **kwargs):
+    """Stop using the members' interests tables when the register, the
+    people in it, or the positions that the tables are filtered by party
+    with, change"""
+    if kwargs.get('raw'):
+        return
+    if sender is InformationSource and \
+            kwargs['instance'].content_type.model_class() is not Release:
+        return
+    cache_versions.invalidate(
+        caches['interests_register'], 'sa-interests-version-', 'register')
+
+for interests_model in (
+        Category, Entry, EntryLineItem, Release, InformationSource, Position, Person):
+    post_save.connect(invalidate_interests_register_cache, sender=interests_model)
+    post_delete.connect(invalidate_interests_register_cache, sender=interests_model)
+
+post_init.connect(record_position_organisation, sender=Position)
+post_save.connect(invalidate_house_composition, sender=Position)
+post_delete.connect(invalidate_house_composition, sender=Position)
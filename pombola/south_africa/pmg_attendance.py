@@ -0,0 +1,508 @@
+"""Fetch committee meeting attendance from the PMG API into the local store
+
+The attendance pages only read the PMG* models and PersonMeetingAttendance;
+refresh_attendance (run by the south_africa_refresh_pmg_attendance command)
+is the only thing that talks to the API.  When the meetings-by-member
+attendance is replaced it's also tallied into the rows of the MP
+attendance page, so that page doesn't depend on how many meetings there
+have been.
+"""
+
+from __future__ import division
+
+from collections import defaultdict
+from multiprocessing.pool import ThreadPool
+import datetime
+import logging
+import math
+import re
+import urllib
+from urlparse import parse_qs, urlsplit, urlunsplit
+
+import dateutil.parser
+import requests
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from pombola.core.models import Identifier, Person, Position
+from pombola.south_africa.models import (
+    PersonMeetingAttendance, PMGAttendanceBucket, PMGAttendanceBucketParty,
+    PMGAttendancePeriod, PMGAttendanceRefresh, PMGAttendanceSummary,
+    PMGMeetingAttendance, PMGMemberAttendance)
+
+logger = logging.getLogger(__name__)
+
+PMG_MEMBER_SCHEME = 'za.org.pmg.api/member'
+
+MEETINGS_BY_MEMBER_URL = \
+    'https://api.pmg.org.za/committee-meeting-attendance/meetings-by-member/'
+MEMBER_ATTENDANCE_URL = 'https://api.pmg.org.za/member/{}/attendance/'
+MEETING_URL = 'https://pmg.org.za/committee-meeting/{}/'
+API_MEETING_PATH_RE = re.compile(r'/committee-meeting/(\d+)/')
+
+#  A:   Absent
+#  AP:  Absent with Apologies
+#  DE:  Departed Early
+#  L:   Arrived Late
+#  LDE: Arrived Late and Departed Early
+#  P:   Present
+PRESENT_CODES = ('P', 'L', 'LDE', 'DE')
+ARRIVE_LATE_CODES = ('L', 'LDE')
+DEPART_EARLY_CODES = ('DE', 'LDE')
+
+POST_ELECTION_2019 = '2019 - post elections'
+
+# Nobody is waiting on these requests, so they can be given longer than
+# the API requests made while rendering a page.
+REQUEST_TIMEOUT = 30
+
+
+def fetch_json(url):
+    response = requests.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def page_url(url, page):
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    query['page'] = [page]
+    return urlunsplit(parts._replace(query=urllib.urlencode(query, doseq=True)))
+
+
+def fetch_all_pages(url, pool=None):
+    """Return the results from every page of a paginated PMG API endpoint
+
+    The first page gives the total count and the URL of the next page,
+    from which the URLs of all the remaining pages can be worked out.  If
+    a pool is given they're fetched concurrently in it; otherwise (or if
+    the pages can't be numbered) the 'next' links are followed in turn."""
+    data = fetch_json(url)
+    results = list(data['results'])
+    next_url = data.get('next')
+    next_page = parse_qs(urlsplit(next_url).query).get('page') if next_url else None
+
+    if pool and next_page and data.get('count') and results:
+        first_page = int(next_page[0])
+        page_count = int(math.ceil(data['count'] / len(results)))
+        urls = [
+            page_url(next_url, page)
+            for page in range(first_page, first_page + page_count - 1)
+        ]
+        for page_data in pool.map(fetch_json, urls):
+            results.extend(page_data['results'])
+        return results
+
+    while next_url:
+        data = fetch_json(next_url)
+        results.extend(data['results'])
+        next_url = data.get('next')
+    return results
+
+
+def slug_from_pa_url(pa_url):
+    return pa_url.rstrip('/').split('/')[-1]
+
+
+def pmg_member_ids_by_person(periods):
+    """Return a dict mapping the IDs of people to their PMG member IDs
+
+    As well as the people who already have an identifier in the PMG
+    member scheme, this includes anyone whose PA URL is given for a
+    member in the meetings-by-member results but who has no such
+    identifier yet."""
+    existing = dict(
+        (object_id, identifier)
+        for object_id, identifier in Identifier.objects.filter(
+            scheme=PMG_MEMBER_SCHEME,
+            content_type=ContentType.objects.get_for_model(Person),
+        ).values_list('object_id', 'identifier')
+    )
+    known_member_ids = set(existing.values())
+
+    member_ids_by_slug = {}
+    for period in periods:
+        for record in period['meetings_by_member']:
+            member = record['member']
+            if member.get('pa_url') and member.get('id') is not None:
+                member_id = str(member['id'])
+                if member_id not in known_member_ids:
+                    member_ids_by_slug[slug_from_pa_url(member['pa_url'])] = member_id
+
+    result = dict(existing)
+    for person_id, slug in Person.objects.filter(
+            slug__in=member_ids_by_slug.keys()).values_list('id', 'slug'):
+        result.setdefault(person_id, member_ids_by_slug[slug])
+    return result
+
+
+def fetch_member_attendance(pmg_member_id):
+    """Return all the attendance records of a PMG member, or None if they
+    couldn't be fetched"""
+    url = MEMBER_ATTENDANCE_URL.format(pmg_member_id)
+    try:
+        return fetch_all_pages(url)
+    except (requests.exceptions.RequestException, ValueError, KeyError):
+        logger.exception("Fetching attendance from %s failed", url)
+        return None
+
+
+def replace_period_attendance(periods):
+    """Replace the stored meetings-by-member attendance with periods, which
+    are in the form the API returns them, and rebuild its summaries"""
+    PMGMeetingAttendance.objects.all().delete()
+    PMGMemberAttendance.objects.all().delete()
+    PMGAttendancePeriod.objects.all().delete()
+
+    meetings = []
+    for period_data in periods:
+        period = PMGAttendancePeriod.objects.create(
+            start_date=period_data['start_date'],
+            end_date=period_data['end_date'],
+        )
+        for record in period_data['meetings_by_member']:
+            member_data = record['member']
+            member = PMGMemberAttendance.objects.create(
+                period=period,
+                pmg_member_id=member_data.get('id'),
+                name=member_data['name'],
+                pa_url=member_data.get('pa_url'),
+                party_name=member_data.get('party_name'),
+            )
+            meetings.extend(
+                PMGMeetingAttendance(
+                    member=member,
+                    date=meeting['date'],
+                    attendance=meeting['attendance'],
+                )
+                for meeting in record['meetings']
+            )
+    PMGMeetingAttendance.objects.bulk_create(meetings, batch_size=1000)
+
+    summarise_period_attendance()
+
+
+def minister_or_deputy_for_position_slug(position_slug):
+    if position_slug.startswith('minister'):
+        return 'minister'
+    if position_slug.startswith('deputy-minister'):
+        return 'deputy-minister'
+    return ''
+
+
+def build_minister_zero_attendance(minister, position):
+    """
+    Return a record in the same format as the PMG API data for ministers with
+    no attendance records. These records should be populated with zero.
+    """
+    initials = "".join(name[0].upper() for name in minister.given_name.split())
+    minister_name = " ".join("{}, {} {}".format(
+        minister.family_name, minister.title, initials).split())
+
+    parties = minister.parties()
+    party_name = parties[0].slug.upper() if parties else ""
+
+    return {'member': {
+                'name': minister_name,
+                'position': minister_or_deputy_for_position_slug(position),
+                'pa_url': minister.get_absolute_url(),
+                'party_name': party_name},
+            'meetings': None}
+
+
+def divide_pre_and_post_election_records(meetings_by_member):
+    # Pre-election: 01/01/2019 - 30/06/2019
+    # Post-election: 01/07/2019 - 31/12/2019
+
+    pre_election_meetings_by_member, post_election_meetings_by_member = [[], []]
+
+    for record in meetings_by_member:
+        member_pre_election_meetings, member_post_election_meetings = [[], []]
+        for meeting in record['meetings']:
+            if datetime.datetime.strptime(meeting['date'], "%Y-%m-%d").month > 6:
+                member_post_election_meetings.append(meeting)
+            else:
+                member_pre_election_meetings.append(meeting)
+        if member_pre_election_meetings:
+            pre_election_meetings_by_member.append({
+                'member': record['member'],
+                'meetings': member_pre_election_meetings})
+        if member_post_election_meetings:
+            post_election_meetings_by_member.append({
+                'member': record['member'],
+                'meetings': member_post_election_meetings})
+
+    return pre_election_meetings_by_member, post_election_meetings_by_member
+
+
+def filter_attendance(annual_attendance, ctx_party, ctx_pos):
+    """
+    Filter meeting attendance to only include items which match
+    the party and position that can be selected on the MP attendance page.
+
+    `ctx_party`, `ctx_pos` are the party and position parameters that the
+    page would be sent by the client.
+    """
+
+    attendance_records = annual_attendance['meetings_by_member']
+    if ctx_party:
+        attendance_records = [ma for ma in attendance_records if
+            ma['member']['party_name'] == ctx_party]
+
+    year = datetime.datetime.strptime(annual_attendance['end_date'], "%Y-%m-%d").year
+
+    if year == 2019:
+        # 2019 is divided into pre- and post-election records
+        start_date = datetime.datetime.strptime(annual_attendance['start_date'], "%Y-%m-%d")
+        end_date = datetime.datetime.strptime(annual_attendance['end_date'], "%Y-%m-%d")
+
+        active_minister_positions = Position.objects \
+        .title_slug_prefixes(['minister', 'deputy-minister']) \
+        .overlapping_dates(start_date, end_date) \
+        .select_related('person') \
+        .order_by('person', 'start_date')
+
+    else:
+        # Sorted by person, then start date so the latest position is last for a person
+        # when iterating over the list.
+        active_minister_positions = Position.objects \
+            .title_slug_prefixes(['minister', 'deputy-minister']) \
+            .active_during_year(year) \
+            .select_related('person') \
+            .order_by('person', 'start_date')
+
+    ministers = defaultdict(list)
+    for position in active_minister_positions:
+        ministers[position.person.slug].append(position)
+
+    minister_slugs = ministers.keys()
+
+    minister_attendance = []
+    mp_attendance = []
+
+    for record in attendance_records:
+        # Split records between MP and Minister attendance
+        attendance_as_minister = []
+        attendance_as_mp = []
+
+        if record['member']['pa_url']:
+            # We cannot determine a position if no `pa_url` was returned. Ignore these records.
+            slug = record['member']['pa_url'].split('/')[-2]
+
+            if slug in minister_slugs:
+                # This member was a minister during the year
+                positions = ministers[slug]
+                for meeting in record['meetings']:
+                    # Check the member position at each meeting date.
+                    minister_at_date = False
+                    for position in positions:
+                    # A member can have more than one active ministerial position in a year
+                        if position.is_active_at_date(meeting['date']):
+                            minister_at_date = True
+                            record['member']['position'] = minister_or_deputy_for_position_slug(position.title.slug)
+
+                    if minister_at_date:
+                        attendance_as_minister.append(meeting)
+                    else:
+                        attendance_as_mp.append(meeting)
+
+                # Member can be a Minister and an MP during the year
+                if attendance_as_minister:
+                    minister_attendance.append({'member': record['member'], 'meetings': attendance_as_minister})
+                    # Only remove if slug if minister attendance was added.
+                    # If not, retain, as zero attendance zero attendance entry needs to be added.
+                    minister_slugs.remove(slug)
+
+                if attendance_as_mp:
+                    mp_attendance.append({'member': record['member'], 'meetings': attendance_as_mp})
+
+            else:
+                # Member wasn't a minister during the year. All attendance as MP.
+                mp_attendance.append(record)
+
+    if ctx_pos == 'ministers':
+        # Ministers remaining in `minister_slugs` had no attendance records returned
+        # Create a record for each.
+        for slug in minister_slugs:
+            minister = ministers[slug][0].person
+            position = ministers[slug][-1].title.slug
+            if ctx_party and not minister.parties():
+                # Some previous ministers are no longer a member of a party.
+                # Don't display them when a party is selected, but do when all parties are shown.
+                continue
+            if ctx_party and minister.parties() and minister.parties()[0].slug.upper() != ctx_party:
+                # Don't show ministers who aren't currently members of the party selected.
+                continue
+            else:
+                minister_attendance.append(build_minister_zero_attendance(minister, position))
+
+        return minister_attendance
+
+    return mp_attendance
+
+
+def get_attendance_summary(attendance):
+    """Return the tallied attendance records"""
+    attendance_summary = []
+    for record in attendance:
+        attendance_count = {}
+        if not record['meetings']:
+            # Ministers with no attendance records. Show zero attendance.
+            attendance_summary.append({'member': record['member'], 'attendance': {'P': 0}})
+        else:
+            for meeting in record['meetings']:
+                attendance_count.setdefault(meeting['attendance'], 0)
+                attendance_count[meeting['attendance']] += 1
+
+            attendance_summary.append({'member': record['member'], 'attendance': attendance_count})
+
+    return attendance_summary
+
+
+def attendance_buckets(periods):
+    """Yield a (label, annual attendance) pair for each period that can be
+    chosen on the MP attendance page, most recent first
+
+    2019 is divided into pre- and post-election records, which are
+    offered as separate choices."""
+    for annual_attendance in periods:
+        year = datetime.datetime.strptime(annual_attendance['end_date'], "%Y-%m-%d").year
+        if year == 2019:
+            attendance_pre_election, attendance_post_election = (
+                divide_pre_and_post_election_records(annual_attendance['meetings_by_member']))
+            yield POST_ELECTION_2019, {
+                'start_date': '2019-07-01',
+                'end_date': '2019-12-31',
+                'meetings_by_member': attendance_post_election}
+            yield '2019', {
+                'start_date': '2019-01-01',
+                'end_date': '2019-06-30',
+                'meetings_by_member': attendance_pre_election}
+        else:
+            yield str(year), annual_attendance
+
+
+def summarise_period_attendance():
+    """Rebuild the rows of the MP attendance page from the stored
+    meetings-by-member attendance
+
+    Each member's attendance is tallied for every period, party and
+    position that can be chosen on the page, so that showing it is just
+    a lookup."""
+    PMGAttendanceSummary.objects.all().delete()
+    PMGAttendanceBucketParty.objects.all().delete()
+    PMGAttendanceBucket.objects.all().delete()
+
+    summaries = []
+    for label, annual_attendance in attendance_buckets(PMGAttendancePeriod.as_api_results()):
+        bucket = PMGAttendanceBucket.objects.create(
+            label=label,
+            start_date=annual_attendance['start_date'],
+            end_date=annual_attendance['end_date'],
+        )
+
+        parties = set(ma['member']['party_name'] for
+            ma in annual_attendance['meetings_by_member'])
+        parties.discard(None)
+        PMGAttendanceBucketParty.objects.bulk_create(
+            PMGAttendanceBucketParty(bucket=bucket, name=party)
+            for party in sorted(parties)
+        )
+
+        for party in [''] + sorted(parties):
+            for position in ('mps', 'ministers'):
+                attendance = filter_attendance(annual_attendance, party, position)
+                for order, summary in enumerate(get_attendance_summary(attendance)):
+                    counts = summary['attendance']
+                    summaries.append(PMGAttendanceSummary(
+                        bucket=bucket,
+                        party=party,
+                        position=position,
+                        order=order,
+                        name=summary['member']['name'],
+                        pa_url=urlsplit(summary['member']['pa_url']).path,
+                        party_name=summary['member']['party_name'],
+                        minister_position=(
+                            summary['member'].get('position', '')
+                            if position == 'ministers' else ''),
+                        total=sum(counts.itervalues()),
+                        present=sum(
+                            v for k, v in counts.iteritems() if k in PRESENT_CODES),
+                        arrive_late=sum(
+                            v for k, v in counts.iteritems() if k in ARRIVE_LATE_CODES),
+                        depart_early=sum(
+                            v for k, v in counts.iteritems() if k in DEPART_EARLY_CODES),
+                    ))
+
+    PMGAttendanceSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+def replace_person_attendance(person_id, results):
+    """Replace the stored attendance of a person with results from the
+    per-member attendance API, keeping the API's order"""
+    PersonMeetingAttendance.objects.filter(person_id=person_id).delete()
+
+    records = []
+    for record in results:
+        meeting = record['meeting']
+        meeting_id = API_MEETING_PATH_RE.search(
+            urlsplit(meeting['url']).path).group(1)
+        records.append(PersonMeetingAttendance(
+            person_id=person_id,
+            attendance=record['attendance'],
+            meeting_date=dateutil.parser.parse(meeting['date']).date(),
+            meeting_url=MEETING_URL.format(meeting_id),
+            title=meeting['title'],
+            committee_name=meeting['committee']['name'],
+            summary=meeting.get('summary') or '',
+        ))
+    PersonMeetingAttendance.objects.bulk_create(records, batch_size=1000)
+
+
+def refresh_attendance(workers=8, verbose=False):
+    """Fetch all the attendance data from the PMG API and replace the
+    stored copy with it
+
+    Everything is fetched before anything is written, and then written in
+    one transaction, so the pages go on showing the previous data (and
+    its date) until the new data is complete.  A member whose attendance
+    can't be fetched keeps their previously stored records."""
+    fetched_at = timezone.now()
+    pool = ThreadPool(workers)
+    try:
+        periods = fetch_all_pages(MEETINGS_BY_MEMBER_URL, pool)
+        if verbose:
+            print "Fetched {0} periods of meetings by member".format(len(periods))
+
+        member_ids = pmg_member_ids_by_person(periods)
+        person_ids = member_ids.keys()
+        attendance = pool.map(
+            fetch_member_attendance,
+            [member_ids[person_id] for person_id in person_ids])
+    finally:
+        pool.close()
+        pool.join()
+
+    if verbose:
+        print "Fetched the attendance of {0} of {1} members".format(
+            sum(1 for results in attendance if results is not None),
+            len(person_ids))
+
+    person_content_type = ContentType.objects.get_for_model(Person)
+
+    with transaction.atomic():
+        replace_period_attendance(periods)
+
+        for person_id, results in zip(person_ids, attendance):
+            Identifier.objects.get_or_create(
+                scheme=PMG_MEMBER_SCHEME,
+                content_type=person_content_type,
+                object_id=person_id,
+                defaults={'identifier': member_ids[person_id]},
+            )
+            if results is not None:
+                replace_person_attendance(person_id, results)
+
+        return PMGAttendanceRefresh.objects.create(fetched_at=fetched_at)
@@ -7,7 +7,7 @@ from pombola.search import search_indexes
 class SAPlaceIndex(search_indexes.PlaceIndex):
 
     def index_queryset(self, **kwargs):
-        return self.get_model().objects. \
+        return super(SAPlaceIndex, self).index_queryset(**kwargs). \
             exclude(kind__slug__in=('constituency-office', 'wards'))
 
 # We use our own index of speeches in SayIt since we want to add tags
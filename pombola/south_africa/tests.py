@@ -9,6 +9,7 @@ from collections import OrderedDict
 from datetime import datetime
 
 import requests
+import requests_mock
 
 from mock import patch, MagicMock
 
@@ -21,6 +22,7 @@ from django.test.utils import override_settings
 from django.core.cache import caches
 
 from django.core.urlresolvers import reverse, resolve
+from django.utils import timezone
 from django.core.management import call_command
 from django_date_extensions.fields import ApproximateDate
 from django_webtest import WebTest
@@ -37,8 +39,16 @@ from info.models import InfoPage
 
 from pombola.core import models
 from pombola import south_africa
+from pombola.south_africa import geocoding, house_composition
 from pombola.south_africa.views import SAPersonDetail
-from pombola.south_africa.models import ParliamentaryTerm
+from pombola.south_africa.management.helpers import (
+    LocationNotFound, geocode)
+from pombola.south_africa.models import (
+    GeocodedAddress, ParliamentaryTerm, PersonMeetingAttendance, PMGAttendanceBucket,
+    PMGAttendancePeriod, PMGAttendanceRefresh, PMGAttendanceSummary,
+    PMGMemberAttendance, SectionSummary)
+from pombola.south_africa.pmg_attendance import (
+    replace_period_attendance, replace_person_attendance)
 from pombola.core.views import PersonSpeakerMappingsMixin
 from instances.models import Instance
 from pombola.interests_register.models import Category, Release, Entry, EntryLineItem
@@ -48,8 +58,8 @@ from pombola.za_hansard.models import Source
 from nose.plugins.attrib import attr
 from pygeolib import GeocoderError
 
-def fake_constituency_office_geocode(address_string, geocode_cache=None, verbose=True):
-    return 18.424, -33.925, {}
+def fake_constituency_office_geocode(address_string, verbose=True):
+    return 18.424, -33.925
 
 def fake_geocoder(country, q, decimal_places=3):
     if q == 'anywhere':
@@ -89,7 +99,7 @@ class HomeViewTest(TestCase):
 class ConstituencyOfficesImportTestCase(WebTest):
     def setUp(self):
         # Geocode needs to return
-        # return lon, lat, geocode_cache
+        # return lon, lat
         kind = models.OrganisationKind.objects.create(
             slug='party',
             name='Party'
@@ -213,6 +223,71 @@ class ConstituencyOfficesImportTestCase(WebTest):
         self.assertTrue(models.Person.objects.filter(Q(legal_name="Sonja Boshoff")).exists())
 
 
+class CountingGeocoder(geocoding.StubGeocoder):
+    def __init__(self, locations, statuses=None):
+        super(CountingGeocoder, self).__init__(locations)
+        self.statuses = statuses or {}
+        self.requested = []
+
+    def request(self, address, bounds):
+        self.requested.append(address)
+        if address in self.statuses:
+            return {'status': self.statuses[address], 'results': []}
+        return super(CountingGeocoder, self).request(address, bounds)
+
+
+@attr(country='south_africa')
+class GeocodingTest(TestCase):
+    def setUp(self):
+        self.geocoder = CountingGeocoder(
+            {'12 Long Street, Cape Town': (18.419, -33.921)},
+            statuses={'Somewhere busy': 'OVER_QUERY_LIMIT'},
+        )
+
+    def test_responses_stored_and_reused(self):
+        results = geocoding.geocode_many(
+            ['12 Long Street, Cape Town', 'Nowhere'], self.geocoder)
+        self.assertEqual(results['12 Long Street, Cape Town']['status'], 'OK')
+        self.assertEqual(results['Nowhere']['status'], 'ZERO_RESULTS')
+        self.assertEqual(
+            sorted(self.geocoder.requested),
+            ['12 Long Street, Cape Town', 'Nowhere'])
+        self.assertEqual(GeocodedAddress.objects.count(), 2)
+
+        # Different spacing or case is the same address:
+        results = geocoding.geocode_many(
+            ['12  long street, Cape Town ', 'Nowhere'], self.geocoder)
+        self.assertEqual(
+            results['12  long street, Cape Town ']['results'][0]
+            ['geometry']['location'],
+            {'lat': -33.921, 'lng': 18.419})
+        self.assertEqual(len(self.geocoder.requested), 2)
+
+    def test_transient_errors_not_stored(self):
+        for i in range(2):
+            results = geocoding.geocode_many(['Somewhere busy'], self.geocoder)
+            self.assertEqual(
+                results['Somewhere busy']['status'], 'OVER_QUERY_LIMIT')
+        self.assertEqual(len(self.geocoder.requested), 2)
+        self.assertFalse(GeocodedAddress.objects.exists())
+
+    def test_bounds_are_part_of_the_key(self):
+        geocoding.geocode_many(['Nowhere'], self.geocoder, bounds='1,2|3,4')
+        geocoding.geocode_many(['Nowhere'], self.geocoder, bounds='5,6|7,8')
+        self.assertEqual(len(self.geocoder.requested), 2)
+
+    @override_settings(GEOCODING_STUB_LOCATIONS={
+        '12 Long Street, Cape Town': (18.419, -33.921)})
+    def test_geocode_with_stub_provider(self):
+        self.assertEqual(
+            geocode('12 Long Street, Cape Town', verbose=False),
+            (18.419, -33.921))
+        with self.assertRaises(LocationNotFound):
+            geocode('Nowhere', verbose=False)
+        with self.assertRaises(LocationNotFound):
+            geocode('TBA', verbose=False)
+
+
 @attr(country='south_africa')
 class ConstituencyOfficesTestCase(WebTest):
     def setUp(self):
@@ -335,10 +410,52 @@ class ConstituencyOfficesTestCase(WebTest):
 
 @attr(country='south_africa')
 class LatLonDetailViewTest(TestCase):
+    def setUp(self):
+        caches['ward_lookup'].clear()
+
     def test_404_for_incorrect_province_lat_lon(self):
         res = self.client.get(reverse('latlon', kwargs={'lat': '0', 'lon': '0'}))
         self.assertEquals(404, res.status_code)
 
+    @patch('pombola.south_africa.views.geolocalization.requests')
+    def test_ward_lookups_are_cached(self, mock_requests):
+        from pombola.south_africa.views.geolocalization import (
+            fetch_ward_and_councillor)
+
+        mapit_response = MagicMock()
+        mapit_response.json.return_value = {
+            '4321': {'id': 4321, 'type_name': 'Ward', 'codes': {'MDB': '19100057'}},
+            '1234': {'id': 1234, 'type_name': 'Municipality', 'codes': {'MDB': 'CPT'}},
+        }
+        councillor_response = MagicMock()
+        councillor_response.json.return_value = {'councillor': {'Name': 'Jane'}}
+        mock_requests.get.side_effect = [mapit_response, councillor_response]
+
+        expected = (
+            {'ward_id': '19100057', 'muni_id': 'CPT', 'ward_mapit_area_id': 4321},
+            {'councillor': {'Name': 'Jane'}},
+        )
+        self.assertEqual(
+            fetch_ward_and_councillor(Point(18.423221, -33.925201)), expected)
+        # A nearby point rounds to the same coordinates, so the cached
+        # results are used without any more requests:
+        self.assertEqual(
+            fetch_ward_and_councillor(Point(18.42321, -33.92519)), expected)
+        self.assertEqual(mock_requests.get.call_count, 2)
+
+    @patch('pombola.south_africa.views.geolocalization.requests')
+    def test_no_ward_is_cached(self, mock_requests):
+        from pombola.south_africa.views.geolocalization import (
+            fetch_ward_and_councillor)
+
+        mapit_response = MagicMock()
+        mapit_response.json.return_value = {}
+        mock_requests.get.return_value = mapit_response
+
+        self.assertIsNone(fetch_ward_and_councillor(Point(0, 0)))
+        self.assertIsNone(fetch_ward_and_councillor(Point(0, 0)))
+        self.assertEqual(mock_requests.get.call_count, 1)
+
 
 @attr(country='south_africa')
 class SASearchViewTest(WebTest):
@@ -479,14 +596,6 @@ class SAPersonDetailViewTest(PersonSpeakerMappingsMixin, TestCase):
         # Make sure there are SayIt speakers for all Pombola
         call_command('pombola_sayit_sync_pombola_to_popolo')
 
-        # Put blank attendance data in the cache to stop us fetching from
-        # the live PMG API
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.set(
-            "https://api.pmg.org.za/member/moomin-finn/attendance/",
-            [],
-            )
-
     def _setup_positions_test_data(self):
         parliament = models.OrganisationKind.objects.create(
             name='Parliament',
@@ -674,14 +783,13 @@ class SAPersonDetailViewTest(PersonSpeakerMappingsMixin, TestCase):
         with open(test_data_path) as f:
             raw_data = json.load(f)
 
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.set(
-            "https://api.pmg.org.za/member/moomin-finn/attendance/",
-            raw_data['results'],
-            )
+        person = models.Person.objects.get(slug='moomin-finn')
+        replace_person_attendance(person.id, raw_data['results'])
+        refresh = PMGAttendanceRefresh.objects.create(fetched_at=timezone.now())
 
         context = self.client.get(reverse('person', args=('moomin-finn',))).context
 
+        self.assertEqual(context['attendance_as_of'], refresh.fetched_at)
         self.assertEqual(
             context['attendance'],
             [{'total': 28, 'percentage': 89.28571428571429, 'attended': 25, 'year': 2015, 'position':'mp'},
@@ -713,22 +821,14 @@ class SAPersonDetailViewTest(PersonSpeakerMappingsMixin, TestCase):
             )
 
     @patch('requests.get', side_effect=connection_error)
-    def test_attendance_data_requests_errors(self, m):
+    def test_attendance_data_before_first_refresh(self, m):
         self._setup_party_for_attendance(True)
-        # Check context if identifier exists, cache lookup misses
-        # and the PMG API is unavailable.
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.clear()
-
-        context = self.client.get(reverse('person', args=('moomin-finn',))).context
-        assert context['attendance'] == 'UNAVAILABLE'
-
-        # Get rid of identifiers so that we do the mocked url fetch
-        # to find the identifier.
-        models.Identifier.objects.all().delete()
-
+        # Until the attendance has been fetched from the PMG API it's
+        # unavailable, and the page doesn't try to fetch it itself.
         context = self.client.get(reverse('person', args=('moomin-finn',))).context
         assert context['attendance'] == 'UNAVAILABLE'
+        assert context['attendance_as_of'] is None
+        self.assertFalse(m.called)
 
     def test_no_attendance_if_show_attendance_false(self):
         self._setup_party_for_attendance(False)
@@ -739,11 +839,9 @@ class SAPersonDetailViewTest(PersonSpeakerMappingsMixin, TestCase):
         with open(test_data_path) as f:
             raw_data = json.load(f)
 
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.set(
-            "https://api.pmg.org.za/member/moomin-finn/attendance/",
-            raw_data['results'],
-            )
+        person = models.Person.objects.get(slug='moomin-finn')
+        replace_person_attendance(person.id, raw_data['results'])
+        PMGAttendanceRefresh.objects.create(fetched_at=timezone.now())
 
         context = self.client.get(reverse('person', args=('moomin-finn',))).context
 
@@ -964,18 +1062,22 @@ class SAAttendanceDataTest(TestCase):
             raw_data = json.load(f)
 
         person = models.Person.objects.get(slug='person1')
+        replace_person_attendance(person.id, raw_data['results'])
         person_detail = SAPersonDetail(object = person)
 
         expected = {2014: {'mp': {u'A': 1, u'P': 14}}, 2015: {'mp': {u'A': 1, u'P': 25, u'AP': 2}}}
-        raw_stats = person_detail.get_attendance_stats_raw(raw_data['results'])
+        raw_stats = person_detail.get_attendance_stats_raw(
+            person_detail.get_attendance_records())
         self.assertEqual(raw_stats, expected)
 
         # MP who has become a Minister
         person = models.Person.objects.get(slug='person2')
+        replace_person_attendance(person.id, raw_data['results'])
         person_detail = SAPersonDetail(object = person)
 
         expected = {2014: {'mp': {u'A': 1, u'P': 14}}, 2015: {'minister': {u'P': 4}, 'mp': {u'A': 1, u'P': 21, u'AP': 2}}}
-        raw_stats = person_detail.get_attendance_stats_raw(raw_data['results'])
+        raw_stats = person_detail.get_attendance_stats_raw(
+            person_detail.get_attendance_records())
         self.assertEqual(raw_stats, expected)
 
     def test_get_meetings_attended(self):
@@ -987,9 +1089,11 @@ class SAAttendanceDataTest(TestCase):
             raw_data = json.load(f)
 
         person = models.Person.objects.get(slug='person1')
+        replace_person_attendance(person.id, raw_data['results'])
         person_detail = SAPersonDetail(object = person)
 
-        meetings_attended = person_detail.get_meetings_attended(raw_data['results'])
+        meetings_attended = person_detail.get_meetings_attended(
+            person_detail.get_attendance_records())
         meeting_keys = ['url', 'committee_name', 'summary', 'date', 'title']
         self.assertEqual(len(meetings_attended), 39)
         self.assertTrue(bool(k in meeting_keys for k in meetings_attended[0].iterkeys()))
@@ -1049,11 +1153,7 @@ class SAMpAttendancePageTest(TestCase):
             ],
         }]
 
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.set(
-            "https://api.pmg.org.za/committee-meeting-attendance/meetings-by-member/",
-            raw_data,
-        )
+        replace_period_attendance(raw_data)
 
         # Default, Minister attendance
         url = "%s?year=2000" % reverse('mp-attendance')
@@ -1090,11 +1190,7 @@ class SAMpAttendancePageTest(TestCase):
                     {u'date': u'2000-03-01', u'attendance': u'P'},]}],
             u'start_date': u'2000-01-01'}]
 
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.set(
-            "https://api.pmg.org.za/committee-meeting-attendance/meetings-by-member/",
-            raw_data,
-        )
+        replace_period_attendance(raw_data)
 
         url = "%s?year=2000" % reverse('mp-attendance')
         context = self.client.get(url).context
@@ -1131,11 +1227,7 @@ class SAMpAttendancePageTest(TestCase):
                     {u'date': u'2000-03-01', u'attendance': u'P'},]}],
             u'start_date': u'2000-01-01'}]
 
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.set(
-            "https://api.pmg.org.za/committee-meeting-attendance/meetings-by-member/",
-            raw_data,
-        )
+        replace_period_attendance(raw_data)
 
         url = "%s?year=2000" % reverse('mp-attendance')
         context = self.client.get(url).context
@@ -1179,11 +1271,7 @@ class SAMpAttendancePageTest(TestCase):
                     {u'date': u'2019-07-01', u'attendance': u'P'}]}]
             }]
 
-        pmg_api_cache = caches['pmg_api']
-        pmg_api_cache.set(
-            "https://api.pmg.org.za/committee-meeting-attendance/meetings-by-member/",
-            raw_data,
-        )
+        replace_period_attendance(raw_data)
 
         url = "%s?year=2019" % reverse('mp-attendance')
         context = self.client.get(url).context
@@ -1203,6 +1291,121 @@ class SAMpAttendancePageTest(TestCase):
 
         self.assertEqual(context['attendance_data'], expected)
 
+    def test_attendance_summaries(self):
+        raw_data = [{
+            u'start_date': u'2000-01-01',
+            u'end_date': u'2000-12-31',
+            u'meetings_by_member': [
+                {u'member': {
+                    u'party_id': 1, u'pa_url': u'http://www.pa.org.za/person/person1/',
+                    u'party_name': u'PARTY1', u'name': u'1, P', u'id': 1},
+                 u'meetings': [
+                    {u'date': u'2000-03-01', u'attendance': u'A'},
+                    {u'date': u'2000-03-02', u'attendance': u'LDE'},
+                    {u'date': u'2000-03-03', u'attendance': u'P'}]},
+                {u'member': {
+                    u'party_id': 2, u'pa_url': u'http://www.pa.org.za/person/person4/',
+                    u'party_name': u'PARTY2', u'name': u'4, P', u'id': 4},
+                 u'meetings': [
+                    {u'date': u'2000-03-01', u'attendance': u'DE'}]}
+            ],
+        }]
+
+        replace_period_attendance(raw_data)
+
+        bucket = PMGAttendanceBucket.objects.get()
+        self.assertEqual(bucket.label, '2000')
+        self.assertEqual(
+            list(bucket.parties.values_list('name', flat=True)),
+            [u'PARTY1', u'PARTY2'])
+
+        def mp_rows(party):
+            return list(bucket.summaries.filter(party=party, position='mps').values_list(
+                'name', 'total', 'present', 'arrive_late', 'depart_early'))
+
+        self.assertEqual(mp_rows(''), [(u'1, P', 3, 2, 1, 1), (u'4, P', 1, 1, 0, 1)])
+        self.assertEqual(mp_rows('PARTY2'), [(u'4, P', 1, 1, 0, 1)])
+
+        # Refreshing again replaces the summaries
+        replace_period_attendance([])
+        self.assertFalse(PMGAttendanceSummary.objects.exists())
+
+    def test_no_attendance_fetched_yet(self):
+        context = self.client.get(reverse('mp-attendance')).context
+        self.assertEqual(context['attendance_data'], [])
+        self.assertEqual(context['years'], [])
+        self.assertIsNone(context['attendance_as_of'])
+
+
+@attr(country='south_africa')
+class SARefreshPMGAttendanceTest(TestCase):
+    def setUp(self):
+        self.person = models.Person.objects.create(
+            legal_name='Person1', slug='person1')
+
+    def meetings_by_member_page(self, member_ids):
+        return {
+            'count': 3,
+            'next': None,
+            'results': [{
+                'start_date': '2000-01-01',
+                'end_date': '2000-12-31',
+                'meetings_by_member': [
+                    {'member': {
+                        'id': member_id,
+                        'pa_url': 'http://www.pa.org.za/person/person{0}/'.format(member_id),
+                        'party_name': 'PARTY1',
+                        'name': '{0}, P'.format(member_id)},
+                     'meetings': [{'date': '2000-03-01', 'attendance': 'P'}]}
+                    for member_id in member_ids
+                ],
+            }],
+        }
+
+    def test_refresh(self):
+        test_data_path = os.path.join(
+            os.path.dirname(os.path.realpath(__file__)),
+            'data/test/attendance_587.json',
+            )
+        with open(test_data_path) as f:
+            member_attendance = json.load(f)
+
+        url = 'https://api.pmg.org.za/committee-meeting-attendance/meetings-by-member/'
+        first_page = self.meetings_by_member_page([1])
+        first_page['next'] = url + '?page=1'
+
+        with requests_mock.Mocker() as m:
+            m.get(url, json=first_page)
+            m.get(url + '?page=1', json=self.meetings_by_member_page([2]))
+            m.get(url + '?page=2', json=self.meetings_by_member_page([3]))
+            m.get(
+                'https://api.pmg.org.za/member/1/attendance/',
+                json=member_attendance)
+            call_command('south_africa_refresh_pmg_attendance')
+
+        # Every page was fetched, and stored in order
+        self.assertEqual(PMGAttendancePeriod.objects.count(), 3)
+        self.assertEqual(
+            list(PMGMemberAttendance.objects.order_by('id').values_list('name', flat=True)),
+            ['1, P', '2, P', '3, P'])
+
+        # Person1 has been matched to PMG member 1 by their PA URL, and
+        # their attendance fetched
+        self.assertEqual(
+            self.person.get_identifier('za.org.pmg.api/member'), '1')
+        self.assertEqual(
+            PersonMeetingAttendance.objects.filter(person=self.person).count(),
+            43)
+        self.assertIsNotNone(PMGAttendanceRefresh.latest_fetched_at())
+
+        # The pages show the stored data without fetching anything
+        with requests_mock.Mocker() as m:
+            response = self.client.get(
+                reverse('sa-person-attendance', kwargs={'person_slug': 'person1'}))
+            self.assertFalse(m.called)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.context['attendance_as_of'])
+
 
 @attr(country='south_africa')
 class SAPersonProfileSubPageTest(WebTest):
@@ -1271,24 +1474,6 @@ class SAPersonProfileSubPageTest(WebTest):
             end_date='2014-04-01',
         )
 
-        # Make some identifiers for these people so we avoid
-        # looking them up with PMG, and put blank attendance data
-        # in the cache to stop us fetching from the live PMG API.
-        pmg_api_cache = caches['pmg_api']
-
-        for person in (self.deceased, self.former_mp):
-            models.Identifier.objects.create(
-                scheme='za.org.pmg.api/member',
-                identifier=person.slug,
-                content_object=person,
-                )
-
-            pmg_api_cache.set(
-                "https://api.pmg.org.za/member/{}/attendance/".format(person.slug),
-                [],
-                )
-
-
     def get_person_summary(self, soup):
         return soup.find('div', class_='person-summary')
 
@@ -1581,6 +1766,7 @@ class SAHansardIndexViewTest(TestCase):
             is404=False,
             sayit_section=section
         )
+        SectionSummary.objects.rebuild()
 
     def test_index_page(self):
         c = Client()
@@ -1595,6 +1781,32 @@ class SAHansardIndexViewTest(TestCase):
         self.assertContains(response, '<a href="/hansard/%s">%s</a>' % (section.id, section_name), html=True)
         self.assertNotContains(response, "Empty section")
 
+    def test_section_summaries(self):
+        section = Section.objects.get(heading="Proceedings of Foo")
+        summary = SectionSummary.objects.get(section=section)
+        self.assertEqual(summary.speech_count, 4)
+        self.assertEqual(summary.latest_speech_date, date(2013, 2, 16))
+        self.assertEqual(
+            summary.first_speech_id,
+            section.speech_set.order_by('id')[0].id)
+        self.assertEqual(
+            summary.parent_heading,
+            "Proceedings of the National Assembly (2012/2/16)")
+        self.assertFalse(
+            SectionSummary.objects.filter(section__heading="Empty section").exists())
+
+        # Adding a speech and updating the section's tree updates it:
+        Speech.objects.create(
+            instance=section.instance,
+            section=section,
+            text="An extra speech",
+            start_date=date(2013, 2, 17),
+        )
+        SectionSummary.objects.update_for_tree(section.parent)
+        summary = SectionSummary.objects.get(section=section)
+        self.assertEqual(summary.speech_count, 5)
+        self.assertEqual(summary.latest_speech_date, date(2013, 2, 17))
+
     def test_hansard_redirect(self):
         client = Client()
         section_name = "Proceedings of Foo"
@@ -1659,6 +1871,7 @@ class SACommitteeIndexViewTest(WebTest):
                 ],
             },
         ], instance=default_instance)
+        SectionSummary.objects.rebuild()
 
     def test_committee_index_page(self):
         response = self.app.get('/committee-minutes/')
@@ -1909,6 +2122,7 @@ class SAOrganisationDetailViewTestParliament(WebTest):
             start_date=ApproximateDate(2000, 1, 1),
             end_date=ApproximateDate(2005, 12, 31),
         )
+        caches['house_composition'].clear()
 
     def test_counts_and_percentages(self):
         with self.assertNumQueries(15):
@@ -1922,6 +2136,55 @@ class SAOrganisationDetailViewTestParliament(WebTest):
         self.assertEqual(ps_and_ps[1][1], 1)
         self.assertAlmostEqual(ps_and_ps[1][2], 33.333333333333)
 
+    def test_counts_cached_until_positions_change(self):
+        total, ps_and_ps = house_composition.party_seats(self.organisation)
+        self.assertEqual(total, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                house_composition.party_seats(self.organisation),
+                (total, ps_and_ps))
+
+        # John Smith leaves Another Random Party for Random Party:
+        self.party_position2.end_date = ApproximateDate(2010, 1, 1)
+        self.party_position2.save()
+        models.Position.objects.create(
+            person=self.person2,
+            organisation=self.party_random,
+            title=self.member_title,
+            start_date=ApproximateDate(2010, 1, 2),
+            end_date=ApproximateDate(future=True),
+        )
+        total, ps_and_ps = house_composition.party_seats(self.organisation)
+        self.assertEqual(
+            [(party, seats) for party, seats, _ in ps_and_ps],
+            [(self.party_random, 2), (self.party_another_random, 1)])
+
+        # And the Speaker's position in the house ends:
+        self.speaker_position.end_date = ApproximateDate(2010, 1, 1)
+        self.speaker_position.save()
+        total, ps_and_ps = house_composition.party_seats(self.organisation)
+        self.assertEqual(total, 2)
+        self.assertEqual(
+            [(party, seats) for party, seats, _ in ps_and_ps],
+            [(self.party_another_random, 1), (self.party_random, 1)])
+
+    def test_counts_cached_until_position_moves_to_another_house(self):
+        other_house = models.Organisation.objects.create(
+            kind=self.parliament_kind,
+            name='Other Parliament',
+            slug='other-parliament')
+        total, ps_and_ps = house_composition.party_seats(self.organisation)
+        self.assertEqual(total, 3)
+
+        position = models.Position.objects.get(pk=self.position2.pk)
+        position.organisation = other_house
+        position.save()
+        total, ps_and_ps = house_composition.party_seats(self.organisation)
+        self.assertEqual(total, 2)
+        self.assertEqual(
+            [(party, seats) for party, seats, _ in ps_and_ps],
+            [(self.party_another_random, 1), (self.party_random, 1)])
+
 @attr(country='south_africa')
 class SAOrganisationDetailViewTestPlaceAndTitleDisplay(WebTest):
 
@@ -2345,6 +2608,8 @@ class SAPlaceDetailViewTest(WebTest):
 @attr(country='south_africa')
 class SAMembersInterestsBrowserTest(TestCase):
     def setUp(self):
+        caches['interests_register'].clear()
+
         person1 = models.Person.objects.create(
             legal_name='Alice Smith',
             slug='asmith')
@@ -2495,6 +2760,34 @@ class SAMembersInterestsBrowserTest(TestCase):
         self.assertEqual(len(context['data']), 1)
         self.assertEqual(context['data'][0].c, 1)
 
+    def test_members_interests_browser_cache_cleared_on_change(self):
+        url = reverse('sa-interests-index') + '?category=category-a'
+        context = self.client.get(url).context
+        self.assertEqual(len(context['data']), 3)
+
+        entry = Entry.objects.create(
+            person=models.Person.objects.get(slug='bobsmith'),
+            release=Release.objects.get(slug='2013-data'),
+            category=Category.objects.get(slug='category-a'),
+            sort_order=5)
+        EntryLineItem.objects.create(entry=entry, key=u'Source', value=u'Source3')
+
+        context = self.client.get(url).context
+        self.assertEqual(len(context['data']), 4)
+
+    def test_members_interests_browser_cache_cleared_on_rename(self):
+        url = reverse('sa-interests-index') + '?category=category-a'
+        self.client.get(url)
+
+        person = models.Person.objects.get(slug='bobsmith')
+        person.legal_name = 'Robert Smith'
+        person.save()
+
+        context = self.client.get(url).context
+        self.assertIn(
+            'Robert Smith',
+            [row[1].legal_name for row in context['data']])
+
     def test_members_interests_browser_sources_view(self):
         context = self.client.get(
             reverse('sa-interests-source')+'?release=all&category=category-a&match=absolute&source=Source1'
@@ -1,10 +1,10 @@
 import re
 
-from django.db.models import Count, Q
 from django.views.generic import TemplateView
 from django.shortcuts import get_object_or_404
 
 from pombola.core import models
+from pombola.south_africa import house_composition
 
 
 class SAElectionOverviewMixin(TemplateView):
@@ -66,85 +66,14 @@ class SAElectionStatisticsView(SAElectionOverviewMixin):
     def get_context_data(self, **kwargs):
         context = super(SAElectionStatisticsView, self).get_context_data(**kwargs)
 
-        context['current_mps'] = {'all': {}, 'byparty': []}
+        national_assembly = models.Organisation.objects.get(
+            slug='national-assembly')
 
-        election_2014_query = (
-            Q(person__position__organisation__slug__contains='national-election-list-2014') |
-            (Q(person__position__organisation__slug__contains='election-list-2014') &
-             Q(person__position__organisation__slug__contains='regional'))
-        )
-
-        current_na_positions = (
-            models.Organisation.objects
-            .get(slug='national-assembly')
-            .position_set.all()
-            .currently_active()
-        )
-
-        context['current_mps']['all']['current'] = (
-            current_na_positions
-            .order_by('person__id')
-            .distinct('person__id')
-            .count()
-        )
-
-        context['current_mps']['all']['rerunning'] = (
-            current_na_positions
-            .filter(election_2014_query)
-            .order_by('person__id')
-            .distinct('person__id')
-            .count()
-        )
-
-        context['current_mps']['all']['percent_rerunning'] = 100 * context['current_mps']['all']['rerunning'] / context['current_mps']['all']['current']
-
-        #find the number of current MPs running for office per party
-        for p in context['party_list']:
-            party = models.Organisation.objects.get(slug=p.slug)
-
-            current = (
-                current_na_positions
-                .filter(person__position__organisation__slug=p.slug)
-                .order_by('person__id')
-                .distinct('person__id')
-                .count()
-            )
-
-            rerunning = (
-                current_na_positions
-                .filter(person__position__organisation__slug=p.slug)
-                .filter(election_2014_query)
-                .order_by('person__id')
-                .distinct('person__id')
-                .count()
-            )
-
-            if current:
-                percent = 100 * rerunning / current
-                context['current_mps']['byparty'].append({'party': party, 'current': current, 'rerunning': rerunning, 'percent_rerunning': percent})
-
-        # find individuals who appear to have switched party
-        context['people_new_party'] = []
-        people = models.Person.objects \
-            .filter(
-                position__organisation__kind__slug='party',
-                position__title__slug='member') \
-            .annotate(
-                num_parties=Count('position')).filter(num_parties__gt=1)
-
-        for person in people:
-            #check whether the person is a candidate - there is probably be a cleaner way to do this in the initial query
-            person_list = person.position_set.all().filter(
-                organisation__slug__contains='election-list-2014')
-            if person_list:
-                context['people_new_party'].append({
-                    'person': person,
-                    'current_positions': person.position_set.all().filter(
-                        organisation__kind__slug='party').currently_active(),
-                    'former_positions': person.position_set.all().filter(
-                        organisation__kind__slug='party').currently_inactive(),
-                    'person_list': person_list
-                })
+        # The counts of current MPs running for office, in total and per
+        # party, and the candidates who appear to have switched party:
+        context['current_mps'] = house_composition.rerunning_counts(
+            national_assembly, '2014')
+        context['people_new_party'] = house_composition.party_switchers('2014')
 
         return context
 
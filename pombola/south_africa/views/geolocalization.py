@@ -1,3 +1,7 @@
+from collections import defaultdict
+import sys
+import threading
+
 import mapit
 import requests
 
@@ -6,7 +10,9 @@ from .constants import API_REQUESTS_TIMEOUT
 from django import forms
 from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
+from django.core.cache import caches
 from django.core.urlresolvers import reverse
+from django.db.models import Prefetch
 from django.http import Http404
 from django.shortcuts import redirect
 from django.utils.http import urlquote
@@ -32,6 +38,114 @@ class WardCouncillorAPIDown(Exception):
     pass
 
 
+# The ward containing a point is cached by the point's coordinates
+# rounded to this many decimal places (about 11m), and for this long:
+WARD_POINT_PRECISION = 4
+WARD_POINT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+WARD_COUNCILLOR_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def fetch_ward_for_point(location):
+    """Return a dict with the MapIt ward and municipality for a location
+
+    Returns None if there's no ward there. The results are cached by
+    the rounded coordinates of the location."""
+    lon = round(location.x, WARD_POINT_PRECISION)
+    lat = round(location.y, WARD_POINT_PRECISION)
+    cache = caches['ward_lookup']
+    cache_key = 'ward-for-point-{lon},{lat}'.format(lon=lon, lat=lat)
+    result = cache.get(cache_key)
+    if result is not None:
+        return result or None
+
+    # Look up the ward on MapIt:
+    url = 'http://mapit.code4sa.org/point/4326/{lon},{lat}?type=WD,MN'.format(
+        lon=lon, lat=lat
+    )
+
+    try:
+        r = requests.get(url, timeout=API_REQUESTS_TIMEOUT)
+        mapit_json = r.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise WardCouncillorAPIDown(u"MapIt request failed: {0}".format(e))
+
+    ward = None
+    muni = None
+    for item in (mapit_json or {}).values():
+        if item['type_name'] == 'Ward':
+            ward = item
+        elif item['type_name'] == 'Municipality':
+            muni = item
+
+    # An empty dict is cached for places with no ward, since None means
+    # that nothing was found in the cache:
+    result = {}
+    if ward and muni:
+        result = {
+            'ward_id': ward['codes']['MDB'],
+            'muni_id': muni['codes']['MDB'],
+            'ward_mapit_area_id': ward['id'],
+        }
+    cache.set(cache_key, result, WARD_POINT_CACHE_TIMEOUT)
+    return result or None
+
+
+def fetch_ward_councillor(ward_id):
+    """Return the data about the councillor for a ward from Code for SA"""
+    cache = caches['ward_lookup']
+    cache_key = 'ward-councillor-{0}'.format(ward_id)
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    url_fmt = 'http://nearby.code4sa.org/councillor/ward-{ward_id}.json'
+    try:
+        r = requests.get(
+            url_fmt.format(ward_id=ward_id),
+            timeout=API_REQUESTS_TIMEOUT)
+        r.raise_for_status()
+        result = r.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise WardCouncillorAPIDown(unicode(e))
+
+    cache.set(cache_key, result, WARD_COUNCILLOR_CACHE_TIMEOUT)
+    return result
+
+
+def fetch_ward_and_councillor(location):
+    """Return a (ward, councillor data) tuple for a location, or None
+
+    This only makes HTTP requests, and doesn't touch the database, so
+    it's safe to run in another thread."""
+    ward = fetch_ward_for_point(location)
+    if not ward:
+        return None
+    return ward, fetch_ward_councillor(ward['ward_id'])
+
+
+class BackgroundCall(object):
+    """Call a function in a thread, and get its result (or exception) later"""
+
+    def __init__(self, function, *args):
+        self._result = None
+        self._exc_info = None
+        self._thread = threading.Thread(target=self._run, args=(function,) + args)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, function, *args):
+        try:
+            self._result = function(*args)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def result(self):
+        self._thread.join()
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
 class SAGeocoderView(GeocoderView):
     def get(self, request, *args, **kwargs):
         context = self.get_context_data(**kwargs)
@@ -85,41 +199,18 @@ class LatLonDetailBaseView(BaseDetailView):
         return province
 
     def get_ward_councillors(self, location):
-        # Look up the ward on MapIt:
-        url = 'http://mapit.code4sa.org/point/4326/{lon},{lat}?type=WD,MN'.format(
-            lon=location.x, lat=location.y
-        )
-
-        try:
-            r = requests.get(url, timeout=API_REQUESTS_TIMEOUT)
-        except requests.exceptions.RequestException as e:
-            raise WardCouncillorAPIDown(u"MapIt request failed: {0}".format(e))
+        return self.ward_councillors_from_data(
+            fetch_ward_and_councillor(location))
 
-        mapit_json = r.json()
-        if not mapit_json:
+    def ward_councillors_from_data(self, ward_and_councillor):
+        if not ward_and_councillor:
             return []
-        ward = None
-        muni = None
-        for item in mapit_json.values():
-            if item['type_name'] == 'Ward':
-                ward = item
-            elif item['type_name'] == 'Municipality':
-                muni = item
-        ward_id = ward['codes']['MDB']
-        muni_id = muni['codes']['MDB']
-
-        # Then find the ward councillor from that ward ID. There
-        # should only be one at the moment, but make it a list in case
-        # we support broader lookups in the future:
-        url_fmt = 'http://nearby.code4sa.org/councillor/ward-{ward_id}.json'
-        try:
-            r = requests.get(
-                url_fmt.format(ward_id=ward_id),
-                timeout=API_REQUESTS_TIMEOUT)
-            r.raise_for_status()
-            ward_result = r.json()
-        except (requests.exceptions.RequestException, ValueError) as e:
-            raise WardCouncillorAPIDown(unicode(e))
+        ward, ward_result = ward_and_councillor
+        ward_id = ward['ward_id']
+
+        # There should only be one ward councillor at the moment, but
+        # make it a list in case we support broader lookups in the
+        # future:
         councillor_data = ward_result['councillor']
 
         party = models.Organisation.objects.filter(
@@ -138,7 +229,7 @@ class LatLonDetailBaseView(BaseDetailView):
                 'party': party,
                 'has_party_logo': has_party_logo,
                 'ward_data': ward_result,
-                'ward_mapit_area_id': mapit_json.values()[0]['id'],
+                'ward_mapit_area_id': ward['ward_mapit_area_id'],
                 'positions': [
                     {
                         'title': {'name': 'Ward Councillor'}
@@ -147,23 +238,41 @@ class LatLonDetailBaseView(BaseDetailView):
                 'element_id': 'ward-councillor-{ward_id}-0'.format(
                     ward_id=ward_id
                 ),
-                'muni_id': muni_id
+                'muni_id': ward['muni_id']
             }
         ]
 
     def get_context_data(self, **kwargs):
         context = super(LatLonDetailBaseView, self).get_context_data(**kwargs)
 
+        # Start looking up the ward councillor over HTTP, while the
+        # nearby offices are found in the database:
+        ward_lookup = BackgroundCall(fetch_ward_and_councillor, self.location)
+
+        context['location'] = self.location
+        context['office_search_radius'] = self.constituency_office_search_radius
+
+        context['mp_data'], context['mpl_data'] = self.get_office_contacts()
+
         try:
-            context['ward_data'] = self.get_ward_councillors(self.location)
+            context['ward_data'] = self.ward_councillors_from_data(
+                ward_lookup.result())
         except WardCouncillorAPIDown as e:
             context['ward_data'] = []
             context['ward_data_not_available'] = u"The error was: {0}".format(e)
 
-        context['location'] = self.location
-        context['office_search_radius'] = self.constituency_office_search_radius
+        context['form'] = LocationSearchForm(
+            initial={'q': self.request.GET.get('q')}
+        )
+        return context
 
-        nearest_office_places = (
+    def get_office_contacts(self):
+        """Return lists of data about the MPs and MPLs with nearby offices
+
+        Everything is fetched with a fixed number of queries, however
+        many offices there are within the search radius."""
+
+        nearest_office_places = list(
             ZAPlace.objects
             .filter(kind__slug__in=CONSTITUENCY_OFFICE_PLACE_KIND_SLUGS)
             .distance(self.location)
@@ -171,17 +280,64 @@ class LatLonDetailBaseView(BaseDetailView):
                 self.location, D(km=self.constituency_office_search_radius)))
             .order_by('distance')
             .select_related('organisation')
-            .prefetch_related('organisation__org_rels_as_b')
-            .prefetch_related('organisation__position_set')
+            .prefetch_related(
+                'organisation__org_rels_as_b__kind',
+                'organisation__org_rels_as_b__organisation_a',
+                Prefetch(
+                    'organisation__contacts',
+                    queryset=models.Contact.objects.filter(kind__slug='address'),
+                    to_attr='address_contacts',
+                ),
+            )
+        )
+        nearest_office_places = [
+            p for p in nearest_office_places if p.organisation.is_ongoing()
+        ]
+
+        contact_positions = defaultdict(list)
+        for position in models.Position.objects \
+                .filter(organisation__in=[p.organisation for p in nearest_office_places]) \
+                .currently_active() \
+                .select_related('organisation'):
+            contact_positions[position.organisation_id].append(position)
+
+        person_ids = set(
+            position.person_id
+            for positions in contact_positions.values()
+            for position in positions
         )
+        people = models.Person.objects \
+            .filter(id__in=person_ids) \
+            .prefetch_related(
+                'images',
+                Prefetch(
+                    'contacts',
+                    queryset=models.Contact.objects \
+                        .filter(kind__slug__in=('email', 'voice')) \
+                        .select_related('kind'),
+                    to_attr='email_and_phone_contacts',
+                ),
+            ).in_bulk(person_ids)
 
-        context['mp_data'] = mp_data = []
-        context['mpl_data'] = mpl_data = []
+        def current_member_positions(**position_filter):
+            positions = defaultdict(list)
+            for position in models.Position.objects \
+                    .filter(person__in=person_ids, title__slug='member', **position_filter) \
+                    .currently_active() \
+                    .select_related('title', 'organisation'):
+                positions[position.person_id].append(position)
+            return positions
+
+        all_mp_positions = current_member_positions(
+            organisation__slug='national-assembly')
+        all_mpl_positions = current_member_positions(
+            organisation__kind__slug='provincial-legislature')
+
+        mp_data = []
+        mpl_data = []
 
         for office_place in nearest_office_places:
             organisation = office_place.organisation
-            if not organisation.is_ongoing():
-                continue
 
             # Get the party and party logo:
             party = None
@@ -193,32 +349,21 @@ class LatLonDetailBaseView(BaseDetailView):
                         has_party_logo = True
 
             # Find all the constituency contacts:
-            for i, position in enumerate(organisation.position_set.currently_active()):
-                person = position.person
+            for i, position in enumerate(contact_positions[organisation.id]):
+                person = people[position.person_id]
                 element_id = 'constituency-contact-{office_id}-{i}'.format(
                     office_id=position.organisation.id, i=i
                 )
-                mp_positions = person.position_set \
-                    .filter(
-                        organisation__slug='national-assembly',
-                        title__slug='member'
-                    ) \
-                    .currently_active()
-                mpl_positions = person.position_set \
-                    .filter(
-                        organisation__kind__slug='provincial-legislature',
-                        title__slug='member'
-                    ) \
-                    .currently_active()
-                email, phone = None, None
-                email_contact = person.contacts.filter(kind__slug='email').first()
+                mp_positions = all_mp_positions[person.id]
+                mpl_positions = all_mpl_positions[person.id]
 
-                if email_contact:
-                    email = email_contact.value
-                phone_contact = person.contacts.filter(kind__slug='voice').first()
+                email, phone = None, None
+                for contact in person.email_and_phone_contacts:
+                    if contact.kind.slug == 'email' and email is None:
+                        email = contact.value
+                    elif contact.kind.slug == 'voice' and phone is None:
+                        phone = contact.value
 
-                if phone_contact:
-                    phone = phone_contact.value
                 person_data = {
                     'name': person.legal_name,
                     'person': person,
@@ -243,10 +388,7 @@ class LatLonDetailBaseView(BaseDetailView):
                     person_data['is_mpl'] = True
                     mpl_data.append(person_data)
 
-        context['form'] = LocationSearchForm(
-            initial={'q': self.request.GET.get('q')}
-        )
-        return context
+        return mp_data, mpl_data
 
 
 class LatLonDetailLocalView(LatLonDetailBaseView):
@@ -1,15 +1,58 @@
+from collections import defaultdict, OrderedDict
 import datetime
+import hashlib
 
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
+from django.db.models import Prefetch, Q
+from django.db.models.query import prefetch_related_objects
 from django.views.generic import TemplateView
 
 from django_date_extensions.fields import ApproximateDate
 
 from pombola.core import models
-from pombola.interests_register.models import Release, Category, Entry
+from pombola.interests_register.models import (
+    Release, Category, Entry, EntryLineItem)
+from pombola.south_africa.models import interests_register_version
+
+
+def line_items_prefetch():
+    return Prefetch(
+        'line_items', queryset=EntryLineItem.objects.order_by('id'))
+
+
+def add_line_items_to_row(entry, row, headers, headers_index):
+    """Put the values of an entry's line items in the row's columns for
+    their keys, adding a column for any key that hasn't been seen yet"""
+    for entrylineitem in entry.line_items.all():
+        if entrylineitem.key not in headers:
+            headers_index[entrylineitem.key] = len(headers)
+            headers.append(entrylineitem.key)
+            row.append('')
+
+        row[headers_index[entrylineitem.key]] = entrylineitem.value
+
+
+def release_source_urls(release_ids):
+    """Return a dict mapping each of the releases' IDs to the URL of its
+    first source, for those that have one"""
+    source_urls = {}
+    sources = models.InformationSource.objects.filter(
+        content_type=ContentType.objects.get_for_model(Release),
+        object_id__in=set(release_ids),
+    )
+    for source in sources:
+        source_urls.setdefault(source.object_id, source.source)
+    return source_urls
+
+
+def detach_page(page):
+    """Drop a page's reference to the full list it's a page of (whose
+    count has already been taken), so that it can be cached"""
+    page.object_list = list(page.object_list)
+    page.paginator.object_list = ()
 
 
 class SAMembersInterestsIndex(TemplateView):
@@ -61,35 +104,70 @@ class SAMembersInterestsIndex(TemplateView):
         except ObjectDoesNotExist:
             return context
 
-        # Complete view - declarations for multiple people in multiple categories
-        if context['display'] == 'all' and context['category'] == 'all':
-            context = self.get_complete_view(context)
-
-        # Section view - data for multiple people in different categories
-        elif context['display'] == 'all' and context['category'] != 'all':
-            context = self.get_section_view(context)
+        # The tables for each choice of filters and page are kept in the
+        # 'interests_register' cache, under a version which changes
+        # whenever anything in the register changes. They also vary by
+        # date, since the party filters use the current memberships.
+        cache = caches['interests_register']
+        cache_key = 'sa-interests-index-' + hashlib.md5(u'\n'.join(
+            [interests_register_version(), datetime.date.today().isoformat()] +
+            [context[key] for key in ('display', 'category', 'party', 'release')] +
+            [self.request.GET.get('page', '')]
+        ).encode('utf-8')).hexdigest()
+        results = cache.get(cache_key)
+
+        if results is None:
+            # Complete view - declarations for multiple people in multiple categories
+            if context['display'] == 'all' and context['category'] == 'all':
+                results = self.get_complete_view(context)
+
+            # Section view - data for multiple people in different categories
+            elif context['display'] == 'all' and context['category'] != 'all':
+                results = self.get_section_view(context)
+
+            # numberbyrepresentative view - number of declarations per person per category
+            elif context['display'] == 'numberbyrepresentative':
+                results = self.get_number_by_representative_view(context)
+
+            # numberbysource view - number of declarations by source per category
+            elif context['display'] == 'numberbysource':
+                results = self.get_numberbysource_view(context)
 
-        # numberbyrepresentative view - number of declarations per person per category
-        elif context['display'] == 'numberbyrepresentative':
-            context = self.get_number_by_representative_view(context)
+            else:
+                results = {}
 
-        # numberbysource view - number of declarations by source per category
-        elif context['display'] == 'numberbysource':
-            context = self.get_numberbysource_view(context)
+            if 'paginator' in results:
+                detach_page(results['paginator'])
+            elif 'data' in results:
+                detach_page(results['data'])
+            cache.set(cache_key, results)
 
+        context.update(results)
         return context
 
-    def get_complete_view(self, context):
-        release_content_type = ContentType.objects.get_for_model(Release)
+    def paginate(self, object_list, per_page):
+        paginator = Paginator(object_list, per_page)
+        page = self.request.GET.get('page')
 
+        try:
+            return paginator.page(page)
+        except PageNotAnInteger:
+            return paginator.page(1)
+        except EmptyPage:
+            return paginator.page(paginator.num_pages)
+
+    def get_complete_view(self, context):
         # Complete view - declarations for multiple people in multiple categories
-        context['layout'] = 'complete'
+        results = {'layout': 'complete'}
 
         when = datetime.date.today()
         now_approx = repr(
             ApproximateDate(year=when.year, month=when.month, day=when.day))
 
-        people = Entry.objects.order_by(
+        people = Entry.objects.select_related(
+            'person',
+            'release'
+        ).order_by(
             'person__legal_name',
             'release__date'
         ).distinct(
@@ -107,81 +185,64 @@ class SAMembersInterestsIndex(TemplateView):
                 person__position__organisation__slug__in=context['party_slug_filter'],
                 person__position__start_date__lte=now_approx)
 
-        paginator = Paginator(people, 10)
-        page = self.request.GET.get('page')
+        people_paginated = self.paginate(people, 10)
+        results['paginator'] = people_paginated
 
-        try:
-            people_paginated = paginator.page(page)
-        except PageNotAnInteger:
-            people_paginated = paginator.page(1)
-        except EmptyPage:
-            people_paginated = paginator.page(paginator.num_pages)
+        # Get the entries of everyone on the page at once, grouped by
+        # person and release, and then by category in order of its id
+        page_entries = list(people_paginated.object_list)
+        entries = Entry.objects.filter(
+            person__in=set(e.person_id for e in page_entries),
+            release__in=set(e.release_id for e in page_entries),
+        ).select_related(
+            'category'
+        ).prefetch_related(
+            line_items_prefetch()
+        ).order_by(
+            'category__id',
+            'sort_order',
+            'id'
+        )
+        entries_by_person_release = defaultdict(OrderedDict)
+        for entry in entries:
+            entries_by_person_release[(entry.person_id, entry.release_id)] \
+                .setdefault(entry.category_id, []).append(entry)
 
-        context['paginator'] = people_paginated
+        source_urls = release_source_urls(e.release_id for e in page_entries)
 
         # Tabulate the data
         data = []
-        for entry_person in people_paginated:
-            person = entry_person.person
-            year = entry_person.release.date.year
+        for entry_person in page_entries:
             person_data = []
-            person_categories = person.interests_register_entries.filter(
-                release=entry_person.release
-            ).order_by(
-                'category__id'
-            ).distinct(
-                'category__id'
-            )
-
-            sources = models.InformationSource.objects.filter(
-                content_type=release_content_type,
-                object_id=entry_person.release.id
-            )
-            if sources:
-                source_url = sources[0].source
-            else:
-                source_url = ''
-
-            for cat in person_categories:
-                entries = person.interests_register_entries.filter(
-                    category=cat.category,
-                    release=entry_person.release)
+            categories = entries_by_person_release[
+                (entry_person.person_id, entry_person.release_id)]
 
+            for cat_entries in categories.values():
                 headers = []
                 headers_index = {}
                 cat_data = []
-                for entry in entries:
+                for entry in cat_entries:
                     row = [''] * len(headers)
-
-                    for entrylineitem in entry.line_items.all():
-                        if entrylineitem.key not in headers:
-                            headers_index[entrylineitem.key] = len(headers)
-                            headers.append(entrylineitem.key)
-                            row.append('')
-
-                        row[headers_index[entrylineitem.key]] = entrylineitem.value
-
+                    add_line_items_to_row(entry, row, headers, headers_index)
                     cat_data.append(row)
 
                 person_data.append({
-                    'category': cat.category,
+                    'category': cat_entries[0].category,
                     'headers': headers,
                     'data': cat_data})
             data.append({
-                'person': person,
+                'person': entry_person.person,
                 'data': person_data,
-                'year': year,
-                'source_url': source_url})
+                'year': entry_person.release.date.year,
+                'source_url': source_urls.get(entry_person.release_id, '')})
 
-        context['data'] = data
+        results['data'] = data
 
-        return context
+        return results
 
     def get_section_view(self, context):
-        release_content_type = ContentType.objects.get_for_model(Release)
-
         # Section view - data for multiple people in different categories
-        context['layout'] = 'section'
+        results = {'layout': 'section'}
 
         when = datetime.date.today()
         now_approx = repr(
@@ -189,7 +250,11 @@ class SAMembersInterestsIndex(TemplateView):
 
         entries = Entry.objects.select_related(
             'person',
-            'category'
+            'category',
+            'release'
+        ).prefetch_related(
+            line_items_prefetch(),
+            models.current_memberships_prefetch('person__position_set')
         ).all().filter(
             category__id=context['category_id']
         ).order_by(
@@ -207,57 +272,34 @@ class SAMembersInterestsIndex(TemplateView):
                 person__position__organisation__slug__in=context['party_slug_filter'],
                 person__position__start_date__lte=now_approx)
 
-        paginator = Paginator(entries, 25)
-        page = self.request.GET.get('page')
-
-        try:
-            entries_paginated = paginator.page(page)
-        except PageNotAnInteger:
-            entries_paginated = paginator.page(1)
-        except EmptyPage:
-            entries_paginated = paginator.page(paginator.num_pages)
+        entries_paginated = self.paginate(entries, 25)
+        page_entries = list(entries_paginated.object_list)
+        source_urls = release_source_urls(entry.release_id for entry in page_entries)
 
         headers = ['Year', 'Person', 'Type']
         headers_index = {'Year': 0, 'Person': 1, 'Type': 2}
         data = []
-        for entry in entries_paginated:
-            sources = models.InformationSource.objects.filter(
-                content_type=release_content_type,
-                object_id=entry.release.id
-            )
-            if sources:
-                source_url = sources[0].source
-            else:
-                source_url = ''
-
-            entry.release.source_url = source_url
+        for entry in page_entries:
+            entry.release.source_url = source_urls.get(entry.release_id, '')
 
             row = [''] * len(headers)
             row[0] = entry.release
             row[1] = entry.person
             row[2] = entry.category.name
 
-            for entrylineitem in entry.line_items.all():
-                if entrylineitem.key not in headers:
-                    headers_index[entrylineitem.key] = len(headers)
-                    headers.append(entrylineitem.key)
-                    row.append('')
-
-                row[headers_index[entrylineitem.key]] = entrylineitem.value
+            add_line_items_to_row(entry, row, headers, headers_index)
 
             data.append(row)
 
-        context['data'] = data
-        context['headers'] = headers
-        context['paginator'] = entries_paginated
+        results['data'] = data
+        results['headers'] = headers
+        results['paginator'] = entries_paginated
 
-        return context
+        return results
 
     def get_number_by_representative_view(self, context):
-        release_content_type = ContentType.objects.get_for_model(Release)
-
         # numberbyrepresentative view - number of declarations per person per category
-        context['layout'] = 'numberbyrepresentative'
+        results = {'layout': 'numberbyrepresentative'}
 
         # Custom sql used as:
         # Entry.objects.values('category', 'release', 'person').annotate(c=Count('id')).order_by('-c')
@@ -291,44 +333,35 @@ class SAMembersInterestsIndex(TemplateView):
                 GROUP BY category_id, release_id, person_id ORDER BY c DESC''',
                 [context['category_id'], context['release_id']])
 
-        paginator = Paginator(data, 20)
-        paginator._count = len(list(data))
-        page = self.request.GET.get('page')
+        # A raw query is run again each time it's sliced or counted, so
+        # run it once and paginate the list.
+        data_paginated = self.paginate(list(data), 20)
 
-        try:
-            data_paginated = paginator.page(page)
-        except PageNotAnInteger:
-            data_paginated = paginator.page(1)
-        except EmptyPage:
-            data_paginated = paginator.page(paginator.num_pages)
-
-        for row in data_paginated:
-            sources = models.InformationSource.objects.filter(
-                content_type=release_content_type,
-                object_id=row.release.id
-            )
-            if sources:
-                source_url = sources[0].source
-            else:
-                source_url = ''
+        page_rows = list(data_paginated.object_list)
+        prefetch_related_objects(page_rows, [
+            'release',
+            'category',
+            models.current_memberships_prefetch('person__position_set'),
+        ])
+        source_urls = release_source_urls(row.release_id for row in page_rows)
+        for row in page_rows:
+            row.release.source_url = source_urls.get(row.release_id, '')
 
-            row.release.source_url = source_url
+        results['data'] = data_paginated
 
-        context['data'] = data_paginated
-
-        return context
+        return results
 
     def get_numberbysource_view(self, context):
-        release_content_type = ContentType.objects.get_for_model(Release)
+        results = {}
 
-        context['categories'] = Category.objects.filter(
+        results['categories'] = Category.objects.filter(
             slug__in=['sponsorships',
                       'gifts-and-hospitality',
                       'benefits',
                       'pensions'])
 
         # numberbysource view - number of declarations by source per category
-        context['layout'] = 'numberbysource'
+        results['layout'] = 'numberbysource'
         if context['category'] == 'all' and context['release'] == 'all':
             data = Entry.objects.raw(
                 '''SELECT max("interests_register_entrylineitem"."id") as id,
@@ -378,32 +411,19 @@ class SAMembersInterestsIndex(TemplateView):
                 GROUP BY value, release_id, category_id ORDER BY c DESC''',
                 [context['category_id'], context['release_id']])
 
-        paginator = Paginator(data, 20)
-        paginator._count = len(list(data))
-        page = self.request.GET.get('page')
-
-        try:
-            data_paginated = paginator.page(page)
-        except PageNotAnInteger:
-            data_paginated = paginator.page(1)
-        except EmptyPage:
-            data_paginated = paginator.page(paginator.num_pages)
-
-        for row in data_paginated:
-            sources = models.InformationSource.objects.filter(
-                content_type=release_content_type,
-                object_id=row.release.id
-            )
-            if sources:
-                source_url = sources[0].source
-            else:
-                source_url = ''
+        # A raw query is run again each time it's sliced or counted, so
+        # run it once and paginate the list.
+        data_paginated = self.paginate(list(data), 20)
 
-            row.release.source_url = source_url
+        page_rows = list(data_paginated.object_list)
+        prefetch_related_objects(page_rows, ['release', 'category'])
+        source_urls = release_source_urls(row.release_id for row in page_rows)
+        for row in page_rows:
+            row.release.source_url = source_urls.get(row.release_id, '')
 
-        context['data'] = data_paginated
+        results['data'] = data_paginated
 
-        return context
+        return results
 
 
 class SAMembersInterestsSource(TemplateView):
@@ -447,6 +467,12 @@ class SAMembersInterestsSource(TemplateView):
             if context['release'] != 'all':
                 entries = entries.filter(release__slug=context['release'])
 
+            entries = entries.select_related(
+                'person', 'category', 'release'
+            ).prefetch_related(
+                line_items_prefetch(),
+                models.current_memberships_prefetch('person__position_set'))
+
             paginator = Paginator(entries, 25)
             page = self.request.GET.get('page')
 
@@ -467,13 +493,7 @@ class SAMembersInterestsSource(TemplateView):
                 row[1] = entry.person
                 row[2] = entry.category.name
 
-                for entrylineitem in entry.line_items.all():
-                    if entrylineitem.key not in headers:
-                        headers_index[entrylineitem.key] = len(headers)
-                        headers.append(entrylineitem.key)
-                        row.append('')
-
-                    row[headers_index[entrylineitem.key]] = entrylineitem.value
+                add_line_items_to_row(entry, row, headers, headers_index)
 
                 data.append(row)
 
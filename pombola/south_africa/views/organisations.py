@@ -1,12 +1,11 @@
 import datetime
 
-from collections import defaultdict
-
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 
 from pombola.core import models
+from pombola.south_africa import house_composition
 from pombola.core.views import (
     OrganisationDetailView, OrganisationDetailSub, CommentArchiveMixin,
     filter_by_alphabet)
@@ -71,37 +70,10 @@ class SAOrganisationDetailView(CommentArchiveMixin, OrganisationDetailView):
         return context
 
     def add_parliament_counts_to_context_data(self, context):
-        # Get all the currently active positions in the house:
-        positions_in_house = models.Position.objects.filter(
-            organisation=self.object). \
-            select_related('person').currently_active()
-
-        # Then find the distinct people who have those positions:
-        people_in_house = set(p.person for p in positions_in_house)
-
-        # Now find all the active party memberships for those people:
-        party_counts = defaultdict(int)
-        for current_party_position in models.Position.objects.filter(
-            title__slug='member',
-            organisation__kind__slug='party',
-            person__in=people_in_house).currently_active(). \
-                select_related('organisation'):
-            party_counts[current_party_position.organisation] += 1
-        parties = sorted(party_counts.keys(), key=lambda o: o.name)
-        total_people = len(people_in_house)
-
-        # Calculate the % of the house each party occupies.
-        context['parties_counts_and_percentages'] = sorted(
-            [
-                (party,
-                 party_counts[party],
-                 (float(party_counts[party]) * 100) / total_people)
-                for party in parties
-            ],
-            key=lambda x: x[1],
-            reverse=True,
-        )
-
+        total_people, parties_counts_and_percentages = \
+            house_composition.party_seats(self.object)
+        context['parties_counts_and_percentages'] = \
+            parties_counts_and_percentages
         context['total_people'] = total_people
 
     def get_template_names(self):
@@ -1,33 +1,21 @@
 from __future__ import division
 
-import dateutil
-import json
 import logging
-import re
-import requests
-import urllib
 import datetime
 
-from .constants import API_REQUESTS_TIMEOUT
-from urlparse import urlsplit
-
 from django.contrib.contenttypes.models import ContentType
-from django.core.cache import caches
 from django.db.models import Q
 
 from pombola.core import models
 from pombola.core.views import PersonDetail, PersonSpeakerMappingsMixin
 from pombola.interests_register.models import Release
+from pombola.south_africa.models import PMGAttendanceRefresh
 
 from speeches.models import Speech
 
 logger = logging.getLogger('django.request')
 
 
-class AttendanceAPIDown(Exception):
-    pass
-
-
 class SAPersonDetail(PersonSpeakerMappingsMixin, PersonDetail):
     important_org_kind_slugs = (
         'national-executive', 'parliament', 'provincial-legislature')
@@ -146,41 +134,6 @@ class SAPersonDetail(PersonSpeakerMappingsMixin, PersonDetail):
         return models.Organisation.objects.filter(
             position__in=former_party_memberships).distinct()
 
-    def store_or_get_pmg_member_id(self, scheme='za.org.pmg.api/member'):
-        identifier = self.object.get_identifier(scheme)
-
-        if not identifier:
-            # First find the id of the person
-            pa_link = urllib.quote(
-                "https://www.pa.org.za/person/{}/".format(self.object.slug))
-
-            url_fmt = "https://api.pmg.org.za/member/?filter[pa_link]={}"
-            api_search_url = url_fmt.format(pa_link)
-            try:
-                search_resp = requests.get(
-                    api_search_url, timeout=API_REQUESTS_TIMEOUT)
-            except requests.exceptions.RequestException:
-                raise AttendanceAPIDown
-            search_data = json.loads(search_resp.text)
-
-            if not search_data.get('count'):
-                return None
-
-            if search_data['count'] > 1:
-                logger.error(
-                    'Duplicate members at PMG with slug {} - SKIPPING'.format(self.object.slug))
-                return None
-
-            identifier = search_data['results'][0]['id']
-
-            models.Identifier.objects.create(
-                scheme=scheme,
-                identifier=identifier,
-                content_object=self.object,
-            )
-
-        return identifier
-
     def get_active_minister_positions(self, years):
         """
         Return a year:active_ministerial_position dict for the list of years provided
@@ -203,49 +156,23 @@ class SAPersonDetail(PersonSpeakerMappingsMixin, PersonDetail):
                 return True
         return False
 
-    def get_attendance_data_url(self, attendance_url_template="https://api.pmg.org.za/member/{}/attendance/"):
-        identifier = self.store_or_get_pmg_member_id()
-
-        if identifier:
-            return attendance_url_template.format(identifier)
-
-    def download_attendance_data(self):
-        attendance_url = next_url = self.get_attendance_data_url()
-
-        cache = caches['pmg_api']
-        results = cache.get(attendance_url)
-
-        if results is None:
-            results = []
-            while next_url:
-                try:
-                    resp = requests.get(next_url, timeout=API_REQUESTS_TIMEOUT)
-                except requests.exceptions.RequestException:
-                    raise AttendanceAPIDown
-
-                data = json.loads(resp.text)
-                results.extend(data.get('results'))
+    def get_attendance_records(self):
+        """Return the person's stored committee meeting attendance records,
+        most recent first"""
+        return self.object.meeting_attendances.all()
 
-                next_url = data.get('next')
-
-            cache.set(attendance_url, results)
-
-        # Results are returned from the API most recent first, which
-        # is convenient for us.
-        return results
-
-    def get_attendance_stats_raw(self, data):
-        if not data:
+    def get_attendance_stats_raw(self, records):
+        if not records:
             return {}
 
         attendance_by_year = {}
 
-        years = sorted(set(dateutil.parser.parse(x['meeting']['date']).year for x in data), reverse=True)
+        years = sorted(set(x.meeting_date.year for x in records), reverse=True)
         minister_positions_by_year = self.get_active_minister_positions(years)
 
-        for x in data:
-            attendance = x['attendance']
-            meeting_date = dateutil.parser.parse(x['meeting']['date'])
+        for x in records:
+            attendance = x.attendance
+            meeting_date = x.meeting_date
             year = meeting_date.year
 
             minister_at_date = self.active_position_at_date(minister_positions_by_year[year], meeting_date)
@@ -267,30 +194,22 @@ class SAPersonDetail(PersonSpeakerMappingsMixin, PersonDetail):
 
         return attendance_by_year
 
-    def get_meetings_attended(self, data, limit=None):
-        api_url_re = r'/committee-meeting/(\d+)/'
-        meeting_url_template = 'https://pmg.org.za/committee-meeting/{}/'
-
+    def get_meetings_attended(self, records, limit=None):
+        meetings = records.filter(attendance__in=self.present_values)
         if limit:
-            meetings = [x['meeting'] for x in data if x['attendance'] in self.present_values][:limit]
-        else:
-            meetings = [x['meeting'] for x in data if x['attendance'] in self.present_values]
+            meetings = meetings[:limit]
 
         results = []
         for meeting in meetings:
-            api_url = meeting['url']
-            path = urlsplit(api_url).path
-            meeting_id = re.match(api_url_re, path).group(1)
-
             meeting_summary = {
-                'url': meeting_url_template.format(meeting_id),
-                'title': meeting['title'],
-                'committee_name': meeting['committee']['name'],
-                'date': dateutil.parser.parse(meeting['date']).date()
+                'url': meeting.meeting_url,
+                'title': meeting.title,
+                'committee_name': meeting.committee_name,
+                'date': meeting.meeting_date,
             }
 
             if not limit:
-                meeting_summary['summary'] = meeting.get('summary', None)
+                meeting_summary['summary'] = meeting.summary or None
 
             results.append(meeting_summary)
 
@@ -339,10 +258,10 @@ class SAPersonDetail(PersonSpeakerMappingsMixin, PersonDetail):
         return return_data
 
     def get_attendance_data_for_display(self):
-        raw_data = self.download_attendance_data()
-        attendance_by_year = self.get_attendance_stats_raw(raw_data)
+        records = self.get_attendance_records()
+        attendance_by_year = self.get_attendance_stats_raw(records)
         attendance_stats = self.get_attendance_stats(attendance_by_year)
-        latest_meetings_attended = self.get_meetings_attended(raw_data, limit=5)
+        latest_meetings_attended = self.get_meetings_attended(records, limit=5)
 
         return attendance_stats, latest_meetings_attended
 
@@ -405,11 +324,14 @@ class SAPersonDetail(PersonSpeakerMappingsMixin, PersonDetail):
             if party.show_attendance:
                 show_attendance = True
         if show_attendance:
-            try:
-                context['attendance'], context['latest_meetings_attended'] = \
-                    self.get_attendance_data_for_display()
-            except AttendanceAPIDown:
+            # The attendance is only ever read from the database; it's
+            # fetched from the PMG API by south_africa_refresh_pmg_attendance
+            context['attendance_as_of'] = PMGAttendanceRefresh.latest_fetched_at()
+            if context['attendance_as_of'] is None:
                 context['attendance'] = context['latest_meetings_attended'] = \
                     'UNAVAILABLE'
+            else:
+                context['attendance'], context['latest_meetings_attended'] = \
+                    self.get_attendance_data_for_display()
 
         return context
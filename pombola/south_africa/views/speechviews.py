@@ -14,6 +14,7 @@ from haystack.inputs import AutoQuery
 
 from pombola.core import models
 from pombola.core.views import PersonSpeakerMappingsMixin
+from pombola.south_africa.models import SectionSummary
 from pombola.za_hansard.models import Source
 
 from slug_helpers.views import SlugRedirect
@@ -42,15 +43,10 @@ class SASpeechesIndex(NamespaceMixin, TemplateView):
     top_section_name = 'Hansard'
     sections_to_show = 25
 
-    def get_section_filter(self):
+    def get_summary_filter(self):
         # Get the hansard sections using the ZAHansard Source model.
-        section_ids = Source.objects.values('sayit_section_id')
         return {
-            'id__in': section_ids,
-            # exclude sections without subsections
-            'children__speech__id__isnull': False,
-            # and with subsections that have no speeches
-            'children__id__isnull': False
+            'parent_id__in': Source.objects.values('sayit_section_id'),
         }
 
 
@@ -60,32 +56,20 @@ class SASpeechesIndex(NamespaceMixin, TemplateView):
 
         context['show_lateness_warning'] = (self.top_section_name == 'Hansard')
 
-        # As we know that the hansard section structure is
-        # "Hansard" -> yyyy -> mm -> dd -> section -> subsection -> [speeches]
-        # we can create very specific queries to fetch the sections
-        # then the subsections containing the speeches themselves.
-        #
-        # The parent_sections form the headings which are expanded by javascript
-        # to reveal the debate_sections
-        #
-        # FIXME ideally we'd have start_date for sections rather than
-        # having to get MAX('start_date') from the speeches table
+        # The debate sections (the ones with speeches in) are listed
+        # under the headings of their parent sections, which are
+        # expanded by javascript to reveal them. Both come from the
+        # SectionSummary of each debate section, so that the speeches
+        # themselves don't need to be aggregated here.
+        summaries = SectionSummary.objects.filter(**self.get_summary_filter())
 
-        # Use the ZAHansard Source objects to find all of the hansards' 
-        # top-level sections
-
-        section_filter = self.get_section_filter()
-
-        # Select distinct parent sections headings 
-        # (in the case of committee meetings, multiple sections might have the 
+        # Select distinct parent sections headings
+        # (in the case of committee meetings, multiple sections might have the
         # same heading)
-        all_parent_section_headings = Section \
-            .objects \
-            .filter(**section_filter) \
-            .values('heading') \
-            .distinct() \
-            .annotate(latest_start_date=Max('children__speech__start_date')) \
-            .order_by('-latest_start_date')
+        all_parent_section_headings = summaries \
+            .values('parent_heading') \
+            .annotate(latest_start_date=Max('latest_speech_date')) \
+            .order_by('-latest_start_date', 'parent_heading')
 
         # use Paginator to cut this down to the sections for the current page
         paginator = Paginator(all_parent_section_headings, self.sections_to_show)
@@ -95,33 +79,15 @@ class SASpeechesIndex(NamespaceMixin, TemplateView):
             parent_section_headings = paginator.page(1)
         except EmptyPage:
             parent_section_headings = paginator.page(paginator.num_pages)
-        
-        # get the sections for the current page in date order
-        headings = list(section['heading'] for section in parent_section_headings)
-        section_filter['heading__in'] = headings
-        parent_sections = Section \
-            .objects \
-            .values('id', 'heading') \
-            .filter(**section_filter) \
-            .annotate(latest_start_date=Max('children__speech__start_date')) \
-            .order_by('-latest_start_date', 'heading')
 
-        # get the subsections based on the relevant section ids
+        # get the debate sections under the headings for the current page
         # exclude those with blank headings as we have no way of linking to them
-        parent_ids = list(section['id'] for section in parent_sections)
-        debate_sections = Section \
-            .objects \
-            .filter(parent_id__in=parent_ids, speech__id__isnull=False) \
-            .annotate(
-                start_order=Min('speech__id'), 
-                speech_start_date=Max('speech__start_date'), 
-                speech_count=Count('speech__id')) \
+        headings = list(section['parent_heading'] for section in parent_section_headings)
+        debate_sections = summaries \
+            .filter(parent_heading__in=headings) \
             .exclude(heading='') \
-            .select_related(
-                'parent__slug', 'parent__heading'
-                ) \
-            .order_by('-speech_start_date', 'parent__heading', 'start_order')
-        
+            .order_by('-latest_speech_date', 'parent_heading', 'first_speech_id')
+
         context['entries'] = debate_sections
         context['page_obj'] = parent_section_headings
         context['top_section_name'] = self.top_section_name
@@ -139,15 +105,11 @@ class SACommitteeIndex(SASpeechesIndex):
     top_section_name = 'Committee Minutes'
     sections_to_show = 25
 
-    def get_section_filter(self):
+    def get_summary_filter(self):
         top_section = get_object_or_404(
             Section, heading=self.top_section_name, parent=None)
         return {
-            'parent__parent': top_section,
-            # exclude sections without subsections
-            'children__speech__id__isnull': False,
-            # and with subsections that have no speeches
-            'children__id__isnull': False
+            'grandparent__parent': top_section,
         }
 
 
@@ -0,0 +1,24 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from pombola.wordcloud.models import EntryWordCount
+
+
+class Command(NoArgsCommand):
+    """Recount the words in every hansard entry for the wordcloud.
+
+    The counts are updated as entries are imported, so this is only
+    needed when the wordcloud app is first set up, or after the stop
+    words have been changed.
+    """
+
+    help = 'Rebuild the word counts used by the wordcloud'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int', default=1000,
+            help='The number of entries to count at a time'),
+    )
+
+    def handle_noargs(self, **options):
+        EntryWordCount.objects.rebuild(batch_size=options['batch_size'])
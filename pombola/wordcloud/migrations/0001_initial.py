@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hansard', '0005_populate_personappearancesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryWordCount',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('sitting_start_date', models.DateField(db_index=True)),
+                ('word', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField()),
+                ('entry', models.ForeignKey(related_name='word_counts', to='hansard.Entry')),
+            ],
+        ),
+    ]
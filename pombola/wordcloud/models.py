@@ -0,0 +1,108 @@
+from django.db import models, transaction
+from django.db.models.signals import post_save
+
+from pombola.hansard.models import Entry
+from pombola.hansard.signals import entries_created
+
+from .wordcloud import count_words
+
+
+class EntryWordCountManager(models.Manager):
+
+    def counts_for_entries(self, entries):
+        """Return unsaved EntryWordCounts for the entries in a queryset"""
+        rows = entries.order_by().values_list('id', 'content', 'sitting__start_date')
+        word_counts = []
+        for entry_id, content, start_date in rows.iterator():
+            for word, count in count_words(content).items():
+                word_counts.append(self.model(
+                    entry_id=entry_id,
+                    sitting_start_date=start_date,
+                    word=word,
+                    count=count,
+                ))
+        return word_counts
+
+    def update_for_entries(self, entries):
+        """Recount the words in the entries in a queryset"""
+        with transaction.atomic():
+            self.filter(entry__in=entries.values('id')).delete()
+            self.bulk_create(self.counts_for_entries(entries), batch_size=1000)
+
+    def rebuild(self, batch_size=1000):
+        """Recount the words in every entry, a batch of entries at a time"""
+        with transaction.atomic():
+            self.all().delete()
+            entry_ids = list(
+                Entry.objects.order_by('id').values_list('id', flat=True))
+            for i in range(0, len(entry_ids), batch_size):
+                batch = entry_ids[i:i + batch_size]
+                self.bulk_create(
+                    self.counts_for_entries(
+                        Entry.objects.filter(id__gte=batch[0], id__lte=batch[-1])),
+                    batch_size=1000,
+                )
+
+    def word_totals(self, max_entries=None, start_date=None, end_date=None):
+        """Return dicts of each word and its total count, most common first
+
+        The counts are for the max_entries most recent entries from
+        sittings between start_date and end_date."""
+        word_counts = self.all()
+        if start_date:
+            word_counts = word_counts.filter(sitting_start_date__gte=start_date)
+        if end_date:
+            word_counts = word_counts.filter(sitting_start_date__lte=end_date)
+        if max_entries is not None:
+            entries = Entry.objects.all()
+            if start_date:
+                entries = entries.filter(sitting__start_date__gte=start_date)
+            if end_date:
+                entries = entries.filter(sitting__start_date__lte=end_date)
+            entry_ids = list(
+                entries
+                .order_by('-sitting__start_date', '-id')
+                .values_list('id', flat=True)[:max_entries]
+            )
+            word_counts = word_counts.filter(entry__in=entry_ids)
+        return (
+            word_counts
+            .values('word')
+            .annotate(total=models.Sum('count'))
+            .order_by('-total', 'word')
+        )
+
+
+class EntryWordCount(models.Model):
+    """The number of times a word is used in a hansard entry
+
+    Stop words aren't stored. These are kept up to date as entries are
+    imported or saved, and can be rebuilt with
+    wordcloud_rebuild_word_counts (which is needed if the stop words
+    change)."""
+
+    entry = models.ForeignKey(Entry, related_name='word_counts')
+    # A copy of entry.sitting.start_date, so that date ranges can be
+    # counted without joining to the sittings:
+    sitting_start_date = models.DateField(db_index=True)
+    word = models.CharField(max_length=100)
+    count = models.PositiveIntegerField()
+
+    objects = EntryWordCountManager()
+
+    def __unicode__(self):
+        return "%s: %s" % (self.word, self.count)
+
+
+def update_word_counts_for_sitting(sender, sitting, **kwargs):
+    EntryWordCount.objects.update_for_entries(sitting.entry_set.all())
+
+entries_created.connect(update_word_counts_for_sitting)
+
+
+def update_word_counts_for_entry(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    EntryWordCount.objects.update_for_entries(Entry.objects.filter(id=instance.id))
+
+post_save.connect(update_word_counts_for_entry, sender=Entry)
@@ -1,36 +1,63 @@
 # coding=UTF-8
-from mock import patch, Mock
+from datetime import date
+import json
 
+from django.core.urlresolvers import reverse
 from django.test import TestCase
 
+from pombola.hansard.models import Entry, Sitting, Source, Venue
+from pombola.hansard.signals import entries_created
+from pombola.wordcloud.models import EntryWordCount
 from pombola.wordcloud.wordcloud import popular_words
 
 
-def debug_print():
-    print 'DEBUGGING'
+class TestPopularWords(TestCase):
 
+    def setUp(self):
+        self.venue = Venue.objects.create(
+            name='National Assembly',
+            slug='national_assembly',
+        )
+        self.counter = 0
 
-@patch('pombola.wordcloud.wordcloud.recent_entries')
-class TestPopularWords(TestCase):
-    def make_entries(self, recent_entries, text_entries):
-        recent_entries.return_value = [
-            Mock(**{'object.content': x}) for x in text_entries
-            ]
+    def make_entries(self, text_entries, start_date=date(2016, 3, 1)):
+        source = Source.objects.create(
+            name='Source for {0}'.format(start_date),
+            date=start_date,
+        )
+        sitting = Sitting.objects.create(
+            source=source,
+            venue=self.venue,
+            start_date=start_date,
+        )
+        entries = []
+        for text in text_entries:
+            self.counter += 1
+            entries.append(Entry(
+                sitting=sitting,
+                type='speech',
+                page_number=1,
+                text_counter=self.counter,
+                content=text,
+            ))
+        # Create them the way that KenyaParser does:
+        Entry.objects.bulk_create(entries)
+        entries_created.send(sender=Entry, sitting=sitting)
 
-    def test_popular_words_punctuation(self, recent_entries):
+    def test_popular_words_punctuation(self):
         text_entries = [
             'Testing! Testing!',
             'Testing again.',
             ]
 
-        self.make_entries(recent_entries, text_entries)
+        self.make_entries(text_entries)
 
         self.assertEqual(
             [{'text': 'testing', 'link': '/search/hansard/?q=testing', 'weight': 3}],
             popular_words(),
             )
 
-    def test_popular_words(self, recent_entries):
+    def test_popular_words(self):
         text_entries = [
             'As well as issuing 107 formal notices to underperforming academies, '
             'we have intervened and changed the sponsor in 75 cases of particular '
@@ -41,38 +68,95 @@ class TestPopularWords(TestCase):
             'be inadequate.',
             ]
 
-        self.make_entries(recent_entries, text_entries)
+        self.make_entries(text_entries)
 
         words = popular_words()
 
+        # Words with the same weight are in alphabetical order:
         expected = [
             {'text': 'academies', 'link': '/search/hansard/?q=academies', 'weight': 2},
+            {'text': '107', 'link': '/search/hansard/?q=107', 'weight': 1},
+            {'text': '75', 'link': '/search/hansard/?q=75', 'weight': 1},
+            {'text': 'academy', 'link': '/search/hansard/?q=academy', 'weight': 1},
+            {'text': 'cases', 'link': '/search/hansard/?q=cases', 'weight': 1},
             {'text': 'changed', 'link': '/search/hansard/?q=changed', 'weight': 1},
-            {'text': 'underperforming', 'link': '/search/hansard/?q=underperforming', 'weight': 1},
+            {'text': 'commissioner', 'link': '/search/hansard/?q=commissioner', 'weight': 1},
+            {'text': 'concern', 'link': '/search/hansard/?q=concern', 'weight': 1},
+            {'text': 'constituency', 'link': '/search/hansard/?q=constituency', 'weight': 1},
+            {'text': 'evident', 'link': '/search/hansard/?q=evident', 'weight': 1},
+            {'text': 'failing', 'link': '/search/hansard/?q=failing', 'weight': 1},
+            {'text': 'formal', 'link': '/search/hansard/?q=formal', 'weight': 1},
             {'text': 'inadequate', 'link': '/search/hansard/?q=inadequate', 'weight': 1},
-            {'text': 'sponsor', 'link': '/search/hansard/?q=sponsor', 'weight': 1},
+            {'text': 'interested', 'link': '/search/hansard/?q=interested', 'weight': 1},
+            {'text': 'intervened', 'link': '/search/hansard/?q=intervened', 'weight': 1},
             {'text': 'intervention', 'link': '/search/hansard/?q=intervention', 'weight': 1},
+            {'text': 'involved', 'link': '/search/hansard/?q=involved', 'weight': 1},
+            {'text': 'issuing', 'link': '/search/hansard/?q=issuing', 'weight': 1},
             {'text': 'judges', 'link': '/search/hansard/?q=judges', 'weight': 1},
-            {'text': 'ofsted', 'link': '/search/hansard/?q=ofsted', 'weight': 1},
-            {'text': '107', 'link': '/search/hansard/?q=107', 'weight': 1},
-            {'text': 'interested', 'link': '/search/hansard/?q=interested', 'weight': 1},
+            {'text': 'lady', 'link': '/search/hansard/?q=lady', 'weight': 1},
             {'text': 'notices', 'link': '/search/hansard/?q=notices', 'weight': 1},
-            {'text': 'concern', 'link': '/search/hansard/?q=concern', 'weight': 1},
-            {'text': 'commissioner', 'link': '/search/hansard/?q=commissioner', 'weight': 1},
-            {'text': 'intervened', 'link': '/search/hansard/?q=intervened', 'weight': 1},
-            {'text': 'academy', 'link': '/search/hansard/?q=academy', 'weight': 1},
+            {'text': 'ofsted', 'link': '/search/hansard/?q=ofsted', 'weight': 1},
             {'text': 'regional', 'link': '/search/hansard/?q=regional', 'weight': 1},
-            {'text': '75', 'link': '/search/hansard/?q=75', 'weight': 1},
             {'text': 'schools', 'link': '/search/hansard/?q=schools', 'weight': 1},
-            {'text': 'cases', 'link': '/search/hansard/?q=cases', 'weight': 1},
-            {'text': 'lady', 'link': '/search/hansard/?q=lady', 'weight': 1},
-            {'text': 'issuing', 'link': '/search/hansard/?q=issuing', 'weight': 1},
-            {'text': 'formal', 'link': '/search/hansard/?q=formal', 'weight': 1},
-            {'text': 'evident', 'link': '/search/hansard/?q=evident', 'weight': 1},
-            {'text': 'involved', 'link': '/search/hansard/?q=involved', 'weight': 1},
-            {'text': 'failing', 'link': '/search/hansard/?q=failing', 'weight': 1},
-            {'text': 'constituency', 'link': '/search/hansard/?q=constituency', 'weight': 1},
+            {'text': 'sponsor', 'link': '/search/hansard/?q=sponsor', 'weight': 1},
+            {'text': 'underperforming', 'link': '/search/hansard/?q=underperforming', 'weight': 1},
             ]
 
-        # I guess this is slightly fragile and relies on the ordering being preserved.
         self.assertEqual(words, expected)
+
+    def test_max_entries_and_dates(self):
+        self.make_entries(['Budget budget'], start_date=date(2016, 1, 5))
+        self.make_entries(['Budget roads'], start_date=date(2016, 2, 5))
+        self.make_entries(['Roads'], start_date=date(2016, 3, 5))
+
+        def weights(words):
+            return dict((w['text'], w['weight']) for w in words)
+
+        self.assertEqual(
+            weights(popular_words(max_entries=2)),
+            {'roads': 2, 'budget': 1},
+        )
+        self.assertEqual(
+            weights(popular_words(max_entries=None, end_date=date(2016, 2, 28))),
+            {'budget': 3, 'roads': 1},
+        )
+        self.assertEqual(
+            weights(popular_words(
+                max_entries=None,
+                start_date=date(2016, 2, 1),
+                end_date=date(2016, 2, 28))),
+            {'budget': 1, 'roads': 1},
+        )
+
+    def test_saving_an_entry_updates_counts(self):
+        self.make_entries(['Budget budget'])
+        entry = Entry.objects.get()
+        entry.content = 'Roads'
+        entry.save()
+
+        self.assertEqual(
+            list(EntryWordCount.objects.values_list('word', 'count')),
+            [('roads', 1)],
+        )
+
+    def test_rebuild(self):
+        self.make_entries(['Budget budget', 'Budget roads'])
+        EntryWordCount.objects.all().delete()
+
+        EntryWordCount.objects.rebuild(batch_size=1)
+
+        self.assertEqual(
+            [(w['text'], w['weight']) for w in popular_words()],
+            [('budget', 3), ('roads', 1)],
+        )
+
+    def test_view_date_range(self):
+        self.make_entries(['Budget'], start_date=date(2016, 1, 5))
+        self.make_entries(['Roads'], start_date=date(2016, 3, 5))
+
+        response = self.client.get(
+            reverse('wordcloud'), {'from': '2016-03-01', 'to': '2016-03-31'})
+        self.assertEqual(
+            [w['text'] for w in json.loads(response.content)],
+            ['roads'],
+        )
@@ -1,38 +1,40 @@
 import json
-import os
 
-from django.conf import settings
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.utils.dateparse import parse_date
 from django.views.decorators.cache import cache_page
 
 from .wordcloud import popular_words
 
 
-@cache_page(60*60*4)
-def wordcloud(request, max_entries=30):
-    """ Return tag cloud JSON results"""
+DEFAULT_MAX_ENTRIES = 30
 
-    max_entries = int(max_entries)
-    leaf_name = 'wordcloud-{0}.json'.format(max_entries)
-    subdir = 'wordcloud_cache'
-    cache_path = os.path.join(
-        settings.MEDIA_ROOT, subdir, leaf_name
-    )
-    if os.path.exists(cache_path):
-        response = HttpResponse(json.dumps({
-            'error':
-            ("If you can see this, then X-SendFile (for Apache) or "
-             "X-Accel-Redirect (for Nginx) isn't set up correctly in "
-             "your webserver's configuration.")
-        }))
-        response['Content-Type'] = 'application/json'
-        response['X-Sendfile'] = cache_path.encode('utf-8')
-        response['X-Accel-Redirect'] = '/media_root/{0}/{1}'.format(
-            subdir, leaf_name
-        )
-        return response
-
-    content = json.dumps(popular_words(max_entries=max_entries))
+
+@cache_page(60*60)
+def wordcloud(request, max_entries=None):
+    """ Return tag cloud JSON results
+
+    The optional 'from' and 'to' query parameters (YYYY-MM-DD) restrict
+    the words to entries from sittings in that range. With a date range
+    and no max_entries in the URL, all the entries in the range are
+    included."""
+
+    try:
+        start_date = parse_date(request.GET.get('from', ''))
+        end_date = parse_date(request.GET.get('to', ''))
+    except ValueError:
+        return HttpResponseBadRequest('Bad date in from or to')
+
+    if max_entries is not None:
+        max_entries = int(max_entries)
+    elif not (start_date or end_date):
+        max_entries = DEFAULT_MAX_ENTRIES
+
+    content = json.dumps(popular_words(
+        max_entries=max_entries,
+        start_date=start_date,
+        end_date=end_date,
+    ))
 
     return HttpResponse(
         content,
@@ -1,43 +1,49 @@
+from collections import Counter
 import os
-from operator import itemgetter
 import re
 
-from haystack.query import SearchQuerySet
-from pombola.hansard import models as hansard_models
-
 
 BASEDIR = os.path.dirname(__file__)
 # normal english stop words and hansard-centric words to ignore
 with open(os.path.join(BASEDIR, 'stopwords.txt'), 'rU') as f:
     STOP_WORDS = set(f.read().splitlines())
 
-def recent_entries(max_entries=10):
-    return SearchQuerySet().models(hansard_models.Entry).order_by('-sitting_start_date')[:max_entries]
-
-
-def popular_words(max_entries=10, max_words=50):
-    sqs = recent_entries(max_entries)
-
-    # Generate tag cloud from content of returned entries
-    words = {}
-    for entry in sqs:
-        text = re.sub(ur'[^\w\s]', '', entry.object.content.lower())
-
-        for x in text.split():
-            if x not in STOP_WORDS:
-                words[x] = 1 + words.get(x, 0)
-
-    wordlist = []
-
-    for word in words:
-        wordlist.append(
-            {
-                "text": word,
-                "weight": words.get(word),
-                "link": "/search/hansard/?q=%s" % word,
-                }
-            )
-
-    wordlist.sort(key=itemgetter('weight'), reverse=True)
-
-    return wordlist[:max_words]
+# Longer "words" than this are junk from the PDF conversion, and aren't
+# stored.
+MAX_WORD_LENGTH = 100
+
+
+def count_words(text):
+    """Return a Counter of the words in text that aren't stop words"""
+    text = re.sub(ur'[^\w\s]', '', text.lower())
+    return Counter(
+        x for x in text.split()
+        if x not in STOP_WORDS and len(x) <= MAX_WORD_LENGTH
+    )
+
+
+def popular_words(max_entries=10, max_words=50, start_date=None, end_date=None):
+    """Return the most common words in the most recent hansard entries
+
+    The words are counted from the stored EntryWordCount rows rather
+    than the text of the entries. If start_date or end_date are given,
+    only entries from sittings in that range are included, and
+    max_entries can be None to include all of them."""
+
+    # import here to avoid creating an import loop
+    from pombola.wordcloud.models import EntryWordCount
+
+    counts = EntryWordCount.objects.word_totals(
+        max_entries=max_entries,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+    return [
+        {
+            "text": c['word'],
+            "weight": c['total'],
+            "link": "/search/hansard/?q=%s" % c['word'],
+        }
+        for c in counts[:max_words]
+    ]
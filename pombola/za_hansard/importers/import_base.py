@@ -1,10 +1,14 @@
+from collections import OrderedDict
 import logging
+import time
 
 from django.core.exceptions import ObjectDoesNotExist
 
 from popolo_name_resolver.resolve import ResolvePopoloName
 from speeches.models import Speaker
 
+from pombola.south_africa.models import SectionSummary
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,8 +29,100 @@ class AllowedPersonFilter(object):
         return pombola_person_id not in self.pombola_id_blacklist
 
 
+class NameResolutionIndex(object):
+    """
+    Name resolvers and resolved speakers shared by several importers.
+
+    A command that imports many documents can pass one of these to each
+    of its importers, so that a resolver is only built once for each
+    date, a name that has been resolved for a date isn't looked up
+    again, and the speakers of the SayIt instance are loaded in one
+    query rather than one for each name that couldn't be resolved.
+
+    Only speakers that already existed are shared; the speakers an
+    importer creates are only cached by that importer, in case the
+    document it is importing fails and they are rolled back.
+    """
+
+    def __init__(self, max_resolvers=50, max_speakers=10000):
+        self.resolvers = OrderedDict()
+        self.max_resolvers = max_resolvers
+        self.speakers = OrderedDict()
+        self.max_speakers = max_speakers
+        self.speakers_by_instance = {}
+        self.speakers_by_slug = {}
+
+    @staticmethod
+    def lru_get(cache, key):
+        value = cache.pop(key, None)
+        if value is not None:
+            cache[key] = value
+        return value
+
+    @staticmethod
+    def lru_set(cache, key, value, max_size):
+        cache.pop(key, None)
+        cache[key] = value
+        if len(cache) > max_size:
+            cache.popitem(last=False)
+
+    def get_resolver(self, date_string, date, pombola_id_blacklist):
+        key = (date_string, date, frozenset(pombola_id_blacklist or ()))
+        resolver = self.lru_get(self.resolvers, key)
+        if resolver is None:
+            resolver = ResolvePopoloName(
+                date=date,
+                date_string=date_string,
+                person_filter=AllowedPersonFilter(pombola_id_blacklist),
+            )
+            self.lru_set(self.resolvers, key, resolver, self.max_resolvers)
+        return key, resolver
+
+    def get_resolved_speaker(self, key):
+        return self.lru_get(self.speakers, key)
+
+    def set_resolved_speaker(self, key, speaker):
+        self.lru_set(self.speakers, key, speaker, self.max_speakers)
+
+    def get_speaker_by_slug(self, pombola_person_slug):
+        if pombola_person_slug not in self.speakers_by_slug:
+            self.speakers_by_slug[pombola_person_slug] = Speaker.objects.filter(
+                identifiers__scheme='pombola_person_slug',
+                identifiers__identifier=pombola_person_slug).first()
+        return self.speakers_by_slug[pombola_person_slug]
+
+    def instance_speakers(self, instance):
+        """Return dicts of the instance's speakers by id and by name"""
+        instance_id = instance.id if instance else None
+        if instance_id not in self.speakers_by_instance:
+            by_id = {}
+            by_name = {}
+            # Where several speakers have the same name, use the oldest.
+            for speaker in Speaker.objects.filter(instance=instance).order_by('-id'):
+                by_id[speaker.id] = speaker
+                by_name[speaker.name] = speaker
+            self.speakers_by_instance[instance_id] = (by_id, by_name)
+        return self.speakers_by_instance[instance_id]
+
+    def get_speaker_for_person(self, instance, person):
+        by_id, by_name = self.instance_speakers(instance)
+        return by_id.get(person.id) or person.speaker
+
+    def get_speaker_by_name(self, instance, name):
+        by_id, by_name = self.instance_speakers(instance)
+        speaker = by_name.get(name)
+        if speaker is None:
+            # It may have been created since the speakers were loaded.
+            speaker = Speaker.objects.filter(
+                instance=instance, name=name).order_by('id').first()
+            if speaker is not None:
+                by_id[speaker.id] = speaker
+                by_name[name] = speaker
+        return speaker
+
+
 class ImportZAMixin(object):
-    def __init__(self, instance=None, commit=True, pombola_id_blacklist=None, **kwargs):
+    def __init__(self, instance=None, commit=True, pombola_id_blacklist=None, name_index=None, **kwargs):
         super(ImportZAMixin, self).__init__(
             instance=instance,
             commit=commit,
@@ -34,14 +130,33 @@ class ImportZAMixin(object):
         )
         self.person_cache = {}
         self.pombola_id_blacklist = pombola_id_blacklist
+        self.name_index = name_index or NameResolutionIndex()
+        self.resolver_key = None
+        self.reset_resolution_stats()
 
     def set_resolver_for_date(self, date_string='', date=None):
-        self.resolver = ResolvePopoloName(
-            date=date,
-            date_string=date_string,
-            person_filter=AllowedPersonFilter(self.pombola_id_blacklist),
+        self.resolver_key, self.resolver = self.name_index.get_resolver(
+            date_string, date, self.pombola_id_blacklist)
+        self.reset_resolution_stats()
+
+    def reset_resolution_stats(self):
+        self.resolution_lookups = 0
+        self.resolution_cache_hits = 0
+        self.resolution_time = 0.0
+
+    def resolution_summary(self):
+        """Describe the name resolution for the last document imported"""
+        return "Resolved {0} names ({1} from cache) in {2:.2f}s".format(
+            self.resolution_lookups,
+            self.resolution_cache_hits,
+            self.resolution_time,
         )
 
+    def update_section_summaries(self, section):
+        """Bring the summaries of the imported section and those below it up to date"""
+        if self.commit:
+            SectionSummary.objects.update_for_tree(section)
+
     def debug_output_csv_row(self, pombola_person_slug, from_cache, our_speaker, speaker_from_slug):
         '''A method to help produce data for analyzing name resolution results'''
         import csv
@@ -58,21 +173,31 @@ class ImportZAMixin(object):
             ])
 
     def get_person(self, name, party, pombola_person_slug=None):
+        start = time.time()
+        try:
+            return self.resolve_person(name, party, pombola_person_slug)
+        finally:
+            self.resolution_lookups += 1
+            self.resolution_time += time.time() - start
+
+    def resolve_person(self, name, party, pombola_person_slug):
 
         # If we can directly find the person from the
         # pombola_person_slug, use that - the Code4SA / PMG
         # identification of speakers seems to be better than that from
         # popolo_name_resolver.
-        speaker_from_slug = None
         if pombola_person_slug is not None:
-            speaker_from_slug = Speaker.objects.filter(
-                identifiers__scheme='pombola_person_slug',
-                identifiers__identifier=pombola_person_slug).first()
+            speaker_from_slug = self.name_index.get_speaker_by_slug(
+                pombola_person_slug)
             if speaker_from_slug:
                 return speaker_from_slug
 
-        cached = self.person_cache.get(name, None)
+        key = (self.instance.id if self.instance else None,
+               self.resolver_key, name, party)
+        cached = self.person_cache.get(key) \
+            or self.name_index.get_resolved_speaker(key)
         if cached:
+            self.resolution_cache_hits += 1
             return cached
 
         display_name = name or '(narrative)'
@@ -83,16 +208,19 @@ class ImportZAMixin(object):
         if name:
             person = self.resolver.get_person(display_name, party)
             if person:
-                speaker = person.speaker
+                speaker = self.name_index.get_speaker_for_person(
+                    self.instance, person)
 
         if not speaker:
-            try:
-                speaker = Speaker.objects.get(
-                    instance=self.instance, name=display_name)
-            except Speaker.DoesNotExist:
-                speaker = Speaker(instance=self.instance, name=display_name)
-                if self.commit:
-                    speaker.save()
-
-        self.person_cache[name] = speaker
+            speaker = self.name_index.get_speaker_by_name(
+                self.instance, display_name)
+
+        if speaker:
+            self.name_index.set_resolved_speaker(key, speaker)
+        else:
+            speaker = Speaker(instance=self.instance, name=display_name)
+            if self.commit:
+                speaker.save()
+            self.person_cache[key] = speaker
+
         return speaker
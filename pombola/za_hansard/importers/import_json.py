@@ -131,6 +131,7 @@ class ImportJson (ImportZAMixin, ImporterBase):
                         name=tagname, instance=self.instance)
                     speech.tags.add(tag)
 
+        self.update_section_summaries(section)
         return section
 
     def format_date(self, date_string):
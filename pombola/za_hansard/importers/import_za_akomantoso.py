@@ -60,6 +60,7 @@ class ImportZAAkomaNtoso(ImportZAMixin, ImportAkomaNtoso):
 
         self.visit(mainSection, section)
         self.imported_section_ids.add(section.id)
+        self.update_section_summaries(section)
         return section
 
     def name_display(self, name):
@@ -4,8 +4,10 @@ import pytz
 import time
 import sys
 
+from pombola.za_hansard.importers.import_base import NameResolutionIndex
 from pombola.za_hansard.importers.import_za_akomantoso import ImportZAAkomaNtoso
 from speeches.models import Section, Tag, Speech
+from pombola.south_africa.models import SectionSummary
 from pombola.za_hansard.models import Source
 from instances.models import Instance
 
@@ -85,6 +87,8 @@ class Command(BaseCommand):
         hansard_tag, hansard_tag_created = Tag.objects.get_or_create(
             instance=instance, name="hansard")
 
+        name_index = NameResolutionIndex()
+
         sources = sources[:limit] if limit else sources.all()
         for s in sources.iterator():
 
@@ -93,7 +97,8 @@ class Command(BaseCommand):
                 continue
 
             importer = ImportZAAkomaNtoso(instance=instance,
-                                          section_parent_headings=s.section_parent_headings)
+                                          section_parent_headings=s.section_parent_headings,
+                                          name_index=name_index)
             try:
                 self.stdout.write("TRYING %s\n" % path)
                 section = importer.import_document(path)
@@ -101,6 +106,7 @@ class Command(BaseCommand):
                 self.stderr.write('WARN: failed to import %d: %s' %
                                   (s.id, str(e)))
                 continue
+            self.stdout.write("%s\n" % importer.resolution_summary())
 
             section_ids.append(section.id)
             s.sayit_section = section
@@ -110,6 +116,11 @@ class Command(BaseCommand):
             for speech in section.descendant_speeches():
                 speech.tags.add(hansard_tag)
 
+        if options['delete_existing']:
+            # Sections whose speeches were deleted but not reimported
+            # need their summaries removing too.
+            SectionSummary.objects.rebuild()
+
         self.stdout.write('Imported %d / %d sections\n' %
                           (len(section_ids), len(sources)))
 
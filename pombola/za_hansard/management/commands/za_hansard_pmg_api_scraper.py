@@ -1,23 +1,34 @@
 from bs4 import BeautifulSoup, NavigableString
+from collections import deque
 import csv
 from datetime import datetime, timedelta
 import errno
+import hashlib
+from itertools import islice, izip
 import json
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 from optparse import make_option
 import os
 from os.path import dirname, join, exists
 from pytz.tzinfo import StaticTzInfo
 import re
+import tempfile
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 
 from instances.models import Instance
 
 import pombola.za_hansard.chairperson as chair
 from pombola.za_hansard.chairperson import strip_tags_from_html
 from pombola.za_hansard.datejson import DateEncoder
+from pombola.za_hansard.importers.import_base import NameResolutionIndex
 from pombola.za_hansard.importers.import_json import ImportJson
 from pombola.za_hansard.models import PMGCommitteeAppearance, PMGCommitteeReport
 
@@ -38,6 +49,10 @@ committee_mapping_filename = join(
 )
 
 source_cache_directory = join(settings.COMMITTEE_CACHE, 'meetings')
+api_cache_directory = join(settings.COMMITTEE_CACHE, 'api')
+checkpoint_filename = join(settings.COMMITTEE_CACHE, 'scrape-checkpoint.txt')
+
+REQUEST_TIMEOUT = 60
 
 name_part_re_str = r'(?:[A-Z][-a-zA-Z]*|van|de|den|der|[A-Z]\.)'
 final_name_part_re_str = r'(?:[A-Z][-a-zA-Z]*)'
@@ -77,32 +92,130 @@ def mkdir_p(path):
 
 
 mkdir_p(source_cache_directory)
+mkdir_p(api_cache_directory)
 
 
-def get_authenticated(url):
-    """A wrapper for python-requests's get, but with the API auth header"""
+class RateLimiter(object):
+    """Space out calls to wait(), from any thread, to `rate` a second"""
 
-    return requests.get(
-        url,
-        headers={
-            'Authentication-Token': settings.PMG_API_KEY,
-        }
-    )
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PMGAPIClient(object):
+    """Make authenticated requests to the PMG API
+
+    Connections are reused between requests, which can be made from
+    several threads at once, and are rate limited. Responses that come
+    with an ETag or Last-Modified header are cached on disk, and later
+    requests for the same URL are conditional, so that unchanged
+    committees aren't downloaded again."""
+
+    def __init__(self, workers=1, requests_per_second=None,
+                 cache_directory=api_cache_directory):
+        self.session = requests.Session()
+        self.session.headers['Authentication-Token'] = settings.PMG_API_KEY
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.cache_directory = cache_directory
+
+    def cache_filename(self, url):
+        return join(self.cache_directory, hashlib.sha1(url).hexdigest() + '.json')
+
+    def get_json(self, url):
+        """Return parsed JSON from an authenticated GET request"""
 
+        filename = self.cache_filename(url)
+        cached = None
+        try:
+            with open(filename) as f:
+                cached = json.load(f)
+        except (IOError, ValueError):
+            pass
+
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        self.rate_limiter.wait()
+        response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if cached and response.status_code == 304:
+            return cached['data']
+        response.raise_for_status()
+        data = response.json()
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            # Write to a temporary file first, so that an interrupted
+            # write never leaves a truncated cache file.
+            fd, temp_filename = tempfile.mkstemp(dir=self.cache_directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'data': data,
+                }, f)
+            os.rename(temp_filename, filename)
+        return data
+
+
+class ScrapeCheckpoint(object):
+    """The IDs of the meetings that a scrape has finished with
+
+    These are appended to a file as each meeting is done, so that an
+    interrupted scrape can be resumed without handling them again. If
+    record is False (as for a run without --commit), the file is only
+    read, so that it's kept for resuming the scrape that wrote it."""
+
+    def __init__(self, filename, resume=False, record=True):
+        self.completed = set()
+        if resume:
+            try:
+                with open(filename) as f:
+                    self.completed = set(int(l) for l in f if l.strip())
+            except IOError:
+                pass
+        self.f = None
+        if record:
+            self.f = open(filename, 'a' if resume else 'w')
 
-def get_authenticated_json(url, cache_filename=None):
-    """Return parsed JSON from an authenticated GET request"""
+    def __contains__(self, meeting_id):
+        return meeting_id in self.completed
 
-    return get_authenticated(url).json()
+    def add(self, meeting_id):
+        self.completed.add(meeting_id)
+        if self.f:
+            self.f.write('{0}\n'.format(meeting_id))
+            self.f.flush()
 
+    def close(self):
+        if self.f:
+            self.f.close()
 
-def all_committees():
+
+def all_committees(client):
     """A generator function to yield all committees from the PMG API"""
 
     page = 0
     url_format = 'https://api.pmg.org.za/committee/?page={0}'
     while True:
-        results = get_authenticated_json(url_format.format(page))['results']
+        results = client.get_json(url_format.format(page))['results']
         if not results:
             break
         for result in results:
@@ -249,6 +362,93 @@ def is_apologies_statement(appearance_text):
         ('The Chairperson noted the apologies of' in appearance_text)
 
 
+def parse_appearances(meeting_id, body, api_chairperson):
+    """Find the appearances in the body of a meeting report
+
+    Returns a tuple of the names of the chairpeople and a list of
+    (text, name, party, chair) tuples, one for each appearance. This
+    doesn't use the database, so it can be run in a worker process."""
+
+    write_prettified_html(body, meeting_id, 'meeting-body')
+    body = re.sub(r'&nbsp;', ' ', body)
+    body = strip_tags_from_html(body)
+    soup = write_prettified_html(body, meeting_id, 'meeting-body-bleached')
+    chairpeople = api_chairperson or find_chairpeople(soup)
+
+    appearances = []
+
+    chairperson_name_matches = []
+    if chairpeople:
+        chairperson_name_matches = get_names_from_appearance(
+            chairpeople, allow_no_party=True
+        )
+
+    def get_appearance(text, name='', party='', chair=False, **kwargs):
+        return (text, name, party, chair)
+
+    found_chairperson_appearances = False
+
+    # Consider as a (real) appearance any navigable string right
+    # under a <p>:
+    for p in soup.find_all('p'):
+        for appearance in p.children:
+            if not isinstance(appearance, NavigableString):
+                continue
+            # Ignore whitespace only:
+            appearance = appearance.strip()
+            if not appearance:
+                continue
+            # Don't try to match names in a list of apologies;
+            # it'll make an appearance for that person when they
+            # weren't there:
+            if is_apologies_statement(appearance):
+                continue
+            # The first time "The Chairperson" is mentioned,
+            # create an appearance for each of the chairpersons'
+            # names:
+            if ('The Chairperson' in appearance and
+                    not found_chairperson_appearances):
+                found_chairperson_appearances = True
+                for name_match in chairperson_name_matches:
+                    appearances.append(
+                        get_appearance(
+                            appearance,
+                            chair=True,
+                            **name_match.groupdict()
+                        )
+                    )
+            # Now add any normal name matches:
+            for name_match in get_names_from_appearance(appearance):
+                appearances.append(
+                    get_appearance(appearance, **name_match.groupdict())
+                )
+
+    if not found_chairperson_appearances:
+        # If there were no appearances from 'The Chairperson' make
+        # sure there's at least a 'pseudo-appearance' saying that
+        # they chaired the meeting.
+        appearances = [
+            get_appearance(
+                '{0} chaired the meeting'.format(
+                    format_name_match(name_match)
+                ),
+                **name_match.groupdict()
+            ) for name_match in chairperson_name_matches
+        ] + appearances
+
+    chairperson_names = [
+        format_name_match(name_match)
+        for name_match in chairperson_name_matches
+    ]
+    return chairperson_names, appearances
+
+
+def parse_event_appearances(args):
+    """parse_appearances for Pool.imap, which passes a single argument"""
+
+    return parse_appearances(*args)
+
+
 # Modified from http://stackoverflow.com/a/15516170/223092
 class TimezoneOffset(StaticTzInfo):
 
@@ -306,22 +506,39 @@ class Command(BaseCommand):
         make_option('--meeting',
                     type='int',
                     help='Only process the meeting with this ID',
-                    )
+                    ),
+        make_option('--workers',
+                    type='int',
+                    default=1,
+                    help='The number of API requests to make, and of meetings to parse, at once (with --scrape)',
+                    ),
+        make_option('--requests-per-second',
+                    type='float',
+                    default=5,
+                    help='The most API requests to make a second (with --scrape)',
+                    ),
+        make_option('--resume',
+                    default=False,
+                    action='store_true',
+                    help='Skip the meetings that an interrupted scrape with --commit had finished (with --scrape)',
+                    ),
     )
 
-    def handle_committee(self, committee):
+    def handle_committee(self, committee, full_committee_results):
         self.stdout.write("=======================================\n")
         self.stdout.write(
             u"handling committee: {0}\n".format(committee['name']))
-        full_committee_results = get_authenticated_json(committee['url'])
 
         if 'events' not in full_committee_results:
             self.stdout.write("No events for that committee!\n")
             return
 
+        to_parse = []
         for i, event in enumerate(full_committee_results['events']):
             if not (self.process_all_meetings or self.specified_meeting(event['id'])):
                 continue
+            if event['id'] in self.checkpoint:
+                continue
             self.stdout.write(u"committee {0}\n".format(committee['name']))
             msg = "api_committee_id {0} api_meeting_id {1}\n"
             self.stdout.write(msg.format(committee['id'], event['id']))
@@ -329,6 +546,7 @@ class Command(BaseCommand):
                 committee, event
             )
             if not meeting_report:
+                self.complete_meeting(event['id'])
                 continue
             if self.options['commit']:
                 meeting_report.save()
@@ -336,12 +554,28 @@ class Command(BaseCommand):
             if not event.get('body'):
                 self.stdout.write(
                     "Skipping an entry with an empty or missing body\n")
+                self.complete_meeting(event['id'])
                 continue
-            self.get_appearances(
-                meeting_report,
-                event['body'],
-                event['chairperson']
-            )
+            to_parse.append((meeting_report, event))
+
+        # The bodies of all the committee's meetings are parsed
+        # together, in the worker processes if there are any:
+        parse_args = [
+            (meeting_report.api_meeting_id, event['body'], event['chairperson'])
+            for meeting_report, event in to_parse
+        ]
+        if self.parse_pool:
+            parsed = self.parse_pool.imap(parse_event_appearances, parse_args)
+        else:
+            parsed = (parse_event_appearances(a) for a in parse_args)
+        for (meeting_report, event), (chairpeople, appearances) in izip(to_parse, parsed):
+            self.stdout.write(u"meeting {0}\n".format(event['id']))
+            self.save_appearances(meeting_report, chairpeople, appearances)
+            self.complete_meeting(event['id'])
+
+    def complete_meeting(self, meeting_id):
+        if self.options['commit']:
+            self.checkpoint.add(meeting_id)
 
     def get_meeting_report(self, committee, committee_event):
         api_committee_id = committee['id']
@@ -393,88 +627,24 @@ class Command(BaseCommand):
             )
         return meeting_report
 
-    def get_appearances(self, meeting_report, body, api_chairperson):
-        meeting_id = meeting_report.api_meeting_id
-        write_prettified_html(body, meeting_id, 'meeting-body')
-        body = re.sub(r'&nbsp;', ' ', body)
-        body = strip_tags_from_html(body)
-        soup = write_prettified_html(body, meeting_id, 'meeting-body-bleached')
-        chairpeople = api_chairperson or find_chairpeople(soup)
+    def save_appearances(self, meeting_report, chairpeople, parsed_appearances):
+        for full_name in chairpeople:
+            self.stdout.write(u"  chair => {0}\n".format(full_name))
 
         appearances = []
-
-        chairperson_name_matches = []
-        if chairpeople:
-            chairperson_name_matches = get_names_from_appearance(
-                chairpeople, allow_no_party=True
-            )
-            for name_match in chairperson_name_matches:
-                full_name = format_name_match(name_match)
-                self.stdout.write(u"  chair => {0}\n".format(full_name))
-
-        def get_appearance(text, name='', party='', chair=False, **kwargs):
-            """Create a new apperance and indicate that on the console"""
+        for text, name, party, chair in parsed_appearances:
+            # Create a new apperance and indicate that on the console
             self.stdout.write(u"    {0}appearance from {1} ({2})".format(
                 'chairperson ' if chair else '',
                 name,
                 party,
             ))
-            return PMGCommitteeAppearance(
+            appearances.append(PMGCommitteeAppearance(
                 report=meeting_report,
                 party=party,
                 person=name,
                 text=text,
-            )
-
-        found_chairperson_appearances = False
-
-        # Consider as a (real) appearance any navigable string right
-        # under a <p>:
-        for p in soup.find_all('p'):
-            for appearance in p.children:
-                if not isinstance(appearance, NavigableString):
-                    continue
-                # Ignore whitespace only:
-                appearance = appearance.strip()
-                if not appearance:
-                    continue
-                # Don't try to match names in a list of apologies;
-                # it'll make an appearance for that person when they
-                # weren't there:
-                if is_apologies_statement(appearance):
-                    continue
-                # The first time "The Chairperson" is mentioned,
-                # create an appearance for each of the chairpersons'
-                # names:
-                if ('The Chairperson' in appearance and
-                        not found_chairperson_appearances):
-                    found_chairperson_appearances = True
-                    for name_match in chairperson_name_matches:
-                        appearances.append(
-                            get_appearance(
-                                appearance,
-                                chair=True,
-                                **name_match.groupdict()
-                            )
-                        )
-                # Now add any normal name matches:
-                for name_match in get_names_from_appearance(appearance):
-                    appearances.append(
-                        get_appearance(appearance, **name_match.groupdict())
-                    )
-
-        if not found_chairperson_appearances:
-            # If there were no appearances from 'The Chairperson' make
-            # sure there's at least a 'pseudo-appearance' saying that
-            # they chaired the meeting.
-            appearances = [
-                get_appearance(
-                    '{0} chaired the meeting'.format(
-                        format_name_match(name_match)
-                    ),
-                    **name_match.groupdict()
-                ) for name_match in chairperson_name_matches
-            ] + appearances
+            ))
 
         self.stdout.write("{0} appearances found\n".format(len(appearances)))
 
@@ -539,9 +709,57 @@ class Command(BaseCommand):
                 for row in csv.DictReader(f):
                     self.meeting_from_api_id[row['committee_meeting_id']] = row
 
-            for committee in all_committees():
-                if self.process_all_committees or self.specified_committee(committee['id']):
-                    self.handle_committee(committee)
+            workers = options['workers']
+            if workers < 1:
+                raise CommandError("--workers must be at least 1")
+
+            self.parse_pool = None
+            if workers > 1:
+                # Parse the meeting bodies in worker processes, which
+                # mustn't inherit this process's database connection.
+                connections.close_all()
+                self.parse_pool = Pool(workers)
+            fetch_pool = ThreadPool(workers)
+            self.checkpoint = ScrapeCheckpoint(
+                checkpoint_filename,
+                resume=options['resume'],
+                record=options['commit'])
+
+            finished = False
+            try:
+                client = PMGAPIClient(
+                    workers=workers,
+                    requests_per_second=options['requests_per_second'],
+                )
+                committees = iter([
+                    committee for committee in all_committees(client)
+                    if self.process_all_committees or self.specified_committee(committee['id'])
+                ])
+
+                # Fetch the next few committees (and their meetings) in
+                # the background while earlier ones are being handled,
+                # but no more, so that they don't pile up in memory:
+                def fetch(committee):
+                    return committee, fetch_pool.apply_async(
+                        client.get_json, (committee['url'],))
+                fetching = deque(fetch(c) for c in islice(committees, workers))
+                while fetching:
+                    committee, full_committee_results = fetching.popleft()
+                    fetching.extend(fetch(c) for c in islice(committees, 1))
+                    self.handle_committee(committee, full_committee_results.get())
+                finished = True
+            finally:
+                self.checkpoint.close()
+                for pool in (fetch_pool, self.parse_pool):
+                    if not pool:
+                        continue
+                    if finished:
+                        pool.close()
+                    else:
+                        # Don't wait for the work that's still queued
+                        # before the error is reported.
+                        pool.terminate()
+                    pool.join()
 
         if options['save_json']:
 
@@ -612,6 +830,8 @@ class Command(BaseCommand):
             if not options['delete_existing']:
                 reports = reports_all.filter(sayit_section=None)
 
+            name_index = NameResolutionIndex()
+
             for report in reports.iterator():
 
                 if not self.should_process_report(report):
@@ -635,12 +855,14 @@ class Command(BaseCommand):
                         '4555',
                         '5421',
                         '8277',
-                    )
+                    ),
+                    name_index=name_index,
                 )
                 try:
                     message = "Importing {0} ({1})\n"
                     self.stdout.write(message.format(report.id, filename))
                     section = importer.import_document(filename)
+                    self.stdout.write("{0}\n".format(importer.resolution_summary()))
 
                     report.sayit_section = section
                     report.last_sayit_import = datetime.now().date()
@@ -26,6 +26,7 @@ import requests
 
 from pombola.south_africa.models import ParliamentaryTerm
 from pombola.za_hansard.models import Question, Answer, QuestionParsingError
+from pombola.za_hansard.importers.import_base import NameResolutionIndex
 from pombola.za_hansard.importers.import_json import ImportJson
 from instances.models import Instance
 
@@ -711,6 +712,8 @@ class Command(BaseCommand):
             raise CommandError(
                 "Instance specified not found (%s)" % options['instance'])
 
+        name_index = NameResolutionIndex()
+
         questions = (Question.objects
                      .filter(sayit_section=None)  # not already imported
                      )
@@ -723,7 +726,7 @@ class Command(BaseCommand):
             if not os.path.exists(path):
                 continue
 
-            importer = ImportJson(instance=instance)
+            importer = ImportJson(instance=instance, name_index=name_index)
             self.stderr.write("TRYING %s\n" % path)
             try:
                 section = importer.import_document(path)
@@ -751,6 +754,8 @@ class Command(BaseCommand):
                     msg
                 )
                 continue
+            if self.verbose:
+                self.stdout.write("%s\n" % importer.resolution_summary())
             section_ids.append(section)
             question.sayit_section = section
             question.last_sayit_import = datetime.now().date()
@@ -776,7 +781,7 @@ class Command(BaseCommand):
             if not os.path.exists(path):
                 continue
 
-            importer = ImportJson(instance=instance)
+            importer = ImportJson(instance=instance, name_index=name_index)
             if self.verbose:
                 self.stdout.write("TRYING %s\n" % path)
             try:
@@ -808,6 +813,8 @@ class Command(BaseCommand):
                 )
                 continue
 
+            if self.verbose:
+                self.stdout.write("%s\n" % importer.resolution_summary())
             section_ids.append(section.id)
             answer.sayit_section = section
             answer.last_sayit_import = datetime.now().date()
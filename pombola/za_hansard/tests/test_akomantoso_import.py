@@ -17,6 +17,7 @@ from instances.tests import InstanceTestCase
 from popolo_name_resolver.resolve import EntityName, recreate_entities
 
 from speeches.models import Speaker, Section
+from pombola.za_hansard.importers.import_base import NameResolutionIndex
 from pombola.za_hansard.importers.import_za_akomantoso import (
     ImportZAAkomaNtoso,
     title_case_heading,
@@ -74,6 +75,28 @@ class ImportZAAkomaNtosoTests(InstanceTestCase):
             % (speaker_name, speaker_count),
         )
 
+    def test_import_hansard_with_shared_name_index(self):
+        document_path = os.path.join(self._in_fixtures, "SMALL_HANSARD.xml")
+        name_index = NameResolutionIndex()
+
+        first = ImportZAAkomaNtoso(
+            instance=self.instance, commit=True, name_index=name_index)
+        first.import_document(document_path)
+        speakers_after_first = Speaker.objects.count()
+
+        second = ImportZAAkomaNtoso(
+            instance=self.instance, commit=True, name_index=name_index)
+        second.import_document(document_path)
+
+        # The second document reuses the first's resolver and speakers
+        self.assertEqual(1, len(name_index.resolvers))
+        self.assertEqual(speakers_after_first, Speaker.objects.count())
+        self.assertTrue(second.resolution_lookups)
+        self.assertIn(
+            "Resolved %d names" % second.resolution_lookups,
+            second.resolution_summary(),
+        )
+
     def test_import_hansard_speakers(self):
         document_name = "NA200912.xml"
         document_path = os.path.join(self._in_fixtures, document_name)
@@ -1,15 +1,17 @@
 from datetime import date, time
+from StringIO import StringIO
 
 from django.test import TestCase
 from django.core.management import call_command
 
 from nose.plugins.attrib import attr
+import requests_mock
 
 from speeches.tests.helpers import create_sections
 from speeches.models import Speech, Tag
 
 from mock import patch
-from pombola.za_hansard.models import Source
+from pombola.za_hansard.models import PMGCommitteeAppearance, Source
 
 
 @attr(country="south_africa")
@@ -144,3 +146,71 @@ class ZaHansardCheckForNewSourcesFromPMGTests(TestCase):
 
         first_source = Source.objects.get(document_number=1)
         self.assertIsNotNone(first_source)
+
+
+@attr(country="south_africa")
+class ZaHansardPMGAPIScraperTests(TestCase):
+    def setUp(self):
+        self.requests_mock = requests_mock.Mocker()
+        self.requests_mock.start()
+        self.addCleanup(self.requests_mock.stop)
+
+        committee_url = 'https://api.pmg.org.za/committee/7/'
+        self.requests_mock.get(
+            'https://api.pmg.org.za/committee/?page=0',
+            json={'results': [{
+                'id': 7,
+                'name': 'Health',
+                'url': committee_url,
+                'premium': False,
+            }]},
+        )
+        self.requests_mock.get(
+            'https://api.pmg.org.za/committee/?page=1',
+            json={'results': []},
+        )
+        self.requests_mock.get(
+            committee_url,
+            json={'events': [{
+                'id': 42,
+                'date': '2019-03-05T10:00:00+02:00',
+                'url': 'https://api.pmg.org.za/committee-meeting/42/',
+                'title': 'Briefing by the Department',
+                'chairperson': 'Ms J Doe (ANC)',
+                'body': (
+                    '<p>The Chairperson opened the meeting.</p>'
+                    '<p>Mr A Smith (DA) asked about the budget.</p>'
+                ),
+            }]},
+            headers={'ETag': '"committee-7"'},
+        )
+
+    def scrape(self, **options):
+        out = StringIO()
+        call_command(
+            'za_hansard_pmg_api_scraper',
+            scrape=True,
+            commit=True,
+            requests_per_second=0,
+            stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_scrape_and_resume(self):
+        output = self.scrape()
+        self.assertIn('api_meeting_id 42', output)
+        self.assertEqual(
+            sorted(PMGCommitteeAppearance.objects.values_list('person', 'party')),
+            [('A Smith', 'DA'), ('J Doe', 'ANC')],
+        )
+
+        # The committee is refetched conditionally, and the meeting
+        # that has been done is skipped:
+        output = self.scrape(resume=True)
+        self.assertEqual(
+            self.requests_mock.last_request.headers['If-None-Match'],
+            '"committee-7"',
+        )
+        self.assertNotIn('api_meeting_id 42', output)
+        self.assertEqual(PMGCommitteeAppearance.objects.count(), 2)